@@ -21,6 +21,12 @@ except ImportError:
     logger.exception("ForumEngine: 论坛主持人模块未找到，将以纯监控模式运行")
     HOST_AVAILABLE = False
 
+# 主持人发言写入后推送给同进程的读取方
+try:
+    from utils.forum_reader import publish_host_speech
+except ImportError:
+    publish_host_speech = None
+
 class LogMonitor:
     """基于文件变化的智能日志监控器"""
    
@@ -87,6 +93,8 @@ class LogMonitor:
             with open(self.forum_log_file, 'w', encoding='utf-8') as f:
                 pass  # 先创建空文件
             self.write_to_forum_log(f"=== ForumEngine 监控开始 - {start_time} ===", "SYSTEM")
+            if publish_host_speech:
+                publish_host_speech(None, str(self.log_dir))
                
             logger.info(f"ForumEngine: forum.log 已清空并初始化")
             
@@ -117,6 +125,8 @@ class LogMonitor:
                     else:
                         f.write(f"[{timestamp}] {content_one_line}\n")
                     f.flush()
+                if source == "HOST" and publish_host_speech:
+                    publish_host_speech(content, str(self.log_dir))
         except Exception as e:
             logger.exception(f"ForumEngine: 写入forum.log失败: {e}")
     
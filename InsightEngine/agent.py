@@ -5,9 +5,11 @@ Deep Search Agent主类
 
 import json
 import os
+import sys
 import re
+from concurrent.futures import Future
 from datetime import datetime
-from typing import Optional, Dict, Any, List, Union
+from typing import Optional, Callable, Dict, Any, List, Union, Tuple
 from loguru import logger
 
 from .llms import LLMClient
@@ -24,32 +26,55 @@ from .tools import MediaCrawlerDB, DBResponse, keyword_optimizer, multilingual_s
 from .utils.config import settings, Settings
 from .utils import format_search_results_for_prompt
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.research_scheduler import ResearchScheduler
+from utils.result_store import configure_result_store, get_result_store, result_id
+from utils.checkpoint import new_run_id, read_checkpoint, write_checkpoint, list_checkpoints, maintain_result_store
+from utils.near_duplicates import get_near_duplicate_index
+
 
 class DeepSearchAgent:
     """Deep Search Agent主类"""
     
-    def __init__(self, config: Optional[Settings] = None):
+    def __init__(self, config: Optional[Settings] = None, llm_client: Optional[LLMClient] = None):
         """
         初始化Deep Search Agent
         
         Args:
             config: 可选配置对象（不填则用全局settings）
+            llm_client: 可选的LLM客户端（引擎宿主中同一引擎的任务共用一个），不填则按配置创建
         """
         self.config = config or settings
         
+        # 搜索结果正文写入共享的结果存储，状态中只保留ID；超过保留期且未被断点引用的旧结果在后台清理
+        configure_result_store(self.config.RESULT_STORE_PATH)
+        maintain_result_store(get_result_store(), self._checkpoint_dir(), self.config.RESULT_RETENTION_DAYS)
+        
         # 初始化LLM客户端
-        self.llm_client = self._initialize_llm()
+        self.llm_client = llm_client or self._initialize_llm()
         
         
         # 初始化搜索工具集
         self.search_agency = MediaCrawlerDB()
         
+        # 近似重复索引：同一次运行中不同搜索返回的转发、搬运内容只保留一份
+        self.near_duplicates = get_near_duplicate_index(self.config.NEAR_DUPLICATE_INDEX_PATH,
+                                                        self.config.NEAR_DUPLICATE_MAX_DISTANCE)
+        
         # 初始化情感分析器
         self.sentiment_analyzer = multilingual_sentiment_analyzer
         
         # 初始化节点
         self._initialize_nodes()
         
+        # 段落研究流水线：一个段落总结时，后续段落的搜索规划和搜索提前进行
+        self.scheduler = ResearchScheduler(
+            {"llm": self.config.RESEARCH_LLM_CONCURRENCY, "db": self.config.RESEARCH_DB_CONCURRENCY},
+            max_workers=max(1, self.config.RESEARCH_PREFETCH_PARAGRAPHS),
+            name="InsightEngine",
+        )
+        self._prefetched: Dict[int, Future] = {}
+        
         # 状态
         self.state = State()
         
@@ -77,6 +102,23 @@ class DeepSearchAgent:
         self.reflection_summary_node = ReflectionSummaryNode(self.llm_client)
         self.report_formatting_node = ReportFormattingNode(self.llm_client)
     
+    def _filter_near_duplicates(self, items: List, text_of: Callable[[Any], str], paragraph_index: Optional[int],
+                                label: str) -> List:
+        """
+        去掉近似重复的搜索结果：本批内去重，并去掉本段落中其他搜索已经返回过的内容
+        作用域按段落划分，不同段落各自需要的相同内容不会被前面的段落占用
+        """
+        if self.config.NEAR_DUPLICATE_CROSS_RUN:
+            scope = ""
+        elif self.state.run_id and paragraph_index is not None:
+            scope = f"{self.state.run_id}:{paragraph_index}"
+        else:
+            scope = None
+        unique = self.near_duplicates.filter(items, text_of, scope=scope, source=f"{self.state.run_id}:{label}")
+        if len(unique) < len(items):
+            logger.info(f"  - 去除 {len(items) - len(unique)} 条近似重复结果")
+        return unique
+    
     def _validate_date_format(self, date_str: str) -> bool:
         """
         验证日期格式是否为YYYY-MM-DD
@@ -117,11 +159,15 @@ class DeepSearchAgent:
             query: 搜索关键词/话题
             **kwargs: 额外参数（如start_date, end_date, platform, limit, enable_sentiment等）
                      enable_sentiment: 是否自动对搜索结果进行情感分析（默认True）
+                     dedup_label: 近似重复去重的来源标识（如段落序号），同一来源重新执行时不会与自己去重
+                     dedup_paragraph: 所属段落的下标，与本段落此前的搜索结果去重，未指定时只在本次结果内去重
             
         Returns:
             DBResponse对象（可能包含情感分析结果）
         """
         logger.info(f"  → 执行数据库查询工具: {tool_name}")
+        dedup_label = kwargs.pop("dedup_label", tool_name)
+        dedup_paragraph = kwargs.pop("dedup_paragraph", None)
         
         # 对于热点内容搜索，不需要关键词优化（因为不需要query参数）
         if tool_name == "search_hot_content":
@@ -219,7 +265,7 @@ class DeepSearchAgent:
                 continue
         
         # 去重和整合结果
-        unique_results = self._deduplicate_results(all_results)
+        unique_results = self._deduplicate_results(all_results, dedup_label, dedup_paragraph)
         logger.info(f"  总计找到 {total_count} 条结果，去重后 {len(unique_results)} 条")
         
         # 构建整合后的响应
@@ -247,21 +293,21 @@ class DeepSearchAgent:
         
         return integrated_response
     
-    def _deduplicate_results(self, results: List) -> List:
+    def _deduplicate_results(self, results: List, label: str = "", paragraph_index: Optional[int] = None) -> List:
         """
-        去重搜索结果
+        去重搜索结果：先按URL去掉完全相同的结果，再按内容的SimHash去掉近似重复（转发、引用、跨平台搬运）
         """
         seen = set()
         unique_results = []
         
         for result in results:
-            # 使用URL或内容作为去重标识
-            identifier = result.url if result.url else result.title_or_content[:100]
-            if identifier not in seen:
-                seen.add(identifier)
-                unique_results.append(result)
+            if result.url and result.url in seen:
+                continue
+            seen.add(result.url)
+            unique_results.append(result)
         
-        return unique_results
+        return self._filter_near_duplicates(unique_results, lambda result: result.title_or_content,
+                                            paragraph_index, label)
     
     def _perform_sentiment_analysis(self, results: List) -> Optional[Dict[str, Any]]:
         """
@@ -286,6 +332,7 @@ class DeepSearchAgent:
             results_dict = []
             for result in results:
                 result_dict = {
+                    "result_id": result_id(result.url, result.title_or_content, result.title_or_content),
                     "content": result.title_or_content,
                     "platform": result.platform,
                     "author": result.author_nickname,
@@ -404,7 +451,10 @@ class DeepSearchAgent:
             
         except Exception as e:
             logger.exception(f"研究过程中发生错误: {str(e)}")
+            self._log_resume_hint()
             raise e
+        finally:
+            self._finish_run()
     
     def _generate_report_structure(self, query: str):
         """生成报告结构"""
@@ -415,6 +465,10 @@ class DeepSearchAgent:
         
         # 生成结构并更新状态
         self.state = report_structure_node.mutate_state(state=self.state)
+        self._prefetched = {}
+        self.scheduler.reset()
+        self.state.run_id = new_run_id()
+        self._checkpoint("报告结构")
         
         _message = f"报告结构已生成，共 {len(self.state.paragraphs)} 个段落:"
         for i, paragraph in enumerate(self.state.paragraphs, 1):
@@ -426,6 +480,10 @@ class DeepSearchAgent:
         total_paragraphs = len(self.state.paragraphs)
         
         for i in range(total_paragraphs):
+            if self.state.paragraphs[i].is_completed():
+                logger.info(f"\n[步骤 2.{i+1}] 段落已完成（断点恢复），跳过: {self.state.paragraphs[i].title}")
+                continue
+            
             logger.info(f"\n[步骤 2.{i+1}] 处理段落: {self.state.paragraphs[i].title}")
             logger.info("-" * 50)
             
@@ -437,12 +495,13 @@ class DeepSearchAgent:
             
             # 标记段落完成
             self.state.paragraphs[i].research.mark_completed()
+            self._checkpoint(f"段落{i + 1}完成")
             
             progress = (i + 1) / total_paragraphs * 100
             logger.info(f"段落处理完成 ({progress:.1f}%)")
     
-    def _initial_search_and_summary(self, paragraph_index: int):
-        """执行初始搜索和总结"""
+    def _initial_search(self, paragraph_index: int) -> Tuple[str, List[Dict[str, Any]]]:
+        """生成初始搜索查询并执行搜索，只读取段落标题和内容，可在后台线程中提前执行"""
         paragraph = self.state.paragraphs[paragraph_index]
         
         # 准备搜索输入
@@ -453,7 +512,8 @@ class DeepSearchAgent:
         
         # 生成搜索查询和工具选择
         logger.info("  - 生成搜索查询...")
-        search_output = self.first_search_node.run(search_input)
+        search_output = self.scheduler.run("first_search", "llm", self.first_search_node.run, search_input,
+                                           label=f"段落{paragraph_index + 1}")
         search_query = search_output["search_query"]
         search_tool = search_output.get("search_tool", "search_topic_globally")  # 默认工具
         reasoning = search_output["reasoning"]
@@ -516,7 +576,10 @@ class DeepSearchAgent:
                 limit = self.config.DEFAULT_SEARCH_TOPIC_ON_PLATFORM_LIMIT
             search_kwargs["limit"] = limit
         
-        search_response = self.execute_search_tool(search_tool, search_query, **search_kwargs)
+        search_kwargs["dedup_label"] = f"段落{paragraph_index + 1}"
+        search_kwargs["dedup_paragraph"] = paragraph_index
+        search_response = self.scheduler.run("search", "db", self.execute_search_tool, search_tool, search_query,
+                                             label=f"段落{paragraph_index + 1}", **search_kwargs)
         
         # 转换为兼容格式
         search_results = []
@@ -540,6 +603,8 @@ class DeepSearchAgent:
                     'engagement': result.engagement
                 })
         
+        self._attach_sentiment(search_results, search_response)
+        
         if search_results:
             _message = f"  - 找到 {len(search_results)} 个搜索结果"
             for j, result in enumerate(search_results, 1):
@@ -549,6 +614,50 @@ class DeepSearchAgent:
         else:
             logger.info("  - 未找到搜索结果")
         
+        return search_query, search_results
+    
+    @staticmethod
+    def _attach_sentiment(search_results: List[Dict[str, Any]], search_response: Optional[DBResponse]):
+        """
+        把情感分析的高置信度结果按结果ID对应到搜索结果上，供搜索结果打包时分层和排序
+        不同平台、不同作者的内容可能完全相同，按内容对应会把一条的情感标到另一条上
+        """
+        if not search_results or not search_response:
+            return
+        sentiment_analysis = search_response.parameters.get("sentiment_analysis") or {}
+        labels = {}
+        for item in sentiment_analysis.get("high_confidence_results", []):
+            item_id = item.get("original_data", {}).get("result_id")
+            if item_id:
+                labels[item_id] = (item.get("sentiment"), item.get("confidence", 0.0))
+        for result in search_results:
+            item_id = result_id(result["url"], result["title"], result["content"])
+            if item_id in labels:
+                result["sentiment"], result["sentiment_confidence"] = labels[item_id]
+    
+    def _prefetch_initial_searches(self, paragraph_index: int):
+        """在后台提前执行之后若干段落的初始搜索"""
+        last = min(paragraph_index + self.config.RESEARCH_PREFETCH_PARAGRAPHS, len(self.state.paragraphs) - 1)
+        for i in range(paragraph_index + 1, last + 1):
+            if i not in self._prefetched and not self.state.paragraphs[i].research.latest_summary:
+                self._prefetched[i] = self.scheduler.submit("prefetch_search", self._initial_search, i,
+                                                            label=f"段落{i + 1}")
+    
+    def _initial_search_and_summary(self, paragraph_index: int):
+        """执行初始搜索和总结"""
+        paragraph = self.state.paragraphs[paragraph_index]
+        if paragraph.research.latest_summary:
+            logger.info("  - 初始总结已完成（断点恢复），跳过")
+            return
+        
+        # 已提前开始的搜索直接等待结果，否则在当前线程执行
+        pending = self._prefetched.pop(paragraph_index, None)
+        self._prefetch_initial_searches(paragraph_index)
+        if pending:
+            search_query, search_results = pending.result()
+        else:
+            search_query, search_results = self._initial_search(paragraph_index)
+        
         # 更新状态中的搜索历史
         paragraph.research.add_search_results(search_query, search_results)
         
@@ -559,22 +668,26 @@ class DeepSearchAgent:
             "content": paragraph.content,
             "search_query": search_query,
             "search_results": format_search_results_for_prompt(
-                search_results, self.config.MAX_CONTENT_LENGTH
+                search_results, self.config.MAX_CONTENT_LENGTH,
+                self.config.SEARCH_RESULTS_TOKEN_BUDGET
             )
         }
         
         # 更新状态
-        self.state = self.first_summary_node.mutate_state(
-            summary_input, self.state, paragraph_index
+        self.state = self.scheduler.run(
+            "first_summary", "llm", self.first_summary_node.mutate_state,
+            summary_input, self.state, paragraph_index, label=f"段落{paragraph_index + 1}"
         )
         
+        self._checkpoint(f"段落{paragraph_index + 1}首次总结")
         logger.info("  - 初始总结完成")
     
     def _reflection_loop(self, paragraph_index: int):
         """执行反思循环"""
         paragraph = self.state.paragraphs[paragraph_index]
         
-        for reflection_i in range(self.config.MAX_REFLECTIONS):
+        # 断点恢复时从已完成的反思轮数之后继续
+        for reflection_i in range(paragraph.research.reflection_iteration, self.config.MAX_REFLECTIONS):
             logger.info(f"  - 反思 {reflection_i + 1}/{self.config.MAX_REFLECTIONS}...")
             
             # 准备反思输入
@@ -585,7 +698,9 @@ class DeepSearchAgent:
             }
             
             # 生成反思搜索查询
-            reflection_output = self.reflection_node.run(reflection_input)
+            label = f"段落{paragraph_index + 1}-反思{reflection_i + 1}"
+            reflection_output = self.scheduler.run("reflection", "llm", self.reflection_node.run,
+                                                   reflection_input, label=label)
             search_query = reflection_output["search_query"]
             search_tool = reflection_output.get("search_tool", "search_topic_globally")  # 默认工具
             reasoning = reflection_output["reasoning"]
@@ -649,7 +764,10 @@ class DeepSearchAgent:
                     limit = self.config.DEFAULT_SEARCH_TOPIC_ON_PLATFORM_LIMIT
                 search_kwargs["limit"] = limit
             
-            search_response = self.execute_search_tool(search_tool, search_query, **search_kwargs)
+            search_kwargs["dedup_label"] = label
+            search_kwargs["dedup_paragraph"] = paragraph_index
+            search_response = self.scheduler.run("reflection_search", "db", self.execute_search_tool,
+                                                 search_tool, search_query, label=label, **search_kwargs)
             
             # 转换为兼容格式
             search_results = []
@@ -673,6 +791,8 @@ class DeepSearchAgent:
                         'engagement': result.engagement
                     })
             
+            self._attach_sentiment(search_results, search_response)
+            
             if search_results:
                 _message = f"    找到 {len(search_results)} 个反思搜索结果"
                 for j, result in enumerate(search_results, 1):
@@ -691,16 +811,19 @@ class DeepSearchAgent:
                 "content": paragraph.content,
                 "search_query": search_query,
                 "search_results": format_search_results_for_prompt(
-                    search_results, self.config.MAX_CONTENT_LENGTH
+                    search_results, self.config.MAX_CONTENT_LENGTH,
+                    self.config.SEARCH_RESULTS_TOKEN_BUDGET
                 ),
                 "paragraph_latest_state": paragraph.research.latest_summary
             }
             
             # 更新状态
-            self.state = self.reflection_summary_node.mutate_state(
-                reflection_summary_input, self.state, paragraph_index
+            self.state = self.scheduler.run(
+                "reflection_summary", "llm", self.reflection_summary_node.mutate_state,
+                reflection_summary_input, self.state, paragraph_index, label=label
             )
             
+            self._checkpoint(f"段落{paragraph_index + 1}反思{reflection_i + 1}")
             logger.info(f"    反思 {reflection_i + 1} 完成")
     
     def _generate_final_report(self) -> str:
@@ -717,7 +840,7 @@ class DeepSearchAgent:
         
         # 格式化报告
         try:
-            final_report = self.report_formatting_node.run(report_data)
+            final_report = self.scheduler.run("report_formatting", "llm", self.report_formatting_node.run, report_data)
         except Exception as e:
             logger.exception(f"LLM格式化失败，使用备用方法: {str(e)}")
             final_report = self.report_formatting_node.format_report_manually(
@@ -727,6 +850,8 @@ class DeepSearchAgent:
         # 更新状态
         self.state.final_report = final_report
         self.state.mark_completed()
+        self._checkpoint("最终报告")
+        self.scheduler.log_summary()
         
         logger.info("最终报告生成完成")
         return final_report
@@ -753,11 +878,87 @@ class DeepSearchAgent:
             state_filepath = os.path.join(self.config.OUTPUT_DIR, state_filename)
             self.state.save_to_file(state_filepath)
             logger.info(f"状态已保存到: {state_filepath}")
+            trace_filepath = os.path.join(self.config.OUTPUT_DIR, f"trace_{query_safe}_{timestamp}.json")
+            self.scheduler.save_trace(trace_filepath)
+            logger.info(f"阶段耗时记录已保存到: {trace_filepath}")
     
     def get_progress_summary(self) -> Dict[str, Any]:
         """获取进度摘要"""
         return self.state.get_progress_summary()
     
+    def resume(self, run_id: str, save_report: bool = True) -> str:
+        """
+        从断点继续一次中断的研究
+        已完成的段落直接跳过，未完成段落中已完成的首次总结和反思不会重新执行
+        
+        Args:
+            run_id: 运行ID（research开始时生成，见日志或 list_checkpoints）
+            save_report: 是否保存报告到文件
+            
+        Returns:
+            最终报告内容
+        """
+        self.load_checkpoint(run_id)
+        if self.state.is_completed and self.state.final_report:
+            logger.info(f"运行 {run_id} 已生成最终报告，直接返回")
+            return self.state.final_report
+        
+        progress = self.state.get_progress_summary()
+        logger.info(f"\n{'='*60}")
+        logger.info(f"从断点继续研究: {self.state.query}（已完成 {progress['completed_paragraphs']}/{progress['total_paragraphs']} 个段落）")
+        logger.info(f"{'='*60}")
+        
+        try:
+            self._process_paragraphs()
+            final_report = self._generate_final_report()
+            if save_report:
+                self._save_report(final_report)
+            logger.info("深度研究完成！")
+            return final_report
+        except Exception as e:
+            logger.exception(f"研究过程中发生错误: {str(e)}")
+            self._log_resume_hint()
+            raise e
+        finally:
+            self._finish_run()
+    
+    def _checkpoint_dir(self) -> str:
+        return self.config.CHECKPOINT_DIR or os.path.join(self.config.OUTPUT_DIR, "checkpoints")
+    
+    def _checkpoint(self, stage: str):
+        """保存断点，写入失败只记录警告，不中断研究"""
+        if not self.config.ENABLE_CHECKPOINTS or not self.state.run_id:
+            return
+        try:
+            self.state.update_timestamp()
+            path = write_checkpoint(self._checkpoint_dir(), self.state.run_id, self.state.to_dict())
+            logger.debug(f"断点已保存（{stage}）: {path}")
+        except (OSError, TypeError, ValueError) as e:
+            logger.warning(f"保存断点失败（{stage}）: {str(e)}")
+    
+    def _finish_run(self):
+        """一次研究结束（完成或出错）后释放提前搜索的后台线程和本次运行的近似重复索引"""
+        self._prefetched = {}
+        self.scheduler.shutdown()
+        if self.state.run_id:
+            self.near_duplicates.drop_scopes(f"{self.state.run_id}:")
+    
+    def _log_resume_hint(self):
+        if self.config.ENABLE_CHECKPOINTS and self.state.run_id:
+            logger.info(f"已完成的阶段保存在断点中，可调用 resume('{self.state.run_id}') 继续研究")
+    
+    def load_checkpoint(self, run_id: str):
+        """加载断点作为当前状态"""
+        self.state = State.from_dict(read_checkpoint(self._checkpoint_dir(), run_id))
+        self.state.run_id = run_id
+        self._prefetched = {}
+        self.scheduler.reset()
+        logger.info(f"已加载运行 {run_id} 的断点")
+    
+    def list_checkpoints(self, include_completed: bool = False) -> List[Dict[str, Any]]:
+        """列出可以继续的运行"""
+        return list_checkpoints(self._checkpoint_dir(), include_completed)
+    
     def load_state(self, filepath: str):
         """从文件加载状态"""
         self.state = State.load_from_file(filepath)
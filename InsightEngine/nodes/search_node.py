@@ -4,17 +4,15 @@
 """
 
 import json
-from typing import Dict, Any
+from typing import Dict, Any, Union
 from json.decoder import JSONDecodeError
 from loguru import logger
 
 from .base_node import BaseNode
 from ..prompts import SYSTEM_PROMPT_FIRST_SEARCH, SYSTEM_PROMPT_REFLECTION
 from ..utils.text_processing import (
-    remove_reasoning_from_output,
-    clean_json_tags,
-    extract_clean_response,
-    fix_incomplete_json
+    JSONStreamResult,
+    parse_llm_json
 )
 
 
@@ -48,7 +46,7 @@ class FirstSearchNode(BaseNode):
         
         Args:
             input_data: 包含title和content的字符串或字典
-            **kwargs: 额外参数
+            **kwargs: 额外参数，on_field 为顶层字段完成时的回调（如拿到search_query即可提前开始搜索）
             
         Returns:
             包含search_query和reasoning的字典
@@ -66,7 +64,9 @@ class FirstSearchNode(BaseNode):
             logger.info("正在生成首次搜索查询")
             
             # 调用LLM（流式，安全拼接UTF-8）
-            response = self.llm_client.stream_invoke_to_string(SYSTEM_PROMPT_FIRST_SEARCH, message)
+            response = self.llm_client.stream_invoke_json(
+                SYSTEM_PROMPT_FIRST_SEARCH, message, on_field=kwargs.get("on_field")
+            )
             
             # 处理响应
             processed_response = self.process_output(response)
@@ -78,47 +78,28 @@ class FirstSearchNode(BaseNode):
             logger.exception(f"生成首次搜索查询失败: {str(e)}")
             raise e
     
-    def process_output(self, output: str) -> Dict[str, str]:
+    def process_output(self, output: Union[str, JSONStreamResult]) -> Dict[str, str]:
         """
         处理LLM输出，提取搜索查询和推理
         
         Args:
-            output: LLM原始输出
+            output: LLM原始输出，或 stream_invoke_json 边接收边解析的结果
             
         Returns:
             包含search_query和reasoning的字典
         """
         try:
-            # 清理响应文本
-            cleaned_output = remove_reasoning_from_output(output)
-            cleaned_output = clean_json_tags(cleaned_output)
+            parsed = parse_llm_json(output)
             
             # 记录清理后的输出用于调试
-            logger.info(f"清理后的输出: {cleaned_output}")
+            logger.info(f"清理后的输出: {parsed.text}")
+            if parsed.repaired:
+                logger.warning("LLM输出不完整，已按未闭合的结构补全")
             
-            # 解析JSON
-            try:
-                result = json.loads(cleaned_output)
-                logger.info("JSON解析成功")
-            except JSONDecodeError as e:
-                logger.error(f"JSON解析失败: {str(e)}")
-                # 使用更强大的提取方法
-                result = extract_clean_response(cleaned_output)
-                if "error" in result:
-                    logger.error("JSON解析失败，尝试修复...")
-                    # 尝试修复JSON
-                    fixed_json = fix_incomplete_json(cleaned_output)
-                    if fixed_json:
-                        try:
-                            result = json.loads(fixed_json)
-                            logger.info("JSON修复成功")
-                        except JSONDecodeError:
-                            logger.error("JSON修复失败")
-                            # 返回默认查询
-                            return self._get_default_search_query()
-                    else:
-                        logger.error("无法修复JSON，使用默认查询")
-                        return self._get_default_search_query()
+            result = parsed.value
+            if not isinstance(result, dict):
+                logger.error("JSON解析失败，使用默认查询")
+                return self._get_default_search_query()
             
             # 验证和清理结果
             search_query = result.get("search_query", "")
@@ -183,7 +164,7 @@ class ReflectionNode(BaseNode):
         
         Args:
             input_data: 包含title、content和paragraph_latest_state的字符串或字典
-            **kwargs: 额外参数
+            **kwargs: 额外参数，on_field 为顶层字段完成时的回调（如拿到search_query即可提前开始搜索）
             
         Returns:
             包含search_query和reasoning的字典
@@ -201,7 +182,9 @@ class ReflectionNode(BaseNode):
             logger.info("正在进行反思并生成新搜索查询")
             
             # 调用LLM（流式，安全拼接UTF-8）
-            response = self.llm_client.stream_invoke_to_string(SYSTEM_PROMPT_REFLECTION, message)
+            response = self.llm_client.stream_invoke_json(
+                SYSTEM_PROMPT_REFLECTION, message, on_field=kwargs.get("on_field")
+            )
             
             # 处理响应
             processed_response = self.process_output(response)
@@ -213,47 +196,28 @@ class ReflectionNode(BaseNode):
             logger.exception(f"反思生成搜索查询失败: {str(e)}")
             raise e
     
-    def process_output(self, output: str) -> Dict[str, str]:
+    def process_output(self, output: Union[str, JSONStreamResult]) -> Dict[str, str]:
         """
         处理LLM输出，提取搜索查询和推理
         
         Args:
-            output: LLM原始输出
+            output: LLM原始输出，或 stream_invoke_json 边接收边解析的结果
             
         Returns:
             包含search_query和reasoning的字典
         """
         try:
-            # 清理响应文本
-            cleaned_output = remove_reasoning_from_output(output)
-            cleaned_output = clean_json_tags(cleaned_output)
+            parsed = parse_llm_json(output)
             
             # 记录清理后的输出用于调试
-            logger.info(f"清理后的输出: {cleaned_output}")
+            logger.info(f"清理后的输出: {parsed.text}")
+            if parsed.repaired:
+                logger.warning("LLM输出不完整，已按未闭合的结构补全")
             
-            # 解析JSON
-            try:
-                result = json.loads(cleaned_output)
-                logger.info("JSON解析成功")
-            except JSONDecodeError as e:
-                logger.error(f"JSON解析失败: {str(e)}")
-                # 使用更强大的提取方法
-                result = extract_clean_response(cleaned_output)
-                if "error" in result:
-                    logger.error("JSON解析失败，尝试修复...")
-                    # 尝试修复JSON
-                    fixed_json = fix_incomplete_json(cleaned_output)
-                    if fixed_json:
-                        try:
-                            result = json.loads(fixed_json)
-                            logger.info("JSON修复成功")
-                        except JSONDecodeError:
-                            logger.error("JSON修复失败")
-                            # 返回默认查询
-                            return self._get_default_reflection_query()
-                    else:
-                        logger.error("无法修复JSON，使用默认查询")
-                        return self._get_default_reflection_query()
+            result = parsed.value
+            if not isinstance(result, dict):
+                logger.error("JSON解析失败，使用默认查询")
+                return self._get_default_reflection_query()
             
             # 验证和清理结果
             search_query = result.get("search_query", "")
@@ -5,29 +5,41 @@
 
 import os
 import sys
+import threading
+import importlib
+import importlib.util
 from typing import List, Dict, Any, Optional, Union
 from dataclasses import dataclass
 import re
 
-try:
-    import torch
-    TORCH_AVAILABLE = True
-except ImportError:
-    torch = None  # type: ignore
-    TORCH_AVAILABLE = False
+from InsightEngine.utils.config import settings
 
-try:
-    from transformers import AutoTokenizer, AutoModelForSequenceClassification
-    TRANSFORMERS_AVAILABLE = True
-except ImportError:
-    AutoTokenizer = None  # type: ignore
-    AutoModelForSequenceClassification = None  # type: ignore
-    TRANSFORMERS_AVAILABLE = False
+# torch 和 transformers 导入需要数秒，只检查是否安装，首次加载模型时才真正导入
+TORCH_AVAILABLE = importlib.util.find_spec("torch") is not None
+TRANSFORMERS_AVAILABLE = importlib.util.find_spec("transformers") is not None
+
+_LAZY_ATTRIBUTES = {
+    "torch": ("torch", None),
+    "AutoTokenizer": ("transformers", "AutoTokenizer"),
+    "AutoModelForSequenceClassification": ("transformers", "AutoModelForSequenceClassification"),
+}
+
+
+def __getattr__(name: str):
+    """兼容原先的模块级 torch / AutoTokenizer / AutoModelForSequenceClassification（PEP 562，访问时才导入）"""
+    if name not in _LAZY_ATTRIBUTES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    module_name, attribute = _LAZY_ATTRIBUTES[name]
+    module = importlib.import_module(module_name)
+    return getattr(module, attribute) if attribute else module
 
 
 # INFO：若想跳过情感分析，可手动切换此开关为False
 SENTIMENT_ANALYSIS_ENABLED = True
 
+# 模型推理服务中托管的多语言情感模型名称，见 SentimentAnalysisModel/model_server.py
+SERVER_MODEL_NAME = "multilingual"
+
 def _describe_missing_dependencies() -> str:
     missing = []
     if not TORCH_AVAILABLE:
@@ -40,6 +52,7 @@ def _describe_missing_dependencies() -> str:
 project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 weibo_sentiment_path = os.path.join(project_root, "SentimentAnalysisModel", "WeiboMultilingualSentiment")
 sys.path.append(weibo_sentiment_path)
+sys.path.append(os.path.join(project_root, "SentimentAnalysisModel"))
 
 @dataclass
 class SentimentResult:
@@ -75,9 +88,16 @@ class WeiboMultilingualSentimentAnalyzer:
         self.model = None
         self.tokenizer = None
         self.device = None
+        # 纯CPU环境下若已导出ONNX模型，则用ONNX Runtime代替PyTorch推理
+        self.onnx_model = None
         self.is_initialized = False
         self.is_disabled = False
         self.disable_reason: Optional[str] = None
+        # 配置了 SENTIMENT_MODEL_SERVER 时，推理交给共享的模型服务完成，本进程不加载模型
+        self.server_address: Optional[str] = settings.SENTIMENT_MODEL_SERVER
+        self.server_client = None
+        # 引擎宿主中多个研究任务共用本实例，模型加载需要加锁
+        self._init_lock = threading.Lock()
         
         # 情感标签映射（5级分类）
         self.sentiment_map = {
@@ -90,7 +110,7 @@ class WeiboMultilingualSentimentAnalyzer:
 
         if not SENTIMENT_ANALYSIS_ENABLED:
             self.disable("情感分析功能已在配置中关闭。")
-        elif not (TORCH_AVAILABLE and TRANSFORMERS_AVAILABLE):
+        elif not self.server_address and not (TORCH_AVAILABLE and TRANSFORMERS_AVAILABLE):
             missing = _describe_missing_dependencies() or "未知依赖"
             self.disable(f"缺少依赖: {missing}，情感分析已禁用。")
 
@@ -108,6 +128,8 @@ class WeiboMultilingualSentimentAnalyzer:
             self.model = None
             self.tokenizer = None
             self.device = None
+            self.onnx_model = None
+            self.server_client = None
             self.is_initialized = False
 
     def enable(self) -> bool:
@@ -115,7 +137,7 @@ class WeiboMultilingualSentimentAnalyzer:
         if not SENTIMENT_ANALYSIS_ENABLED:
             self.disable("情感分析功能已在配置中关闭。")
             return False
-        if not (TORCH_AVAILABLE and TRANSFORMERS_AVAILABLE):
+        if not self.server_address and not (TORCH_AVAILABLE and TRANSFORMERS_AVAILABLE):
             missing = _describe_missing_dependencies() or "未知依赖"
             self.disable(f"缺少依赖: {missing}，情感分析已禁用。")
             return False
@@ -127,41 +149,93 @@ class WeiboMultilingualSentimentAnalyzer:
         """Select the best available torch device."""
         if not TORCH_AVAILABLE:
             return None
+        import torch
         if torch.cuda.is_available():
             return torch.device("cuda")
         mps_backend = getattr(torch.backends, "mps", None)
         if mps_backend and getattr(mps_backend, "is_available", lambda: False)() and getattr(mps_backend, "is_built", lambda: False)():
             return torch.device("mps")
         return torch.device("cpu")
+
+    def _connect_server(self) -> bool:
+        """连接模型推理服务，服务可用且托管了多语言情感模型时返回True"""
+        from model_server import ModelServerClient, ModelServerError
+
+        client = ModelServerClient(self.server_address)
+        try:
+            models = client.health().get("models", {})
+        except ModelServerError as e:
+            print(f"模型推理服务不可用: {e}")
+            return False
+        if "classify" not in models.get(SERVER_MODEL_NAME, []):
+            print(f"模型推理服务 {self.server_address} 未托管 {SERVER_MODEL_NAME} 模型")
+            return False
+        self.server_client = client
+        return True
+
+    def _load_onnx_model(self, local_model_path: str) -> bool:
+        """纯CPU环境下加载已导出的ONNX模型（优先int8量化版本），成功返回True"""
+        import torch
+        if torch.cuda.is_available():
+            return False
+        try:
+            from onnx_backend import load_onnx_classifier
+            onnx_model = load_onnx_classifier(local_model_path)
+        except Exception as e:
+            print(f"ONNX模型加载失败，回退到PyTorch: {e}")
+            return False
+        if onnx_model is None:
+            return False
+        self.onnx_model = onnx_model
+        self.is_initialized = True
+        self.enable()
+        print(f"已加载ONNX模型: {onnx_model.onnx_path}，使用 ONNX Runtime 在CPU上推理")
+        return True
     
     def initialize(self) -> bool:
         """
-        初始化模型和分词器
+        初始化模型和分词器（线程安全，并发调用时只加载一次）
         
         Returns:
             是否初始化成功
         """
+        with self._init_lock:
+            return self._initialize()
+
+    def _initialize(self) -> bool:
         if self.is_disabled:
             reason = self.disable_reason or "情感分析功能已禁用"
             print(f"情感分析功能已禁用，跳过模型加载：{reason}")
             return False
 
+        if self.is_initialized:
+            print("模型已经初始化，无需重复加载")
+            return True
+
+        if self.server_address:
+            if self._connect_server():
+                self.is_initialized = True
+                print(f"已连接模型推理服务: {self.server_address}，情感分析将由服务端批量完成")
+                return True
+            print("回退到本进程加载模型")
+
         if not (TORCH_AVAILABLE and TRANSFORMERS_AVAILABLE):
             missing = _describe_missing_dependencies() or "未知依赖"
             self.disable(f"缺少依赖: {missing}，情感分析已禁用。", drop_state=True)
             print(f"缺少依赖: {missing}，无法加载情感分析模型。")
             return False
-
-        if self.is_initialized:
-            print("模型已经初始化，无需重复加载")
-            return True
             
         try:
             print("正在加载多语言情感分析模型...")
+            from transformers import AutoTokenizer, AutoModelForSequenceClassification
             
             # 使用多语言情感分析模型
             model_name = "tabularisai/multilingual-sentiment-analysis"
             local_model_path = os.path.join(weibo_sentiment_path, "model")
+
+            # 已通过 SentimentAnalysisModel/onnx_backend.py 导出ONNX时优先使用
+            if self._load_onnx_model(local_model_path):
+                return True
             
             # 检查本地是否已有模型
             if os.path.exists(local_model_path):
@@ -230,6 +304,63 @@ class WeiboMultilingualSentimentAnalyzer:
         text = re.sub(r'\s+', ' ', text.strip())
         
         return text
+
+    def _analyze_remote(self, texts: List[str]) -> List[SentimentResult]:
+        """
+        通过模型推理服务批量分析，整批文本一次请求，服务端再与其他调用方的请求合并成微批次
+
+        Args:
+            texts: 文本列表
+
+        Returns:
+            与输入一一对应的SentimentResult列表
+        """
+        from model_server import ModelServerError
+
+        results: List[Optional[SentimentResult]] = [None] * len(texts)
+        pending = []
+        for i, text in enumerate(texts):
+            processed_text = self._preprocess_text(text)
+            if processed_text:
+                pending.append((i, processed_text))
+            else:
+                results[i] = SentimentResult(
+                    text=text,
+                    sentiment_label="输入错误",
+                    confidence=0.0,
+                    probability_distribution={},
+                    success=False,
+                    error_message="输入文本为空或无效内容",
+                    analysis_performed=False
+                )
+
+        if pending:
+            try:
+                predictions = self.server_client.classify(SERVER_MODEL_NAME, [text for _, text in pending])
+            except ModelServerError as e:
+                predictions = None
+                error_message = f"模型推理服务调用失败: {e}"
+            for n, (i, _) in enumerate(pending):
+                if predictions is None:
+                    results[i] = SentimentResult(
+                        text=texts[i],
+                        sentiment_label="分析失败",
+                        confidence=0.0,
+                        probability_distribution={},
+                        success=False,
+                        error_message=error_message,
+                        analysis_performed=False
+                    )
+                    continue
+                prediction = predictions[n]
+                results[i] = SentimentResult(
+                    text=texts[i],
+                    sentiment_label=prediction["label"],
+                    confidence=prediction["confidence"],
+                    probability_distribution=prediction["probabilities"],
+                    success=True
+                )
+        return results
     
     def analyze_single_text(self, text: str) -> SentimentResult:
         """
@@ -263,12 +394,47 @@ class WeiboMultilingualSentimentAnalyzer:
                 analysis_performed=False
             )
 
-        try:
-            # 预处理文本
-            processed_text = self._preprocess_text(text)
+        if self.server_client is not None:
+            return self._analyze_remote([text])[0]
+        return self._analyze_local([text])[0]
+
+    def _predict_probabilities(self, texts: List[str]) -> List[List[float]]:
+        """对一批已预处理的文本做一次前向推理，返回各文本的类别概率"""
+        if self.onnx_model is not None:
+            return self.onnx_model.predict_proba(texts, max_length=512, batch_size=len(texts)).tolist()
+
+        import torch
+        inputs = self.tokenizer(
+            texts,
+            max_length=512,
+            padding=True,
+            truncation=True,
+            return_tensors='pt'
+        )
+        inputs = {k: v.to(self.device) for k, v in inputs.items()}
+        with torch.no_grad():
+            outputs = self.model(**inputs)
+            return torch.softmax(outputs.logits, dim=1).tolist()
 
-            if not processed_text:
-                return SentimentResult(
+    def _analyze_local(self, texts: List[str], batch_size: int = 32) -> List[SentimentResult]:
+        """
+        用本进程加载的模型批量分析，按长度排序后分批前向，减少同一批次内的填充
+
+        Args:
+            texts: 文本列表
+            batch_size: 每次前向的文本数
+
+        Returns:
+            与输入一一对应的SentimentResult列表
+        """
+        results: List[Optional[SentimentResult]] = [None] * len(texts)
+        pending = []
+        for i, text in enumerate(texts):
+            processed_text = self._preprocess_text(text)
+            if processed_text:
+                pending.append((i, processed_text))
+            else:
+                results[i] = SentimentResult(
                     text=text,
                     sentiment_label="输入错误",
                     confidence=0.0,
@@ -278,52 +444,33 @@ class WeiboMultilingualSentimentAnalyzer:
                     analysis_performed=False
                 )
 
-            # 分词编码
-            inputs = self.tokenizer(
-                processed_text,
-                max_length=512,
-                padding=True,
-                truncation=True,
-                return_tensors='pt'
-            )
-
-            # 转移到设备
-            inputs = {k: v.to(self.device) for k, v in inputs.items()}
-
-            # 预测
-            with torch.no_grad():
-                outputs = self.model(**inputs)
-                logits = outputs.logits
-                probabilities = torch.softmax(logits, dim=1)
-                prediction = torch.argmax(probabilities, dim=1).item()
-
-            # 构建结果
-            confidence = probabilities[0][prediction].item()
-            label = self.sentiment_map[prediction]
-
-            # 构建概率分布字典
-            prob_dist = {}
-            for label_name, prob in zip(self.sentiment_map.values(), probabilities[0]):
-                prob_dist[label_name] = prob.item()
-
-            return SentimentResult(
-                text=text,
-                sentiment_label=label,
-                confidence=confidence,
-                probability_distribution=prob_dist,
-                success=True
-            )
-
-        except Exception as e:
-            return SentimentResult(
-                text=text,
-                sentiment_label="分析失败",
-                confidence=0.0,
-                probability_distribution={},
-                success=False,
-                error_message=f"预测时发生错误: {str(e)}",
-                analysis_performed=False
-            )
+        pending.sort(key=lambda item: len(item[1]))
+        for start in range(0, len(pending), batch_size):
+            batch = pending[start:start + batch_size]
+            try:
+                batch_probabilities = self._predict_probabilities([text for _, text in batch])
+            except Exception as e:
+                for i, _ in batch:
+                    results[i] = SentimentResult(
+                        text=texts[i],
+                        sentiment_label="分析失败",
+                        confidence=0.0,
+                        probability_distribution={},
+                        success=False,
+                        error_message=f"预测时发生错误: {str(e)}",
+                        analysis_performed=False
+                    )
+                continue
+            for (i, _), probabilities in zip(batch, batch_probabilities):
+                prediction = max(range(len(probabilities)), key=probabilities.__getitem__)
+                results[i] = SentimentResult(
+                    text=texts[i],
+                    sentiment_label=self.sentiment_map[prediction],
+                    confidence=probabilities[prediction],
+                    probability_distribution=dict(zip(self.sentiment_map.values(), probabilities)),
+                    success=True
+                )
+        return results
 
     def analyze_batch(self, texts: List[str], show_progress: bool = True) -> BatchSentimentResult:
         """
@@ -371,14 +518,17 @@ class WeiboMultilingualSentimentAnalyzer:
         results = []
         success_count = 0
         total_confidence = 0.0
-        
-        for i, text in enumerate(texts):
+
+        if self.server_client is not None:
             if show_progress and len(texts) > 1:
-                print(f"处理进度: {i+1}/{len(texts)}")
-            
-            result = self.analyze_single_text(text)
-            results.append(result)
-            
+                print(f"提交 {len(texts)} 条文本到模型推理服务")
+            results = self._analyze_remote(texts)
+        else:
+            if show_progress and len(texts) > 1:
+                print(f"批量分析 {len(texts)} 条文本")
+            results = self._analyze_local(texts)
+
+        for result in results:
             if result.success:
                 success_count += 1
                 total_confidence += result.confidence
@@ -563,7 +713,9 @@ class WeiboMultilingualSentimentAnalyzer:
             ],
             "sentiment_levels": list(self.sentiment_map.values()),
             "is_initialized": self.is_initialized,
-            "device": str(self.device) if self.device else "未设置"
+            "device": str(self.device) if self.device else "未设置",
+            "backend": "onnxruntime" if self.onnx_model is not None else "torch",
+            "model_server": self.server_address if self.server_client is not None else None
         }
 
 
@@ -8,6 +8,7 @@ from .text_processing import (
     clean_markdown_tags, 
     remove_reasoning_from_output,
     extract_clean_response,
+    parse_llm_json,
     update_state_with_search_results,
     format_search_results_for_prompt
 )
@@ -17,6 +18,7 @@ __all__ = [
     "clean_markdown_tags",
     "remove_reasoning_from_output", 
     "extract_clean_response",
+    "parse_llm_json",
     "update_state_with_search_results",
     "format_search_results_for_prompt",
 ]
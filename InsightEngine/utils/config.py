@@ -23,9 +23,18 @@ class Settings(BaseSettings):
     DB_CHARSET: str = Field("utf8mb4", description="数据库字符集")
     DB_DIALECT: Optional[str] = Field("mysql", description="数据库方言，如mysql、postgresql等，SQLAlchemy后端选择")
     MAX_REFLECTIONS: int = Field(3, description="最大反思次数")
+    RESEARCH_PREFETCH_PARAGRAPHS: int = Field(1, description="段落总结时提前进行搜索规划和搜索的后续段落数，0表示不提前")
+    RESULT_STORE_PATH: str = Field("cache/search_results.db", description="搜索结果去重存储（SQLite）路径，研究状态中只保存结果ID")
+    RESULT_RETENTION_DAYS: int = Field(30, description="搜索结果存储的保留天数，超过该天数未再出现且没有断点引用的结果在引擎启动时清理，0表示不清理")
+    NEAR_DUPLICATE_INDEX_PATH: Optional[str] = Field("cache/near_duplicates.db", description="搜索结果近似重复索引（SQLite）路径，为空则只保存在内存中")
+    NEAR_DUPLICATE_MAX_DISTANCE: int = Field(3, description="SimHash汉明距离不超过该值的搜索结果视为近似重复")
+    NEAR_DUPLICATE_CROSS_RUN: bool = Field(False, description="是否跨研究运行去重（开启后近期运行中出现过的内容也会被去掉）")
+    RESEARCH_LLM_CONCURRENCY: int = Field(2, description="研究流程中同时进行的LLM调用数上限")
+    RESEARCH_DB_CONCURRENCY: int = Field(2, description="研究流程中同时进行的数据库查询数上限")
     MAX_PARAGRAPHS: int = Field(6, description="最大段落数")
     SEARCH_TIMEOUT: int = Field(240, description="单次搜索请求超时")
     MAX_CONTENT_LENGTH: int = Field(500000, description="搜索最大内容长度")
+    SEARCH_RESULTS_TOKEN_BUDGET: int = Field(12000, description="每次总结提示词中搜索结果的token预算，超出时去重并按热度、互动量、时间和情感置信度分层挑选，0表示不限制")
     DEFAULT_SEARCH_HOT_CONTENT_LIMIT: int = Field(100, description="热榜内容默认最大数")
     DEFAULT_SEARCH_TOPIC_GLOBALLY_LIMIT_PER_TABLE: int = Field(50, description="按表全局话题最大数")
     DEFAULT_SEARCH_TOPIC_BY_DATE_LIMIT_PER_TABLE: int = Field(100, description="按日期话题最大数")
@@ -33,8 +42,11 @@ class Settings(BaseSettings):
     DEFAULT_SEARCH_TOPIC_ON_PLATFORM_LIMIT: int = Field(200, description="平台搜索话题最大数")
     MAX_SEARCH_RESULTS_FOR_LLM: int = Field(0, description="供LLM用搜索结果最大数")
     MAX_HIGH_CONFIDENCE_SENTIMENT_RESULTS: int = Field(0, description="高置信度情感分析最大数")
+    SENTIMENT_MODEL_SERVER: Optional[str] = Field(None, description="情感模型推理服务地址，如http://127.0.0.1:8765或unix:///tmp/bettafish_models.sock，为空则在本进程加载模型")
     OUTPUT_DIR: str = Field("reports", description="输出路径")
     SAVE_INTERMEDIATE_STATES: bool = Field(True, description="是否保存中间状态")
+    ENABLE_CHECKPOINTS: bool = Field(True, description="是否在每次总结后保存断点，用于中断后从断点继续研究")
+    CHECKPOINT_DIR: Optional[str] = Field(None, description="断点保存目录，为空时使用 OUTPUT_DIR/checkpoints")
 
     class Config:
         env_file = ".env"
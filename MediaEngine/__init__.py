@@ -3,10 +3,28 @@ Deep Search Agent
 一个无框架的深度搜索AI代理实现
 """
 
-from .agent import DeepSearchAgent, create_agent
-from .utils.config import Settings
+import importlib
 
 __version__ = "1.0.0"
 __author__ = "Deep Search Agent Team"
 
+_LAZY_EXPORTS = {
+    "DeepSearchAgent": ".agent",
+    "create_agent": ".agent",
+    "Settings": ".utils.config",
+}
+
 __all__ = ["DeepSearchAgent", "create_agent", "Settings"]
+
+
+def __getattr__(name):
+    """按需导入（PEP 562）：导入包或其中的配置模块时不再加载Agent及其LLM、搜索依赖"""
+    if name not in _LAZY_EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_LAZY_EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_EXPORTS))
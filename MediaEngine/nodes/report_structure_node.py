@@ -4,7 +4,7 @@
 """
 
 import json
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Union
 from json.decoder import JSONDecodeError
 from loguru import logger
 
@@ -12,10 +12,8 @@ from .base_node import StateMutationNode
 from ..state.state import State
 from ..prompts import SYSTEM_PROMPT_REPORT_STRUCTURE
 from ..utils.text_processing import (
-    remove_reasoning_from_output,
-    clean_json_tags,
-    extract_clean_response,
-    fix_incomplete_json
+    JSONStreamResult,
+    parse_llm_json
 )
 
 
@@ -52,7 +50,7 @@ class ReportStructureNode(StateMutationNode):
             logger.info(f"正在为查询生成报告结构: {self.query}")
             
             # 调用LLM
-            response = self.llm_client.stream_invoke_to_string(SYSTEM_PROMPT_REPORT_STRUCTURE, self.query)
+            response = self.llm_client.stream_invoke_json(SYSTEM_PROMPT_REPORT_STRUCTURE, self.query)
             
             # 处理响应
             processed_response = self.process_output(response)
@@ -64,47 +62,28 @@ class ReportStructureNode(StateMutationNode):
             logger.exception(f"生成报告结构失败: {str(e)}")
             raise e
     
-    def process_output(self, output: str) -> List[Dict[str, str]]:
+    def process_output(self, output: Union[str, JSONStreamResult]) -> List[Dict[str, str]]:
         """
         处理LLM输出，提取报告结构
         
         Args:
-            output: LLM原始输出
+            output: LLM原始输出，或 stream_invoke_json 边接收边解析的结果
             
         Returns:
             处理后的报告结构列表
         """
         try:
-            # 清理响应文本
-            cleaned_output = remove_reasoning_from_output(output)
-            cleaned_output = clean_json_tags(cleaned_output)
+            parsed = parse_llm_json(output)
             
             # 记录清理后的输出用于调试
-            logger.info(f"清理后的输出: {cleaned_output}")
-            
-            # 解析JSON
-            try:
-                report_structure = json.loads(cleaned_output)
-                logger.info("JSON解析成功")
-            except JSONDecodeError as e:
-                logger.error(f"JSON解析失败: {str(e)}")
-                # 使用更强大的提取方法
-                report_structure = extract_clean_response(cleaned_output)
-                if "error" in report_structure:
-                    logger.error("JSON解析失败，尝试修复...")
-                    # 尝试修复JSON
-                    fixed_json = fix_incomplete_json(cleaned_output)
-                    if fixed_json:
-                        try:
-                            report_structure = json.loads(fixed_json)
-                            logger.info("JSON修复成功")
-                        except JSONDecodeError:
-                            logger.error("JSON修复失败")
-                            # 返回默认结构
-                            return self._generate_default_structure()
-                    else:
-                        logger.error("无法修复JSON，使用默认结构")
-                        return self._generate_default_structure()
+            logger.info(f"清理后的输出: {parsed.text}")
+            if parsed.repaired:
+                logger.warning("LLM输出不完整，已按未闭合的结构补全")
+            
+            report_structure = parsed.value
+            if report_structure is None:
+                logger.error("JSON解析失败，使用默认结构")
+                return self._generate_default_structure()
             
             # 验证结构
             if not isinstance(report_structure, list):
@@ -4,7 +4,7 @@
 """
 
 import json
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Union
 from json.decoder import JSONDecodeError
 from loguru import logger
 
@@ -12,10 +12,8 @@ from .base_node import StateMutationNode
 from ..state.state import State
 from ..prompts import SYSTEM_PROMPT_FIRST_SUMMARY, SYSTEM_PROMPT_REFLECTION_SUMMARY
 from ..utils.text_processing import (
-    remove_reasoning_from_output,
-    clean_json_tags,
-    extract_clean_response,
-    fix_incomplete_json,
+    JSONStreamResult,
+    parse_llm_json,
     format_search_results_for_prompt
 )
 
@@ -100,7 +98,7 @@ class FirstSummaryNode(StateMutationNode):
             logger.info("正在生成首次段落总结")
             
             # 调用LLM生成总结（流式，安全拼接UTF-8）
-            response = self.llm_client.stream_invoke_to_string(
+            response = self.llm_client.stream_invoke_json(
                 SYSTEM_PROMPT_FIRST_SUMMARY,
                 message,
             )
@@ -115,44 +113,25 @@ class FirstSummaryNode(StateMutationNode):
             logger.exception(f"生成首次总结失败: {str(e)}")
             raise e
     
-    def process_output(self, output: str) -> str:
+    def process_output(self, output: Union[str, JSONStreamResult]) -> str:
         """
         处理LLM输出，提取段落内容
         
         Args:
-            output: LLM原始输出
+            output: LLM原始输出，或 stream_invoke_json 边接收边解析的结果
             
         Returns:
             段落内容
         """
         try:
-            # 清理响应文本
-            cleaned_output = remove_reasoning_from_output(output)
-            cleaned_output = clean_json_tags(cleaned_output)
+            parsed = parse_llm_json(output)
             
             # 记录清理后的输出用于调试
-            logger.info(f"清理后的输出: {cleaned_output}")
+            logger.info(f"清理后的输出: {parsed.text}")
+            if parsed.repaired:
+                logger.warning("LLM输出不完整，已按未闭合的结构补全")
             
-            # 解析JSON
-            try:
-                result = json.loads(cleaned_output)
-                logger.info("JSON解析成功")
-            except JSONDecodeError as e:
-                logger.error(f"JSON解析失败: {str(e)}")
-                # 尝试修复JSON
-                fixed_json = fix_incomplete_json(cleaned_output)
-                if fixed_json:
-                    try:
-                        result = json.loads(fixed_json)
-                        logger.info("JSON修复成功")
-                    except JSONDecodeError:
-                        logger.exception("JSON修复失败，直接使用清理后的文本")
-                        # 如果不是JSON格式，直接返回清理后的文本
-                        return cleaned_output
-                else:
-                    logger.exception("无法修复JSON，直接使用清理后的文本")
-                    # 如果不是JSON格式，直接返回清理后的文本
-                    return cleaned_output
+            result = parsed.value
             
             # 提取段落内容
             if isinstance(result, dict):
@@ -160,8 +139,8 @@ class FirstSummaryNode(StateMutationNode):
                 if paragraph_content:
                     return paragraph_content
             
-            # 如果提取失败，返回原始清理后的文本
-            return cleaned_output
+            # 不是JSON或提取失败时，返回清理后的文本
+            return parsed.text
             
         except Exception as e:
             logger.exception(f"处理输出失败: {str(e)}")
@@ -268,7 +247,7 @@ class ReflectionSummaryNode(StateMutationNode):
             logger.info("正在生成反思总结")
             
             # 调用LLM生成总结（流式，安全拼接UTF-8）
-            response = self.llm_client.stream_invoke_to_string(
+            response = self.llm_client.stream_invoke_json(
                 SYSTEM_PROMPT_REFLECTION_SUMMARY,
                 message,
             )
@@ -283,44 +262,25 @@ class ReflectionSummaryNode(StateMutationNode):
             logger.exception(f"生成反思总结失败: {str(e)}")
             raise e
     
-    def process_output(self, output: str) -> str:
+    def process_output(self, output: Union[str, JSONStreamResult]) -> str:
         """
         处理LLM输出，提取更新后的段落内容
         
         Args:
-            output: LLM原始输出
+            output: LLM原始输出，或 stream_invoke_json 边接收边解析的结果
             
         Returns:
             更新后的段落内容
         """
         try:
-            # 清理响应文本
-            cleaned_output = remove_reasoning_from_output(output)
-            cleaned_output = clean_json_tags(cleaned_output)
+            parsed = parse_llm_json(output)
             
             # 记录清理后的输出用于调试
-            logger.info(f"清理后的输出: {cleaned_output}")
+            logger.info(f"清理后的输出: {parsed.text}")
+            if parsed.repaired:
+                logger.warning("LLM输出不完整，已按未闭合的结构补全")
             
-            # 解析JSON
-            try:
-                result = json.loads(cleaned_output)
-                logger.info("JSON解析成功")
-            except JSONDecodeError as e:
-                logger.error(f"JSON解析失败: {str(e)}")
-                # 尝试修复JSON
-                fixed_json = fix_incomplete_json(cleaned_output)
-                if fixed_json:
-                    try:
-                        result = json.loads(fixed_json)
-                        logger.info("JSON修复成功")
-                    except JSONDecodeError:
-                        logger.error("JSON修复失败，直接使用清理后的文本")
-                        # 如果不是JSON格式，直接返回清理后的文本
-                        return cleaned_output
-                else:
-                    logger.error("无法修复JSON，直接使用清理后的文本")
-                    # 如果不是JSON格式，直接返回清理后的文本
-                    return cleaned_output
+            result = parsed.value
             
             # 提取更新后的段落内容
             if isinstance(result, dict):
@@ -328,8 +288,8 @@ class ReflectionSummaryNode(StateMutationNode):
                 if updated_content:
                     return updated_content
             
-            # 如果提取失败，返回原始清理后的文本
-            return cleaned_output
+            # 不是JSON或提取失败时，返回清理后的文本
+            return parsed.text
             
         except Exception as e:
             logger.exception(f"处理输出失败: {str(e)}")
@@ -3,6 +3,6 @@
 定义Deep Search Agent的状态数据结构
 """
 
-from .state import State, Paragraph, Research, Search
+from .state import State, Paragraph, Research, Search, SearchRound
 
-__all__ = ["State", "Paragraph", "Research", "Search"]
+__all__ = ["State", "Paragraph", "Research", "Search", "SearchRound"]
@@ -6,10 +6,15 @@ Deep Search Agent状态管理
 from dataclasses import dataclass, field
 from typing import List, Dict, Any, Optional
 import json
+import os
+import sys
 from datetime import datetime
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from utils.result_store import get_result_store
 
-@dataclass
+
+@dataclass(slots=True)
 class Search:
     """单个搜索结果的状态"""
     query: str = ""                    # 搜索查询
@@ -43,33 +48,81 @@ class Search:
         )
 
 
-@dataclass
+@dataclass(slots=True)
+class SearchRound:
+    """一次搜索的记录：结果正文在结果存储中，这里只保留ID和评分"""
+    query: str = ""                                                # 搜索查询
+    result_ids: List[str] = field(default_factory=list)            # 结果ID
+    scores: List[Optional[float]] = field(default_factory=list)    # 与结果ID一一对应的相关度评分
+    timestamp: str = field(default_factory=lambda: datetime.now().isoformat())
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为字典格式"""
+        return {
+            "query": self.query,
+            "result_ids": self.result_ids,
+            "scores": self.scores,
+            "timestamp": self.timestamp
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "SearchRound":
+        """从字典创建SearchRound对象"""
+        return cls(
+            query=data.get("query", ""),
+            result_ids=list(data.get("result_ids", [])),
+            scores=list(data.get("scores", [])),
+            timestamp=data.get("timestamp", datetime.now().isoformat())
+        )
+
+
+@dataclass(slots=True)
 class Research:
     """段落研究过程的状态"""
-    search_history: List[Search] = field(default_factory=list)     # 搜索记录列表
+    search_rounds: List[SearchRound] = field(default_factory=list)  # 搜索记录（只含结果ID）
     latest_summary: str = ""                                       # 当前段落的最新总结
     reflection_iteration: int = 0                                  # 反思迭代次数
     is_completed: bool = False                                     # 是否完成研究
+    store_path: Optional[str] = None                               # 结果存储路径，为空使用默认存储
+    
+    def _add_round(self, query: str, results: List[Dict[str, Any]], timestamp: Optional[str] = None):
+        result_ids = get_result_store(self.store_path).put_many(results)
+        search_round = SearchRound(query=query, result_ids=result_ids,
+                                   scores=[result.get("score") for result in results])
+        if timestamp:
+            search_round.timestamp = timestamp
+        self.search_rounds.append(search_round)
     
     def add_search(self, search: Search):
         """添加搜索记录"""
-        self.search_history.append(search)
+        self._add_round(search.query, [search.to_dict()], search.timestamp)
     
     def add_search_results(self, query: str, results: List[Dict[str, Any]]):
         """批量添加搜索结果"""
-        for result in results:
-            search = Search(
-                query=query,
-                url=result.get("url", ""),
-                title=result.get("title", ""),
-                content=result.get("content", ""),
-                score=result.get("score")
-            )
-            self.add_search(search)
+        self._add_round(query, results)
+    
+    @property
+    def search_history(self) -> List[Search]:
+        """从结果存储中还原完整的搜索记录（只在展示时使用）"""
+        ids = [result_id for search_round in self.search_rounds for result_id in search_round.result_ids]
+        stored = get_result_store(self.store_path).get_many(ids)
+        history = []
+        for search_round in self.search_rounds:
+            for result_id, score in zip(search_round.result_ids, search_round.scores):
+                result = stored.get(result_id, {})
+                history.append(Search(
+                    query=search_round.query,
+                    url=result.get("url", ""),
+                    title=result.get("title", ""),
+                    content=result.get("content", ""),
+                    score=score,
+                    timestamp=search_round.timestamp
+                ))
+        return history
     
     def get_search_count(self) -> int:
         """获取搜索次数"""
-        return len(self.search_history)
+        return sum(len(search_round.result_ids) for search_round in self.search_rounds)
     
     def increment_reflection(self):
         """增加反思次数"""
@@ -82,22 +135,25 @@ class Research:
     def to_dict(self) -> Dict[str, Any]:
         """转换为字典格式"""
         return {
-            "search_history": [search.to_dict() for search in self.search_history],
+            "search_rounds": [search_round.to_dict() for search_round in self.search_rounds],
             "latest_summary": self.latest_summary,
             "reflection_iteration": self.reflection_iteration,
             "is_completed": self.is_completed
         }
     
     @classmethod
-    def from_dict(cls, data: Dict[str, Any]) -> "Research":
-        """从字典创建Research对象"""
-        search_history = [Search.from_dict(search_data) for search_data in data.get("search_history", [])]
-        return cls(
-            search_history=search_history,
+    def from_dict(cls, data: Dict[str, Any], store_path: Optional[str] = None) -> "Research":
+        """从字典创建Research对象，兼容旧版本保存的完整search_history"""
+        research = cls(
+            search_rounds=[SearchRound.from_dict(item) for item in data.get("search_rounds", [])],
             latest_summary=data.get("latest_summary", ""),
             reflection_iteration=data.get("reflection_iteration", 0),
-            is_completed=data.get("is_completed", False)
+            is_completed=data.get("is_completed", False),
+            store_path=store_path
         )
+        for search_data in data.get("search_history", []):
+            research.add_search(Search.from_dict(search_data))
+        return research
 
 
 @dataclass
@@ -126,10 +182,10 @@ class Paragraph:
         }
     
     @classmethod
-    def from_dict(cls, data: Dict[str, Any]) -> "Paragraph":
+    def from_dict(cls, data: Dict[str, Any], store_path: Optional[str] = None) -> "Paragraph":
         """从字典创建Paragraph对象"""
         research_data = data.get("research", {})
-        research = Research.from_dict(research_data) if research_data else Research()
+        research = Research.from_dict(research_data, store_path) if research_data else Research(store_path=store_path)
         
         return cls(
             title=data.get("title", ""),
@@ -149,6 +205,8 @@ class State:
     is_completed: bool = False                                     # 是否完成
     created_at: str = field(default_factory=lambda: datetime.now().isoformat())
     updated_at: str = field(default_factory=lambda: datetime.now().isoformat())
+    result_store: Optional[str] = None                             # 搜索结果存储路径，为空使用默认存储
+    run_id: str = ""                                               # 运行ID，断点文件以此命名
     
     def add_paragraph(self, title: str, content: str) -> int:
         """
@@ -162,7 +220,8 @@ class State:
             段落索引
         """
         order = len(self.paragraphs)
-        paragraph = Paragraph(title=title, content=content, order=order)
+        paragraph = Paragraph(title=title, content=content, order=order,
+                              research=Research(store_path=self.result_store))
         self.paragraphs.append(paragraph)
         self.update_timestamp()
         return order
@@ -217,7 +276,9 @@ class State:
             "final_report": self.final_report,
             "is_completed": self.is_completed,
             "created_at": self.created_at,
-            "updated_at": self.updated_at
+            "updated_at": self.updated_at,
+            "result_store": get_result_store(self.result_store).path,
+            "run_id": self.run_id
         }
     
     def to_json(self, indent: int = 2) -> str:
@@ -227,7 +288,8 @@ class State:
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> "State":
         """从字典创建State对象"""
-        paragraphs = [Paragraph.from_dict(p_data) for p_data in data.get("paragraphs", [])]
+        store_path = data.get("result_store")
+        paragraphs = [Paragraph.from_dict(p_data, store_path) for p_data in data.get("paragraphs", [])]
         
         return cls(
             query=data.get("query", ""),
@@ -236,7 +298,9 @@ class State:
             final_report=data.get("final_report", ""),
             is_completed=data.get("is_completed", False),
             created_at=data.get("created_at", datetime.now().isoformat()),
-            updated_at=data.get("updated_at", datetime.now().isoformat())
+            updated_at=data.get("updated_at", datetime.now().isoformat()),
+            result_store=store_path,
+            run_id=data.get("run_id", "")
         )
     
     @classmethod
@@ -9,7 +9,8 @@ from .search import (
     ImageResult,
     ModalCardResult,
     BochaResponse,
-    print_response_summary
+    print_response_summary,
+    get_search_gateway
 )
 
 __all__ = [
@@ -18,5 +19,6 @@ __all__ = [
     "ImageResult",
     "ModalCardResult",
     "BochaResponse",
-    "print_response_summary"
+    "print_response_summary",
+    "get_search_gateway"
 ]
@@ -23,7 +23,8 @@
 import os
 import json
 import sys
-from typing import List, Dict, Any, Optional, Literal
+from functools import partial
+from typing import List, Dict, Any, Optional, Literal, Tuple
 
 from loguru import logger
 from config import settings
@@ -42,6 +43,7 @@ if utils_dir not in sys.path:
     sys.path.append(utils_dir)
 
 from retry_helper import with_graceful_retry, SEARCH_API_RETRY_CONFIG
+from search_gateway import SearchGateway, get_search_gateway
 
 # --- 1. 数据结构定义 ---
 from dataclasses import dataclass, field
@@ -96,15 +98,22 @@ class BochaMultimodalSearch:
 
     BOCHA_BASE_URL = settings.BOCHA_BASE_URL or "https://api.bochaai.com/v1/ai-search"
 
-    def __init__(self, api_key: Optional[str] = None):
+    TOOL_NAMES = (
+        "comprehensive_search", "web_search_only", "search_for_structured_data",
+        "search_last_24_hours", "search_last_week",
+    )
+
+    def __init__(self, api_key: Optional[str] = None, gateway: Optional[SearchGateway] = None):
         """
         初始化客户端。
         Args:
             api_key: Bocha API密钥，若不提供则从环境变量 BOCHA_API_KEY 读取。
+            gateway: 搜索网关（连接池、缓存、并发与离线模拟），若不提供则使用进程内共享的默认网关。
         """
+        self._gateway = gateway or get_search_gateway()
         if api_key is None:
             api_key = settings.BOCHA_WEB_SEARCH_API_KEY
-            if not api_key:
+            if not api_key and not self._gateway.offline:
                 raise ValueError("Bocha API Key未找到！请设置 BOCHA_API_KEY 环境变量或在初始化时提供")
 
         self._headers = {
@@ -171,6 +180,12 @@ class BochaMultimodalSearch:
         return final_response
 
 
+    def _post(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """通过网关共享的连接池发送请求"""
+        response = self._gateway.session.post(self.BOCHA_BASE_URL, headers=self._headers, json=payload, timeout=30)
+        response.raise_for_status()  # 如果HTTP状态码是4xx或5xx，则抛出异常
+        return response.json()
+
     @with_graceful_retry(SEARCH_API_RETRY_CONFIG, default_return=BochaResponse(query="搜索失败"))
     def _search_internal(self, **kwargs) -> BochaResponse:
         """内部通用的搜索执行器，所有工具最终都调用此方法"""
@@ -181,10 +196,8 @@ class BochaMultimodalSearch:
         payload.update(kwargs)
 
         try:
-            response = requests.post(self.BOCHA_BASE_URL, headers=self._headers, json=payload, timeout=30)
-            response.raise_for_status()  # 如果HTTP状态码是4xx或5xx，则抛出异常
-
-            response_dict = response.json()
+            response_dict = self._gateway.search("bocha", payload, self._post,
+                                                 cacheable=lambda result: result.get("code") == 200)
             if response_dict.get("code") != 200:
                 logger.error(f"API返回错误: {response_dict.get('msg', '未知错误')}")
                 return BochaResponse(query=query)
@@ -255,6 +268,17 @@ class BochaMultimodalSearch:
         logger.info(f"--- TOOL: 搜索本周信息 (query: {query}) ---")
         return self._search_internal(query=query, freshness='oneWeek', answer=True)
 
+    def batch_search(self, calls: List[Tuple[str, Dict[str, Any]]]) -> List[BochaResponse]:
+        """
+        并发执行多个工具调用，按输入顺序返回结果。
+        Args:
+            calls: [(工具名称, 参数字典)]，如 [("comprehensive_search", {"query": "A"}), ("search_last_week", {"query": "B"})]
+        """
+        for tool_name, _ in calls:
+            if tool_name not in self.TOOL_NAMES:
+                raise ValueError(f"未知的搜索工具: {tool_name}")
+        return self._gateway.batch([partial(getattr(self, tool_name), **kwargs) for tool_name, kwargs in calls])
+
 
 # --- 3. 测试与使用示例 ---
 
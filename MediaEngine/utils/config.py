@@ -40,8 +40,23 @@ class Settings(BaseSettings):
     BOCHA_API_KEY: Optional[str] = Field(None, description="Bocha 兼容键（别名）")
     
     SEARCH_TIMEOUT: int = Field(240, description="搜索超时（秒）")
+    SEARCH_BACKEND: str = Field("live", description="搜索后端：live调用真实API，fake使用离线模拟结果（用于压测，无需API密钥）")
+    SEARCH_CACHE_DIR: Optional[str] = Field("cache/search", description="搜索结果磁盘缓存目录，多个引擎和多次运行共享，为空则只缓存在内存")
+    SEARCH_CACHE_TTL: int = Field(21600, description="搜索结果缓存有效期（秒），0表示关闭缓存")
+    SEARCH_MAX_WORKERS: int = Field(8, description="批量搜索的最大并发数")
+    SEARCH_FAKE_LATENCY: float = Field(0.0, description="fake后端每次搜索的模拟耗时（秒）")
+    SPECULATIVE_SEARCH: bool = Field(True, description="搜索规划输出search_query与search_tool后立即用所选工具在后台开始搜索（需开启搜索缓存）")
     SEARCH_CONTENT_MAX_LENGTH: int = Field(20000, description="用于提示的最长内容长度")
+    SEARCH_RESULTS_TOKEN_BUDGET: int = Field(12000, description="每次总结提示词中搜索结果的token预算，超出时去重并按热度、互动量、时间和情感置信度分层挑选，0表示不限制")
     MAX_REFLECTIONS: int = Field(2, description="最大反思轮数")
+    RESEARCH_PREFETCH_PARAGRAPHS: int = Field(1, description="段落总结时提前进行搜索规划和搜索的后续段落数，0表示不提前")
+    RESULT_STORE_PATH: str = Field("cache/search_results.db", description="搜索结果去重存储（SQLite）路径，研究状态中只保存结果ID")
+    RESULT_RETENTION_DAYS: int = Field(30, description="搜索结果存储的保留天数，超过该天数未再出现且没有断点引用的结果在引擎启动时清理，0表示不清理")
+    NEAR_DUPLICATE_INDEX_PATH: Optional[str] = Field("cache/near_duplicates.db", description="搜索结果近似重复索引（SQLite）路径，为空则只保存在内存中")
+    NEAR_DUPLICATE_MAX_DISTANCE: int = Field(3, description="SimHash汉明距离不超过该值的搜索结果视为近似重复")
+    NEAR_DUPLICATE_CROSS_RUN: bool = Field(False, description="是否跨研究运行去重（开启后近期运行中出现过的内容也会被去掉）")
+    RESEARCH_LLM_CONCURRENCY: int = Field(2, description="研究流程中同时进行的LLM调用数上限")
+    RESEARCH_SEARCH_CONCURRENCY: int = Field(4, description="研究流程中同时进行的网络搜索数上限")
     MAX_PARAGRAPHS: int = Field(5, description="最大段落数")
     
     MINDSPIDER_API_KEY: Optional[str] = Field(None, description="MindSpider API密钥")
@@ -50,6 +65,8 @@ class Settings(BaseSettings):
     
     OUTPUT_DIR: str = Field("reports", description="输出目录")
     SAVE_INTERMEDIATE_STATES: bool = Field(True, description="是否保存中间状态")
+    ENABLE_CHECKPOINTS: bool = Field(True, description="是否在每次总结后保存断点，用于中断后从断点继续研究")
+    CHECKPOINT_DIR: Optional[str] = Field(None, description="断点保存目录，为空时使用 OUTPUT_DIR/checkpoints")
 
     
     QUERY_ENGINE_API_KEY: str = Field(None, description="Query Agent（推荐DeepSeek，https://www.deepseek.com/）API密钥")
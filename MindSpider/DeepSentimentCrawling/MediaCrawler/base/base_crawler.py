@@ -16,6 +16,9 @@ from playwright.async_api import BrowserContext, BrowserType, Playwright
 
 class AbstractCrawler(ABC):
 
+    # 开启IP代理时在 start() 中创建的代理池（ProxyIpPool），爬取结束后需要停止它的后台巡检任务
+    ip_proxy_pool = None
+
     @abstractmethod
     async def start(self):
         """
@@ -54,6 +57,14 @@ class AbstractCrawler(ABC):
         # 默认实现：回退到标准模式
         return await self.launch_browser(playwright.chromium, playwright_proxy, user_agent, headless)
 
+    async def close_ip_proxy_pool(self):
+        """
+        停止代理池的后台巡检与验证任务
+        """
+        if self.ip_proxy_pool is not None:
+            await self.ip_proxy_pool.close()
+            self.ip_proxy_pool = None
+
 
 class AbstractLogin(ABC):
 
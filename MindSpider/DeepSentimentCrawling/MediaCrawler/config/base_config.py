@@ -24,6 +24,12 @@ IP_PROXY_POOL_COUNT = 2
 # 代理IP提供商名称
 IP_PROXY_PROVIDER_NAME = "kuaidaili"  # kuaidaili | wandouhttp
 
+# 代理池后台巡检间隔（秒），巡检时并发验证代理、剔除失效代理并提前补充
+IP_PROXY_CHECK_INTERVAL_SEC = 30
+
+# 距离过期不足该秒数的代理不再分配
+IP_PROXY_EXPIRE_MARGIN_SEC = 30
+
 # 设置为True不会打开浏览器（无头浏览器）
 # 设置False会打开一个浏览器
 # 小红书如果一直扫码登录不通过，打开浏览器手动过一下滑动验证码
@@ -88,8 +94,13 @@ CRAWLER_MAX_COMMENTS_COUNT_SINGLENOTES = 20
 # 老版本项目使用了 db, 则需参考 schema/tables.sql line 287 增加表字段
 ENABLE_GET_SUB_COMMENTS = False
 
+# 是否开启评论增量爬取模式
+# 开启后会记录每个帖子的评论高水位线（最新评论ID/时间、评论数），再次爬取时只抓取新增评论，
+# 评论数没有变化的帖子直接跳过；关闭则每次都从头翻页爬取全部评论
+ENABLE_INCREMENTAL_COMMENTS = True
+
 # 词云相关
-# 是否开启生成评论词云图
+# 是否开启生成评论词云图（仅 json / csv 存储模式，db / sqlite 模式下评论不经过文件存储，不统计词频）
 ENABLE_GET_WORDCLOUD = False
 # 自定义词语及其分组
 # 添加规则：xx:yy 其中xx为自定义添加的词组，yy为将xx该词组分到的组名。
@@ -104,9 +115,26 @@ STOP_WORDS_FILE = "./docs/hit_stopwords.txt"
 # 中文字体文件路径
 FONT_PATH = "./docs/STZHONGS.TTF"
 
+# 词云只绘制出现频率最高的前 K 个词
+WORD_CLOUD_TOP_K = 20
+
+# 评论分词进程数，评论存储时按批次交给进程池分词，不阻塞爬虫
+WORD_FREQ_WORKERS = 2
+
+# 每攒够多少条评论提交一次分词
+WORD_FREQ_BATCH_SIZE = 200
+
 # 爬取间隔时间
+# 请求速率由自适应速率控制器管理，此值为最慢的请求间隔（即速率下限为每 CRAWLER_MAX_SLEEP_SEC 秒一次）
 CRAWLER_MAX_SLEEP_SEC = 2
 
+# 自适应请求速率（每秒请求数），每个平台共享一个令牌桶：
+# 请求成功时逐步加速到 CRAWLER_MAX_REQUEST_RATE，请求失败时成倍减速，
+# 遇到限流状态码（429/461/471）时额外冷却 CRAWLER_THROTTLE_COOLDOWN_SEC 秒
+CRAWLER_INITIAL_REQUEST_RATE = 1.0
+CRAWLER_MAX_REQUEST_RATE = 4.0
+CRAWLER_THROTTLE_COOLDOWN_SEC = 10
+
 from .bilibili_config import *
 from .xhs_config import *
 from .dy_config import *
@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine, Column, Integer, Text, String, BigInteger
+from sqlalchemy import create_engine, Column, Integer, Text, String, BigInteger, UniqueConstraint
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
@@ -431,4 +431,17 @@ class ZhihuCreator(Base):
     column_count = Column(Integer, default=0)
     get_voteup_count = Column(Integer, default=0)
     add_ts = Column(BigInteger)
-    last_modify_ts = Column(BigInteger)
\ No newline at end of file
+    last_modify_ts = Column(BigInteger)
+
+class CrawlState(Base):
+    __tablename__ = 'crawl_state'
+    __table_args__ = (UniqueConstraint('platform', 'note_id', name='uk_crawl_state_platform_note'),)
+    id = Column(Integer, primary_key=True)
+    platform = Column(String(32), nullable=False, index=True)
+    note_id = Column(String(255), nullable=False, index=True)
+    comment_cursor = Column(Text)
+    latest_comment_id = Column(String(255))
+    latest_comment_time = Column(BigInteger, default=0)
+    comment_count = Column(BigInteger, default=-1)
+    add_ts = Column(BigInteger)
+    last_modify_ts = Column(BigInteger)
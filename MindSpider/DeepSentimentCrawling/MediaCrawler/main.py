@@ -10,6 +10,7 @@
 
 
 import asyncio
+import importlib
 import sys
 from typing import Optional
 
@@ -17,35 +18,30 @@ import cmd_arg
 import config
 from database import db
 from base.base_crawler import AbstractCrawler
-from media_platform.bilibili import BilibiliCrawler
-from media_platform.douyin import DouYinCrawler
-from media_platform.kuaishou import KuaishouCrawler
-from media_platform.tieba import TieBaCrawler
-from media_platform.weibo import WeiboCrawler
-from media_platform.xhs import XiaoHongShuCrawler
-from media_platform.zhihu import ZhihuCrawler
-from tools.async_file_writer import AsyncFileWriter
 from var import crawler_type_var
 
 
 class CrawlerFactory:
+    # 平台 -> (模块, 爬虫类)。只导入本次运行的平台，其他平台的爬虫和依赖不加载
     CRAWLERS = {
-        "xhs": XiaoHongShuCrawler,
-        "dy": DouYinCrawler,
-        "ks": KuaishouCrawler,
-        "bili": BilibiliCrawler,
-        "wb": WeiboCrawler,
-        "tieba": TieBaCrawler,
-        "zhihu": ZhihuCrawler,
+        "xhs": ("media_platform.xhs", "XiaoHongShuCrawler"),
+        "dy": ("media_platform.douyin", "DouYinCrawler"),
+        "ks": ("media_platform.kuaishou", "KuaishouCrawler"),
+        "bili": ("media_platform.bilibili", "BilibiliCrawler"),
+        "wb": ("media_platform.weibo", "WeiboCrawler"),
+        "tieba": ("media_platform.tieba", "TieBaCrawler"),
+        "zhihu": ("media_platform.zhihu", "ZhihuCrawler"),
     }
 
     @staticmethod
     def create_crawler(platform: str) -> AbstractCrawler:
-        crawler_class = CrawlerFactory.CRAWLERS.get(platform)
-        if not crawler_class:
+        target = CrawlerFactory.CRAWLERS.get(platform)
+        if not target:
             raise ValueError(
                 "Invalid Media Platform Currently only supported xhs or dy or ks or bili ..."
             )
+        module_name, class_name = target
+        crawler_class = getattr(importlib.import_module(module_name), class_name)
         return crawler_class()
 
 
@@ -72,11 +68,17 @@ async def main():
 
 
     crawler = CrawlerFactory.create_crawler(platform=config.PLATFORM)
-    await crawler.start()
+    try:
+        await crawler.start()
+    finally:
+        await crawler.close_ip_proxy_pool()
 
     # Generate wordcloud after crawling is complete
-    # Only for JSON save mode
-    if config.SAVE_DATA_OPTION == "json" and config.ENABLE_GET_WORDCLOUD:
+    # Only for JSON/CSV save mode, comments are tokenized incrementally while being stored
+    if config.SAVE_DATA_OPTION in ("json", "csv") and config.ENABLE_GET_WORDCLOUD:
+        # 词云依赖 jieba / matplotlib / wordcloud，需要时才导入
+        from tools.async_file_writer import AsyncFileWriter
+        from tools.words import get_word_frequency_service
         try:
             file_writer = AsyncFileWriter(
                 platform=config.PLATFORM,
@@ -85,6 +87,8 @@ async def main():
             await file_writer.generate_wordcloud_from_comments()
         except Exception as e:
             print(f"Error generating wordcloud: {e}")
+        finally:
+            await get_word_frequency_service().close()
 
 
 def cleanup():
@@ -23,7 +23,10 @@ from playwright.async_api import BrowserContext, Page
 
 import config
 from base.base_crawler import AbstractApiClient
+from proxy.proxy_ip_pool import IpInfoModel, ProxyIpPool, track_proxy
+from store.crawl_state import CommentWatermark
 from tools import utils
+from tools.rate_controller import get_rate_controller
 
 from .exception import DataFetchError
 from .field import CommentOrderType, SearchOrderType
@@ -40,26 +43,35 @@ class BilibiliClient(AbstractApiClient):
         headers: Dict[str, str],
         playwright_page: Page,
         cookie_dict: Dict[str, str],
+        ip_pool: Optional[ProxyIpPool] = None,
+        ip_proxy_info: Optional[IpInfoModel] = None,
     ):
         self.proxy = proxy
+        self.ip_pool = ip_pool
+        self.ip_proxy_info = ip_proxy_info  # 当前代理在代理池中的信息，用于上报代理健康状况
         self.timeout = timeout
         self.headers = headers
         self._host = "https://api.bilibili.com"
         self.playwright_page = playwright_page
         self.cookie_dict = cookie_dict
+        self.rate_controller = get_rate_controller("bili")
 
     async def request(self, method, url, **kwargs) -> Any:
-        async with httpx.AsyncClient(proxy=self.proxy) as client:
-            response = await client.request(method, url, timeout=self.timeout, **kwargs)
-        try:
-            data: Dict = response.json()
-        except json.JSONDecodeError:
-            utils.logger.error(f"[BilibiliClient.request] Failed to decode JSON from response. status_code: {response.status_code}, response_text: {response.text}")
-            raise DataFetchError(f"Failed to decode JSON, content: {response.text}")
-        if data.get("code") != 0:
-            raise DataFetchError(data.get("message", "unkonw error"))
-        else:
-            return data.get("data", {})
+        async with self.rate_controller.request_slot() as slot, \
+                track_proxy(self.ip_pool, self.ip_proxy_info) as proxy_usage:
+            async with httpx.AsyncClient(proxy=self.proxy) as client:
+                response = await client.request(method, url, timeout=self.timeout, **kwargs)
+            slot.observe_status(response.status_code)
+            proxy_usage.observe_status(response.status_code)
+            try:
+                data: Dict = response.json()
+            except json.JSONDecodeError:
+                utils.logger.error(f"[BilibiliClient.request] Failed to decode JSON from response. status_code: {response.status_code}, response_text: {response.text}")
+                raise DataFetchError(f"Failed to decode JSON, content: {response.text}")
+            if data.get("code") != 0:
+                raise DataFetchError(data.get("message", "unkonw error"))
+            else:
+                return data.get("data", {})
 
     async def pre_request_data(self, req_data: Dict) -> Dict:
         """
@@ -236,18 +248,18 @@ class BilibiliClient(AbstractApiClient):
     async def get_video_all_comments(
         self,
         video_id: str,
-        crawl_interval: float = 1.0,
         is_fetch_sub_comments=False,
         callback: Optional[Callable] = None,
         max_count: int = 10,
+        watermark: Optional[CommentWatermark] = None,
     ):
         """
         get video all comments include sub comments
         :param video_id:
-        :param crawl_interval:
         :param is_fetch_sub_comments:
         :param callback:
         max_count: 一次笔记爬取的最大评论数量
+        :param watermark: 评论高水位线，非首次爬取时按时间倒序翻页，遇到已爬取过的评论即停止
 
         :return:
         """
@@ -255,11 +267,13 @@ class BilibiliClient(AbstractApiClient):
         is_end = False
         next_page = 0
         max_retries = 3
+        incremental = watermark is not None and not watermark.is_first_crawl
+        order_mode = CommentOrderType.TIME if incremental else CommentOrderType.DEFAULT
         while not is_end and len(result) < max_count:
             comments_res = None
             for attempt in range(max_retries):
                 try:
-                    comments_res = await self.get_video_comments(video_id, CommentOrderType.DEFAULT, next_page)
+                    comments_res = await self.get_video_comments(video_id, order_mode, next_page)
                     break  # Success
                 except DataFetchError as e:
                     if attempt < max_retries - 1:
@@ -291,19 +305,31 @@ class BilibiliClient(AbstractApiClient):
             if not isinstance(is_end, bool):
                 utils.logger.warning(f"[BilibiliClient.get_video_all_comments] 'is_end' is not a boolean for video_id: {video_id}. Assuming end of comments.")
                 is_end = True
+            if watermark:
+                comment_list = watermark.filter_new_comments(
+                    comment_list,
+                    time_getter=lambda c: c.get("ctime"),
+                    id_getter=lambda c: c.get("rpid"),
+                    limit=max_count - len(result),
+                )
+                watermark.comment_cursor = str(next_page)
+                if watermark.should_stop(ordered_by_time=incremental):
+                    utils.logger.info(f"[BilibiliClient.get_video_all_comments] Reached known comments of video_id: {video_id}, new comments: {watermark.new_comment_count}")
+                    is_end = True
             if is_fetch_sub_comments:
                 for comment in comment_list:
                     comment_id = comment['rpid']
                     if (comment.get("rcount", 0) > 0):
-                        {await self.get_video_all_level_two_comments(video_id, comment_id, CommentOrderType.DEFAULT, 10, crawl_interval, callback)}
+                        {await self.get_video_all_level_two_comments(video_id, comment_id, CommentOrderType.DEFAULT, 10, callback)}
             if len(result) + len(comment_list) > max_count:
                 comment_list = comment_list[:max_count - len(result)]
             if callback:  # 如果有回调函数，就执行回调函数
                 await callback(video_id, comment_list)
-            await asyncio.sleep(crawl_interval)
             if not is_fetch_sub_comments:
                 result.extend(comment_list)
                 continue
+        if watermark and not is_end and len(result) >= max_count:
+            watermark.truncated = True
         return result
 
     async def get_video_all_level_two_comments(
@@ -312,7 +338,6 @@ class BilibiliClient(AbstractApiClient):
         level_one_comment_id: int,
         order_mode: CommentOrderType,
         ps: int = 10,
-        crawl_interval: float = 1.0,
         callback: Optional[Callable] = None,
     ) -> Dict:
         """
@@ -321,7 +346,6 @@ class BilibiliClient(AbstractApiClient):
         :param level_one_comment_id: 一级评论 ID
         :param order_mode:
         :param ps: 一页评论数
-        :param crawl_interval:
         :param callback:
         :return:
         """
@@ -332,7 +356,6 @@ class BilibiliClient(AbstractApiClient):
             comment_list: List[Dict] = result.get("replies", [])
             if callback:  # 如果有回调函数，就执行回调函数
                 await callback(video_id, comment_list)
-            await asyncio.sleep(crawl_interval)
             if (int(result["page"]["count"]) <= pn * ps):
                 break
 
@@ -457,14 +480,12 @@ class BilibiliClient(AbstractApiClient):
     async def get_creator_all_fans(
         self,
         creator_info: Dict,
-        crawl_interval: float = 1.0,
         callback: Optional[Callable] = None,
         max_count: int = 100,
     ) -> List:
         """
         get creator all fans
         :param creator_info:
-        :param crawl_interval:
         :param callback:
         :param max_count: 一个up主爬取的最大粉丝数量
 
@@ -482,7 +503,6 @@ class BilibiliClient(AbstractApiClient):
                 fans_list = fans_list[:max_count - len(result)]
             if callback:  # 如果有回调函数，就执行回调函数
                 await callback(creator_info, fans_list)
-            await asyncio.sleep(crawl_interval)
             if not fans_list:
                 break
             result.extend(fans_list)
@@ -491,14 +511,12 @@ class BilibiliClient(AbstractApiClient):
     async def get_creator_all_followings(
         self,
         creator_info: Dict,
-        crawl_interval: float = 1.0,
         callback: Optional[Callable] = None,
         max_count: int = 100,
     ) -> List:
         """
         get creator all followings
         :param creator_info:
-        :param crawl_interval:
         :param callback:
         :param max_count: 一个up主爬取的最大关注者数量
 
@@ -516,7 +534,6 @@ class BilibiliClient(AbstractApiClient):
                 followings_list = followings_list[:max_count - len(result)]
             if callback:  # 如果有回调函数，就执行回调函数
                 await callback(creator_info, followings_list)
-            await asyncio.sleep(crawl_interval)
             if not followings_list:
                 break
             result.extend(followings_list)
@@ -525,14 +542,12 @@ class BilibiliClient(AbstractApiClient):
     async def get_creator_all_dynamics(
         self,
         creator_info: Dict,
-        crawl_interval: float = 1.0,
         callback: Optional[Callable] = None,
         max_count: int = 20,
     ) -> List:
         """
         get creator all followings
         :param creator_info:
-        :param crawl_interval:
         :param callback:
         :param max_count: 一个up主爬取的最大动态数量
 
@@ -551,6 +566,5 @@ class BilibiliClient(AbstractApiClient):
                 dynamics_list = dynamics_list[:max_count - len(result)]
             if callback:
                 await callback(creator_info, dynamics_list)
-            await asyncio.sleep(crawl_interval)
             result.extend(dynamics_list)
         return result
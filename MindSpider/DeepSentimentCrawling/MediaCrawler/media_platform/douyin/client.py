@@ -18,7 +18,9 @@ import httpx
 from playwright.async_api import BrowserContext
 
 from base.base_crawler import AbstractApiClient
+from proxy.proxy_ip_pool import IpInfoModel, ProxyIpPool, track_proxy
 from tools import utils
+from tools.rate_controller import get_rate_controller
 from var import request_keyword_var
 
 from .exception import *
@@ -36,13 +38,18 @@ class DouYinClient(AbstractApiClient):
         headers: Dict,
         playwright_page: Optional[Page],
         cookie_dict: Dict,
+        ip_pool: Optional[ProxyIpPool] = None,
+        ip_proxy_info: Optional[IpInfoModel] = None,
     ):
         self.proxy = proxy
+        self.ip_pool = ip_pool
+        self.ip_proxy_info = ip_proxy_info  # 当前代理在代理池中的信息，用于上报代理健康状况
         self.timeout = timeout
         self.headers = headers
         self._host = "https://www.douyin.com"
         self.playwright_page = playwright_page
         self.cookie_dict = cookie_dict
+        self.rate_controller = get_rate_controller("dy")
 
     async def __process_req_params(
         self,
@@ -95,15 +102,21 @@ class DouYinClient(AbstractApiClient):
         params["a_bogus"] = a_bogus
 
     async def request(self, method, url, **kwargs):
-        async with httpx.AsyncClient(proxy=self.proxy) as client:
-            response = await client.request(method, url, timeout=self.timeout, **kwargs)
-        try:
-            if response.text == "" or response.text == "blocked":
-                utils.logger.error(f"request params incrr, response.text: {response.text}")
-                raise Exception("account blocked")
-            return response.json()
-        except Exception as e:
-            raise DataFetchError(f"{e}, {response.text}")
+        async with self.rate_controller.request_slot() as slot, \
+                track_proxy(self.ip_pool, self.ip_proxy_info) as proxy_usage:
+            async with httpx.AsyncClient(proxy=self.proxy) as client:
+                response = await client.request(method, url, timeout=self.timeout, **kwargs)
+            slot.observe_status(response.status_code)
+            proxy_usage.observe_status(response.status_code)
+            try:
+                if response.text == "" or response.text == "blocked":
+                    utils.logger.error(f"request params incrr, response.text: {response.text}")
+                    slot.mark_throttled()
+                    proxy_usage.mark_failed()
+                    raise Exception("account blocked")
+                return response.json()
+            except Exception as e:
+                raise DataFetchError(f"{e}, {response.text}")
 
     async def get(self, uri: str, params: Optional[Dict] = None, headers: Optional[Dict] = None):
         """
@@ -218,7 +231,6 @@ class DouYinClient(AbstractApiClient):
     async def get_aweme_all_comments(
         self,
         aweme_id: str,
-        crawl_interval: float = 1.0,
         is_fetch_sub_comments=False,
         callback: Optional[Callable] = None,
         max_count: int = 10,
@@ -226,7 +238,6 @@ class DouYinClient(AbstractApiClient):
         """
         获取帖子的所有评论，包括子评论
         :param aweme_id: 帖子ID
-        :param crawl_interval: 抓取间隔
         :param is_fetch_sub_comments: 是否抓取子评论
         :param callback: 回调函数，用于处理抓取到的评论
         :param max_count: 一次帖子爬取的最大评论数量
@@ -248,7 +259,6 @@ class DouYinClient(AbstractApiClient):
             if callback:  # 如果有回调函数，就执行回调函数
                 await callback(aweme_id, comments)
 
-            await asyncio.sleep(crawl_interval)
             if not is_fetch_sub_comments:
                 continue
             # 获取二级评论
@@ -271,7 +281,6 @@ class DouYinClient(AbstractApiClient):
                         result.extend(sub_comments)
                         if callback:  # 如果有回调函数，就执行回调函数
                             await callback(aweme_id, sub_comments)
-                        await asyncio.sleep(crawl_interval)
         return result
 
     async def get_user_info(self, sec_user_id: str):
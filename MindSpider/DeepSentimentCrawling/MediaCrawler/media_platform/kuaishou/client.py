@@ -20,7 +20,9 @@ from playwright.async_api import BrowserContext, Page
 
 import config
 from base.base_crawler import AbstractApiClient
+from proxy.proxy_ip_pool import IpInfoModel, ProxyIpPool, track_proxy
 from tools import utils
+from tools.rate_controller import get_rate_controller
 
 from .exception import DataFetchError
 from .graphql import KuaiShouGraphQL
@@ -35,23 +37,32 @@ class KuaiShouClient(AbstractApiClient):
         headers: Dict[str, str],
         playwright_page: Page,
         cookie_dict: Dict[str, str],
+        ip_pool: Optional[ProxyIpPool] = None,
+        ip_proxy_info: Optional[IpInfoModel] = None,
     ):
         self.proxy = proxy
+        self.ip_pool = ip_pool
+        self.ip_proxy_info = ip_proxy_info  # 当前代理在代理池中的信息，用于上报代理健康状况
         self.timeout = timeout
         self.headers = headers
         self._host = "https://www.kuaishou.com/graphql"
         self.playwright_page = playwright_page
         self.cookie_dict = cookie_dict
         self.graphql = KuaiShouGraphQL()
+        self.rate_controller = get_rate_controller("ks")
 
     async def request(self, method, url, **kwargs) -> Any:
-        async with httpx.AsyncClient(proxy=self.proxy) as client:
-            response = await client.request(method, url, timeout=self.timeout, **kwargs)
-        data: Dict = response.json()
-        if data.get("errors"):
-            raise DataFetchError(data.get("errors", "unkonw error"))
-        else:
-            return data.get("data", {})
+        async with self.rate_controller.request_slot() as slot, \
+                track_proxy(self.ip_pool, self.ip_proxy_info) as proxy_usage:
+            async with httpx.AsyncClient(proxy=self.proxy) as client:
+                response = await client.request(method, url, timeout=self.timeout, **kwargs)
+            slot.observe_status(response.status_code)
+            proxy_usage.observe_status(response.status_code)
+            data: Dict = response.json()
+            if data.get("errors"):
+                raise DataFetchError(data.get("errors", "unkonw error"))
+            else:
+                return data.get("data", {})
 
     async def get(self, uri: str, params=None) -> Dict:
         final_uri = uri
@@ -180,14 +191,12 @@ class KuaiShouClient(AbstractApiClient):
     async def get_video_all_comments(
         self,
         photo_id: str,
-        crawl_interval: float = 1.0,
         callback: Optional[Callable] = None,
         max_count: int = 10,
     ):
         """
         get video all comments include sub comments
         :param photo_id:
-        :param crawl_interval:
         :param callback:
         :param max_count:
         :return:
@@ -206,9 +215,8 @@ class KuaiShouClient(AbstractApiClient):
             if callback:  # 如果有回调函数，就执行回调函数
                 await callback(photo_id, comments)
             result.extend(comments)
-            await asyncio.sleep(crawl_interval)
             sub_comments = await self.get_comments_all_sub_comments(
-                comments, photo_id, crawl_interval, callback
+                comments, photo_id, callback
             )
             result.extend(sub_comments)
         return result
@@ -217,7 +225,6 @@ class KuaiShouClient(AbstractApiClient):
         self,
         comments: List[Dict],
         photo_id,
-        crawl_interval: float = 1.0,
         callback: Optional[Callable] = None,
     ) -> List[Dict]:
         """
@@ -225,7 +232,6 @@ class KuaiShouClient(AbstractApiClient):
         Args:
             comments: 评论列表
             photo_id: 视频id
-            crawl_interval: 爬取一次评论的延迟单位（秒）
             callback: 一次评论爬取结束后
         Returns:
 
@@ -259,7 +265,6 @@ class KuaiShouClient(AbstractApiClient):
                 comments = vision_sub_comment_list.get("subComments", {})
                 if callback:
                     await callback(photo_id, comments)
-                await asyncio.sleep(crawl_interval)
                 result.extend(comments)
         return result
 
@@ -275,14 +280,12 @@ class KuaiShouClient(AbstractApiClient):
     async def get_all_videos_by_creator(
         self,
         user_id: str,
-        crawl_interval: float = 1.0,
         callback: Optional[Callable] = None,
     ) -> List[Dict]:
         """
         获取指定用户下的所有发过的帖子，该方法会一直查找一个用户下的所有帖子信息
         Args:
             user_id: 用户ID
-            crawl_interval: 爬取一次的延迟单位（秒）
             callback: 一次分页爬取结束后的更新回调函数
         Returns:
 
@@ -308,6 +311,5 @@ class KuaiShouClient(AbstractApiClient):
 
             if callback:
                 await callback(videos)
-            await asyncio.sleep(crawl_interval)
             result.extend(videos)
         return result
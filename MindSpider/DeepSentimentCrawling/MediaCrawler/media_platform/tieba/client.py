@@ -20,8 +20,9 @@ from tenacity import RetryError, retry, stop_after_attempt, wait_fixed
 import config
 from base.base_crawler import AbstractApiClient
 from model.m_baidu_tieba import TiebaComment, TiebaCreator, TiebaNote
-from proxy.proxy_ip_pool import ProxyIpPool
+from proxy.proxy_ip_pool import IpInfoModel, ProxyIpPool, track_proxy
 from tools import utils
+from tools.rate_controller import get_rate_controller
 
 from .field import SearchNoteType, SearchSortType
 from .help import TieBaExtractor
@@ -34,6 +35,7 @@ class BaiduTieBaClient(AbstractApiClient):
         timeout=10,
         ip_pool=None,
         default_ip_proxy=None,
+        default_ip_proxy_info: Optional[IpInfoModel] = None,
         headers: Dict[str, str] = None,
         playwright_page: Optional[Page] = None,
     ):
@@ -47,7 +49,9 @@ class BaiduTieBaClient(AbstractApiClient):
         self._host = "https://tieba.baidu.com"
         self._page_extractor = TieBaExtractor()
         self.default_ip_proxy = default_ip_proxy
+        self.default_ip_proxy_info = default_ip_proxy_info  # 当前代理在代理池中的信息，用于上报代理健康状况
         self.playwright_page = playwright_page  # Playwright页面对象
+        self.rate_controller = get_rate_controller("tieba")
 
     def _sync_request(self, method, url, proxy=None, **kwargs):
         """
@@ -95,29 +99,36 @@ class BaiduTieBaClient(AbstractApiClient):
 
         """
         actual_proxy = proxy if proxy else self.default_ip_proxy
-
-        # 在线程池中执行同步的requests请求
-        response = await asyncio.to_thread(
-            self._sync_request,
-            method,
-            url,
-            actual_proxy,
-            **kwargs
-        )
-
-        if response.status_code != 200:
-            utils.logger.error(f"Request failed, method: {method}, url: {url}, status code: {response.status_code}")
-            utils.logger.error(f"Request failed, response: {response.text}")
-            raise Exception(f"Request failed, method: {method}, url: {url}, status code: {response.status_code}")
-
-        if response.text == "" or response.text == "blocked":
-            utils.logger.error(f"request params incorrect, response.text: {response.text}")
-            raise Exception("account blocked")
-
-        if return_ori_content:
-            return response.text
-
-        return response.json()
+        proxy_info = self.default_ip_proxy_info if actual_proxy == self.default_ip_proxy else None
+
+        async with self.rate_controller.request_slot() as slot, \
+                track_proxy(self.ip_pool, proxy_info) as proxy_usage:
+            # 在线程池中执行同步的requests请求
+            response = await asyncio.to_thread(
+                self._sync_request,
+                method,
+                url,
+                actual_proxy,
+                **kwargs
+            )
+            slot.observe_status(response.status_code)
+            proxy_usage.observe_status(response.status_code)
+
+            if response.status_code != 200:
+                utils.logger.error(f"Request failed, method: {method}, url: {url}, status code: {response.status_code}")
+                utils.logger.error(f"Request failed, response: {response.text}")
+                raise Exception(f"Request failed, method: {method}, url: {url}, status code: {response.status_code}")
+
+            if response.text == "" or response.text == "blocked":
+                utils.logger.error(f"request params incorrect, response.text: {response.text}")
+                slot.mark_throttled()
+                proxy_usage.mark_failed()
+                raise Exception("account blocked")
+
+            if return_ori_content:
+                return response.text
+
+            return response.json()
 
     async def get(self, uri: str, params=None, return_ori_content=False, **kwargs) -> Any:
         """
@@ -139,11 +150,12 @@ class BaiduTieBaClient(AbstractApiClient):
             return res
         except RetryError as e:
             if self.ip_pool:
+                # 每次失败的请求已经上报给代理池，连续失败的代理已被剔除，换一个代理重试
                 proxie_model = await self.ip_pool.get_proxy()
                 _, proxy = utils.format_proxy_info(proxie_model)
-                res = await self.request(method="GET", url=f"{self._host}{final_uri}", return_ori_content=return_ori_content, proxy=proxy, **kwargs)
                 self.default_ip_proxy = proxy
-                return res
+                self.default_ip_proxy_info = proxie_model
+                return await self.request(method="GET", url=f"{self._host}{final_uri}", return_ori_content=return_ori_content, **kwargs)
 
             utils.logger.error(f"[BaiduTieBaClient.get] 达到了最大重试次数，IP已经被Block，请尝试更换新的IP代理: {e}")
             raise Exception(f"[BaiduTieBaClient.get] 达到了最大重试次数，IP已经被Block，请尝试更换新的IP代理: {e}")
@@ -210,6 +222,22 @@ class BaiduTieBaClient(AbstractApiClient):
         self.headers["Cookie"] = cookie_str
         utils.logger.info("[BaiduTieBaClient.update_cookies] Cookie has been updated")
 
+    async def _goto_page(self, url: str) -> str:
+        """
+        使用Playwright打开页面并返回页面内容，与API请求共用贴吧的速率控制器：
+        打开失败或返回限流状态码时降速，成功时逐步提速
+        Args:
+            url: 页面URL
+
+        Returns:
+            页面HTML内容
+        """
+        async with self.rate_controller.request_slot() as slot:
+            response = await self.playwright_page.goto(url, wait_until="domcontentloaded")
+            if response is not None:
+                slot.observe_status(response.status)
+            return await self.playwright_page.content()
+
     async def get_notes_by_keyword(
         self,
         keyword: str,
@@ -251,13 +279,7 @@ class BaiduTieBaClient(AbstractApiClient):
 
         try:
             # 使用Playwright访问搜索页面
-            await self.playwright_page.goto(full_url, wait_until="domcontentloaded")
-
-            # 等待页面加载,使用配置文件中的延时设置
-            await asyncio.sleep(config.CRAWLER_MAX_SLEEP_SEC)
-
-            # 获取页面HTML内容
-            page_content = await self.playwright_page.content()
+            page_content = await self._goto_page(full_url)
             utils.logger.info(f"[BaiduTieBaClient.get_notes_by_keyword] 成功获取搜索页面HTML,长度: {len(page_content)}")
 
             # 提取搜索结果
@@ -288,13 +310,7 @@ class BaiduTieBaClient(AbstractApiClient):
 
         try:
             # 使用Playwright访问帖子详情页面
-            await self.playwright_page.goto(note_url, wait_until="domcontentloaded")
-
-            # 等待页面加载,使用配置文件中的延时设置
-            await asyncio.sleep(config.CRAWLER_MAX_SLEEP_SEC)
-
-            # 获取页面HTML内容
-            page_content = await self.playwright_page.content()
+            page_content = await self._goto_page(note_url)
             utils.logger.info(f"[BaiduTieBaClient.get_note_by_id] 成功获取帖子详情HTML,长度: {len(page_content)}")
 
             # 提取帖子详情
@@ -308,7 +324,6 @@ class BaiduTieBaClient(AbstractApiClient):
     async def get_note_all_comments(
         self,
         note_detail: TiebaNote,
-        crawl_interval: float = 1.0,
         callback: Optional[Callable] = None,
         max_count: int = 10,
     ) -> List[TiebaComment]:
@@ -316,7 +331,6 @@ class BaiduTieBaClient(AbstractApiClient):
         获取指定帖子下的所有一级评论 (使用Playwright访问页面,避免API检测)
         Args:
             note_detail: 帖子详情对象
-            crawl_interval: 爬取一次笔记的延迟单位（秒）
             callback: 一次笔记爬取结束后的回调函数
             max_count: 一次帖子爬取的最大评论数量
         Returns:
@@ -336,13 +350,7 @@ class BaiduTieBaClient(AbstractApiClient):
 
             try:
                 # 使用Playwright访问评论页面
-                await self.playwright_page.goto(comment_url, wait_until="domcontentloaded")
-
-                # 等待页面加载,使用配置文件中的延时设置
-                await asyncio.sleep(config.CRAWLER_MAX_SLEEP_SEC)
-
-                # 获取页面HTML内容
-                page_content = await self.playwright_page.content()
+                page_content = await self._goto_page(comment_url)
 
                 # 提取评论
                 comments = self._page_extractor.extract_tieba_note_parment_comments(
@@ -364,10 +372,9 @@ class BaiduTieBaClient(AbstractApiClient):
 
                 # 获取所有子评论
                 await self.get_comments_all_sub_comments(
-                    comments, crawl_interval=crawl_interval, callback=callback
+                    comments, callback=callback
                 )
 
-                await asyncio.sleep(crawl_interval)
                 current_page += 1
 
             except Exception as e:
@@ -380,14 +387,12 @@ class BaiduTieBaClient(AbstractApiClient):
     async def get_comments_all_sub_comments(
         self,
         comments: List[TiebaComment],
-        crawl_interval: float = 1.0,
         callback: Optional[Callable] = None,
     ) -> List[TiebaComment]:
         """
         获取指定评论下的所有子评论 (使用Playwright访问页面,避免API检测)
         Args:
             comments: 评论列表
-            crawl_interval: 爬取一次笔记的延迟单位（秒）
             callback: 一次笔记爬取结束后的回调函数
 
         Returns:
@@ -422,13 +427,7 @@ class BaiduTieBaClient(AbstractApiClient):
 
                 try:
                     # 使用Playwright访问子评论页面
-                    await self.playwright_page.goto(sub_comment_url, wait_until="domcontentloaded")
-
-                    # 等待页面加载,使用配置文件中的延时设置
-                    await asyncio.sleep(config.CRAWLER_MAX_SLEEP_SEC)
-
-                    # 获取页面HTML内容
-                    page_content = await self.playwright_page.content()
+                    page_content = await self._goto_page(sub_comment_url)
 
                     # 提取子评论
                     sub_comments = self._page_extractor.extract_tieba_note_sub_comments(
@@ -446,7 +445,6 @@ class BaiduTieBaClient(AbstractApiClient):
                         await callback(parment_comment.note_id, sub_comments)
 
                     all_sub_comments.extend(sub_comments)
-                    await asyncio.sleep(crawl_interval)
                     current_page += 1
 
                 except Exception as e:
@@ -479,13 +477,7 @@ class BaiduTieBaClient(AbstractApiClient):
 
         try:
             # 使用Playwright访问贴吧页面
-            await self.playwright_page.goto(tieba_url, wait_until="domcontentloaded")
-
-            # 等待页面加载,使用配置文件中的延时设置
-            await asyncio.sleep(config.CRAWLER_MAX_SLEEP_SEC)
-
-            # 获取页面HTML内容
-            page_content = await self.playwright_page.content()
+            page_content = await self._goto_page(tieba_url)
             utils.logger.info(f"[BaiduTieBaClient.get_notes_by_tieba_name] 成功获取贴吧页面HTML,长度: {len(page_content)}")
 
             # 提取帖子列表
@@ -514,13 +506,7 @@ class BaiduTieBaClient(AbstractApiClient):
 
         try:
             # 使用Playwright访问创作者主页
-            await self.playwright_page.goto(creator_url, wait_until="domcontentloaded")
-
-            # 等待页面加载,使用配置文件中的延时设置
-            await asyncio.sleep(config.CRAWLER_MAX_SLEEP_SEC)
-
-            # 获取页面HTML内容
-            page_content = await self.playwright_page.content()
+            page_content = await self._goto_page(creator_url)
             utils.logger.info(f"[BaiduTieBaClient.get_creator_info_by_url] 成功获取创作者主页HTML,长度: {len(page_content)}")
 
             return page_content
@@ -549,13 +535,7 @@ class BaiduTieBaClient(AbstractApiClient):
 
         try:
             # 使用Playwright访问创作者帖子列表页面
-            await self.playwright_page.goto(creator_url, wait_until="domcontentloaded")
-
-            # 等待页面加载,使用配置文件中的延时设置
-            await asyncio.sleep(config.CRAWLER_MAX_SLEEP_SEC)
-
-            # 获取页面内容(这个接口返回JSON)
-            page_content = await self.playwright_page.content()
+            page_content = await self._goto_page(creator_url)
 
             # 提取JSON数据(页面会包含<pre>标签或直接是JSON)
             try:
@@ -576,7 +556,6 @@ class BaiduTieBaClient(AbstractApiClient):
     async def get_all_notes_by_creator_user_name(
         self,
         user_name: str,
-        crawl_interval: float = 1.0,
         callback: Optional[Callable] = None,
         max_note_count: int = 0,
         creator_page_html_content: str = None,
@@ -585,7 +564,6 @@ class BaiduTieBaClient(AbstractApiClient):
         根据创作者用户名获取创作者所有帖子
         Args:
             user_name: 创作者用户名
-            crawl_interval: 爬取一次笔记的延迟单位（秒）
             callback: 一次笔记爬取结束后的回调函数，是一个awaitable类型的函数
             max_note_count: 帖子最大获取数量，如果为0则获取所有
             creator_page_html_content: 创作者主页HTML内容
@@ -622,7 +600,6 @@ class BaiduTieBaClient(AbstractApiClient):
             notes = await asyncio.gather(*note_detail_task)
             if callback:
                 await callback(notes)
-            await asyncio.sleep(crawl_interval)
             result.extend(notes)
             page_number += 1
             total_get_count += page_per_count
@@ -56,14 +56,15 @@ class TieBaCrawler(AbstractCrawler):
 
         """
         playwright_proxy_format, httpx_proxy_format = None, None
+        ip_proxy_info: Optional[IpInfoModel] = None
         if config.ENABLE_IP_PROXY:
             utils.logger.info(
                 "[BaiduTieBaCrawler.start] Begin create ip proxy pool ..."
             )
-            ip_proxy_pool = await create_ip_pool(
+            self.ip_proxy_pool = await create_ip_pool(
                 config.IP_PROXY_POOL_COUNT, enable_validate_ip=True
             )
-            ip_proxy_info: IpInfoModel = await ip_proxy_pool.get_proxy()
+            ip_proxy_info = await self.ip_proxy_pool.get_proxy()
             playwright_proxy_format, httpx_proxy_format = utils.format_proxy_info(ip_proxy_info)
             utils.logger.info(
                 f"[BaiduTieBaCrawler.start] Init default ip proxy, value: {httpx_proxy_format}"
@@ -101,7 +102,8 @@ class TieBaCrawler(AbstractCrawler):
             # Create a client to interact with the baidutieba website.
             self.tieba_client = await self.create_tieba_client(
                 httpx_proxy_format,
-                ip_proxy_pool if config.ENABLE_IP_PROXY else None
+                self.ip_proxy_pool,
+                ip_proxy_info,
             )
 
             # Check login status and perform login if necessary
@@ -183,10 +185,6 @@ class TieBaCrawler(AbstractCrawler):
                         note_id_list=[note_detail.note_id for note_detail in notes_list]
                     )
                     
-                    # Sleep after page navigation
-                    await asyncio.sleep(config.CRAWLER_MAX_SLEEP_SEC)
-                    utils.logger.info(f"[TieBaCrawler.search] Sleeping for {config.CRAWLER_MAX_SLEEP_SEC} seconds after page {page}")
-                    
                     page += 1
                 except Exception as ex:
                     utils.logger.error(
@@ -225,10 +223,6 @@ class TieBaCrawler(AbstractCrawler):
                 )
                 await self.get_specified_notes([note.note_id for note in note_list])
                 
-                # Sleep after processing notes
-                await asyncio.sleep(config.CRAWLER_MAX_SLEEP_SEC)
-                utils.logger.info(f"[TieBaCrawler.get_specified_tieba_notes] Sleeping for {config.CRAWLER_MAX_SLEEP_SEC} seconds after processing notes from page {page_number}")
-                
                 page_number += tieba_limit_count
 
     async def get_specified_notes(
@@ -274,10 +268,6 @@ class TieBaCrawler(AbstractCrawler):
                 )
                 note_detail: TiebaNote = await self.tieba_client.get_note_by_id(note_id)
                 
-                # Sleep after fetching note details
-                await asyncio.sleep(config.CRAWLER_MAX_SLEEP_SEC)
-                utils.logger.info(f"[TieBaCrawler.get_note_detail_async_task] Sleeping for {config.CRAWLER_MAX_SLEEP_SEC} seconds after fetching note details {note_id}")
-                
                 if not note_detail:
                     utils.logger.error(
                         f"[BaiduTieBaCrawler.get_note_detail] Get note detail error, note_id: {note_id}"
@@ -334,13 +324,8 @@ class TieBaCrawler(AbstractCrawler):
                 f"[BaiduTieBaCrawler.get_comments] Begin get note id comments {note_detail.note_id}"
             )
             
-            # Sleep before fetching comments
-            await asyncio.sleep(config.CRAWLER_MAX_SLEEP_SEC)
-            utils.logger.info(f"[TieBaCrawler.get_comments_async_task] Sleeping for {config.CRAWLER_MAX_SLEEP_SEC} seconds before fetching comments for note {note_detail.note_id}")
-            
             await self.tieba_client.get_note_all_comments(
                 note_detail=note_detail,
-                crawl_interval=config.CRAWLER_MAX_SLEEP_SEC,
                 callback=tieba_store.batch_update_tieba_note_comments,
                 max_count=config.CRAWLER_MAX_COMMENTS_COUNT_SINGLENOTES,
             )
@@ -374,7 +359,6 @@ class TieBaCrawler(AbstractCrawler):
                 all_notes_list = (
                     await self.tieba_client.get_all_notes_by_creator_user_name(
                         user_name=creator_info.user_name,
-                        crawl_interval=0,
                         callback=tieba_store.batch_update_tieba_notes,
                         max_note_count=config.CRAWLER_MAX_NOTES_COUNT,
                         creator_page_html_content=creator_page_html_content,
@@ -534,13 +518,17 @@ class TieBaCrawler(AbstractCrawler):
         utils.logger.info("[TieBaCrawler] Anti-detection scripts injected")
 
     async def create_tieba_client(
-        self, httpx_proxy: Optional[str], ip_pool: Optional[ProxyIpPool] = None
+        self,
+        httpx_proxy: Optional[str],
+        ip_pool: Optional[ProxyIpPool] = None,
+        ip_proxy_info: Optional[IpInfoModel] = None,
     ) -> BaiduTieBaClient:
         """
         Create tieba client with real browser User-Agent and complete headers
         Args:
             httpx_proxy: HTTP代理
             ip_pool: IP代理池
+            ip_proxy_info: HTTP代理在代理池中的信息
 
         Returns:
             BaiduTieBaClient实例
@@ -558,6 +546,7 @@ class TieBaCrawler(AbstractCrawler):
             timeout=10,
             ip_pool=ip_pool,
             default_ip_proxy=httpx_proxy,
+            default_ip_proxy_info=ip_proxy_info,
             headers={
                 "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7",
                 "Accept-Language": "zh-CN,zh;q=0.9",
@@ -25,7 +25,10 @@ from httpx import Response
 from playwright.async_api import BrowserContext, Page
 
 import config
+from proxy.proxy_ip_pool import IpInfoModel, ProxyIpPool, track_proxy
+from store.crawl_state import CommentWatermark
 from tools import utils
+from tools.rate_controller import get_rate_controller
 
 from .exception import DataFetchError
 from .field import SearchType
@@ -41,33 +44,42 @@ class WeiboClient:
         headers: Dict[str, str],
         playwright_page: Page,
         cookie_dict: Dict[str, str],
+        ip_pool: Optional[ProxyIpPool] = None,
+        ip_proxy_info: Optional[IpInfoModel] = None,
     ):
         self.proxy = proxy
+        self.ip_pool = ip_pool
+        self.ip_proxy_info = ip_proxy_info  # 当前代理在代理池中的信息，用于上报代理健康状况
         self.timeout = timeout
         self.headers = headers
         self._host = "https://m.weibo.cn"
         self.playwright_page = playwright_page
         self.cookie_dict = cookie_dict
         self._image_agent_host = "https://i1.wp.com/"
+        self.rate_controller = get_rate_controller("wb")
 
     async def request(self, method, url, **kwargs) -> Union[Response, Dict]:
         enable_return_response = kwargs.pop("return_response", False)
-        async with httpx.AsyncClient(proxy=self.proxy) as client:
-            response = await client.request(method, url, timeout=self.timeout, **kwargs)
-
-        if enable_return_response:
-            return response
-
-        data: Dict = response.json()
-        ok_code = data.get("ok")
-        if ok_code == 0:  # response error
-            utils.logger.error(f"[WeiboClient.request] request {method}:{url} err, res:{data}")
-            raise DataFetchError(data.get("msg", "response error"))
-        elif ok_code != 1:  # unknown error
-            utils.logger.error(f"[WeiboClient.request] request {method}:{url} err, res:{data}")
-            raise DataFetchError(data.get("msg", "unknown error"))
-        else:  # response right
-            return data.get("data", {})
+        async with self.rate_controller.request_slot() as slot, \
+                track_proxy(self.ip_pool, self.ip_proxy_info) as proxy_usage:
+            async with httpx.AsyncClient(proxy=self.proxy) as client:
+                response = await client.request(method, url, timeout=self.timeout, **kwargs)
+            slot.observe_status(response.status_code)
+            proxy_usage.observe_status(response.status_code)
+
+            if enable_return_response:
+                return response
+
+            data: Dict = response.json()
+            ok_code = data.get("ok")
+            if ok_code == 0:  # response error
+                utils.logger.error(f"[WeiboClient.request] request {method}:{url} err, res:{data}")
+                raise DataFetchError(data.get("msg", "response error"))
+            elif ok_code != 1:  # unknown error
+                utils.logger.error(f"[WeiboClient.request] request {method}:{url} err, res:{data}")
+                raise DataFetchError(data.get("msg", "unknown error"))
+            else:  # response right
+                return data.get("data", {})
 
     async def get(self, uri: str, params=None, headers=None, **kwargs) -> Union[Response, Dict]:
         final_uri = uri
@@ -150,16 +162,16 @@ class WeiboClient:
     async def get_note_all_comments(
         self,
         note_id: str,
-        crawl_interval: float = 1.0,
         callback: Optional[Callable] = None,
         max_count: int = 10,
+        watermark: Optional[CommentWatermark] = None,
     ):
         """
         get note all comments include sub comments
         :param note_id:
-        :param crawl_interval:
         :param callback:
         :param max_count:
+        :param watermark: 评论高水位线，传入时只保留新增评论，并在新增评论取完后提前结束翻页
         :return:
         """
         result = []
@@ -172,14 +184,26 @@ class WeiboClient:
             max_id_type: int = comments_res.get("max_id_type")
             comment_list: List[Dict] = comments_res.get("data", [])
             is_end = max_id == 0
+            if watermark:
+                comment_list = watermark.filter_new_comments(
+                    comment_list,
+                    time_getter=lambda c: utils.rfc2822_to_timestamp(c.get("created_at")),
+                    id_getter=lambda c: c.get("id"),
+                    limit=max_count - len(result),
+                )
+                watermark.comment_cursor = str(max_id)
+                if watermark.should_stop():
+                    utils.logger.info(f"[WeiboClient.get_note_all_comments] Reached known comments of note_id: {note_id}, new comments: {watermark.new_comment_count}")
+                    is_end = True
             if len(result) + len(comment_list) > max_count:
                 comment_list = comment_list[:max_count - len(result)]
             if callback:  # 如果有回调函数，就执行回调函数
                 await callback(note_id, comment_list)
-            await asyncio.sleep(crawl_interval)
             result.extend(comment_list)
             sub_comment_result = await self.get_comments_all_sub_comments(note_id, comment_list, callback)
             result.extend(sub_comment_result)
+        if watermark and not is_end and len(result) >= max_count:
+            watermark.truncated = True
         return result
 
     @staticmethod
@@ -341,7 +365,6 @@ class WeiboClient:
         self,
         creator_id: str,
         container_id: str,
-        crawl_interval: float = 1.0,
         callback: Optional[Callable] = None,
     ) -> List[Dict]:
         """
@@ -349,7 +372,6 @@ class WeiboClient:
         Args:
             creator_id:
             container_id:
-            crawl_interval:
             callback:
 
         Returns:
@@ -374,7 +396,6 @@ class WeiboClient:
             notes = [note for note in notes if note.get("card_type") == 9]
             if callback:
                 await callback(notes)
-            await asyncio.sleep(crawl_interval)
             result.extend(notes)
             crawler_total_count += 10
             notes_has_more = notes_res.get("cardlistInfo", {}).get("total", 0) > crawler_total_count
@@ -20,7 +20,10 @@ from tenacity import retry, stop_after_attempt, wait_fixed
 
 import config
 from base.base_crawler import AbstractApiClient
+from proxy.proxy_ip_pool import IpInfoModel, ProxyIpPool, track_proxy
+from store.crawl_state import CommentWatermark
 from tools import utils
+from tools.rate_controller import get_rate_controller
 
 
 from .exception import DataFetchError, IPBlockError
@@ -40,8 +43,12 @@ class XiaoHongShuClient(AbstractApiClient):
         headers: Dict[str, str],
         playwright_page: Page,
         cookie_dict: Dict[str, str],
+        ip_pool: Optional[ProxyIpPool] = None,
+        ip_proxy_info: Optional[IpInfoModel] = None,
     ):
         self.proxy = proxy
+        self.ip_pool = ip_pool
+        self.ip_proxy_info = ip_proxy_info  # 当前代理在代理池中的信息，用于上报代理健康状况
         self.timeout = timeout
         self.headers = headers
         self._host = "https://edith.xiaohongshu.com"
@@ -53,6 +60,7 @@ class XiaoHongShuClient(AbstractApiClient):
         self.playwright_page = playwright_page
         self.cookie_dict = cookie_dict
         self._extractor = XiaoHongShuExtractor()
+        self.rate_controller = get_rate_controller("xhs")
 
     async def _pre_headers(self, url: str, data=None) -> Dict:
         """
@@ -96,26 +104,32 @@ class XiaoHongShuClient(AbstractApiClient):
         """
         # return response.text
         return_response = kwargs.pop("return_response", False)
-        async with httpx.AsyncClient(proxy=self.proxy) as client:
-            response = await client.request(method, url, timeout=self.timeout, **kwargs)
-
-        if response.status_code == 471 or response.status_code == 461:
-            # someday someone maybe will bypass captcha
-            verify_type = response.headers["Verifytype"]
-            verify_uuid = response.headers["Verifyuuid"]
-            msg = f"出现验证码，请求失败，Verifytype: {verify_type}，Verifyuuid: {verify_uuid}, Response: {response}"
-            utils.logger.error(msg)
-            raise Exception(msg)
-
-        if return_response:
-            return response.text
-        data: Dict = response.json()
-        if data["success"]:
-            return data.get("data", data.get("success", {}))
-        elif data["code"] == self.IP_ERROR_CODE:
-            raise IPBlockError(self.IP_ERROR_STR)
-        else:
-            raise DataFetchError(data.get("msg", None))
+        async with self.rate_controller.request_slot() as slot, \
+                track_proxy(self.ip_pool, self.ip_proxy_info) as proxy_usage:
+            async with httpx.AsyncClient(proxy=self.proxy) as client:
+                response = await client.request(method, url, timeout=self.timeout, **kwargs)
+            slot.observe_status(response.status_code)
+            proxy_usage.observe_status(response.status_code)
+
+            if response.status_code == 471 or response.status_code == 461:
+                # someday someone maybe will bypass captcha
+                verify_type = response.headers["Verifytype"]
+                verify_uuid = response.headers["Verifyuuid"]
+                msg = f"出现验证码，请求失败，Verifytype: {verify_type}，Verifyuuid: {verify_uuid}, Response: {response}"
+                utils.logger.error(msg)
+                raise Exception(msg)
+
+            if return_response:
+                return response.text
+            data: Dict = response.json()
+            if data["success"]:
+                return data.get("data", data.get("success", {}))
+            elif data["code"] == self.IP_ERROR_CODE:
+                slot.mark_throttled()
+                proxy_usage.mark_failed()
+                raise IPBlockError(self.IP_ERROR_STR)
+            else:
+                raise DataFetchError(data.get("msg", None))
 
     async def get(self, uri: str, params=None) -> Dict:
         """
@@ -339,18 +353,18 @@ class XiaoHongShuClient(AbstractApiClient):
         self,
         note_id: str,
         xsec_token: str,
-        crawl_interval: float = 1.0,
         callback: Optional[Callable] = None,
         max_count: int = 10,
+        watermark: Optional[CommentWatermark] = None,
     ) -> List[Dict]:
         """
         获取指定笔记下的所有一级评论，该方法会一直查找一个帖子下的所有评论信息
         Args:
             note_id: 笔记ID
             xsec_token: 验证token
-            crawl_interval: 爬取一次笔记的延迟单位（秒）
             callback: 一次笔记爬取结束后
             max_count: 一次笔记爬取的最大评论数量
+            watermark: 评论高水位线，传入时只保留新增评论，并在新增评论取完后提前结束翻页
         Returns:
 
         """
@@ -369,26 +383,38 @@ class XiaoHongShuClient(AbstractApiClient):
                 )
                 break
             comments = comments_res["comments"]
+            if watermark:
+                comments = watermark.filter_new_comments(
+                    comments,
+                    time_getter=lambda c: c.get("create_time"),
+                    id_getter=lambda c: c.get("id"),
+                    limit=max_count - len(result),
+                )
+                watermark.comment_cursor = comments_cursor
             if len(result) + len(comments) > max_count:
                 comments = comments[: max_count - len(result)]
             if callback:
                 await callback(note_id, comments)
-            await asyncio.sleep(crawl_interval)
             result.extend(comments)
             sub_comments = await self.get_comments_all_sub_comments(
                 comments=comments,
                 xsec_token=xsec_token,
-                crawl_interval=crawl_interval,
                 callback=callback,
             )
             result.extend(sub_comments)
+            if watermark and watermark.should_stop():
+                utils.logger.info(
+                    f"[XiaoHongShuClient.get_note_all_comments] Reached known comments of note_id: {note_id}, new comments: {watermark.new_comment_count}"
+                )
+                break
+        if watermark and comments_has_more and len(result) >= max_count:
+            watermark.truncated = True
         return result
 
     async def get_comments_all_sub_comments(
         self,
         comments: List[Dict],
         xsec_token: str,
-        crawl_interval: float = 1.0,
         callback: Optional[Callable] = None,
     ) -> List[Dict]:
         """
@@ -396,7 +422,6 @@ class XiaoHongShuClient(AbstractApiClient):
         Args:
             comments: 评论列表
             xsec_token: 验证token
-            crawl_interval: 爬取一次评论的延迟单位（秒）
             callback: 一次评论爬取结束后
 
         Returns:
@@ -446,7 +471,6 @@ class XiaoHongShuClient(AbstractApiClient):
                 comments = comments_res["comments"]
                 if callback:
                     await callback(note_id, comments)
-                await asyncio.sleep(crawl_interval)
                 result.extend(comments)
         return result
 
@@ -503,14 +527,12 @@ class XiaoHongShuClient(AbstractApiClient):
     async def get_all_notes_by_creator(
         self,
         user_id: str,
-        crawl_interval: float = 1.0,
         callback: Optional[Callable] = None,
     ) -> List[Dict]:
         """
         获取指定用户下的所有发过的帖子，该方法会一直查找一个用户下的所有帖子信息
         Args:
             user_id: 用户ID
-            crawl_interval: 爬取一次的延迟单位（秒）
             callback: 一次分页爬取结束后的更新回调函数
 
         Returns:
@@ -549,7 +571,6 @@ class XiaoHongShuClient(AbstractApiClient):
                 await callback(notes_to_add)
 
             result.extend(notes_to_add)
-            await asyncio.sleep(crawl_interval)
 
         utils.logger.info(
             f"[XiaoHongShuClient.get_all_notes_by_creator] Finished getting notes for user {user_id}, total: {len(result)}"
@@ -23,7 +23,9 @@ import config
 from base.base_crawler import AbstractApiClient
 from constant import zhihu as zhihu_constant
 from model.m_zhihu import ZhihuComment, ZhihuContent, ZhihuCreator
+from proxy.proxy_ip_pool import IpInfoModel, ProxyIpPool, track_proxy
 from tools import utils
+from tools.rate_controller import get_rate_controller
 
 from .exception import DataFetchError, ForbiddenError
 from .field import SearchSort, SearchTime, SearchType
@@ -40,12 +42,17 @@ class ZhiHuClient(AbstractApiClient):
         headers: Dict[str, str],
         playwright_page: Page,
         cookie_dict: Dict[str, str],
+        ip_pool: Optional[ProxyIpPool] = None,
+        ip_proxy_info: Optional[IpInfoModel] = None,
     ):
         self.proxy = proxy
+        self.ip_pool = ip_pool
+        self.ip_proxy_info = ip_proxy_info  # 当前代理在代理池中的信息，用于上报代理健康状况
         self.timeout = timeout
         self.default_headers = headers
         self.cookie_dict = cookie_dict
         self._extractor = ZhihuExtractor()
+        self.rate_controller = get_rate_controller("zhihu")
 
     async def _pre_headers(self, url: str) -> Dict:
         """
@@ -79,29 +86,35 @@ class ZhiHuClient(AbstractApiClient):
         # return response.text
         return_response = kwargs.pop('return_response', False)
 
-        async with httpx.AsyncClient(proxy=self.proxy) as client:
-            response = await client.request(method, url, timeout=self.timeout, **kwargs)
-
-        if response.status_code != 200:
-            utils.logger.error(f"[ZhiHuClient.request] Requset Url: {url}, Request error: {response.text}")
-            if response.status_code == 403:
-                raise ForbiddenError(response.text)
-            elif response.status_code == 404:  # 如果一个content没有评论也是404
-                return {}
-
-            raise DataFetchError(response.text)
-
-        if return_response:
-            return response.text
-        try:
-            data: Dict = response.json()
-            if data.get("error"):
-                utils.logger.error(f"[ZhiHuClient.request] Request error: {data}")
-                raise DataFetchError(data.get("error", {}).get("message"))
-            return data
-        except json.JSONDecodeError:
-            utils.logger.error(f"[ZhiHuClient.request] Request error: {response.text}")
-            raise DataFetchError(response.text)
+        async with self.rate_controller.request_slot() as slot, \
+                track_proxy(self.ip_pool, self.ip_proxy_info) as proxy_usage:
+            async with httpx.AsyncClient(proxy=self.proxy) as client:
+                response = await client.request(method, url, timeout=self.timeout, **kwargs)
+            slot.observe_status(response.status_code)
+            proxy_usage.observe_status(response.status_code)
+
+            if response.status_code != 200:
+                utils.logger.error(f"[ZhiHuClient.request] Requset Url: {url}, Request error: {response.text}")
+                if response.status_code == 403:
+                    slot.mark_throttled()
+                    proxy_usage.mark_failed()
+                    raise ForbiddenError(response.text)
+                elif response.status_code == 404:  # 如果一个content没有评论也是404
+                    return {}
+
+                raise DataFetchError(response.text)
+
+            if return_response:
+                return response.text
+            try:
+                data: Dict = response.json()
+                if data.get("error"):
+                    utils.logger.error(f"[ZhiHuClient.request] Request error: {data}")
+                    raise DataFetchError(data.get("error", {}).get("message"))
+                return data
+            except json.JSONDecodeError:
+                utils.logger.error(f"[ZhiHuClient.request] Request error: {response.text}")
+                raise DataFetchError(response.text)
 
     async def get(self, uri: str, params=None, **kwargs) -> Union[Response, Dict, str]:
         """
@@ -264,14 +277,12 @@ class ZhiHuClient(AbstractApiClient):
     async def get_note_all_comments(
         self,
         content: ZhihuContent,
-        crawl_interval: float = 1.0,
         callback: Optional[Callable] = None,
     ) -> List[ZhihuComment]:
         """
         获取指定帖子下的所有一级评论，该方法会一直查找一个帖子下的所有评论信息
         Args:
             content: 内容详情对象(问题｜文章｜视频)
-            crawl_interval: 爬取一次笔记的延迟单位（秒）
             callback: 一次笔记爬取结束后
 
         Returns:
@@ -297,15 +308,13 @@ class ZhiHuClient(AbstractApiClient):
                 await callback(comments)
 
             result.extend(comments)
-            await self.get_comments_all_sub_comments(content, comments, crawl_interval=crawl_interval, callback=callback)
-            await asyncio.sleep(crawl_interval)
+            await self.get_comments_all_sub_comments(content, comments, callback=callback)
         return result
 
     async def get_comments_all_sub_comments(
         self,
         content: ZhihuContent,
         comments: List[ZhihuComment],
-        crawl_interval: float = 1.0,
         callback: Optional[Callable] = None,
     ) -> List[ZhihuComment]:
         """
@@ -313,7 +322,6 @@ class ZhiHuClient(AbstractApiClient):
         Args:
             content: 内容详情对象(问题｜文章｜视频)
             comments: 评论列表
-            crawl_interval: 爬取一次笔记的延迟单位（秒）
             callback: 一次笔记爬取结束后
 
         Returns:
@@ -346,7 +354,6 @@ class ZhiHuClient(AbstractApiClient):
                     await callback(sub_comments)
 
                 all_sub_comments.extend(sub_comments)
-                await asyncio.sleep(crawl_interval)
         return all_sub_comments
 
     async def get_creator_info(self, url_token: str) -> Optional[ZhihuCreator]:
@@ -425,12 +432,11 @@ class ZhiHuClient(AbstractApiClient):
         }
         return await self.get(uri, params)
 
-    async def get_all_anwser_by_creator(self, creator: ZhihuCreator, crawl_interval: float = 1.0, callback: Optional[Callable] = None) -> List[ZhihuContent]:
+    async def get_all_anwser_by_creator(self, creator: ZhihuCreator, callback: Optional[Callable] = None) -> List[ZhihuContent]:
         """
         获取创作者的所有回答
         Args:
             creator: 创作者信息
-            crawl_interval: 爬取一次笔记的延迟单位（秒）
             callback: 一次笔记爬取结束后
 
         Returns:
@@ -452,20 +458,17 @@ class ZhiHuClient(AbstractApiClient):
                 await callback(contents)
             all_contents.extend(contents)
             offset += limit
-            await asyncio.sleep(crawl_interval)
         return all_contents
 
     async def get_all_articles_by_creator(
         self,
         creator: ZhihuCreator,
-        crawl_interval: float = 1.0,
         callback: Optional[Callable] = None,
     ) -> List[ZhihuContent]:
         """
         获取创作者的所有文章
         Args:
             creator:
-            crawl_interval:
             callback:
 
         Returns:
@@ -486,20 +489,17 @@ class ZhiHuClient(AbstractApiClient):
                 await callback(contents)
             all_contents.extend(contents)
             offset += limit
-            await asyncio.sleep(crawl_interval)
         return all_contents
 
     async def get_all_videos_by_creator(
         self,
         creator: ZhihuCreator,
-        crawl_interval: float = 1.0,
         callback: Optional[Callable] = None,
     ) -> List[ZhihuContent]:
         """
         获取创作者的所有视频
         Args:
             creator:
-            crawl_interval:
             callback:
 
         Returns:
@@ -520,7 +520,6 @@ class ZhiHuClient(AbstractApiClient):
                 await callback(contents)
             all_contents.extend(contents)
             offset += limit
-            await asyncio.sleep(crawl_interval)
         return all_contents
 
     async def get_answer_info(
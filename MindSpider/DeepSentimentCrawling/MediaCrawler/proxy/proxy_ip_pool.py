@@ -12,8 +12,11 @@
 # @Author  : relakkes@gmail.com
 # @Time    : 2023/12/2 13:45
 # @Desc    : ip代理池实现
+import asyncio
 import random
-from typing import Dict, List
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional
 
 import httpx
 from tenacity import retry, stop_after_attempt, wait_fixed
@@ -24,36 +27,218 @@ from proxy.providers import (
     new_wandou_http_proxy,
 )
 from tools import utils
+from tools.rate_controller import THROTTLE_STATUS_CODES
 
 from .base_proxy import ProxyProvider
 from .types import IpInfoModel, ProviderNameEnum
 
+# 小于该值的过期时间视为"剩余秒数"（如快代理 f_et 返回的是剩余有效期），否则视为 unix 时间戳
+_RELATIVE_EXPIRE_THRESHOLD = 10 ** 9
+
+
+class ProxyStat:
+    """单个代理IP的健康状况：成功率、延迟和过期时间"""
+
+    def __init__(self, proxy: IpInfoModel):
+        self.proxy = proxy
+        self.success_count = 0
+        self.failure_count = 0
+        self.consecutive_failures = 0
+        self.latency: Optional[float] = None
+        self.validated = False
+        now = time.time()
+        expired_time_ts = proxy.expired_time_ts or 0
+        if 0 < expired_time_ts < _RELATIVE_EXPIRE_THRESHOLD:
+            expired_time_ts += int(now)
+        self.expire_at = expired_time_ts
+
+    @property
+    def key(self) -> str:
+        return f"{self.proxy.ip}:{self.proxy.port}"
+
+    @property
+    def success_rate(self) -> float:
+        # 拉普拉斯平滑，新代理的成功率从 0.5 开始
+        return (self.success_count + 1) / (self.success_count + self.failure_count + 2)
+
+    @property
+    def failed_validation(self) -> bool:
+        """验证过但从未成功过（新代理第一次验证就没有通过）"""
+        return self.validated and self.success_count == 0
+
+    @property
+    def score(self) -> float:
+        """健康分：成功率越高、延迟越低分数越高"""
+        latency = self.latency if self.latency is not None else 1.0
+        return self.success_rate / (1.0 + latency)
+
+    def is_expired(self, margin_sec: float = 0) -> bool:
+        return bool(self.expire_at) and time.time() + margin_sec >= self.expire_at
+
+    def record_success(self, latency: float):
+        self.success_count += 1
+        self.consecutive_failures = 0
+        self.latency = latency if self.latency is None else self.latency * 0.7 + latency * 0.3
+
+    def record_failure(self):
+        self.failure_count += 1
+        self.consecutive_failures += 1
+
 
 class ProxyIpPool:
 
     def __init__(
-        self, ip_pool_count: int, enable_validate_ip: bool, ip_provider: ProxyProvider
+        self,
+        ip_pool_count: int,
+        enable_validate_ip: bool,
+        ip_provider: ProxyProvider,
+        validate_concurrency: int = 5,
+        check_interval_sec: float = 30,
+        expire_margin_sec: float = 30,
+        max_consecutive_failures: int = 3,
     ) -> None:
         """
 
         Args:
-            ip_pool_count:
-            enable_validate_ip:
-            ip_provider:
+            ip_pool_count: 池中希望保持的可用代理数量
+            enable_validate_ip: 是否验证代理可用性（在后台并发进行，不阻塞取代理）
+            ip_provider: 代理提供商
+            validate_concurrency: 同时验证的代理数量
+            check_interval_sec: 后台巡检间隔（秒）
+            expire_margin_sec: 距离过期不足该秒数的代理不再分配
+            max_consecutive_failures: 连续失败达到该次数的代理被剔除
         """
         self.valid_ip_url = "https://echo.apifox.cn/"  # 验证 IP 是否有效的地址
         self.ip_pool_count = ip_pool_count
         self.enable_validate_ip = enable_validate_ip
-        self.proxy_list: List[IpInfoModel] = []
         self.ip_provider: ProxyProvider = ip_provider
+        self.validate_concurrency = max(validate_concurrency, 1)
+        self.check_interval_sec = check_interval_sec
+        self.expire_margin_sec = expire_margin_sec
+        self.max_consecutive_failures = max_consecutive_failures
+        self._stats: Dict[str, ProxyStat] = {}
+        self._refill_lock = asyncio.Lock()
+        self._validate_semaphore = asyncio.Semaphore(self.validate_concurrency)
+        self._background_tasks: set = set()
+        self._maintain_task: Optional[asyncio.Task] = None
+
+    @property
+    def proxy_list(self) -> List[IpInfoModel]:
+        """当前池中所有未被剔除的代理"""
+        return [stat.proxy for stat in self._stats.values()]
+
+    def _available_stats(self) -> List[ProxyStat]:
+        return [
+            stat for stat in self._stats.values()
+            if not stat.is_expired(self.expire_margin_sec)
+            and stat.consecutive_failures < self.max_consecutive_failures
+            and not stat.failed_validation
+        ]
+
+    def _usable_stats(self) -> List[ProxyStat]:
+        """可以分配出去的代理：开启验证时只包括验证通过（或请求成功过）的代理"""
+        available = self._available_stats()
+        if self.enable_validate_ip:
+            available = [stat for stat in available if stat.success_count > 0]
+        return available
 
     async def load_proxies(self) -> None:
         """
-        加载IP代理
+        加载IP代理，开启验证时首次加载会并发验证一轮，之后由后台任务维护
         Returns:
 
         """
-        self.proxy_list = await self.ip_provider.get_proxy(self.ip_pool_count)
+        await self._refill()
+        if self.enable_validate_ip:
+            await self._validate_all([stat for stat in self._stats.values() if not stat.validated])
+            self._evict()
+        self.start()
+
+    def start(self) -> None:
+        """启动后台巡检任务：剔除过期/失效代理、重新验证、提前补充"""
+        if self._maintain_task is None or self._maintain_task.done():
+            self._maintain_task = asyncio.create_task(self._maintain_loop())
+
+    async def close(self) -> None:
+        """停止后台任务"""
+        tasks = list(self._background_tasks)
+        if self._maintain_task:
+            tasks.append(self._maintain_task)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._maintain_task = None
+        self._background_tasks.clear()
+
+    async def _maintain_loop(self):
+        while True:
+            await asyncio.sleep(self.check_interval_sec)
+            try:
+                self._evict()
+                if len(self._available_stats()) < self.ip_pool_count:
+                    await self._refill()
+                if self.enable_validate_ip:
+                    await self._validate_all(self._available_stats())
+                    self._evict()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                utils.logger.error(f"[ProxyIpPool._maintain_loop] maintain proxy pool err: {e}")
+
+    def _evict(self):
+        """剔除已过期、首次验证未通过或连续失败过多的代理"""
+        for key, stat in list(self._stats.items()):
+            if stat.is_expired(self.expire_margin_sec):
+                utils.logger.info(f"[ProxyIpPool._evict] proxy {key} expired, removed")
+                del self._stats[key]
+            elif stat.failed_validation:
+                utils.logger.info(f"[ProxyIpPool._evict] proxy {key} failed validation, removed")
+                del self._stats[key]
+            elif stat.consecutive_failures >= self.max_consecutive_failures:
+                utils.logger.info(
+                    f"[ProxyIpPool._evict] proxy {key} failed {stat.consecutive_failures} times in a row, removed"
+                )
+                del self._stats[key]
+
+    async def _refill(self):
+        """从代理商补充代理，直到可用数量达到 ip_pool_count"""
+        async with self._refill_lock:
+            need_count = self.ip_pool_count - len(self._available_stats())
+            if need_count <= 0:
+                return
+            proxies = await self.ip_provider.get_proxy(need_count)
+            for proxy in proxies:
+                stat = ProxyStat(proxy)
+                if stat.key not in self._stats and not stat.is_expired(self.expire_margin_sec):
+                    self._stats[stat.key] = stat
+
+    async def _refill_and_validate(self):
+        """补充代理，开启验证时接着验证新补充的代理，通过验证后才会被分配"""
+        await self._refill()
+        if self.enable_validate_ip:
+            await self._validate_all([stat for stat in self._available_stats() if not stat.validated])
+            self._evict()
+
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+
+    async def _validate_all(self, stats: List[ProxyStat]):
+        await asyncio.gather(*(self._validate(stat) for stat in stats))
+
+    async def _validate(self, stat: ProxyStat):
+        async with self._validate_semaphore:
+            started = time.monotonic()
+            try:
+                is_valid = await self._is_valid_proxy(stat.proxy)
+            except Exception:
+                is_valid = False
+            stat.validated = True
+            if is_valid:
+                stat.record_success(time.monotonic() - started)
+            else:
+                stat.record_failure()
 
     async def _is_valid_proxy(self, proxy: IpInfoModel) -> bool:
         """
@@ -70,8 +255,8 @@ class ProxyIpPool:
                 proxy_url = f"http://{proxy.user}:{proxy.password}@{proxy.ip}:{proxy.port}"
             else:
                 proxy_url = f"http://{proxy.ip}:{proxy.port}"
-            
-            async with httpx.AsyncClient(proxy=proxy_url) as client:
+
+            async with httpx.AsyncClient(proxy=proxy_url, timeout=10) as client:
                 response = await client.get(self.valid_ip_url)
             if response.status_code == 200:
                 return True
@@ -86,28 +271,95 @@ class ProxyIpPool:
     @retry(stop=stop_after_attempt(3), wait=wait_fixed(1))
     async def get_proxy(self) -> IpInfoModel:
         """
-        从代理池中随机提取一个代理IP
+        从代理池中取出当前最健康的代理IP，代理在过期前可以被重复使用
+        开启验证时只分配验证通过的代理；池中还有可用代理时补充和验证都在后台进行，
+        只有池子完全空了才会同步向代理商补充并等待验证结果
         :return:
         """
-        if len(self.proxy_list) == 0:
-            await self._reload_proxies()
+        self._evict()
+        available = self._usable_stats()
+        if not available:
+            await self._refill_and_validate()
+            available = self._usable_stats()
+            if not available:
+                raise Exception("[ProxyIpPool.get_proxy] no available proxy and again get it")
+        elif len(available) < self.ip_pool_count and not self._refill_lock.locked():
+            # 可用代理不足时提前在后台补充，避免取空后才去请求代理商
+            self._spawn(self._refill_and_validate())
 
-        proxy = random.choice(self.proxy_list)
-        self.proxy_list.remove(proxy)  # 取出来一个IP就应该移出掉
-        if self.enable_validate_ip:
-            if not await self._is_valid_proxy(proxy):
-                raise Exception(
-                    "[ProxyIpPool.get_proxy] current ip invalid and again get it"
-                )
-        return proxy
+        # 在分数接近最高分的代理中随机挑选，避免所有请求集中到同一个 IP
+        best_score = max(stat.score for stat in available)
+        candidates = [stat for stat in available if stat.score >= best_score * 0.8]
+        return random.choice(candidates).proxy
 
-    async def _reload_proxies(self):
+    def report_success(self, proxy: IpInfoModel, latency: float):
         """
-        # 重新加载代理池
+        上报代理的一次成功请求
+        :param proxy:
+        :param latency: 请求耗时（秒）
         :return:
         """
-        self.proxy_list = []
-        await self.load_proxies()
+        stat = self._stats.get(f"{proxy.ip}:{proxy.port}")
+        if stat:
+            stat.record_success(latency)
+
+    def report_failure(self, proxy: IpInfoModel):
+        """
+        上报代理的一次失败请求，连续失败过多的代理会被剔除
+        :param proxy:
+        :return:
+        """
+        stat = self._stats.get(f"{proxy.ip}:{proxy.port}")
+        if stat:
+            stat.record_failure()
+            if stat.consecutive_failures >= self.max_consecutive_failures:
+                self._evict()
+
+
+class ProxyUsage:
+    """一次经过代理的请求，请求方通过它上报响应状态"""
+
+    def __init__(self):
+        self.responded = False
+        self.failed = False
+
+    def observe_status(self, status_code: int):
+        self.responded = True
+        if status_code in THROTTLE_STATUS_CODES or status_code == 407:
+            self.failed = True
+
+    def mark_failed(self):
+        """平台在响应内容中提示IP被封禁等代理本身的问题"""
+        self.failed = True
+
+
+@asynccontextmanager
+async def track_proxy(pool: Optional[ProxyIpPool], proxy: Optional[IpInfoModel]) -> AsyncIterator[ProxyUsage]:
+    """
+    包裹一次经过代理的请求，结束后向代理池上报代理的健康状况（没有使用代理池时什么都不做）
+    请求没有拿到响应就抛出异常（连接失败、超时等）、返回限流状态码或被标记失败时上报失败，
+    拿到了正常响应时上报成功，之后的业务错误（如内容不存在）与代理无关
+    用法：
+        async with track_proxy(self.ip_pool, self.ip_proxy_info) as proxy_usage:
+            response = await client.request(...)
+            proxy_usage.observe_status(response.status_code)
+    """
+    usage = ProxyUsage()
+    started = time.monotonic()
+    try:
+        yield usage
+    except Exception:
+        if pool and proxy:
+            if usage.responded and not usage.failed:
+                pool.report_success(proxy, time.monotonic() - started)
+            else:
+                pool.report_failure(proxy)
+        raise
+    if pool and proxy:
+        if usage.failed:
+            pool.report_failure(proxy)
+        else:
+            pool.report_success(proxy, time.monotonic() - started)
 
 
 IpProxyProvider: Dict[str, ProxyProvider] = {
@@ -127,6 +379,8 @@ async def create_ip_pool(ip_pool_count: int, enable_validate_ip: bool) -> ProxyI
         ip_pool_count=ip_pool_count,
         enable_validate_ip=enable_validate_ip,
         ip_provider=IpProxyProvider.get(config.IP_PROXY_PROVIDER_NAME),
+        check_interval_sec=config.IP_PROXY_CHECK_INTERVAL_SEC,
+        expire_margin_sec=config.IP_PROXY_EXPIRE_MARGIN_SEC,
     )
     await pool.load_proxies()
     return pool
@@ -588,3 +588,22 @@ alter table douyin_aweme_comment add column `like_count` varchar(255) NOT NULL D
 alter table xhs_note add column xsec_token varchar(50) default null comment '签名算法';
 alter table douyin_aweme_comment add column `pictures` varchar(500) NOT NULL DEFAULT '' COMMENT '评论图片列表';
 alter table bilibili_video_comment add column `like_count` varchar(255) NOT NULL DEFAULT '0' COMMENT '点赞数';
+
+-- ----------------------------
+-- Table structure for crawl_state
+-- ----------------------------
+DROP TABLE IF EXISTS `crawl_state`;
+CREATE TABLE `crawl_state`
+(
+    `id`                  int          NOT NULL AUTO_INCREMENT COMMENT '自增ID',
+    `platform`            varchar(32)  NOT NULL COMMENT '平台名称',
+    `note_id`             varchar(255) NOT NULL COMMENT '帖子/视频ID',
+    `comment_cursor`      longtext COMMENT '最后一次评论分页游标',
+    `latest_comment_id`   varchar(255) DEFAULT NULL COMMENT '已爬取的最新评论ID',
+    `latest_comment_time` bigint       NOT NULL DEFAULT 0 COMMENT '已爬取的最新评论时间',
+    `comment_count`       bigint       NOT NULL DEFAULT -1 COMMENT '上次爬取时的评论数',
+    `add_ts`              bigint       NOT NULL COMMENT '记录添加时间戳',
+    `last_modify_ts`      bigint       NOT NULL COMMENT '记录最后修改时间戳',
+    PRIMARY KEY (`id`),
+    UNIQUE KEY `uk_crawl_state_platform_note` (`platform`, `note_id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci COMMENT='评论增量爬取状态';
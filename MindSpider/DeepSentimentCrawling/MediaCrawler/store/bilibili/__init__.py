@@ -16,6 +16,7 @@
 from typing import List
 
 import config
+from store import crawl_state
 from var import source_keyword_var
 
 from ._store_impl import *
@@ -69,6 +70,7 @@ async def update_bilibili_video(video_item: Dict):
         "source_keyword": source_keyword_var.get(),
     }
     utils.logger.info(f"[store.bilibili.update_bilibili_video] bilibili video id:{video_id}, title:{save_content_item.get('title')}")
+    crawl_state.observe_comment_count("bili", video_id, video_item_stat.get("reply"))
     await BiliStoreFactory.create_store().store_content(content_item=save_content_item)
 
 
@@ -0,0 +1,361 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+# @Desc    : 评论增量爬取状态（每个帖子的评论高水位线）
+import asyncio
+import json
+import os
+import pathlib
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, List, Optional
+
+import aiofiles
+from sqlalchemy import select, update
+
+import config
+from database.db_session import get_session
+from database.models import CrawlState
+from tools import utils
+from tools.time_util import get_current_timestamp
+
+
+class CommentWatermark:
+    """
+    单个帖子的评论高水位线
+
+    记录上一次爬取到的最新评论ID/时间、评论数和分页游标。爬取评论时用它过滤掉已经入库的评论，
+    并在新增评论已经全部拿到（或按时间排序时遇到旧评论）后提前结束翻页。
+    """
+
+    def __init__(
+        self,
+        platform: str,
+        note_id: str,
+        latest_comment_id: str = "",
+        latest_comment_time: int = 0,
+        last_comment_count: int = -1,
+        comment_cursor: str = "",
+        comment_count: int = -1,
+    ):
+        self.platform = platform
+        self.note_id = str(note_id)
+        self.latest_comment_id = latest_comment_id or ""
+        self.latest_comment_time = latest_comment_time or 0
+        self.last_comment_count = last_comment_count if last_comment_count is not None else -1
+        self.comment_cursor = comment_cursor or ""
+        # 本次爬取时帖子详情上的评论数，-1 表示未知
+        self.comment_count = comment_count
+        self.new_comment_count = 0
+        self.reached_known = False
+        # 因 max_count 没有取完新增评论时为True，此时不记录本次的评论数，下次爬取不会跳过该帖子
+        self.truncated = False
+        # 被截掉的评论中最早的创建时间减1，高水位线不能越过它，否则这些评论下次爬取时会被当作旧评论过滤掉
+        self._cut_time_cap: Optional[int] = None
+        self._newest_comment_id = self.latest_comment_id
+        self._newest_comment_time = self.latest_comment_time
+
+    @property
+    def is_first_crawl(self) -> bool:
+        return self.last_comment_count < 0 and not self.latest_comment_time
+
+    @property
+    def expected_new_count(self) -> int:
+        """根据评论数的变化估算新增评论数，无法估算时返回 -1"""
+        if self.is_first_crawl or self.comment_count < 0 or self.last_comment_count < 0:
+            return -1
+        return max(self.comment_count - self.last_comment_count, 0)
+
+    def is_unchanged(self) -> bool:
+        """评论数与上次爬取时一致，可以直接跳过该帖子"""
+        return not self.is_first_crawl and self.comment_count >= 0 and self.comment_count == self.last_comment_count
+
+    @staticmethod
+    def _comment_time(comment: Dict, time_getter: Callable[[Dict], int]) -> int:
+        try:
+            return int(time_getter(comment) or 0)
+        except (TypeError, ValueError):
+            return 0
+
+    def filter_new_comments(
+        self,
+        comments: List[Dict],
+        time_getter: Callable[[Dict], int],
+        id_getter: Callable[[Dict], str],
+        limit: int = -1,
+    ) -> List[Dict]:
+        """
+        过滤出比高水位线更新的评论，截取到 limit 条后，只按实际返回的评论推进本次爬取看到的最新评论，
+        且不越过被截掉的评论中最早的一条（截取按页内位置进行，返回的评论不一定都比截掉的新）
+        Args:
+            comments: 一页评论
+            time_getter: 从评论中取出创建时间（可比较的整数）
+            id_getter: 从评论中取出评论ID
+            limit: 本页最多返回的评论数，小于0表示不限制。被截掉的评论不推进高水位线，下次爬取时还会取到
+
+        Returns:
+
+        """
+        new_comments = [
+            comment for comment in comments
+            if self.is_first_crawl or self._comment_time(comment, time_getter) > self.latest_comment_time
+        ]
+        if len(new_comments) < len(comments):
+            self.reached_known = True
+        if 0 <= limit < len(new_comments):
+            cut_time = min(self._comment_time(comment, time_getter) for comment in new_comments[limit:]) - 1
+            if self._cut_time_cap is None or cut_time < self._cut_time_cap:
+                self._cut_time_cap = cut_time
+            new_comments = new_comments[:limit]
+            self.truncated = True
+        for comment in new_comments:
+            comment_time = self._comment_time(comment, time_getter)
+            if comment_time > self._newest_comment_time and (
+                    self._cut_time_cap is None or comment_time <= self._cut_time_cap):
+                self._newest_comment_time = comment_time
+                self._newest_comment_id = str(id_getter(comment) or "")
+        self.new_comment_count += len(new_comments)
+        return new_comments
+
+    def should_stop(self, ordered_by_time: bool = False) -> bool:
+        """
+        是否可以提前结束翻页
+        Args:
+            ordered_by_time: 评论是否按时间倒序返回，是的话遇到第一条旧评论即可停止
+
+        Returns:
+
+        """
+        if self.is_first_crawl:
+            return False
+        if ordered_by_time and self.reached_known:
+            return True
+        expected = self.expected_new_count
+        return expected >= 0 and self.new_comment_count >= expected
+
+    def to_dict(self) -> Dict:
+        """本次爬取结束后需要持久化的状态"""
+        comment_count = self.comment_count if self.comment_count >= 0 and not self.truncated else self.last_comment_count
+        newest_comment_id, newest_comment_time = self._newest_comment_id, self._newest_comment_time
+        if self._cut_time_cap is not None and newest_comment_time > self._cut_time_cap:
+            # 之前的页推进过的高水位线越过了后面某页被截掉的评论，退回到截掉的评论之前
+            newest_comment_id, newest_comment_time = "", max(self._cut_time_cap, self.latest_comment_time)
+        return {
+            "platform": self.platform,
+            "note_id": self.note_id,
+            "comment_cursor": self.comment_cursor,
+            "latest_comment_id": newest_comment_id,
+            "latest_comment_time": newest_comment_time,
+            "comment_count": comment_count,
+        }
+
+
+class AbstractCrawlStateStore(ABC):
+
+    @abstractmethod
+    async def get_state(self, platform: str, note_id: str) -> Optional[Dict]:
+        pass
+
+    @abstractmethod
+    async def save_state(self, state_item: Dict):
+        pass
+
+
+class CrawlStateDbStoreImplement(AbstractCrawlStateStore):
+
+    async def get_state(self, platform: str, note_id: str) -> Optional[Dict]:
+        async with get_session() as session:
+            stmt = select(CrawlState).where(CrawlState.platform == platform, CrawlState.note_id == note_id)
+            result = await session.execute(stmt)
+            row = result.scalars().first()
+            if not row:
+                return None
+            return {
+                "latest_comment_id": row.latest_comment_id,
+                "latest_comment_time": row.latest_comment_time,
+                "last_comment_count": row.comment_count,
+                "comment_cursor": row.comment_cursor,
+            }
+
+    async def save_state(self, state_item: Dict):
+        platform = state_item.get("platform")
+        note_id = state_item.get("note_id")
+        last_modify_ts = int(get_current_timestamp())
+        async with get_session() as session:
+            stmt = select(CrawlState.id).where(CrawlState.platform == platform, CrawlState.note_id == note_id)
+            exists = (await session.execute(stmt)).first() is not None
+            if exists:
+                stmt = update(CrawlState).where(
+                    CrawlState.platform == platform, CrawlState.note_id == note_id
+                ).values(
+                    comment_cursor=state_item.get("comment_cursor"),
+                    latest_comment_id=state_item.get("latest_comment_id"),
+                    latest_comment_time=state_item.get("latest_comment_time"),
+                    comment_count=state_item.get("comment_count"),
+                    last_modify_ts=last_modify_ts,
+                )
+                await session.execute(stmt)
+            else:
+                session.add(CrawlState(
+                    platform=platform,
+                    note_id=note_id,
+                    comment_cursor=state_item.get("comment_cursor"),
+                    latest_comment_id=state_item.get("latest_comment_id"),
+                    latest_comment_time=state_item.get("latest_comment_time"),
+                    comment_count=state_item.get("comment_count"),
+                    add_ts=last_modify_ts,
+                    last_modify_ts=last_modify_ts,
+                ))
+
+
+class CrawlStateJsonStoreImplement(AbstractCrawlStateStore):
+    """csv/json 存储模式下没有数据库，状态保存在 data/{platform}/crawl_state.json"""
+
+    _states: Dict[str, Dict[str, Dict]] = {}
+    _lock = asyncio.Lock()
+
+    @staticmethod
+    def _get_file_path(platform: str) -> str:
+        base_path = f"data/{platform}"
+        pathlib.Path(base_path).mkdir(parents=True, exist_ok=True)
+        return f"{base_path}/crawl_state.json"
+
+    async def _load(self, platform: str) -> Dict[str, Dict]:
+        if platform in self._states:
+            return self._states[platform]
+        file_path = self._get_file_path(platform)
+        states = {}
+        if os.path.exists(file_path) and os.path.getsize(file_path) > 0:
+            async with aiofiles.open(file_path, "r", encoding="utf-8") as f:
+                try:
+                    states = json.loads(await f.read())
+                except json.JSONDecodeError:
+                    utils.logger.warning(f"[CrawlStateJsonStoreImplement._load] Broken state file {file_path}, ignored")
+                    states = {}
+        self._states[platform] = states
+        return states
+
+    async def get_state(self, platform: str, note_id: str) -> Optional[Dict]:
+        async with self._lock:
+            state = (await self._load(platform)).get(note_id)
+        if not state:
+            return None
+        return {
+            "latest_comment_id": state.get("latest_comment_id"),
+            "latest_comment_time": state.get("latest_comment_time"),
+            "last_comment_count": state.get("comment_count"),
+            "comment_cursor": state.get("comment_cursor"),
+        }
+
+    async def save_state(self, state_item: Dict):
+        platform = state_item.get("platform")
+        async with self._lock:
+            states = await self._load(platform)
+            states[state_item.get("note_id")] = {
+                **state_item,
+                "last_modify_ts": int(get_current_timestamp()),
+            }
+            async with aiofiles.open(self._get_file_path(platform), "w", encoding="utf-8") as f:
+                await f.write(json.dumps(states, ensure_ascii=False, indent=4))
+
+
+class CrawlStateStoreFactory:
+    STORES = {
+        "csv": CrawlStateJsonStoreImplement,
+        "db": CrawlStateDbStoreImplement,
+        "json": CrawlStateJsonStoreImplement,
+        "sqlite": CrawlStateDbStoreImplement,
+        "postgresql": CrawlStateDbStoreImplement,
+    }
+
+    @staticmethod
+    def create_store() -> AbstractCrawlStateStore:
+        store_class = CrawlStateStoreFactory.STORES.get(config.SAVE_DATA_OPTION)
+        if not store_class:
+            raise ValueError("[CrawlStateStoreFactory.create_store] Invalid save option only supported csv or db or json or sqlite or postgresql ...")
+        return store_class()
+
+
+# 本次运行中从帖子详情上观察到的评论数，key 为 (platform, note_id)
+_observed_comment_counts: Dict[tuple, int] = {}
+
+
+def parse_comment_count(value) -> int:
+    """
+    将平台返回的评论数转换为整数，如 "1.2万"、"10+" 这类无法精确比较的值返回 -1
+    Args:
+        value:
+
+    Returns:
+
+    """
+    if isinstance(value, int):
+        return value
+    if value is None:
+        return -1
+    value = str(value).strip()
+    return int(value) if value.isdigit() else -1
+
+
+def observe_comment_count(platform: str, note_id, comment_count):
+    """
+    记录帖子详情上的评论数，由存储层在保存帖子时调用，爬取评论时用于判断帖子是否有新评论
+    Args:
+        platform:
+        note_id:
+        comment_count:
+
+    Returns:
+
+    """
+    if not note_id:
+        return
+    _observed_comment_counts[(platform, str(note_id))] = parse_comment_count(comment_count)
+
+
+async def load_comment_watermark(platform: str, note_id) -> CommentWatermark:
+    """
+    加载帖子的评论高水位线，未开启增量爬取时返回一个空的高水位线（等价于全量爬取）
+    Args:
+        platform:
+        note_id:
+
+    Returns:
+
+    """
+    note_id = str(note_id)
+    comment_count = _observed_comment_counts.get((platform, note_id), -1)
+    if not config.ENABLE_INCREMENTAL_COMMENTS:
+        return CommentWatermark(platform, note_id, comment_count=comment_count)
+    try:
+        state = await CrawlStateStoreFactory.create_store().get_state(platform, note_id)
+    except Exception as e:
+        # 如 db 模式下还没有建 crawl_state 表，退回全量爬取，不影响该帖子的评论
+        utils.logger.warning(f"[load_comment_watermark] Load crawl state of {platform} note {note_id} failed, fall back to full crawl: {e}")
+        state = None
+    return CommentWatermark(platform, note_id, comment_count=comment_count, **(state or {}))
+
+
+async def save_comment_watermark(watermark: CommentWatermark):
+    """
+    持久化本次爬取后的评论高水位线
+    Args:
+        watermark:
+
+    Returns:
+
+    """
+    if not config.ENABLE_INCREMENTAL_COMMENTS:
+        return
+    try:
+        await CrawlStateStoreFactory.create_store().save_state(watermark.to_dict())
+    except Exception as e:
+        utils.logger.warning(f"[save_comment_watermark] Save crawl state of {watermark.platform} note {watermark.note_id} failed: {e}")
@@ -16,6 +16,7 @@
 import re
 from typing import List
 
+from store import crawl_state
 from var import source_keyword_var
 
 from .weibo_store_media import *
@@ -93,6 +94,7 @@ async def update_weibo_note(note_item: Dict):
         "source_keyword": source_keyword_var.get(),
     }
     utils.logger.info(f"[store.weibo.update_weibo_note] weibo note id:{note_id}, title:{save_content_item.get('content')[:24]} ...")
+    crawl_state.observe_comment_count("wb", note_id, mblog.get("comments_count"))
     await WeibostoreFactory.create_store().store_content(content_item=save_content_item)
 
 
@@ -15,6 +15,7 @@
 from typing import List
 
 import config
+from store import crawl_state
 from var import source_keyword_var
 
 from .xhs_store_media import *
@@ -110,6 +111,7 @@ async def update_xhs_note(note_item: Dict):
         "xsec_token": note_item.get("xsec_token"),  # xsec_token
     }
     utils.logger.info(f"[store.xhs.update_xhs_note] xhs note: {local_db_item}")
+    crawl_state.observe_comment_count("xhs", note_id, interact_info.get("comment_count"))
     await XhsStoreFactory.create_store().store_content(local_db_item)
 
 
@@ -0,0 +1,89 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+import unittest
+
+from store.crawl_state import CommentWatermark, parse_comment_count
+
+
+def _comments(*times):
+    return [{"id": str(t), "create_time": t} for t in times]
+
+
+class TestCommentWatermark(unittest.TestCase):
+
+    def test_first_crawl_keeps_everything(self):
+        watermark = CommentWatermark("xhs", "n1", comment_count=3)
+        page = watermark.filter_new_comments(_comments(30, 10, 20), lambda c: c["create_time"], lambda c: c["id"])
+        self.assertEqual(len(page), 3)
+        self.assertFalse(watermark.should_stop())
+        state = watermark.to_dict()
+        self.assertEqual(state["latest_comment_time"], 30)
+        self.assertEqual(state["latest_comment_id"], "30")
+        self.assertEqual(state["comment_count"], 3)
+
+    def test_unchanged_comment_count_is_skipped(self):
+        watermark = CommentWatermark("xhs", "n1", latest_comment_time=30, last_comment_count=3, comment_count=3)
+        self.assertTrue(watermark.is_unchanged())
+
+    def test_stop_after_expected_new_comments(self):
+        watermark = CommentWatermark("xhs", "n1", latest_comment_time=30, last_comment_count=3, comment_count=5)
+        page = watermark.filter_new_comments(_comments(40, 20, 35), lambda c: c["create_time"], lambda c: c["id"])
+        self.assertEqual([c["create_time"] for c in page], [40, 35])
+        self.assertTrue(watermark.should_stop())
+        self.assertEqual(watermark.to_dict()["latest_comment_time"], 40)
+
+    def test_time_ordered_stops_on_known_comment(self):
+        watermark = CommentWatermark("bili", "v1", latest_comment_time=30, last_comment_count=3)
+        watermark.filter_new_comments(_comments(50, 40, 30), lambda c: c["create_time"], lambda c: c["id"])
+        self.assertFalse(watermark.should_stop())
+        self.assertTrue(watermark.should_stop(ordered_by_time=True))
+
+    def test_cut_page_only_advances_over_returned_comments(self):
+        watermark = CommentWatermark("xhs", "n1", latest_comment_time=30, last_comment_count=3, comment_count=6)
+        page = watermark.filter_new_comments(_comments(40, 60, 50), lambda c: c["create_time"], lambda c: c["id"], limit=2)
+        self.assertEqual([c["create_time"] for c in page], [40, 60])
+        self.assertTrue(watermark.truncated)
+        state = watermark.to_dict()
+        # 被截掉的50比返回的60旧，高水位线不能推进到60
+        self.assertEqual(state["latest_comment_time"], 40)
+        self.assertEqual(state["latest_comment_id"], "40")
+        # 评论数不更新，下次爬取不会因评论数未变而跳过
+        self.assertEqual(state["comment_count"], 3)
+
+        next_run = CommentWatermark("xhs", "n1", latest_comment_time=state["latest_comment_time"],
+                                    last_comment_count=state["comment_count"], comment_count=6)
+        page = next_run.filter_new_comments(_comments(40, 60, 50), lambda c: c["create_time"], lambda c: c["id"])
+        self.assertIn(50, [c["create_time"] for c in page])
+
+    def test_cut_on_later_page_pulls_watermark_back(self):
+        watermark = CommentWatermark("xhs", "n1", latest_comment_time=30, last_comment_count=3, comment_count=8)
+        watermark.filter_new_comments(_comments(70, 60), lambda c: c["create_time"], lambda c: c["id"], limit=2)
+        watermark.filter_new_comments(_comments(45, 50), lambda c: c["create_time"], lambda c: c["id"], limit=1)
+        state = watermark.to_dict()
+        self.assertEqual(state["latest_comment_time"], 49)
+        self.assertEqual(state["latest_comment_id"], "")
+
+    def test_cut_page_keeps_unreturned_newer_comments(self):
+        watermark = CommentWatermark("xhs", "n1", latest_comment_time=30, last_comment_count=3, comment_count=6)
+        watermark.filter_new_comments(_comments(40, 60, 50), lambda c: c["create_time"], lambda c: c["id"], limit=1)
+        self.assertEqual(watermark.to_dict()["latest_comment_time"], 40)
+
+    def test_parse_comment_count(self):
+        self.assertEqual(parse_comment_count("12"), 12)
+        self.assertEqual(parse_comment_count(7), 7)
+        self.assertEqual(parse_comment_count("1.2万"), -1)
+        self.assertEqual(parse_comment_count(None), -1)
+
+
+if __name__ == '__main__':
+    unittest.main()
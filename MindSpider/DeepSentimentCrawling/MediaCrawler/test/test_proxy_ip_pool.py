@@ -13,12 +13,37 @@
 # @Author  : relakkes@gmail.com
 # @Time    : 2023/12/2 14:42
 # @Desc    :
+import time
+from typing import List
 from unittest import IsolatedAsyncioTestCase
 
-from proxy.proxy_ip_pool import create_ip_pool
+from proxy.base_proxy import ProxyProvider
+from proxy.proxy_ip_pool import ProxyIpPool, create_ip_pool, track_proxy
 from proxy.types import IpInfoModel
 
 
+class FakeProxyProvider(ProxyProvider):
+    def __init__(self):
+        self.fetch_count = 0
+
+    async def get_proxy(self, num: int) -> List[IpInfoModel]:
+        proxies = []
+        for _ in range(num):
+            self.fetch_count += 1
+            proxies.append(IpInfoModel(
+                ip=f"10.0.0.{self.fetch_count}", port=8080, user="", password="",
+                expired_time_ts=int(time.time()) + 3600,
+            ))
+        return proxies
+
+
+class FakeValidateIpPool(ProxyIpPool):
+    """10.0.0.1 永远验证失败，其余代理验证成功"""
+
+    async def _is_valid_proxy(self, proxy: IpInfoModel) -> bool:
+        return proxy.ip != "10.0.0.1"
+
+
 class TestIpPool(IsolatedAsyncioTestCase):
     async def test_ip_pool(self):
         pool = await create_ip_pool(ip_pool_count=1, enable_validate_ip=True)
@@ -28,3 +53,66 @@ class TestIpPool(IsolatedAsyncioTestCase):
             print(ip_proxy_info)
             self.assertIsNotNone(ip_proxy_info.ip, msg="验证 ip 是否获取成功")
 
+
+class TestHealthScoredIpPool(IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.provider = FakeProxyProvider()
+        self.pool = FakeValidateIpPool(
+            ip_pool_count=2, enable_validate_ip=True, ip_provider=self.provider,
+            check_interval_sec=3600, max_consecutive_failures=1,
+        )
+
+    async def asyncTearDown(self):
+        await self.pool.close()
+
+    async def test_invalid_proxy_evicted_on_load(self):
+        await self.pool.load_proxies()
+        self.assertEqual([p.ip for p in self.pool.proxy_list], ["10.0.0.2"])
+
+    async def test_proxy_reused_until_failure(self):
+        await self.pool.load_proxies()
+        self.pool.ip_pool_count = 1
+        first = await self.pool.get_proxy()
+        second = await self.pool.get_proxy()
+        self.assertEqual(first.ip, second.ip)
+        self.pool.report_failure(first)
+        self.assertNotIn(first.ip, [p.ip for p in self.pool.proxy_list])
+
+    async def test_expired_proxy_not_handed_out(self):
+        await self.pool.load_proxies()
+        for stat in self.pool._stats.values():
+            stat.expire_at = int(time.time())
+        proxy = await self.pool.get_proxy()
+        self.assertGreater(int(proxy.ip.rsplit(".", 1)[1]), 2)
+
+    async def test_empty_pool_hands_out_only_validated_proxies(self):
+        """池子取空后同步补充，等验证结果出来再分配，验证失败的代理不会被分配"""
+        self.pool.ip_pool_count = 1
+        proxy = await self.pool.get_proxy()
+        self.assertEqual(proxy.ip, "10.0.0.2")
+        self.assertEqual([p.ip for p in self.pool.proxy_list], ["10.0.0.2"])
+
+    async def test_track_proxy_reports_health(self):
+        await self.pool.load_proxies()
+        proxy = await self.pool.get_proxy()
+        stat = self.pool._stats[f"{proxy.ip}:{proxy.port}"]
+        async with track_proxy(self.pool, proxy) as usage:
+            usage.observe_status(200)
+        self.assertEqual(stat.success_count, 2)
+
+        # 拿到正常响应后的业务错误与代理无关
+        with self.assertRaises(ValueError):
+            async with track_proxy(self.pool, proxy) as usage:
+                usage.observe_status(200)
+                raise ValueError("note not found")
+        self.assertEqual(stat.failure_count, 0)
+
+        with self.assertRaises(ConnectionError):
+            async with track_proxy(self.pool, proxy):
+                raise ConnectionError("proxy refused")
+        self.assertNotIn(proxy.ip, [p.ip for p in self.pool.proxy_list])
+
+    async def test_track_proxy_without_pool(self):
+        async with track_proxy(None, None) as usage:
+            usage.observe_status(461)
+        self.assertTrue(usage.failed)
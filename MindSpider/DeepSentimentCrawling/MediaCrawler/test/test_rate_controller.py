@@ -0,0 +1,55 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+import time
+import unittest
+
+from tools.rate_controller import AdaptiveRateController
+
+
+class TestAdaptiveRateController(unittest.IsolatedAsyncioTestCase):
+
+    async def test_success_increases_rate(self):
+        controller = AdaptiveRateController("xhs", initial_rate=1.0, max_rate=1.2, increase_step=0.1)
+        for _ in range(5):
+            async with controller.request_slot() as slot:
+                slot.observe_status(200)
+        self.assertAlmostEqual(controller.rate, 1.2)
+
+    async def test_throttle_status_halves_rate_and_cools_down(self):
+        controller = AdaptiveRateController("xhs", initial_rate=2.0, min_rate=0.5, cooldown_sec=5)
+        async with controller.request_slot() as slot:
+            slot.observe_status(429)
+        self.assertAlmostEqual(controller.rate, 1.0)
+        self.assertGreater(controller._blocked_until, time.monotonic())
+
+    async def test_exception_decreases_rate(self):
+        controller = AdaptiveRateController("dy", initial_rate=8.0, min_rate=4.0, max_rate=8.0)
+        with self.assertRaises(RuntimeError):
+            async with controller.request_slot():
+                raise RuntimeError("network error")
+        self.assertAlmostEqual(controller.rate, 4.0)
+        with self.assertRaises(RuntimeError):
+            async with controller.request_slot():
+                raise RuntimeError("network error")
+        self.assertAlmostEqual(controller.rate, 4.0)
+
+    async def test_acquire_waits_for_token(self):
+        controller = AdaptiveRateController("wb", initial_rate=20.0, max_rate=20.0)
+        started = time.monotonic()
+        await controller.acquire()
+        await controller.acquire()
+        self.assertGreaterEqual(time.monotonic() - started, 0.04)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -7,7 +7,8 @@ from typing import Dict, List
 import aiofiles
 import config
 from tools.utils import utils
-from tools.words import AsyncWordCloudGenerator
+from tools.words import AsyncWordCloudGenerator, get_word_frequency_service
+from var import source_keyword_var
 
 class AsyncFileWriter:
     def __init__(self, platform: str, crawler_type: str):
@@ -22,7 +23,17 @@ class AsyncFileWriter:
         file_name = f"{self.crawler_type}_{item_type}_{utils.get_current_date()}.{file_type}"
         return f"{base_path}/{file_name}"
 
+    def _feed_word_frequency(self, item: Dict, item_type: str):
+        """评论落盘时顺带送入增量词频统计，分词在进程池中异步完成"""
+        if item_type != 'comments' or not self.wordcloud_generator or not config.ENABLE_GET_COMMENTS:
+            return
+        # Handle different comment data structures across platforms
+        content_text = item.get('content') or item.get('comment_text') or item.get('text') or ''
+        if content_text:
+            get_word_frequency_service().add_comment(self.platform, content_text, source_keyword_var.get())
+
     async def write_to_csv(self, item: Dict, item_type: str):
+        self._feed_word_frequency(item, item_type)
         file_path = self._get_file_path('csv', item_type)
         async with self.lock:
             file_exists = os.path.exists(file_path)
@@ -33,6 +44,7 @@ class AsyncFileWriter:
                 await writer.writerow(item)
 
     async def write_single_item_to_json(self, item: Dict, item_type: str):
+        self._feed_word_frequency(item, item_type)
         file_path = self._get_file_path('json', item_type)
         async with self.lock:
             existing_data = []
@@ -56,6 +68,7 @@ class AsyncFileWriter:
         """
         Generate wordcloud from comments data
         Only works when ENABLE_GET_WORDCLOUD and ENABLE_GET_COMMENTS are True
+        评论在存储时已经增量分词，这里只需等待剩余批次完成，再用当天的 top-K 词频绘制词云
         """
         if not config.ENABLE_GET_WORDCLOUD or not config.ENABLE_GET_COMMENTS:
             return
@@ -64,33 +77,10 @@ class AsyncFileWriter:
             return
 
         try:
-            # Read comments from JSON file
-            comments_file_path = self._get_file_path('json', 'comments')
-            if not os.path.exists(comments_file_path) or os.path.getsize(comments_file_path) == 0:
-                utils.logger.info(f"[AsyncFileWriter.generate_wordcloud_from_comments] No comments file found at {comments_file_path}")
-                return
-
-            async with aiofiles.open(comments_file_path, 'r', encoding='utf-8') as f:
-                content = await f.read()
-                if not content:
-                    utils.logger.info(f"[AsyncFileWriter.generate_wordcloud_from_comments] Comments file is empty")
-                    return
-
-                comments_data = json.loads(content)
-                if not isinstance(comments_data, list):
-                    comments_data = [comments_data]
-
-            # Filter comments data to only include 'content' field
-            # Handle different comment data structures across platforms
-            filtered_data = []
-            for comment in comments_data:
-                if isinstance(comment, dict):
-                    # Try different possible content field names
-                    content_text = comment.get('content') or comment.get('comment_text') or comment.get('text') or ''
-                    if content_text:
-                        filtered_data.append({'content': content_text})
-
-            if not filtered_data:
+            service = get_word_frequency_service()
+            await service.flush(self.platform)
+            word_freq = service.get_word_freq(self.platform)
+            if not word_freq:
                 utils.logger.info(f"[AsyncFileWriter.generate_wordcloud_from_comments] No valid comment content found")
                 return
 
@@ -99,9 +89,9 @@ class AsyncFileWriter:
             pathlib.Path(words_base_path).mkdir(parents=True, exist_ok=True)
             words_file_prefix = f"{words_base_path}/{self.crawler_type}_comments_{utils.get_current_date()}"
 
-            utils.logger.info(f"[AsyncFileWriter.generate_wordcloud_from_comments] Generating wordcloud from {len(filtered_data)} comments")
-            await self.wordcloud_generator.generate_word_frequency_and_cloud(filtered_data, words_file_prefix)
+            utils.logger.info(f"[AsyncFileWriter.generate_wordcloud_from_comments] Generating wordcloud from {len(word_freq)} distinct words")
+            await self.wordcloud_generator.save_word_frequency_and_cloud(word_freq, words_file_prefix)
             utils.logger.info(f"[AsyncFileWriter.generate_wordcloud_from_comments] Wordcloud generated successfully at {words_file_prefix}")
 
         except Exception as e:
-            utils.logger.error(f"[AsyncFileWriter.generate_wordcloud_from_comments] Error generating wordcloud: {e}")
\ No newline at end of file
+            utils.logger.error(f"[AsyncFileWriter.generate_wordcloud_from_comments] Error generating wordcloud: {e}")
@@ -0,0 +1,175 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+# @Desc    : 按平台共享的自适应请求速率控制（令牌桶 + AIMD）
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional
+
+import config
+from tools import utils
+
+# 平台返回这些状态码时表示触发了限流/验证码，需要立即大幅降速
+THROTTLE_STATUS_CODES = (429, 461, 471)
+
+
+class RequestSlot:
+    """一次请求的占位，请求方通过它上报响应状态"""
+
+    def __init__(self):
+        self.throttled = False
+
+    def observe_status(self, status_code: int):
+        if status_code in THROTTLE_STATUS_CODES:
+            self.throttled = True
+
+    def mark_throttled(self):
+        self.throttled = True
+
+
+class AdaptiveRateController:
+    """
+    自适应速率控制器
+
+    令牌桶按 rate（每秒请求数）补充令牌，每次请求消耗一个令牌；请求成功时 rate 线性增加，
+    失败时按 decrease_factor 成倍减少，遇到限流状态码时还会整体冷却一段时间（AIMD）。
+    响应延迟明显高于历史最低水平时也会轻微降速，避免把平台压到限流边缘。
+    """
+
+    def __init__(
+        self,
+        platform: str,
+        initial_rate: float = 1.0,
+        min_rate: float = 0.5,
+        max_rate: float = 4.0,
+        burst: float = 1.0,
+        increase_step: float = 0.1,
+        decrease_factor: float = 0.5,
+        latency_factor: float = 3.0,
+        cooldown_sec: float = 10.0,
+        max_concurrency: int = 1,
+    ):
+        """
+        :param platform: 平台名称
+        :param initial_rate: 初始速率（每秒请求数）
+        :param min_rate: 速率下限
+        :param max_rate: 速率上限
+        :param burst: 令牌桶容量
+        :param increase_step: 每次成功请求增加的速率
+        :param decrease_factor: 每次失败后速率乘以的系数
+        :param latency_factor: 延迟超过基线多少倍时视为拥塞
+        :param cooldown_sec: 触发限流后的冷却时间（秒）
+        :param max_concurrency: 同时在途的最大请求数
+        """
+        self.platform = platform
+        self.min_rate = min_rate
+        self.max_rate = max(max_rate, min_rate)
+        self.rate = min(max(initial_rate, min_rate), self.max_rate)
+        self.burst = max(burst, 1.0)
+        self.increase_step = increase_step
+        self.decrease_factor = decrease_factor
+        self.latency_factor = latency_factor
+        self.cooldown_sec = cooldown_sec
+        self._tokens = self.burst
+        self._last_refill = time.monotonic()
+        self._blocked_until = 0.0
+        self._baseline_latency: Optional[float] = None
+        self._lock = asyncio.Lock()
+        self._in_flight = asyncio.Semaphore(max(max_concurrency, 1))
+
+    def _refill(self, now: float):
+        elapsed = now - self._last_refill
+        self._last_refill = now
+        self._tokens = min(self.burst, self._tokens + elapsed * self.rate)
+
+    async def acquire(self):
+        """等待直到可以发出下一次请求"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._blocked_until:
+                    await asyncio.sleep(self._blocked_until - now)
+                    continue
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def on_success(self, latency: float):
+        """请求成功，线性加速；延迟明显升高时轻微降速"""
+        if self._baseline_latency is None or latency < self._baseline_latency:
+            self._baseline_latency = latency
+        else:
+            # 基线缓慢向当前延迟靠拢，适应网络状况的长期变化
+            self._baseline_latency = self._baseline_latency * 0.95 + latency * 0.05
+        if latency > self._baseline_latency * self.latency_factor:
+            self.rate = max(self.min_rate, self.rate * 0.9)
+        else:
+            self.rate = min(self.max_rate, self.rate + self.increase_step)
+
+    def on_failure(self, throttled: bool = False):
+        """请求失败，成倍减速；被限流时清空令牌并冷却"""
+        self.rate = max(self.min_rate, self.rate * self.decrease_factor)
+        if throttled:
+            self._tokens = 0
+            self._blocked_until = time.monotonic() + self.cooldown_sec
+            utils.logger.warning(
+                f"[AdaptiveRateController] {self.platform} throttled, cool down {self.cooldown_sec}s, rate -> {self.rate:.2f}/s"
+            )
+
+    @asynccontextmanager
+    async def request_slot(self) -> AsyncIterator[RequestSlot]:
+        """
+        包裹一次请求：申请令牌、限制在途请求数，并根据请求结果调整速率
+        用法：
+            async with rate_controller.request_slot() as slot:
+                response = await client.request(...)
+                slot.observe_status(response.status_code)
+        """
+        await self.acquire()
+        async with self._in_flight:
+            slot = RequestSlot()
+            started = time.monotonic()
+            try:
+                yield slot
+            except Exception:
+                self.on_failure(throttled=slot.throttled)
+                raise
+            if slot.throttled:
+                self.on_failure(throttled=True)
+            else:
+                self.on_success(time.monotonic() - started)
+
+
+_controllers: Dict[str, AdaptiveRateController] = {}
+
+
+def get_rate_controller(platform: str) -> AdaptiveRateController:
+    """
+    获取平台共享的速率控制器，同一进程内同一平台的所有客户端共用一个实例
+    :param platform: 平台名称
+    :return:
+    """
+    if platform not in _controllers:
+        # 最慢每 CRAWLER_MAX_SLEEP_SEC 秒一次请求，不会比原来的固定间隔更慢
+        min_rate = 1.0 / config.CRAWLER_MAX_SLEEP_SEC if config.CRAWLER_MAX_SLEEP_SEC > 0 else config.CRAWLER_MAX_REQUEST_RATE
+        _controllers[platform] = AdaptiveRateController(
+            platform=platform,
+            initial_rate=config.CRAWLER_INITIAL_REQUEST_RATE,
+            min_rate=min_rate,
+            max_rate=config.CRAWLER_MAX_REQUEST_RATE,
+            cooldown_sec=config.CRAWLER_THROTTLE_COOLDOWN_SEC,
+            max_concurrency=config.MAX_CONCURRENCY_NUM,
+        )
+    return _controllers[platform]
@@ -12,18 +12,210 @@
 import asyncio
 import json
 import logging
+import os
+import pathlib
 from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Optional, Set, Tuple
 
 import aiofiles
-import jieba
-import matplotlib.pyplot as plt
-from wordcloud import WordCloud
 
 import config
 from tools import utils
 
 plot_lock = asyncio.Lock()
 
+# 分词子进程内的停用词，由 _init_tokenize_worker 初始化，避免每个批次都重新传输
+_worker_stop_words: Set[str] = set()
+
+
+def load_stop_words(stop_words_file: str) -> Set[str]:
+    if not os.path.exists(stop_words_file):
+        return set()
+    with open(stop_words_file, 'r', encoding='utf-8') as f:
+        return set(f.read().strip().split('\n'))
+
+
+def _init_tokenize_worker(stop_words_file: str, custom_words: Dict[str, str]):
+    """分词子进程初始化：加载停用词和自定义词，jieba 词典在首次分词时加载并常驻子进程"""
+    global _worker_stop_words
+    import jieba
+    logging.getLogger('jieba').setLevel(logging.WARNING)
+    _worker_stop_words = load_stop_words(stop_words_file)
+    for word in custom_words:
+        jieba.add_word(word)
+
+
+def tokenize_texts(texts: List[str]) -> Dict[str, int]:
+    """
+    对一批文本分词并统计词频，在子进程中执行
+    逐条分词而不是把所有文本拼成一个大字符串，内存占用只与单个批次有关
+    """
+    import jieba
+    word_freq = Counter()
+    for text in texts:
+        for word in jieba.cut(text):
+            if word not in _worker_stop_words and word.strip():
+                word_freq[word] += 1
+    return dict(word_freq)
+
+
+class WordFrequencyService:
+    """
+    增量词频统计服务
+
+    评论在存储时通过 add_comment 送入，按批次交给进程池分词，爬虫的事件循环不会被 jieba 阻塞。
+    目前只有 json / csv 存储（AsyncFileWriter）会送入评论，db / sqlite 模式不统计词频。
+    词频按 (平台, 日期) 分文件、按关键词分组累计，并持久化到 data/{platform}/words/word_freq_{date}.json，
+    多次运行的结果会合并；生成词云时只需取 top-K，无需重新读取和分词全部评论。
+    """
+
+    def __init__(self, max_workers: int = 2, batch_size: int = 200):
+        self.max_workers = max(max_workers, 1)
+        self.batch_size = max(batch_size, 1)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        # (platform, date) -> keyword -> Counter
+        self._counters: Dict[Tuple[str, str], Dict[str, Counter]] = {}
+        self._buffers: Dict[Tuple[str, str, str], List[str]] = {}
+        self._pending: Set[asyncio.Future] = set()
+        self._lock = asyncio.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                initializer=_init_tokenize_worker,
+                initargs=(config.STOP_WORDS_FILE, config.CUSTOM_WORDS),
+            )
+        return self._executor
+
+    @staticmethod
+    def _get_file_path(platform: str, date: str) -> str:
+        base_path = f"data/{platform}/words"
+        pathlib.Path(base_path).mkdir(parents=True, exist_ok=True)
+        return f"{base_path}/word_freq_{date}.json"
+
+    def _load_counters(self, platform: str, date: str) -> Dict[str, Counter]:
+        key = (platform, date)
+        if key not in self._counters:
+            counters: Dict[str, Counter] = {}
+            file_path = self._get_file_path(platform, date)
+            if os.path.exists(file_path) and os.path.getsize(file_path) > 0:
+                try:
+                    with open(file_path, 'r', encoding='utf-8') as f:
+                        for keyword, word_freq in json.load(f).items():
+                            counters[keyword] = Counter(word_freq)
+                except (json.JSONDecodeError, AttributeError):
+                    utils.logger.warning(f"[WordFrequencyService._load_counters] Broken word freq file {file_path}, ignored")
+            self._counters[key] = counters
+        return self._counters[key]
+
+    def add_comment(self, platform: str, text: str, keyword: str = ""):
+        """
+        送入一条评论，攒够一个批次后提交到进程池分词
+        :param platform: 平台
+        :param text: 评论内容
+        :param keyword: 评论所属的搜索关键词
+        :return:
+        """
+        if not text:
+            return
+        buffer_key = (platform, utils.get_current_date(), keyword or "")
+        buffer = self._buffers.setdefault(buffer_key, [])
+        buffer.append(text)
+        if len(buffer) >= self.batch_size:
+            self._submit(buffer_key)
+
+    async def tokenize_batch(self, texts: List[str]) -> Counter:
+        """
+        对一组文本分词并返回合并后的词频，按 batch_size 切分后在进程池中并行执行，不计入增量统计
+        :param texts: 文本列表
+        :return:
+        """
+        loop = asyncio.get_running_loop()
+        results = await asyncio.gather(*(
+            loop.run_in_executor(self._get_executor(), tokenize_texts, texts[i:i + self.batch_size])
+            for i in range(0, len(texts), self.batch_size)
+        ))
+        word_freq = Counter()
+        for result in results:
+            word_freq.update(result)
+        return word_freq
+
+    def _submit(self, buffer_key: Tuple[str, str, str]):
+        texts = self._buffers.pop(buffer_key, None)
+        if not texts:
+            return
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self._get_executor(), tokenize_texts, texts)
+        self._pending.add(future)
+        future.add_done_callback(lambda f: self._merge(buffer_key, f))
+
+    def _merge(self, buffer_key: Tuple[str, str, str], future: asyncio.Future):
+        self._pending.discard(future)
+        if future.cancelled():
+            return
+        if future.exception():
+            utils.logger.error(f"[WordFrequencyService._merge] tokenize comments err: {future.exception()}")
+            return
+        platform, date, keyword = buffer_key
+        counters = self._load_counters(platform, date)
+        counters.setdefault(keyword, Counter()).update(future.result())
+
+    async def flush(self, platform: Optional[str] = None):
+        """
+        提交剩余的评论，等待分词完成并把词频写入文件
+        :param platform: 只刷新指定平台，为空则刷新全部
+        :return:
+        """
+        for buffer_key in list(self._buffers.keys()):
+            if platform is None or buffer_key[0] == platform:
+                self._submit(buffer_key)
+        if self._pending:
+            await asyncio.gather(*list(self._pending), return_exceptions=True)
+        async with self._lock:
+            for (counter_platform, date), counters in self._counters.items():
+                if platform is not None and counter_platform != platform:
+                    continue
+                file_path = self._get_file_path(counter_platform, date)
+                async with aiofiles.open(file_path, 'w', encoding='utf-8') as f:
+                    await f.write(json.dumps(counters, ensure_ascii=False, indent=4))
+
+    def get_word_freq(self, platform: str, date: Optional[str] = None, keywords: Optional[Iterable[str]] = None) -> Counter:
+        """
+        合并指定平台、日期（默认当天）和关键词（默认全部）的词频
+        :return:
+        """
+        counters = self._load_counters(platform, date or utils.get_current_date())
+        selected = counters.keys() if keywords is None else [k for k in keywords if k in counters]
+        word_freq = Counter()
+        for keyword in selected:
+            word_freq.update(counters[keyword])
+        return word_freq
+
+    def top_k(self, platform: str, k: int, date: Optional[str] = None, keywords: Optional[Iterable[str]] = None) -> Dict[str, int]:
+        return dict(self.get_word_freq(platform, date, keywords).most_common(k))
+
+    async def close(self):
+        await self.flush()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+_word_frequency_service: Optional[WordFrequencyService] = None
+
+
+def get_word_frequency_service() -> WordFrequencyService:
+    global _word_frequency_service
+    if _word_frequency_service is None:
+        _word_frequency_service = WordFrequencyService(
+            max_workers=config.WORD_FREQ_WORKERS,
+            batch_size=config.WORD_FREQ_BATCH_SIZE,
+        )
+    return _word_frequency_service
+
+
 class AsyncWordCloudGenerator:
     def __init__(self):
         logging.getLogger('jieba').setLevel(logging.WARNING)
@@ -31,20 +223,18 @@ class AsyncWordCloudGenerator:
         self.lock = asyncio.Lock()
         self.stop_words = self.load_stop_words()
         self.custom_words = config.CUSTOM_WORDS
-        for word, group in self.custom_words.items():
-            jieba.add_word(word)
+        self.top_k = config.WORD_CLOUD_TOP_K
 
     def load_stop_words(self):
-        if not os.path.exists(self.stop_words_file):
-            return set()
-        with open(self.stop_words_file, 'r', encoding='utf-8') as f:
-            return set(f.read().strip().split('\n'))
+        return load_stop_words(self.stop_words_file)
 
     async def generate_word_frequency_and_cloud(self, data, save_words_prefix):
-        all_text = ' '.join(item['content'] for item in data)
-        words = [word for word in jieba.lcut(all_text) if word not in self.stop_words and len(word.strip()) > 0]
-        word_freq = Counter(words)
+        """对一组评论统计词频并生成词云，分词在进程池中按批次进行"""
+        texts = [item['content'] for item in data if item.get('content')]
+        word_freq = await get_word_frequency_service().tokenize_batch(texts)
+        await self.save_word_frequency_and_cloud(word_freq, save_words_prefix)
 
+    async def save_word_frequency_and_cloud(self, word_freq: Dict[str, int], save_words_prefix):
         # Save word frequency to file
         freq_file = f"{save_words_prefix}_word_freq.json"
         async with aiofiles.open(freq_file, 'w', encoding='utf-8') as file:
@@ -58,9 +248,17 @@ class AsyncWordCloudGenerator:
         await self.generate_word_cloud(word_freq, save_words_prefix)
 
     async def generate_word_cloud(self, word_freq, save_words_prefix):
-        await plot_lock.acquire()
-        top_20_word_freq = {word: freq for word, freq in
-                            sorted(word_freq.items(), key=lambda item: item[1], reverse=True)[:20]}
+        async with plot_lock:
+            top_word_freq = dict(Counter(word_freq).most_common(self.top_k))
+            if not top_word_freq:
+                return
+            # matplotlib 绘图是同步阻塞的，放到线程中执行
+            await asyncio.to_thread(self._render_word_cloud, top_word_freq, save_words_prefix)
+
+    def _render_word_cloud(self, top_word_freq: Dict[str, int], save_words_prefix):
+        import matplotlib.pyplot as plt
+        from wordcloud import WordCloud
+
         wordcloud = WordCloud(
             font_path=config.FONT_PATH,
             width=800,
@@ -71,7 +269,7 @@ class AsyncWordCloudGenerator:
             colormap='viridis',
             contour_color='steelblue',
             contour_width=1
-        ).generate_from_frequencies(top_20_word_freq)
+        ).generate_from_frequencies(top_word_freq)
 
         # Save word cloud image
         plt.figure(figsize=(10, 5), facecolor='white')
@@ -81,5 +279,3 @@ class AsyncWordCloudGenerator:
         plt.tight_layout(pad=0)
         plt.savefig(f"{save_words_prefix}_word_cloud.png", format='png', dpi=300)
         plt.close()
-
-        plot_lock.release()
\ No newline at end of file
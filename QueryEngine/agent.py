@@ -5,9 +5,11 @@ Deep Search Agent主类
 
 import json
 import os
+import sys
 import re
+from concurrent.futures import Future
 from datetime import datetime
-from typing import Optional, Dict, Any, List
+from typing import Optional, Callable, Dict, Any, List, Tuple
 
 from .llms import LLMClient
 from .nodes import (
@@ -19,33 +21,66 @@ from .nodes import (
     ReportFormattingNode
 )
 from .state import State
-from .tools import TavilyNewsAgency, TavilyResponse
+from .tools import TavilyNewsAgency, get_search_gateway, TavilyResponse
 from .utils import Settings, format_search_results_for_prompt
 from loguru import logger
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.research_scheduler import ResearchScheduler
+from utils.result_store import configure_result_store, get_result_store
+from utils.checkpoint import new_run_id, read_checkpoint, write_checkpoint, list_checkpoints, maintain_result_store
+from utils.near_duplicates import get_near_duplicate_index
+
 class DeepSearchAgent:
     """Deep Search Agent主类"""
     
-    def __init__(self, config: Optional[Settings] = None):
+    def __init__(self, config: Optional[Settings] = None, llm_client: Optional[LLMClient] = None):
         """
         初始化Deep Search Agent
         
         Args:
             config: 配置对象，如果不提供则自动加载
+            llm_client: 可选的LLM客户端（引擎宿主中同一引擎的任务共用一个），不填则按配置创建
         """
         # 加载配置
         from .utils.config import settings
         self.config = config or settings
         
+        # 搜索结果正文写入共享的结果存储，状态中只保留ID；超过保留期且未被断点引用的旧结果在后台清理
+        configure_result_store(self.config.RESULT_STORE_PATH)
+        maintain_result_store(get_result_store(), self._checkpoint_dir(), self.config.RESULT_RETENTION_DAYS)
+        
         # 初始化LLM客户端
-        self.llm_client = self._initialize_llm()
+        self.llm_client = llm_client or self._initialize_llm()
         
         # 初始化搜索工具集
-        self.search_agency = TavilyNewsAgency(api_key=self.config.TAVILY_API_KEY)
+        self.search_gateway = get_search_gateway(
+            backend=self.config.SEARCH_BACKEND,
+            cache_dir=self.config.SEARCH_CACHE_DIR,
+            ttl=self.config.SEARCH_CACHE_TTL,
+            max_workers=self.config.SEARCH_MAX_WORKERS,
+            fake_latency=self.config.SEARCH_FAKE_LATENCY,
+        )
+        self.search_agency = TavilyNewsAgency(
+            api_key=self.config.TAVILY_API_KEY,
+            gateway=self.search_gateway,
+        )
+        
+        # 近似重复索引：同一次运行中不同搜索返回的转发、搬运内容只保留一份
+        self.near_duplicates = get_near_duplicate_index(self.config.NEAR_DUPLICATE_INDEX_PATH,
+                                                        self.config.NEAR_DUPLICATE_MAX_DISTANCE)
         
         # 初始化节点
         self._initialize_nodes()
         
+        # 段落研究流水线：一个段落总结时，后续段落的搜索规划和搜索提前进行
+        self.scheduler = ResearchScheduler(
+            {"llm": self.config.RESEARCH_LLM_CONCURRENCY, "search": self.config.RESEARCH_SEARCH_CONCURRENCY},
+            max_workers=max(1, self.config.RESEARCH_PREFETCH_PARAGRAPHS),
+            name="QueryEngine",
+        )
+        self._prefetched: Dict[int, Future] = {}
+        
         # 状态
         self.state = State()
         
@@ -72,6 +107,23 @@ class DeepSearchAgent:
         self.reflection_summary_node = ReflectionSummaryNode(self.llm_client)
         self.report_formatting_node = ReportFormattingNode(self.llm_client)
     
+    def _filter_near_duplicates(self, items: List, text_of: Callable[[Any], str], paragraph_index: Optional[int],
+                                label: str) -> List:
+        """
+        去掉近似重复的搜索结果：本批内去重，并去掉本段落中其他搜索已经返回过的内容
+        作用域按段落划分，不同段落各自需要的相同内容不会被前面的段落占用
+        """
+        if self.config.NEAR_DUPLICATE_CROSS_RUN:
+            scope = ""
+        elif self.state.run_id and paragraph_index is not None:
+            scope = f"{self.state.run_id}:{paragraph_index}"
+        else:
+            scope = None
+        unique = self.near_duplicates.filter(items, text_of, scope=scope, source=f"{self.state.run_id}:{label}")
+        if len(unique) < len(items):
+            logger.info(f"  - 去除 {len(items) - len(unique)} 条近似重复结果")
+        return unique
+    
     def _validate_date_format(self, date_str: str) -> bool:
         """
         验证日期格式是否为YYYY-MM-DD
@@ -177,7 +229,10 @@ class DeepSearchAgent:
             import traceback
             error_traceback = traceback.format_exc()
             logger.error(f"研究过程中发生错误: {str(e)} \n错误堆栈: {error_traceback}")
+            self._log_resume_hint()
             raise e
+        finally:
+            self._finish_run()
     
     def _generate_report_structure(self, query: str):
         """生成报告结构"""
@@ -188,6 +243,10 @@ class DeepSearchAgent:
         
         # 生成结构并更新状态
         self.state = report_structure_node.mutate_state(state=self.state)
+        self._prefetched = {}
+        self.scheduler.reset()
+        self.state.run_id = new_run_id()
+        self._checkpoint("报告结构")
         
         _message = f"报告结构已生成，共 {len(self.state.paragraphs)} 个段落:"
         for i, paragraph in enumerate(self.state.paragraphs, 1):
@@ -199,6 +258,10 @@ class DeepSearchAgent:
         total_paragraphs = len(self.state.paragraphs)
         
         for i in range(total_paragraphs):
+            if self.state.paragraphs[i].is_completed():
+                logger.info(f"\n[步骤 2.{i+1}] 段落已完成（断点恢复），跳过: {self.state.paragraphs[i].title}")
+                continue
+            
             logger.info(f"\n[步骤 2.{i+1}] 处理段落: {self.state.paragraphs[i].title}")
             logger.info("-" * 50)
             
@@ -210,12 +273,13 @@ class DeepSearchAgent:
             
             # 标记段落完成
             self.state.paragraphs[i].research.mark_completed()
+            self._checkpoint(f"段落{i + 1}完成")
             
             progress = (i + 1) / total_paragraphs * 100
             logger.info(f"段落处理完成 ({progress:.1f}%)")
     
-    def _initial_search_and_summary(self, paragraph_index: int):
-        """执行初始搜索和总结"""
+    def _initial_search(self, paragraph_index: int) -> Tuple[str, List[Dict[str, Any]]]:
+        """生成初始搜索查询并执行搜索，只读取段落标题和内容，可在后台线程中提前执行"""
         paragraph = self.state.paragraphs[paragraph_index]
         
         # 准备搜索输入
@@ -226,7 +290,9 @@ class DeepSearchAgent:
         
         # 生成搜索查询和工具选择
         logger.info("  - 生成搜索查询...")
-        search_output = self.first_search_node.run(search_input)
+        search_output = self.scheduler.run("first_search", "llm", self.first_search_node.run, search_input,
+                                           label=f"段落{paragraph_index + 1}",
+                                           on_field=self._speculative_search(f"段落{paragraph_index + 1}"))
         search_query = search_output["search_query"]
         search_tool = search_output.get("search_tool", "basic_search_news")  # 默认工具
         reasoning = search_output["reasoning"]
@@ -258,7 +324,8 @@ class DeepSearchAgent:
                 logger.info(f"  ⚠️  search_news_by_date工具缺少时间参数，改用基础搜索")
                 search_tool = "basic_search_news"
         
-        search_response = self.execute_search_tool(search_tool, search_query, **search_kwargs)
+        search_response = self.scheduler.run("search", "search", self.execute_search_tool, search_tool, search_query,
+                                             label=f"段落{paragraph_index + 1}", **search_kwargs)
         
         # 转换为兼容格式
         search_results = []
@@ -275,6 +342,11 @@ class DeepSearchAgent:
                     'published_date': result.published_date  # 新增字段
                 })
         
+        search_results = self._filter_near_duplicates(
+            search_results, lambda result: result['content'] or result['title'], paragraph_index,
+                f"段落{paragraph_index + 1}"
+        )
+        
         if search_results:
             _message = f"  - 找到 {len(search_results)} 个搜索结果"
             for j, result in enumerate(search_results, 1):
@@ -283,6 +355,61 @@ class DeepSearchAgent:
             logger.info(_message)
         else:
             logger.info("  - 未找到搜索结果")
+        
+        return search_query, search_results
+    
+    def _speculative_search(self, label: str) -> Optional[Callable[[Any, Any], None]]:
+        """
+        搜索规划的字段回调：LLM输出search_query与search_tool后、推理说明生成完之前，先用所选工具在后台发起搜索
+        之后的正式搜索参数相同时由搜索网关合并到这次请求或命中缓存，参数不同时这次结果不被使用
+        """
+        if not self.config.SPECULATIVE_SEARCH or self.config.SEARCH_CACHE_TTL <= 0:
+            return None
+        
+        fields = {}
+        
+        def on_field(key, value):
+            if key not in ("search_query", "search_tool") or not isinstance(value, str) or not value.strip():
+                return
+            if key in fields:
+                fields.clear()  # 重试时对新的输出重新收集
+            fields[key] = value
+            if len(fields) < 2:
+                return
+            # 提交前取出参数：后台任务执行时 fields 可能已因重试被清空
+            search_tool, search_query = fields["search_tool"], fields["search_query"]
+            # search_news_by_date 的日期在推理说明之后输出，还要经过校验，不提前搜索
+            if search_tool != "search_news_by_date":
+                self.search_gateway.submit(lambda: self.scheduler.run(
+                    "speculative_search", "search", self.execute_search_tool, search_tool,
+                    search_query, label=label
+                ))
+        
+        return on_field
+    
+    def _prefetch_initial_searches(self, paragraph_index: int):
+        """在后台提前执行之后若干段落的初始搜索"""
+        last = min(paragraph_index + self.config.RESEARCH_PREFETCH_PARAGRAPHS, len(self.state.paragraphs) - 1)
+        for i in range(paragraph_index + 1, last + 1):
+            if i not in self._prefetched and not self.state.paragraphs[i].research.latest_summary:
+                self._prefetched[i] = self.scheduler.submit("prefetch_search", self._initial_search, i,
+                                                            label=f"段落{i + 1}")
+    
+    def _initial_search_and_summary(self, paragraph_index: int):
+        """执行初始搜索和总结"""
+        paragraph = self.state.paragraphs[paragraph_index]
+        if paragraph.research.latest_summary:
+            logger.info("  - 初始总结已完成（断点恢复），跳过")
+            return
+        
+        # 已提前开始的搜索直接等待结果，否则在当前线程执行
+        pending = self._prefetched.pop(paragraph_index, None)
+        self._prefetch_initial_searches(paragraph_index)
+        if pending:
+            search_query, search_results = pending.result()
+        else:
+            search_query, search_results = self._initial_search(paragraph_index)
+        
         # 更新状态中的搜索历史
         paragraph.research.add_search_results(search_query, search_results)
         
@@ -293,22 +420,26 @@ class DeepSearchAgent:
             "content": paragraph.content,
             "search_query": search_query,
             "search_results": format_search_results_for_prompt(
-                search_results, self.config.SEARCH_CONTENT_MAX_LENGTH
+                search_results, self.config.SEARCH_CONTENT_MAX_LENGTH,
+                self.config.SEARCH_RESULTS_TOKEN_BUDGET
             )
         }
         
         # 更新状态
-        self.state = self.first_summary_node.mutate_state(
-            summary_input, self.state, paragraph_index
+        self.state = self.scheduler.run(
+            "first_summary", "llm", self.first_summary_node.mutate_state,
+            summary_input, self.state, paragraph_index, label=f"段落{paragraph_index + 1}"
         )
         
+        self._checkpoint(f"段落{paragraph_index + 1}首次总结")
         logger.info("  - 初始总结完成")
     
     def _reflection_loop(self, paragraph_index: int):
         """执行反思循环"""
         paragraph = self.state.paragraphs[paragraph_index]
         
-        for reflection_i in range(self.config.MAX_REFLECTIONS):
+        # 断点恢复时从已完成的反思轮数之后继续
+        for reflection_i in range(paragraph.research.reflection_iteration, self.config.MAX_REFLECTIONS):
             logger.info(f"  - 反思 {reflection_i + 1}/{self.config.MAX_REFLECTIONS}...")
             
             # 准备反思输入
@@ -319,7 +450,10 @@ class DeepSearchAgent:
             }
             
             # 生成反思搜索查询
-            reflection_output = self.reflection_node.run(reflection_input)
+            label = f"段落{paragraph_index + 1}-反思{reflection_i + 1}"
+            reflection_output = self.scheduler.run("reflection", "llm", self.reflection_node.run,
+                                                   reflection_input, label=label,
+                                                   on_field=self._speculative_search(label))
             search_query = reflection_output["search_query"]
             search_tool = reflection_output.get("search_tool", "basic_search_news")  # 默认工具
             reasoning = reflection_output["reasoning"]
@@ -349,7 +483,8 @@ class DeepSearchAgent:
                     logger.info(f"    ⚠️  search_news_by_date工具缺少时间参数，改用基础搜索")
                     search_tool = "basic_search_news"
             
-            search_response = self.execute_search_tool(search_tool, search_query, **search_kwargs)
+            search_response = self.scheduler.run("reflection_search", "search", self.execute_search_tool,
+                                                 search_tool, search_query, label=label, **search_kwargs)
             
             # 转换为兼容格式
             search_results = []
@@ -366,6 +501,10 @@ class DeepSearchAgent:
                         'published_date': result.published_date
                     })
             
+            search_results = self._filter_near_duplicates(
+                search_results, lambda result: result['content'] or result['title'], paragraph_index, label
+            )
+            
             if search_results:
                 logger.info(f"    找到 {len(search_results)} 个反思搜索结果")
                 for j, result in enumerate(search_results, 1):
@@ -383,16 +522,19 @@ class DeepSearchAgent:
                 "content": paragraph.content,
                 "search_query": search_query,
                 "search_results": format_search_results_for_prompt(
-                    search_results, self.config.SEARCH_CONTENT_MAX_LENGTH
+                    search_results, self.config.SEARCH_CONTENT_MAX_LENGTH,
+                    self.config.SEARCH_RESULTS_TOKEN_BUDGET
                 ),
                 "paragraph_latest_state": paragraph.research.latest_summary
             }
             
             # 更新状态
-            self.state = self.reflection_summary_node.mutate_state(
-                reflection_summary_input, self.state, paragraph_index
+            self.state = self.scheduler.run(
+                "reflection_summary", "llm", self.reflection_summary_node.mutate_state,
+                reflection_summary_input, self.state, paragraph_index, label=label
             )
             
+            self._checkpoint(f"段落{paragraph_index + 1}反思{reflection_i + 1}")
             logger.info(f"    反思 {reflection_i + 1} 完成")
     
     def _generate_final_report(self) -> str:
@@ -409,7 +551,7 @@ class DeepSearchAgent:
         
         # 格式化报告
         try:
-            final_report = self.report_formatting_node.run(report_data)
+            final_report = self.scheduler.run("report_formatting", "llm", self.report_formatting_node.run, report_data)
         except Exception as e:
             logger.error(f"LLM格式化失败，使用备用方法: {str(e)}")
             final_report = self.report_formatting_node.format_report_manually(
@@ -419,6 +561,8 @@ class DeepSearchAgent:
         # 更新状态
         self.state.final_report = final_report
         self.state.mark_completed()
+        self._checkpoint("最终报告")
+        self.scheduler.log_summary()
         
         logger.info("最终报告生成完成")
         return final_report
@@ -445,11 +589,87 @@ class DeepSearchAgent:
             state_filepath = os.path.join(self.config.OUTPUT_DIR, state_filename)
             self.state.save_to_file(state_filepath)
             logger.info(f"状态已保存到: {state_filepath}")
+            trace_filepath = os.path.join(self.config.OUTPUT_DIR, f"trace_{query_safe}_{timestamp}.json")
+            self.scheduler.save_trace(trace_filepath)
+            logger.info(f"阶段耗时记录已保存到: {trace_filepath}")
     
     def get_progress_summary(self) -> Dict[str, Any]:
         """获取进度摘要"""
         return self.state.get_progress_summary()
     
+    def resume(self, run_id: str, save_report: bool = True) -> str:
+        """
+        从断点继续一次中断的研究
+        已完成的段落直接跳过，未完成段落中已完成的首次总结和反思不会重新执行
+        
+        Args:
+            run_id: 运行ID（research开始时生成，见日志或 list_checkpoints）
+            save_report: 是否保存报告到文件
+            
+        Returns:
+            最终报告内容
+        """
+        self.load_checkpoint(run_id)
+        if self.state.is_completed and self.state.final_report:
+            logger.info(f"运行 {run_id} 已生成最终报告，直接返回")
+            return self.state.final_report
+        
+        progress = self.state.get_progress_summary()
+        logger.info(f"\n{'='*60}")
+        logger.info(f"从断点继续研究: {self.state.query}（已完成 {progress['completed_paragraphs']}/{progress['total_paragraphs']} 个段落）")
+        logger.info(f"{'='*60}")
+        
+        try:
+            self._process_paragraphs()
+            final_report = self._generate_final_report()
+            if save_report:
+                self._save_report(final_report)
+            logger.info("深度研究完成！")
+            return final_report
+        except Exception as e:
+            logger.exception(f"研究过程中发生错误: {str(e)}")
+            self._log_resume_hint()
+            raise e
+        finally:
+            self._finish_run()
+    
+    def _checkpoint_dir(self) -> str:
+        return self.config.CHECKPOINT_DIR or os.path.join(self.config.OUTPUT_DIR, "checkpoints")
+    
+    def _checkpoint(self, stage: str):
+        """保存断点，写入失败只记录警告，不中断研究"""
+        if not self.config.ENABLE_CHECKPOINTS or not self.state.run_id:
+            return
+        try:
+            self.state.update_timestamp()
+            path = write_checkpoint(self._checkpoint_dir(), self.state.run_id, self.state.to_dict())
+            logger.debug(f"断点已保存（{stage}）: {path}")
+        except (OSError, TypeError, ValueError) as e:
+            logger.warning(f"保存断点失败（{stage}）: {str(e)}")
+    
+    def _finish_run(self):
+        """一次研究结束（完成或出错）后释放提前搜索的后台线程和本次运行的近似重复索引"""
+        self._prefetched = {}
+        self.scheduler.shutdown()
+        if self.state.run_id:
+            self.near_duplicates.drop_scopes(f"{self.state.run_id}:")
+    
+    def _log_resume_hint(self):
+        if self.config.ENABLE_CHECKPOINTS and self.state.run_id:
+            logger.info(f"已完成的阶段保存在断点中，可调用 resume('{self.state.run_id}') 继续研究")
+    
+    def load_checkpoint(self, run_id: str):
+        """加载断点作为当前状态"""
+        self.state = State.from_dict(read_checkpoint(self._checkpoint_dir(), run_id))
+        self.state.run_id = run_id
+        self._prefetched = {}
+        self.scheduler.reset()
+        logger.info(f"已加载运行 {run_id} 的断点")
+    
+    def list_checkpoints(self, include_completed: bool = False) -> List[Dict[str, Any]]:
+        """列出可以继续的运行"""
+        return list_checkpoints(self._checkpoint_dir(), include_completed)
+    
     def load_state(self, filepath: str):
         """从文件加载状态"""
         self.state = State.load_from_file(filepath)
@@ -5,7 +5,7 @@ Unified OpenAI-compatible LLM client for the Query Engine, with retry support.
 import os
 import sys
 from datetime import datetime
-from typing import Any, Dict, Optional, Generator
+from typing import Any, Callable, Dict, Optional, Generator
 from loguru import logger
 
 from openai import OpenAI
@@ -26,6 +26,8 @@ except ImportError:
 
     LLM_RETRY_CONFIG = None
 
+from streaming_json import StreamingJSONParser, JSONStreamResult, FieldKey
+
 
 class LLMClient:
     """Minimal wrapper around the OpenAI-compatible chat completion API."""
@@ -153,6 +155,33 @@ class LLMClient:
             return b''.join(byte_chunks).decode('utf-8', errors='replace')
         return ""
 
+    @with_retry(LLM_RETRY_CONFIG)
+    def stream_invoke_json(self, system_prompt: str, user_prompt: str,
+                           on_field: Optional[Callable[[FieldKey, Any], None]] = None,
+                           **kwargs) -> JSONStreamResult:
+        """
+        流式调用LLM并边接收边解析JSON输出
+        推理块和代码块标记在接收时跳过，顶层字段一完成即回调on_field，输出被截断时按未闭合的结构补全
+        
+        Args:
+            system_prompt: 系统提示词
+            user_prompt: 用户提示词
+            on_field: 顶层字段完成时的回调，参数为(字段名或数组下标, 值)；重试时会对新的输出再次回调
+            **kwargs: 额外参数（temperature, top_p等）
+            
+        Returns:
+            解析结果
+        """
+        parser = StreamingJSONParser()
+        for chunk in self.stream_invoke(system_prompt, user_prompt, **kwargs):
+            for key, value in parser.feed(chunk):
+                if on_field:
+                    try:
+                        on_field(key, value)
+                    except Exception as e:
+                        logger.exception(f"字段回调执行失败: {str(e)}")
+        return parser.finish()
+
     @staticmethod
     def validate_response(response: Optional[str]) -> str:
         if response is None:
@@ -8,7 +8,8 @@ from .search import (
     SearchResult, 
     TavilyResponse, 
     ImageResult,
-    print_response_summary
+    print_response_summary,
+    get_search_gateway
 )
 
 __all__ = [
@@ -16,5 +17,6 @@ __all__ = [
     "SearchResult", 
     "TavilyResponse", 
     "ImageResult",
-    "print_response_summary"
+    "print_response_summary",
+    "get_search_gateway"
 ]
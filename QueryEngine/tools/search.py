@@ -23,7 +23,8 @@
 
 import os
 import sys
-from typing import List, Dict, Any, Optional
+from functools import partial
+from typing import List, Dict, Any, Optional, Tuple
 
 # 添加utils目录到Python路径
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -33,6 +34,7 @@ if utils_dir not in sys.path:
     sys.path.append(utils_dir)
 
 from retry_helper import with_graceful_retry, SEARCH_API_RETRY_CONFIG
+from search_gateway import SearchGateway, get_search_gateway
 from dataclasses import dataclass, field
 
 # 运行前请确保已安装Tavily库: pip install tavily-python
@@ -80,16 +82,27 @@ class TavilyNewsAgency:
     每个公共方法都设计为供 AI Agent 独立调用的工具。
     """
 
-    def __init__(self, api_key: Optional[str] = None):
+    TOOL_NAMES = (
+        "basic_search_news", "deep_search_news", "search_news_last_24_hours",
+        "search_news_last_week", "search_images_for_news", "search_news_by_date",
+    )
+
+    def __init__(self, api_key: Optional[str] = None, gateway: Optional[SearchGateway] = None):
         """
         初始化客户端。
         Args:
             api_key: Tavily API密钥，若不提供则从环境变量 TAVILY_API_KEY 读取。
+            gateway: 搜索网关（缓存、并发与离线模拟），若不提供则使用进程内共享的默认网关。
         """
+        self._gateway = gateway or get_search_gateway()
         if api_key is None:
             api_key = os.getenv("TAVILY_API_KEY")
-            if not api_key:
-                raise ValueError("Tavily API Key未找到！请设置TAVILY_API_KEY环境变量或在初始化时提供")
+        if self._gateway.offline:
+            # 离线模拟后端不访问外部API
+            self._client = None
+            return
+        if not api_key:
+            raise ValueError("Tavily API Key未找到！请设置TAVILY_API_KEY环境变量或在初始化时提供")
         self._client = TavilyClient(api_key=api_key)
 
     @with_graceful_retry(SEARCH_API_RETRY_CONFIG, default_return=TavilyResponse(query="搜索失败"))
@@ -98,7 +111,7 @@ class TavilyNewsAgency:
         try:
             kwargs['topic'] = 'general'
             api_params = {k: v for k, v in kwargs.items() if v is not None}
-            response_dict = self._client.search(**api_params)
+            response_dict = self._gateway.search("tavily", api_params, lambda params: self._client.search(**params))
             
             search_results = [
                 SearchResult(
@@ -190,6 +203,18 @@ class TavilyNewsAgency:
         )
 
 
+    def batch_search(self, calls: List[Tuple[str, Dict[str, Any]]]) -> List[TavilyResponse]:
+        """
+        并发执行多个工具调用，按输入顺序返回结果。
+        Args:
+            calls: [(工具名称, 参数字典)]，如 [("basic_search_news", {"query": "A"}), ("deep_search_news", {"query": "B"})]
+        """
+        for tool_name, _ in calls:
+            if tool_name not in self.TOOL_NAMES:
+                raise ValueError(f"未知的搜索工具: {tool_name}")
+        return self._gateway.batch([partial(getattr(self, tool_name), **kwargs) for tool_name, kwargs in calls])
+
+
 # --- 3. 测试与使用示例 ---
 
 def print_response_summary(response: TavilyResponse):
@@ -3,10 +3,20 @@
 用于清理LLM输出、解析JSON等
 """
 
+import os
 import re
+import sys
 import json
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Union
 from json.decoder import JSONDecodeError
+from loguru import logger
+
+# 与 llms/base.py 相同的导入方式，保证 JSONStreamResult 是同一个类
+utils_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "utils")
+if utils_dir not in sys.path:
+    sys.path.append(utils_dir)
+from streaming_json import JSONStreamResult, parse_json_text
+from result_packer import pack_search_results
 
 
 def clean_json_tags(text: str) -> str:
@@ -82,6 +92,21 @@ def remove_reasoning_from_output(text: str) -> str:
     return text.strip()
 
 
+def parse_llm_json(output: Union[str, JSONStreamResult]) -> JSONStreamResult:
+    """
+    解析LLM的JSON输出
+    
+    Args:
+        output: stream_invoke_json 边接收边解析的结果（直接返回），或完整的输出字符串（按相同方式一次性解析）
+        
+    Returns:
+        解析结果，value为None表示输出中没有JSON
+    """
+    if isinstance(output, JSONStreamResult):
+        return output
+    return parse_json_text(output)
+
+
 def extract_clean_response(text: str) -> Dict[str, Any]:
     """
     提取并清理响应中的JSON内容
@@ -286,23 +311,30 @@ def truncate_content(content: str, max_length: int = 20000) -> str:
 
 
 def format_search_results_for_prompt(search_results: List[Dict[str, Any]], 
-                                   max_length: int = 20000) -> List[str]:
+                                   max_length: int = 20000,
+                                   token_budget: int = 0) -> List[str]:
     """
     格式化搜索结果用于提示词
     
     Args:
         search_results: 搜索结果列表
         max_length: 每个结果的最大长度
+        token_budget: 所有结果合计的token预算，大于0时先去除近似重复，
+                      再按热度、互动量、时间和情感置信度在预算内分层挑选
         
     Returns:
         格式化后的内容列表
     """
-    formatted_results = []
+    results = [
+        {**result, 'content': truncate_content(result['content'], max_length)}
+        for result in search_results if result.get('content')
+    ]
     
-    for result in search_results:
-        content = result.get('content', '')
-        if content:
-            truncated_content = truncate_content(content, max_length)
-            formatted_results.append(truncated_content)
+    if token_budget > 0 and results:
+        results, stats = pack_search_results(results, token_budget, max_item_tokens=token_budget // 4)
+        logger.info(
+            f"搜索结果打包: {stats['input']}条 -> {stats['packed']}条"
+            f"（去重{stats['duplicates']}条，{stats['groups']}组，约{stats['tokens']}/{token_budget} tokens）"
+        )
     
-    return formatted_results
+    return [result['content'] for result in results]
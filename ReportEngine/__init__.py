@@ -4,9 +4,27 @@ Report Engine
 基于三个子agent的输出和论坛日志生成综合HTML报告
 """
 
-from .agent import ReportAgent, create_agent
+import importlib
 
 __version__ = "1.0.0"
 __author__ = "Report Engine Team"
 
+_LAZY_EXPORTS = {
+    "ReportAgent": ".agent",
+    "create_agent": ".agent",
+}
+
 __all__ = ["ReportAgent", "create_agent"]
+
+
+def __getattr__(name):
+    """按需导入（PEP 562）：导入包或其中的配置模块时不再加载Agent及其LLM、搜索依赖"""
+    if name not in _LAZY_EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_LAZY_EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_EXPORTS))
@@ -16,6 +16,8 @@ from .nodes import (
 )
 from .state import ReportState
 from .utils.config import settings, Settings
+from .utils.context_packer import ContextPacker
+from .utils.report_sections import split_template_sections
 
 
 class FileCountBaseline:
@@ -173,12 +175,26 @@ class ReportAgent:
         """初始化处理节点"""
         self.template_selection_node = TemplateSelectionNode(
             self.llm_client,
-            self.config.TEMPLATE_DIR
+            self.config.TEMPLATE_DIR,
+            preselect_top_k=self.config.TEMPLATE_PRESELECT_TOP_K,
+            skip_llm_score=self.config.TEMPLATE_SKIP_LLM_SCORE,
+            skip_llm_margin=self.config.TEMPLATE_SKIP_LLM_MARGIN,
+        )
+        self.html_generation_node = HTMLGenerationNode(
+            self.llm_client,
+            mode=self.config.HTML_GENERATION_MODE,
+            max_workers=self.config.SECTION_MAX_WORKERS,
+            section_context_chars=self.config.SECTION_CONTEXT_CHARS,
+        )
+        self.context_packer = ContextPacker(
+            token_budget=self.config.REPORT_CONTEXT_TOKEN_BUDGET,
+            model_name=self.config.REPORT_ENGINE_MODEL_NAME,
+            chunk_tokens=self.config.CONTEXT_CHUNK_TOKENS,
+            dedup_distance=self.config.CONTEXT_DEDUP_DISTANCE,
         )
-        self.html_generation_node = HTMLGenerationNode(self.llm_client)
     
     def generate_report(self, query: str, reports: List[Any], forum_logs: str = "", 
-                       custom_template: str = "", save_report: bool = True) -> str:
+                       custom_template: str = "", save_report: bool = True, stream_handler=None) -> str:
         """
         生成综合报告
         
@@ -188,6 +204,8 @@ class ReportAgent:
             forum_logs: 论坛日志内容
             custom_template: 用户自定义模板（可选）
             save_report: 是否保存报告到文件
+            stream_handler: 流式输出回调（可选），需提供 on_stage(stage, **info) 与 on_html(text)，
+                HTML片段按最终文档的顺序依次送出
             
         Returns:
             最终HTML报告内容
@@ -200,13 +218,24 @@ class ReportAgent:
         try:
             # Step 1: 模板选择
             template_result = self._select_template(query, reports, forum_logs, custom_template)
+            if stream_handler:
+                stream_handler.on_stage("select_template", template=template_result['template_name'])
+            
+            # Step 2: 按token预算打包输入
+            reports, forum_logs, pack_stats = self._pack_context(query, reports, forum_logs, template_result)
+            if stream_handler:
+                stream_handler.on_stage("pack_context", **pack_stats)
             
-            # Step 2: 直接生成HTML报告
-            html_report = self._generate_html_report(query, reports, forum_logs, template_result)
+            # Step 3: 直接生成HTML报告
+            html_report = self._generate_html_report(query, reports, forum_logs, template_result, stream_handler)
+            if stream_handler:
+                stream_handler.on_stage("generate_html", chars=len(html_report))
             
-            # Step 3: 保存报告
+            # Step 4: 保存报告
             if save_report:
                 self._save_report(html_report)
+                if stream_handler:
+                    stream_handler.on_stage("save_report")
             
             # 更新生成时间
             end_time = datetime.now()
@@ -261,7 +290,20 @@ class ReportAgent:
             self.state.metadata.template_used = fallback_template['template_name']
             return fallback_template
     
-    def _generate_html_report(self, query: str, reports: List[Any], forum_logs: str, template_result: Dict[str, Any]) -> str:
+    def _pack_context(self, query: str, reports: List[Any], forum_logs: str, template_result: Dict[str, Any]):
+        """按与查询和模板章节的相关度挑选输入内容，去除跨引擎的近似重复段落，控制在token预算内"""
+        names = ['query_engine_report', 'media_engine_report', 'insight_engine_report']
+        sources = {name: str(report) if report else "" for name, report in zip(names, reports)}
+        sources['forum_logs'] = forum_logs or ""
+        sections = split_template_sections(template_result.get('template_content', ''))
+        focus_terms = [" ".join([section.title] + section.outline) for section in sections]
+        
+        packed, stats = self.context_packer.pack(query, sources, focus_terms, forum_source='forum_logs')
+        packed_reports = [packed[name] for name in names if name in packed]
+        return packed_reports, packed['forum_logs'], stats
+    
+    def _generate_html_report(self, query: str, reports: List[Any], forum_logs: str, template_result: Dict[str, Any],
+                              stream_handler=None) -> str:
         """生成HTML报告"""
         logger.info("多轮生成HTML报告...")
         
@@ -281,11 +323,12 @@ class ReportAgent:
             'media_engine_report': media_report,
             'insight_engine_report': insight_report,
             'forum_logs': forum_logs,
-            'selected_template': template_result.get('template_content', '')
+            'selected_template': template_result.get('template_content', ''),
+            'template_name': template_result.get('template_name', '')
         }
         
         # 使用HTML生成节点生成报告
-        html_content = self.html_generation_node.run(html_input)
+        html_content = self.html_generation_node.run(html_input, stream_handler=stream_handler)
         
         # 更新状态
         self.state.html_content = html_content
@@ -8,11 +8,12 @@ import json
 import threading
 import time
 from datetime import datetime
-from flask import Blueprint, request, jsonify, Response
+from flask import Blueprint, request, jsonify, Response, stream_with_context
 from typing import Dict, Any
 from loguru import logger
-from .agent import ReportAgent, create_agent
 from .utils.config import settings
+from .utils.report_stream import ReportStream, parse_resume_position
+from .utils.template_registry import get_template_registry
 
 
 # 创建Blueprint
@@ -28,6 +29,8 @@ def initialize_report_engine():
     """初始化Report Engine"""
     global report_agent
     try:
+        # Agent及其LLM依赖在初始化时才导入，注册蓝图不需要加载它们
+        from .agent import create_agent
         report_agent = create_agent()
         logger.info("Report Engine初始化成功")
         return True
@@ -50,6 +53,23 @@ class ReportTask:
         self.created_at = datetime.now()
         self.updated_at = datetime.now()
         self.html_content = ""
+        self.stream = ReportStream(settings.STREAM_BUFFER_BYTES)
+        self.sections_done = 0
+
+    def on_stage(self, stage: str, **info):
+        """记录阶段耗时并按阶段推进进度（章节并行生成，计数与事件在流的锁内更新）"""
+        with self.stream.lock:
+            if stage == "section":
+                self.sections_done += 1
+                self.progress = max(self.progress, 50 + 40 * self.sections_done // max(info.get('total', 1), 1))
+            elif stage in STAGE_PROGRESS:
+                self.progress = max(self.progress, STAGE_PROGRESS[stage])
+            self.updated_at = datetime.now()
+            self.stream.stage(stage, progress=self.progress, **info)
+
+    def on_html(self, text: str):
+        """生成过程中按顺序送出的HTML片段"""
+        self.stream.write(text)
 
     def update_status(self, status: str, progress: int = None, error_message: str = ""):
         """更新任务状态"""
@@ -70,10 +90,22 @@ class ReportTask:
             'error_message': self.error_message,
             'created_at': self.created_at.isoformat(),
             'updated_at': self.updated_at.isoformat(),
-            'has_result': bool(self.html_content)
+            'has_result': bool(self.html_content),
+            'stream_bytes': self.stream.total_bytes,
+            'stages': self.stream.stages
         }
 
 
+# 阶段完成后的进度
+STAGE_PROGRESS = {
+    "check_inputs": 10,
+    "load_inputs": 30,
+    "select_template": 50,
+    "generate_html": 90,
+    "save_report": 95,
+}
+
+
 def check_engines_ready() -> Dict[str, Any]:
     """检查三个子引擎是否都有新文件"""
     directories = {
@@ -103,39 +135,43 @@ def run_report_generation(task: ReportTask, query: str, custom_template: str = "
     global current_task
 
     try:
-        task.update_status("running", 10)
+        task.update_status("running", 5)
 
         # 检查输入文件
         check_result = check_engines_ready()
         if not check_result['ready']:
             task.update_status("error", 0, f"输入文件未准备就绪: {check_result.get('missing_files', [])}")
+            task.stream.close("error", error=task.error_message)
             return
-
-        task.update_status("running", 30)
+        task.on_stage("check_inputs")
 
         # 加载输入文件
         content = report_agent.load_input_files(check_result['latest_files'])
+        task.on_stage("load_inputs")
 
-        task.update_status("running", 50)
-
-        # 生成报告
+        # 生成报告，HTML片段边生成边写入任务的流式缓冲
         html_report = report_agent.generate_report(
             query=query,
             reports=content['reports'],
             forum_logs=content['forum_logs'],
             custom_template=custom_template,
-            save_report=True
+            save_report=True,
+            stream_handler=task
         )
 
-        task.update_status("running", 90)
+        # 流式送出的内容与最终报告不一致（如生成失败改用备用HTML）时，整体替换
+        if task.stream.text() != html_report:
+            task.stream.reset(html_report)
 
         # 保存结果
         task.html_content = html_report
         task.update_status("completed", 100)
+        task.stream.close("done", task_id=task.task_id)
 
     except Exception as e:
         logger.exception(f"报告生成过程中发生错误: {str(e)}")
         task.update_status("error", 0, str(e))
+        task.stream.close("error", error=str(e))
         # 只在出错时清理任务
         with task_lock:
             if current_task and current_task.task_id == task.task_id:
@@ -268,6 +304,27 @@ def get_progress(task_id: str):
         }), 500
 
 
+@report_bp.route('/stream/<task_id>', methods=['GET'])
+def stream_report(task_id: str):
+    """
+    以SSE推送报告生成过程：阶段耗时（stage）与按顺序生成的HTML片段（chunk）
+    断线重连时浏览器会自动带上Last-Event-ID，也可以用 ?offset=已接收字节数 指定续传位置
+    """
+    task = current_task
+    if not task or task.task_id != task_id:
+        return jsonify({
+            'success': False,
+            'error': '任务不存在'
+        }), 404
+
+    generation, offset = parse_resume_position(request.headers.get('Last-Event-ID'), request.args.get('offset'))
+    return Response(
+        stream_with_context(task.stream.events(offset, generation)),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
 @report_bp.route('/result/<task_id>', methods=['GET'])
 def get_result(task_id: str):
     """获取报告生成结果"""
@@ -339,6 +396,7 @@ def cancel_task(task_id: str):
             if current_task and current_task.task_id == task_id:
                 if current_task.status == "running":
                     current_task.update_status("cancelled", 0, "用户取消任务")
+                    current_task.stream.close("error", error="用户取消任务")
                 current_task = None
 
                 return jsonify({
@@ -370,24 +428,15 @@ def get_templates():
             }), 500
 
         template_dir = settings.TEMPLATE_DIR
-        templates = []
-
-        if os.path.exists(template_dir):
-            for filename in os.listdir(template_dir):
-                if filename.endswith('.md'):
-                    template_path = os.path.join(template_dir, filename)
-                    try:
-                        with open(template_path, 'r', encoding='utf-8') as f:
-                            content = f.read()
-
-                        templates.append({
-                            'name': filename.replace('.md', ''),
-                            'filename': filename,
-                            'description': content.split('\n')[0] if content else '无描述',
-                            'size': len(content)
-                        })
-                    except Exception as e:
-                        logger.exception(f"读取模板失败 {filename}: {str(e)}")
+        templates = [
+            {
+                'name': template.name,
+                'filename': os.path.basename(template.path),
+                'description': template.content.split('\n')[0] if template.content else '无描述',
+                'size': len(template.content)
+            }
+            for template in get_template_registry(template_dir).templates()
+        ]
 
         return jsonify({
             'success': True,
@@ -3,29 +3,103 @@ HTML生成节点
 将整合后的内容转换为美观的HTML报告
 """
 
+import html
 import json
+import re
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, List
 from loguru import logger
 
 from .base_node import StateMutationNode
 from ..llms.base import LLMClient
 from ..state.state import ReportState
-from ..prompts import SYSTEM_PROMPT_HTML_GENERATION
+from ..prompts import SYSTEM_PROMPT_HTML_GENERATION, SYSTEM_PROMPT_SECTION_HTML_GENERATION
+from ..utils.report_sections import (
+    TemplateSection,
+    assemble_html,
+    html_prefix,
+    html_suffix,
+    section_html,
+    select_section_materials,
+    split_template_sections,
+)
 # 不再需要text_processing依赖
 
+# 来源名称 -> 输入字段
+REPORT_SOURCES = {
+    "QueryEngine报告": "query_engine_report",
+    "MediaEngine报告": "media_engine_report",
+    "InsightEngine报告": "insight_engine_report",
+    "ForumEngine论坛讨论": "forum_logs",
+}
+
+_BODY_PATTERN = re.compile(r"<body[^>]*>(.*?)</body>", re.S | re.I)
+
+
+class _FenceFilter:
+    """流式去掉LLM输出首尾的markdown代码块标记和空白，与 process_output 的处理一致"""
+    
+    HOLD_BACK = 8  # 末尾保留的字符数，足以容纳结尾的 ``` 与换行
+    
+    def __init__(self):
+        self._head = ""
+        self._started = False
+        self._fenced = False
+        self._tail = ""
+    
+    def feed(self, text: str) -> str:
+        if not self._started:
+            self._head += text
+            head = self._head.lstrip()
+            if head.startswith("```"):
+                # 等到代码块标记所在行结束
+                if "\n" not in head:
+                    return ""
+                self._fenced = True
+                head = head.split("\n", 1)[1].lstrip()
+            elif len(head) < 3 and "```".startswith(head):
+                # 开头不足以判断是否为代码块标记时继续等待
+                return ""
+            self._started = True
+            text = head
+        self._tail += text
+        if len(self._tail) <= self.HOLD_BACK:
+            return ""
+        output, self._tail = self._tail[:-self.HOLD_BACK], self._tail[-self.HOLD_BACK:]
+        return output
+    
+    def finish(self) -> str:
+        if not self._started:
+            return self._head.strip()
+        tail = self._tail.rstrip()
+        if self._fenced and tail.endswith("```"):
+            tail = tail[:-3].rstrip()
+        return tail
+
 
 class HTMLGenerationNode(StateMutationNode):
     """HTML生成处理节点"""
     
-    def __init__(self, llm_client: LLMClient):
+    def __init__(self, llm_client: LLMClient, mode: str = "single", max_workers: int = 4,
+                 section_context_chars: int = 12000, total_chars: int = 30000):
         """
         初始化HTML生成节点
         
         Args:
             llm_client: LLM客户端
+            mode: single 一次调用生成整篇HTML；sectioned 按模板章节并行生成后在本地拼接
+            max_workers: sectioned模式下同时生成的章节数
+            section_context_chars: sectioned模式下每个章节输入材料的字符上限
+            total_chars: sectioned模式下整篇报告的目标字数，按章节平均分配
         """
         super().__init__(llm_client, "HTMLGenerationNode")
+        if mode not in ("single", "sectioned"):
+            raise ValueError(f"不支持的HTML生成方式: {mode}")
+        self.mode = mode
+        self.max_workers = max_workers
+        self.section_context_chars = section_context_chars
+        self.total_chars = total_chars
     
     def run(self, input_data: Dict[str, Any], **kwargs) -> str:
         """
@@ -39,10 +113,17 @@ class HTMLGenerationNode(StateMutationNode):
                 - insight_engine_report: InsightEngine报告内容
                 - forum_logs: 论坛日志内容
                 - selected_template: 选择的模板内容
+                - template_name: 选择的模板名称（可选）
+            **kwargs:
+                - stream_handler: 流式输出回调（可选），HTML片段生成后立即通过 on_html 送出
                 
         Returns:
             生成的HTML内容
         """
+        stream_handler = kwargs.get('stream_handler')
+        if self.mode == "sectioned":
+            return self._run_sectioned(input_data, stream_handler)
+        
         logger.info("开始生成HTML报告...")
         
         try:
@@ -60,7 +141,10 @@ class HTMLGenerationNode(StateMutationNode):
             message = json.dumps(llm_input, ensure_ascii=False, indent=2)
             
             # 调用LLM生成HTML
-            response = self.llm_client.stream_invoke_to_string(SYSTEM_PROMPT_HTML_GENERATION, message)
+            if stream_handler:
+                response = self._stream_response(message, stream_handler)
+            else:
+                response = self.llm_client.stream_invoke_to_string(SYSTEM_PROMPT_HTML_GENERATION, message)
             
             # 处理响应（简化版）
             processed_response = self.process_output(response)
@@ -73,6 +157,91 @@ class HTMLGenerationNode(StateMutationNode):
             # 返回备用HTML
             return self._generate_fallback_html(input_data)
     
+    def _stream_response(self, message: str, stream_handler) -> str:
+        """流式调用LLM，边接收边去掉代码块标记并送出，返回完整响应"""
+        byte_chunks = []
+        fence_filter = _FenceFilter()
+        for chunk in self.llm_client.stream_invoke(SYSTEM_PROMPT_HTML_GENERATION, message):
+            byte_chunks.append(chunk.encode('utf-8'))
+            stream_handler.on_html(fence_filter.feed(chunk))
+        stream_handler.on_html(fence_filter.finish())
+        return b''.join(byte_chunks).decode('utf-8', errors='replace')
+    
+    def _run_sectioned(self, input_data: Dict[str, Any], stream_handler=None) -> str:
+        """按模板章节并行生成，每个章节只带入相关的材料片段，最后在本地拼接"""
+        query = input_data.get('query', '')
+        template_name = input_data.get('template_name', '')
+        sections = split_template_sections(input_data.get('selected_template', ''))
+        sources = {name: str(input_data.get(key) or '') for name, key in REPORT_SOURCES.items()}
+        min_chars = max(self.total_chars // len(sections), 1000)
+        generation_time = datetime.now().strftime("%Y年%m月%d日 %H:%M:%S")
+        logger.info(f"开始分章节生成HTML报告: {len(sections)} 个章节，并发 {self.max_workers}")
+        
+        # 标题和目录不依赖LLM，先行送出
+        if stream_handler:
+            stream_handler.on_html(html_prefix(query, sections, generation_time, template_name))
+        
+        fragments = []
+        with ThreadPoolExecutor(max_workers=max(1, self.max_workers)) as executor:
+            futures = [
+                executor.submit(self._generate_section, query, sections, index, sources, min_chars, stream_handler)
+                for index in range(len(sections))
+            ]
+            # 章节并行生成，但按顺序送出：前面的章节完成后，后面已完成的章节立即跟上
+            for index, future in enumerate(futures):
+                fragments.append(future.result())
+                if stream_handler:
+                    stream_handler.on_html(section_html(index + 1, sections[index], fragments[-1]))
+        
+        if stream_handler:
+            stream_handler.on_html(html_suffix(generation_time))
+        
+        html_content = assemble_html(query, sections, fragments, generation_time, template_name)
+        logger.info(f"HTML报告拼接完成，长度: {len(html_content)} 字符")
+        return html_content
+    
+    def _generate_section(self, query: str, sections: List[TemplateSection], index: int,
+                          sources: Dict[str, str], min_chars: int, stream_handler=None) -> str:
+        """生成单个章节的HTML片段，失败时退化为直接展示材料"""
+        section = sections[index]
+        materials = select_section_materials(sources, section, query, self.section_context_chars)
+        section_input = {
+            "query": query,
+            "section_index": index + 1,
+            "total_sections": len(sections),
+            "section_title": section.title,
+            "section_outline": section.outline_text(),
+            "other_sections": [s.title for i, s in enumerate(sections) if i != index],
+            "materials": materials,
+            "min_chars": min_chars,
+        }
+        try:
+            message = json.dumps(section_input, ensure_ascii=False, indent=2)
+            response = self.llm_client.stream_invoke_to_string(SYSTEM_PROMPT_SECTION_HTML_GENERATION, message)
+            fragment = self._extract_fragment(self.process_output(response))
+            if fragment:
+                logger.info(f"章节生成完成 [{index + 1}/{len(sections)}] {section.title}: {len(fragment)} 字符")
+                if stream_handler:
+                    stream_handler.on_stage("section", index=index + 1, total=len(sections),
+                                            title=section.title, chars=len(fragment))
+                return fragment
+            logger.error(f"章节生成结果为空: {section.title}")
+        except Exception as e:
+            logger.exception(f"章节生成失败 {section.title}: {str(e)}")
+        
+        if stream_handler:
+            stream_handler.on_stage("section", index=index + 1, total=len(sections),
+                                    title=section.title, failed=True)
+        return "\n".join(
+            f'<h3>{html.escape(m["source"])}</h3><pre>{html.escape(m["content"])}</pre>' for m in materials
+        )
+    
+    @staticmethod
+    def _extract_fragment(output: str) -> str:
+        """LLM偶尔仍会返回完整文档，只保留body内的内容"""
+        match = _BODY_PATTERN.search(output)
+        return (match.group(1) if match else output).strip()
+    
     def mutate_state(self, input_data: Dict[str, Any], state: ReportState, **kwargs) -> ReportState:
         """
         修改报告状态，添加生成的HTML内容
@@ -3,28 +3,36 @@
 根据查询内容和可用模板选择最合适的报告模板
 """
 
-import os
 import json
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple
 from loguru import logger
 
 from .base_node import BaseNode
 from ..prompts import SYSTEM_PROMPT_TEMPLATE_SELECTION
+from ..utils.template_registry import ReportTemplate, get_template_registry
 
 
 class TemplateSelectionNode(BaseNode):
     """模板选择处理节点"""
     
-    def __init__(self, llm_client, template_dir: str = "ReportEngine/report_template"):
+    def __init__(self, llm_client, template_dir: str = "ReportEngine/report_template",
+                 preselect_top_k: int = 3, skip_llm_score: float = 0.15, skip_llm_margin: float = 2.0):
         """
         初始化模板选择节点
         
         Args:
             llm_client: LLM客户端
             template_dir: 模板目录路径
+            preselect_top_k: 本地预排序后交给LLM挑选的候选模板数
+            skip_llm_score: 本地相似度最高分达到该值，且
+            skip_llm_margin: 是第二名的该倍数以上时，直接采用本地结果，不再调用LLM
         """
         super().__init__(llm_client, "TemplateSelectionNode")
         self.template_dir = template_dir
+        self.registry = get_template_registry(template_dir)
+        self.preselect_top_k = preselect_top_k
+        self.skip_llm_score = skip_llm_score
+        self.skip_llm_margin = skip_llm_margin
         
     def run(self, input_data: Dict[str, Any], **kwargs) -> Dict[str, Any]:
         """
@@ -45,32 +53,77 @@ class TemplateSelectionNode(BaseNode):
         reports = input_data.get('reports', [])
         forum_logs = input_data.get('forum_logs', '')
         
-        # 获取可用模板
-        available_templates = self._get_available_templates()
-        
-        if not available_templates:
+        # 获取可用模板（注册表缓存，目录无变化时不重新读取）
+        if not self.registry.templates():
             logger.info("未找到预设模板，使用内置默认模板")
             return self._get_fallback_template()
         
+        # 本地相似度预排序
+        ranked = self.registry.rank(self._selection_text(query, reports, forum_logs))
+        logger.info("模板本地预排序: " + ", ".join(f"{t.name}={score:.3f}" for t, score in ranked))
+        top_template, top_score = ranked[0]
+        if self._is_confident(ranked):
+            logger.info(f"本地预选置信度足够，跳过LLM: {top_template.name}")
+            return self._template_result(top_template, f"本地相似度预选（相似度{top_score:.2f}）")
+        
+        # 只把排名靠前的候选交给LLM挑选；完全无法区分时交给LLM全部模板
+        if top_score > 0:
+            candidates = [t for t, _ in ranked[:self.preselect_top_k]]
+        else:
+            candidates = [t for t, _ in ranked]
+        
         # 使用LLM进行模板选择
         try:
-            llm_result = self._llm_template_selection(query, reports, forum_logs, available_templates)
+            llm_result = self._llm_template_selection(
+                query, reports, forum_logs, [t.to_dict() for t in candidates]
+            )
             if llm_result:
                 return llm_result
         except Exception as e:
             logger.exception(f"LLM模板选择失败: {str(e)}")
         
-        # 如果LLM选择失败，使用备选方案
+        # 如果LLM选择失败，优先使用本地预排序第一名
+        if top_score > 0:
+            return self._template_result(top_template, f"LLM选择失败，使用本地相似度最高的模板（相似度{top_score:.2f}）")
         return self._get_fallback_template()
     
-
+    def _is_confident(self, ranked: List[Tuple[ReportTemplate, float]]) -> bool:
+        """最高分足够高且明显领先第二名"""
+        top_score = ranked[0][1]
+        second_score = ranked[1][1] if len(ranked) > 1 else 0.0
+        return top_score >= self.skip_llm_score and top_score >= second_score * self.skip_llm_margin
+    
+    @staticmethod
+    def _template_result(template: ReportTemplate, reason: str) -> Dict[str, Any]:
+        return {
+            'template_name': template.name,
+            'template_content': template.content,
+            'selection_reason': reason
+        }
+    
+    @staticmethod
+    def _report_content(report: Any) -> str:
+        """获取报告内容，支持不同的数据格式"""
+        if isinstance(report, dict):
+            return report.get('content', str(report))
+        if hasattr(report, 'content'):
+            return report.content
+        return str(report)
+    
+    def _selection_text(self, query: str, reports: List[Any], forum_logs: str) -> str:
+        """用于本地预排序的文本：查询重复加权，报告与论坛日志取开头部分"""
+        parts = [query] * 3
+        parts.extend(self._report_content(report)[:1000] for report in reports or [])
+        if forum_logs:
+            parts.append(forum_logs[:800])
+        return "\n".join(parts)
     
     def _llm_template_selection(self, query: str, reports: List[Any], forum_logs: str, 
                               available_templates: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
         """使用LLM进行模板选择"""
         logger.info("尝试使用LLM进行模板选择...")
         
-        # 构建模板列表
+        # 构建候选模板列表
         template_list = "\n".join([f"- {t['name']}: {t['description']}" for t in available_templates])
         
         # 构建报告内容摘要
@@ -78,13 +131,7 @@ class TemplateSelectionNode(BaseNode):
         if reports:
             reports_summary = "\n\n=== 分析引擎报告内容 ===\n"
             for i, report in enumerate(reports, 1):
-                # 获取报告内容，支持不同的数据格式
-                if isinstance(report, dict):
-                    content = report.get('content', str(report))
-                elif hasattr(report, 'content'):
-                    content = report.content
-                else:
-                    content = str(report)
+                content = self._report_content(report)
                 
                 # 截断过长的内容，保留前1000个字符
                 if len(content) > 1000:
@@ -109,10 +156,10 @@ class TemplateSelectionNode(BaseNode):
 论坛日志: {'有' if forum_logs else '无'}
 {reports_summary}{forum_summary}
 
-可用模板:
+候选模板（已按与内容的相关度预筛选）:
 {template_list}
 
-请根据查询内容、报告内容和论坛日志的具体情况，选择最合适的模板。"""
+请根据查询内容、报告内容和论坛日志的具体情况，只从上述候选模板中选择最合适的一个。"""
         
         # 调用LLM
         response = self.llm_client.stream_invoke_to_string(SYSTEM_PROMPT_TEMPLATE_SELECTION, user_message)
@@ -185,55 +232,6 @@ class TemplateSelectionNode(BaseNode):
         
         return None
     
-    def _get_available_templates(self) -> List[Dict[str, Any]]:
-        """获取可用的模板列表"""
-        templates = []
-        
-        if not os.path.exists(self.template_dir):
-            logger.error(f"模板目录不存在: {self.template_dir}")
-            return templates
-        
-        # 查找所有markdown模板文件
-        for filename in os.listdir(self.template_dir):
-            if filename.endswith('.md'):
-                template_path = os.path.join(self.template_dir, filename)
-                try:
-                    with open(template_path, 'r', encoding='utf-8') as f:
-                        content = f.read()
-                    
-                    template_name = filename.replace('.md', '')
-                    description = self._extract_template_description(template_name)
-                    
-                    templates.append({
-                        'name': template_name,
-                        'path': template_path,
-                        'content': content,
-                        'description': description
-                    })
-                except Exception as e:
-                    logger.exception(f"读取模板文件失败 {filename}: {str(e)}")
-        
-        return templates
-    
-    def _extract_template_description(self, template_name: str) -> str:
-        """根据模板名称生成描述"""
-        if '企业品牌' in template_name:
-            return "适用于企业品牌声誉和形象分析"
-        elif '市场竞争' in template_name:
-            return "适用于市场竞争格局和对手分析"
-        elif '日常' in template_name or '定期' in template_name:
-            return "适用于日常监测和定期汇报"
-        elif '政策' in template_name or '行业' in template_name:
-            return "适用于政策影响和行业动态分析"
-        elif '热点' in template_name or '社会' in template_name:
-            return "适用于社会热点和公共事件分析"
-        elif '突发' in template_name or '危机' in template_name:
-            return "适用于突发事件和危机公关"
-        
-        return "通用报告模板"
-    
-
-    
     def _get_fallback_template(self) -> Dict[str, Any]:
         """获取备用默认模板（空模板，让LLM自行发挥）"""
         logger.info("未找到合适模板，使用空模板让LLM自行发挥")
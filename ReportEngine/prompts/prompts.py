@@ -30,6 +30,30 @@ input_schema_html_generation = {
     }
 }
 
+# 分章节HTML生成输入Schema
+input_schema_section_html_generation = {
+    "type": "object",
+    "properties": {
+        "query": {"type": "string"},
+        "section_index": {"type": "integer"},
+        "total_sections": {"type": "integer"},
+        "section_title": {"type": "string"},
+        "section_outline": {"type": "string"},
+        "other_sections": {"type": "array", "items": {"type": "string"}},
+        "materials": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "source": {"type": "string"},
+                    "content": {"type": "string"}
+                }
+            }
+        },
+        "min_chars": {"type": "integer"}
+    }
+}
+
 # HTML报告生成输出Schema - 已简化，不再使用JSON格式
 # output_schema_html_generation = {
 #     "type": "object",
@@ -133,3 +157,29 @@ SYSTEM_PROMPT_HTML_GENERATION = f"""
 
 **重要：直接返回完整的HTML代码，不要包含任何解释、说明或其他文本。只返回HTML代码本身。**
 """
+
+# 分章节HTML生成的系统提示词
+SYSTEM_PROMPT_SECTION_HTML_GENERATION = f"""
+你是一位专业的舆情分析报告撰写专家。整份HTML报告按模板章节拆分后并行撰写，你只负责其中一个章节。
+你将收到该章节的标题与小节提纲，以及从三个分析引擎报告（QueryEngine、MediaEngine、InsightEngine）和论坛讨论日志（ForumEngine）中挑选出的相关材料。
+
+<INPUT JSON SCHEMA>
+{json.dumps(input_schema_section_html_generation, indent=2, ensure_ascii=False)}
+</INPUT JSON SCHEMA>
+
+**你的任务：**
+1. 按section_outline的小节顺序撰写本章节内容，每个小节使用<h3>标题
+2. 只使用materials中的信息进行整合分析，避免重复，不要编造数据
+3. 不要展开other_sections中属于其他章节的内容
+4. 本章节正文不少于min_chars字
+
+**输出格式要求：**
+1. 只输出本章节的HTML片段，不要输出DOCTYPE、html、head、body、style标签，也不要输出章节标题<h2>
+2. 不要编写<script>；需要图表时输出 <div class="chart-box"><canvas data-chart='Chart.js配置JSON'></canvas></div>，
+   配置JSON包含type、data和可选的options，页面会统一用Chart.js渲染
+3. 可以使用以下已定义好的样式类：card、highlight、quote、grid-2、risk-high、risk-medium、risk-low、
+   data-table（用于<table>）、chart-box
+4. 内容一次性完整显示，不要使用需要点击展开的效果
+
+**重要：直接返回HTML片段，不要包含任何解释、说明或markdown代码块标记。**
+"""
@@ -18,6 +18,16 @@ class Settings(BaseSettings):
     MAX_CONTENT_LENGTH: int = Field(200000, description="最大内容长度")
     OUTPUT_DIR: str = Field("final_reports", description="主输出目录")
     TEMPLATE_DIR: str = Field("ReportEngine/report_template", description="多模板目录")
+    TEMPLATE_PRESELECT_TOP_K: int = Field(3, description="本地相似度预排序后交给LLM挑选的候选模板数")
+    TEMPLATE_SKIP_LLM_SCORE: float = Field(0.15, description="本地预选最高相似度达到该值才可能跳过LLM模板选择")
+    TEMPLATE_SKIP_LLM_MARGIN: float = Field(2.0, description="本地预选最高相似度需为第二名的该倍数以上才跳过LLM")
+    HTML_GENERATION_MODE: str = Field("sectioned", description="HTML生成方式：sectioned按模板章节并行生成后本地拼接，single单次调用生成整篇")
+    SECTION_MAX_WORKERS: int = Field(4, description="sectioned模式下同时生成的章节数")
+    SECTION_CONTEXT_CHARS: int = Field(12000, description="sectioned模式下每个章节输入材料的字符上限")
+    REPORT_CONTEXT_TOKEN_BUDGET: int = Field(60000, description="三份引擎报告与论坛日志合计送入HTML生成的token上限")
+    CONTEXT_CHUNK_TOKENS: int = Field(800, description="上下文打包时单个片段的token上限")
+    CONTEXT_DEDUP_DISTANCE: int = Field(3, description="SimHash汉明距离不超过该值的片段视为跨引擎近似重复")
+    STREAM_BUFFER_BYTES: int = Field(4 * 1024 * 1024, description="每个报告任务流式输出缓冲区保留的HTML字节数上限")
     API_TIMEOUT: float = Field(900.0, description="单API超时时间（秒）")
     MAX_RETRY_DELAY: float = Field(180.0, description="最大重试间隔（秒）")
     MAX_RETRIES: int = Field(8, description="最大重试次数")
@@ -42,6 +52,7 @@ def print_config(config: Settings):
     message += f"最大内容长度: {config.MAX_CONTENT_LENGTH}\n"
     message += f"输出目录: {config.OUTPUT_DIR}\n"
     message += f"模板目录: {config.TEMPLATE_DIR}\n"
+    message += f"HTML 生成方式: {config.HTML_GENERATION_MODE}\n"
     message += f"API 超时时间: {config.API_TIMEOUT} 秒\n"
     message += f"最大重试间隔: {config.MAX_RETRY_DELAY} 秒\n"
     message += f"最大重试次数: {config.MAX_RETRIES}\n"
@@ -0,0 +1,229 @@
+"""
+报告输入的上下文打包
+三个引擎的Markdown报告按标题切块、论坛日志按发言切块，用目标模型的分词器计数token，
+按与查询和模板章节的相关度打分，跨引擎用SimHash去掉近似重复的段落，最后在token预算内装箱。
+"""
+
+import math
+import os
+import re
+import sys
+from collections import Counter
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from loguru import logger
+
+from .template_registry import tokenize
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from utils.text_metrics import get_token_counter, hamming_distance, simhash
+
+_HEADING_LINE = re.compile(r"^#{1,6}\s")
+_FORUM_LINE = re.compile(r"^\[\d{2}:\d{2}:\d{2}\]")
+
+
+@dataclass
+class ContextChunk:
+    """一个输入片段"""
+    source: str
+    index: int
+    text: str
+    tokens: int
+    score: float = 0.0
+    fingerprint: int = 0
+    separator: str = "\n\n"
+
+
+def split_markdown(text: str, max_tokens: int, count_tokens: Callable[[str], int]) -> List[Tuple[str, str]]:
+    """
+    按Markdown标题切块，单块超过max_tokens时再按段落切开
+
+    Returns:
+        [(与前一片段之间的原始分隔符, 片段文本)]
+    """
+    sections, current = [], []
+    for line in (text or "").splitlines():
+        if _HEADING_LINE.match(line) and current:
+            sections.append("\n".join(current))
+            current = []
+        current.append(line)
+    if current:
+        sections.append("\n".join(current))
+    return _split_sections(sections, max_tokens, count_tokens)
+
+
+def split_forum_log(text: str, max_tokens: int, count_tokens: Callable[[str], int]) -> List[Tuple[str, str]]:
+    """
+    论坛日志每行一条发言，连续发言合并到max_tokens以内
+
+    Returns:
+        [(与前一片段之间的原始分隔符, 片段文本)]
+    """
+    chunks, current, current_tokens = [], [], 0
+    for line in (text or "").splitlines():
+        if not line.strip():
+            continue
+        tokens = count_tokens(line)
+        # 只在新发言的开头断开，不把同一条发言的续行分到两个片段
+        if current and current_tokens + tokens > max_tokens and _FORUM_LINE.match(line):
+            chunks.append("\n".join(current))
+            current, current_tokens = [], 0
+        current.append(line)
+        current_tokens += tokens
+    if current:
+        chunks.append("\n".join(current))
+    return _split_sections(chunks, max_tokens, count_tokens)
+
+
+def _split_sections(sections: List[str], max_tokens: int,
+                    count_tokens: Callable[[str], int]) -> List[Tuple[str, str]]:
+    """相邻的块之间原本以换行分隔，块内超长时继续切开；切块时去掉的首尾空白计入分隔符"""
+    pieces, pending = [], ""
+    for section in sections:
+        split = _split_oversized(section, max_tokens, count_tokens)
+        if not split:
+            pending += section + "\n"
+            continue
+        leading = section[:len(section) - len(section.lstrip())]
+        for position, (separator, piece) in enumerate(split):
+            pieces.append((separator if position else pending + leading, piece))
+        pending = section[len(section.rstrip()):] + "\n"
+    return pieces
+
+
+def _split_oversized(text: str, max_tokens: int, count_tokens: Callable[[str], int]) -> List[Tuple[str, str]]:
+    text = text.strip()
+    if not text:
+        return []
+    if count_tokens(text) <= max_tokens:
+        return [("", text)]
+    parts = re.split(r"(\n\s*\n|\n)", text)
+    pieces, current, current_separator = [], "", ""
+    for position in range(0, len(parts), 2):
+        paragraph = parts[position]
+        separator = parts[position - 1] if position else ""
+        candidate = f"{current}{separator}{paragraph}" if current else paragraph
+        if current and count_tokens(candidate) > max_tokens:
+            pieces.append((current_separator, current))
+            current, current_separator = paragraph, separator
+        else:
+            current = candidate
+        # 单段仍超长时按字符比例硬切
+        while count_tokens(current) > max_tokens:
+            cut = max(1, len(current) * max_tokens // count_tokens(current))
+            pieces.append((current_separator, current[:cut]))
+            current, current_separator = current[cut:], ""
+    if current.strip():
+        pieces.append((current_separator, current))
+    return pieces
+
+
+class ContextPacker:
+    """按token预算为报告生成挑选输入内容"""
+
+    def __init__(self, token_budget: int = 60000, model_name: str = "", chunk_tokens: int = 800,
+                 dedup_distance: int = 3):
+        """
+        Args:
+            token_budget: 三份报告与论坛日志合计的token上限
+            model_name: 目标模型名称，用于选择分词器
+            chunk_tokens: 单个片段的token上限
+            dedup_distance: SimHash汉明距离不超过该值的片段视为近似重复
+        """
+        self.token_budget = token_budget
+        self.chunk_tokens = chunk_tokens
+        self.dedup_distance = dedup_distance
+        self.count_tokens = get_token_counter(model_name)
+
+    def _chunks(self, sources: Dict[str, str], forum_source: Optional[str]) -> List[ContextChunk]:
+        chunks = []
+        for name, text in sources.items():
+            splitter = split_forum_log if name == forum_source else split_markdown
+            pieces = splitter(text, self.chunk_tokens, self.count_tokens)
+            for index, (separator, piece) in enumerate(pieces):
+                chunks.append(ContextChunk(name, index, piece, self.count_tokens(piece), separator=separator))
+        return chunks
+
+    @staticmethod
+    def _score(chunks: List[ContextChunk], focus: str):
+        """TF-IDF余弦相似度"""
+        counts = [Counter(tokenize(chunk.text)) for chunk in chunks]
+        document_frequency = Counter()
+        for counter in counts:
+            document_frequency.update(counter.keys())
+        idf = {token: math.log((1 + len(chunks)) / (1 + df)) + 1 for token, df in document_frequency.items()}
+
+        def weigh(counter: Counter) -> Dict[str, float]:
+            vector = {token: (1 + math.log(count)) * idf.get(token, 1.0) for token, count in counter.items()}
+            norm = math.sqrt(sum(value * value for value in vector.values())) or 1.0
+            return {token: value / norm for token, value in vector.items()}
+
+        focus_vector = weigh(Counter(tokenize(focus)))
+        for chunk, counter in zip(chunks, counts):
+            vector = weigh(counter)
+            chunk.score = sum(weight * vector.get(token, 0.0) for token, weight in focus_vector.items())
+
+    def _deduplicate(self, chunks: List[ContextChunk]) -> List[ContextChunk]:
+        """按相关度从高到低保留，与已保留片段近似重复的丢弃"""
+        kept: List[ContextChunk] = []
+        for chunk in sorted(chunks, key=lambda c: -c.score):
+            chunk.fingerprint = simhash(chunk.text)
+            if any(hamming_distance(chunk.fingerprint, other.fingerprint) <= self.dedup_distance for other in kept):
+                continue
+            kept.append(chunk)
+        return kept
+
+    def pack(self, query: str, sources: Dict[str, str], focus_terms: Sequence[str] = (),
+             forum_source: Optional[str] = None) -> Tuple[Dict[str, str], Dict[str, int]]:
+        """
+        在token预算内挑选内容
+
+        Args:
+            query: 原始查询
+            sources: {来源名称: 全文}
+            focus_terms: 额外的相关度参考文本，如模板章节标题
+            forum_source: sources中论坛日志的名称，按发言切块
+
+        Returns:
+            ({来源名称: 打包后的文本}, 统计信息)
+        """
+        total_tokens = sum(self.count_tokens(text) for text in sources.values() if text)
+        stats = {"input_tokens": total_tokens, "packed_tokens": total_tokens, "dropped_chunks": 0, "duplicates": 0}
+
+        chunks = self._chunks(sources, forum_source)
+        self._score(chunks, " ".join([query] * 3 + list(focus_terms)))
+        unique = self._deduplicate(chunks)
+        stats["duplicates"] = len(chunks) - len(unique)
+        if not stats["duplicates"] and total_tokens <= self.token_budget:
+            # 没有重复且不超预算时原样返回
+            return dict(sources), stats
+
+        # 每个来源的第一个片段（通常是摘要）优先，其余按相关度装箱
+        leading = [chunk for chunk in unique if chunk.index == 0]
+        ranked = sorted((chunk for chunk in unique if chunk.index != 0), key=lambda c: -c.score)
+        selected, used = [], 0
+        for chunk in leading + ranked:
+            if used + chunk.tokens > self.token_budget:
+                continue
+            selected.append(chunk)
+            used += chunk.tokens
+
+        packed = {}
+        for name, text in sources.items():
+            picked = sorted((chunk for chunk in selected if chunk.source == name), key=lambda c: c.index)
+            # 相邻片段按原始分隔符拼回；中间有片段被舍弃时，论坛日志仍保持每行一条发言
+            gap_separator = "\n" if name == forum_source else "\n\n"
+            parts = []
+            for previous, chunk in zip([None] + picked, picked):
+                if previous is not None:
+                    parts.append(chunk.separator if chunk.index == previous.index + 1 else gap_separator)
+                parts.append(chunk.text)
+            packed[name] = "".join(parts)
+        stats["packed_tokens"] = used
+        stats["dropped_chunks"] = len(chunks) - len(selected)
+        logger.info(
+            f"上下文打包: {total_tokens} -> {used} tokens（预算 {self.token_budget}），"
+            f"去除近似重复 {stats['duplicates']} 段，共舍弃 {stats['dropped_chunks']} 段"
+        )
+        return packed, stats
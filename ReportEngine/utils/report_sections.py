@@ -0,0 +1,278 @@
+"""
+分章节生成HTML报告的本地工具
+- split_template_sections: 把选定模板拆分为章节（标题 + 小节提纲）
+- select_section_materials: 从三个引擎报告和论坛日志中挑选与某一章节相关的片段，控制单次LLM调用的上下文长度
+- assemble_html: 把各章节的HTML片段按固定结构拼接成完整文档，CSS/JS只在这里出现一次；
+  html_prefix / section_html / html_suffix 供流式输出按顺序逐段发送
+"""
+
+import html
+import math
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from .template_registry import tokenize
+
+
+# 模板为空（自由发挥）或无法拆分时使用的默认章节
+DEFAULT_SECTIONS = [
+    ("报告摘要", "核心结论、关键数据与主要建议"),
+    ("事件概况与发展脉络", "事件背景、起源与关键时间线"),
+    ("舆情态势与情感分析", "声量趋势、情感分布与主要观点"),
+    ("媒体与平台传播分析", "主流媒体态度、平台分布与传播路径"),
+    ("多方观点与论坛讨论", "各分析引擎的讨论、分歧与共识"),
+    ("风险研判与应对建议", "潜在风险、机遇与具体应对措施"),
+    ("结论与展望", "综合结论与后续关注重点"),
+]
+
+_LIST_CHAPTER = re.compile(r"^[-*+]\s+(.+)$")
+_HEADING = re.compile(r"^(#{1,6})\s+(.+)$")
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n|\n(?=#)")
+
+
+@dataclass
+class TemplateSection:
+    """模板中的一个章节"""
+    title: str
+    outline: List[str] = field(default_factory=list)
+
+    def outline_text(self) -> str:
+        return "\n".join(self.outline)
+
+
+def _clean_title(text: str) -> str:
+    return text.strip().strip("*").strip()
+
+
+def _chapter_title(line: str, chapter_level: int) -> Optional[str]:
+    """chapter_level 为0表示以顶格列表项为章节，否则为章节所在的Markdown标题级别"""
+    if chapter_level == 0:
+        match = _LIST_CHAPTER.match(line)
+        return _clean_title(match.group(1)) if match else None
+    match = _HEADING.match(line)
+    if match and len(match.group(1)) == chapter_level:
+        return _clean_title(match.group(2))
+    return None
+
+
+def _default_sections() -> List[TemplateSection]:
+    return [TemplateSection(title, [outline]) for title, outline in DEFAULT_SECTIONS]
+
+
+def split_template_sections(template: str) -> List[TemplateSection]:
+    """
+    按章节拆分模板
+    顶格的列表项（如 "- **1.0 摘要**"）视为章节；没有时取出现两次以上的最高级Markdown标题；
+    章节之前的内容（模板标题）忽略，章节下的缩进列表和子标题作为小节提纲。
+    """
+    lines = [line.rstrip() for line in (template or "").splitlines()]
+    if any(_LIST_CHAPTER.match(line) for line in lines):
+        chapter_level = 0
+    else:
+        levels = Counter(len(m.group(1)) for m in (_HEADING.match(line) for line in lines) if m)
+        repeated = [level for level, count in levels.items() if count >= 2]
+        if not repeated:
+            return _default_sections()
+        chapter_level = min(repeated)
+
+    sections: List[TemplateSection] = []
+    for line in lines:
+        title = _chapter_title(line, chapter_level)
+        if title:
+            sections.append(TemplateSection(title))
+        elif sections and line.strip():
+            sections[-1].outline.append(_clean_title(line.lstrip(" -*+#")))
+
+    return sections if len(sections) >= 2 else _default_sections()
+
+
+def _split_chunks(text: str, max_chars: int) -> List[str]:
+    """按段落切分，过长的段落再按长度切开"""
+    chunks = []
+    for paragraph in _PARAGRAPH_BREAK.split(text or ""):
+        paragraph = paragraph.strip()
+        while len(paragraph) > max_chars:
+            chunks.append(paragraph[:max_chars])
+            paragraph = paragraph[max_chars:]
+        if paragraph:
+            chunks.append(paragraph)
+    return chunks
+
+
+def select_section_materials(sources: Dict[str, str], section: TemplateSection, query: str,
+                             budget_chars: int = 12000, chunk_chars: int = 1500) -> List[Dict[str, str]]:
+    """
+    为一个章节挑选输入片段
+
+    每个来源的开头片段（通常是摘要）优先保留，其余片段按与 章节标题+提纲+查询 的TF-IDF相似度
+    从高到低选入，直到达到字符预算；同一来源的片段按原文顺序拼接。
+
+    Args:
+        sources: {来源名称: 全文}
+        section: 章节
+        query: 原始查询
+        budget_chars: 本章节输入材料的字符上限
+        chunk_chars: 单个片段的最大长度
+
+    Returns:
+        [{"source": 来源名称, "content": 选中的片段}]
+    """
+    chunks = []  # (来源, 序号, 文本)
+    for name, text in sources.items():
+        chunks.extend((name, index, chunk) for index, chunk in enumerate(_split_chunks(text, chunk_chars)))
+    if not chunks:
+        return []
+
+    counts = [Counter(tokenize(chunk)) for _, _, chunk in chunks]
+    document_frequency = Counter()
+    for counter in counts:
+        document_frequency.update(counter.keys())
+    idf = {token: math.log((1 + len(chunks)) / (1 + df)) + 1 for token, df in document_frequency.items()}
+    section_tokens = Counter(tokenize(" ".join([section.title] * 2 + section.outline + [query])))
+
+    def score(counter: Counter) -> float:
+        weights = {token: (1 + math.log(count)) * idf[token] for token, count in counter.items()}
+        norm = math.sqrt(sum(value * value for value in weights.values())) or 1.0
+        return sum(weights.get(token, 0.0) * (1 + math.log(count)) for token, count in section_tokens.items()) / norm
+
+    leading = [i for i, (_, index, _) in enumerate(chunks) if index == 0]
+    leading_set = set(leading)
+    ranked = sorted((i for i in range(len(chunks)) if i not in leading_set), key=lambda i: -score(counts[i]))
+
+    selected, used = set(), 0
+    for i in leading + ranked:
+        size = len(chunks[i][2])
+        if used + size > budget_chars:
+            continue
+        selected.add(i)
+        used += size
+
+    materials = []
+    for name in sources:
+        picked = [chunk for i, (source, _, chunk) in enumerate(chunks) if source == name and i in selected]
+        if picked:
+            materials.append({"source": name, "content": "\n\n".join(picked)})
+    return materials
+
+
+SHARED_CSS = """
+:root { --bg: #f5f6f8; --card: #ffffff; --text: #2c3e50; --muted: #6b7785; --accent: #3498db; --border: #e3e7ec; }
+body.dark { --bg: #15181d; --card: #1f242b; --text: #e4e8ee; --muted: #9aa5b1; --accent: #5dade2; --border: #2f3640; }
+* { box-sizing: border-box; }
+body { margin: 0; background: var(--bg); color: var(--text); line-height: 1.75;
+       font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', 'PingFang SC', 'Microsoft YaHei', sans-serif; }
+.container { max-width: 1200px; margin: 0 auto; padding: 32px 20px; }
+header.report-header { padding: 32px; background: var(--card); border-radius: 10px; border-top: 5px solid var(--accent); }
+header.report-header h1 { margin: 0 0 12px; }
+.meta { color: var(--muted); font-size: 14px; }
+.toolbar { display: flex; gap: 10px; margin-top: 16px; }
+.toolbar button { border: 1px solid var(--border); background: var(--card); color: var(--text); padding: 6px 14px; border-radius: 6px; cursor: pointer; }
+nav.toc { margin: 24px 0; padding: 20px 32px; background: var(--card); border-radius: 10px; }
+nav.toc ol { margin: 0; padding-left: 20px; columns: 2; }
+nav.toc a { color: var(--accent); text-decoration: none; }
+section.report-section { margin: 24px 0; padding: 32px; background: var(--card); border-radius: 10px; }
+section.report-section > h2 { margin-top: 0; padding-bottom: 10px; border-bottom: 2px solid var(--accent); }
+.card { padding: 16px 20px; margin: 16px 0; border: 1px solid var(--border); border-radius: 8px; }
+.highlight { padding: 12px 18px; margin: 16px 0; border-left: 4px solid var(--accent); background: rgba(52, 152, 219, 0.08); }
+.quote { padding: 10px 18px; margin: 12px 0; border-left: 4px solid var(--muted); color: var(--muted); font-style: italic; }
+.grid-2 { display: grid; grid-template-columns: repeat(auto-fit, minmax(320px, 1fr)); gap: 16px; }
+.risk-high { color: #e74c3c; font-weight: 600; }
+.risk-medium { color: #e67e22; font-weight: 600; }
+.risk-low { color: #27ae60; font-weight: 600; }
+table.data-table { width: 100%; border-collapse: collapse; margin: 16px 0; }
+table.data-table th, table.data-table td { padding: 8px 12px; border: 1px solid var(--border); text-align: left; }
+table.data-table th { background: rgba(52, 152, 219, 0.12); }
+.chart-box { position: relative; height: 320px; margin: 16px 0; }
+pre { white-space: pre-wrap; background: var(--bg); padding: 16px; border-radius: 6px; }
+footer { text-align: center; color: var(--muted); padding: 24px 0; font-size: 14px; }
+@media print { .toolbar { display: none; } section.report-section { break-inside: avoid-page; } }
+"""
+
+SHARED_JS = """
+document.querySelectorAll('canvas[data-chart]').forEach(function (canvas) {
+    try {
+        var config = JSON.parse(canvas.getAttribute('data-chart'));
+        config.options = Object.assign({ responsive: true, maintainAspectRatio: false }, config.options || {});
+        new Chart(canvas, config);
+    } catch (e) {
+        console.warn('图表渲染失败', e);
+    }
+});
+document.getElementById('theme-toggle').addEventListener('click', function () {
+    document.body.classList.toggle('dark');
+});
+document.getElementById('print-button').addEventListener('click', function () {
+    window.print();
+});
+"""
+
+
+def html_prefix(query: str, sections: List[TemplateSection], generation_time: str, template_name: str = "") -> str:
+    """文档开头：head、报告标题与目录（章节标题在生成前即可确定，可先行输出）"""
+    title = html.escape(query or "智能舆情分析报告")
+    toc = "\n".join(
+        f'<li><a href="#section-{i}">{html.escape(section.title)}</a></li>'
+        for i, section in enumerate(sections, 1)
+    )
+    template_line = f" | 报告模板: {html.escape(template_name)}" if template_name else ""
+    return f"""<!DOCTYPE html>
+<html lang="zh-CN">
+<head>
+<meta charset="UTF-8">
+<meta name="viewport" content="width=device-width, initial-scale=1.0">
+<title>{title} - 智能舆情分析报告</title>
+<script src="https://cdn.jsdelivr.net/npm/chart.js"></script>
+<style>{SHARED_CSS}</style>
+</head>
+<body>
+<div class="container">
+<header class="report-header">
+<h1>{title}</h1>
+<div class="meta">报告生成时间: {generation_time}{template_line} | 数据来源: QueryEngine、MediaEngine、InsightEngine、ForumEngine</div>
+<div class="toolbar"><button id="theme-toggle">暗色模式</button><button id="print-button">打印 / 导出PDF</button></div>
+</header>
+<nav class="toc">
+<h2>目录</h2>
+<ol>
+{toc}
+</ol>
+</nav>
+"""
+
+
+def section_html(index: int, section: TemplateSection, fragment: str) -> str:
+    """单个章节，index从1开始"""
+    return (f'<section class="report-section" id="section-{index}">\n'
+            f'<h2>{html.escape(section.title)}</h2>\n{fragment}\n</section>\n')
+
+
+def html_suffix(generation_time: str) -> str:
+    """文档结尾：页脚与共享脚本"""
+    return f"""<footer>本报告由智能舆情分析平台自动生成 | ReportEngine | 生成时间: {generation_time}</footer>
+</div>
+<script>{SHARED_JS}</script>
+</body>
+</html>"""
+
+
+def assemble_html(query: str, sections: List[TemplateSection], fragments: List[str],
+                  generation_time: str, template_name: str = "") -> str:
+    """
+    拼接完整的HTML报告，结果与依次输出 html_prefix、各 section_html、html_suffix 相同
+
+    Args:
+        query: 原始查询，作为报告标题
+        sections: 章节列表
+        fragments: 与章节一一对应的HTML片段
+        generation_time: 生成时间
+        template_name: 使用的模板名称
+
+    Returns:
+        完整HTML文档
+    """
+    body = "".join(
+        section_html(i, section, fragment) for i, (section, fragment) in enumerate(zip(sections, fragments), 1)
+    )
+    return html_prefix(query, sections, generation_time, template_name) + body + html_suffix(generation_time)
@@ -0,0 +1,193 @@
+"""
+报告生成的流式输出缓冲
+生成过程中按顺序写入HTML片段和阶段耗时，客户端通过SSE按字节偏移订阅，断线后可从上次的偏移继续。
+缓冲区有字节上限，超出时丢弃最早的片段（完整报告仍可通过 /result 获取）。
+"""
+
+import json
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+
+
+class ReportStream:
+    """单个报告任务的HTML片段与阶段事件缓冲"""
+
+    def __init__(self, max_bytes: int = 4 * 1024 * 1024):
+        """
+        Args:
+            max_bytes: 缓冲区保留的HTML字节数上限
+        """
+        self.max_bytes = max_bytes
+        self.generation = 0          # 每次重置（内容被整体替换）时递增
+        self.total_bytes = 0         # 当前generation已写入的总字节数
+        self.closed = False
+        self.final_event: Optional[Tuple[str, Dict[str, Any]]] = None
+        self._chunks: Deque[Tuple[int, bytes]] = deque()   # (起始偏移, 内容)
+        self._retained = 0
+        self._stages: List[Dict[str, Any]] = []
+        self._started_at = time.monotonic()
+        self._last_stage_at = self._started_at
+        self._condition = threading.Condition()
+
+    @property
+    def lock(self) -> threading.Condition:
+        """流的可重入锁，调用方需要与阶段事件保持一致的状态可在持有该锁时更新"""
+        return self._condition
+
+    @property
+    def base_offset(self) -> int:
+        """缓冲区中最早一个字节的偏移"""
+        return self._chunks[0][0] if self._chunks else self.total_bytes
+
+    def write(self, text: str):
+        """追加一段HTML"""
+        if not text:
+            return
+        data = text.encode('utf-8')
+        with self._condition:
+            self._chunks.append((self.total_bytes, data))
+            self.total_bytes += len(data)
+            self._retained += len(data)
+            while self._retained > self.max_bytes and len(self._chunks) > 1:
+                _, dropped = self._chunks.popleft()
+                self._retained -= len(dropped)
+            self._condition.notify_all()
+
+    def reset(self, text: str = ""):
+        """丢弃已写入的内容，从偏移0重新开始（客户端会收到reset事件）"""
+        with self._condition:
+            self.generation += 1
+            self._chunks.clear()
+            self._retained = 0
+            self.total_bytes = 0
+            self._condition.notify_all()
+        self.write(text)
+
+    def text(self) -> Optional[str]:
+        """缓冲区仍保留全部内容时返回完整文本"""
+        with self._condition:
+            if self.base_offset != 0:
+                return None
+            return b''.join(data for _, data in self._chunks).decode('utf-8', errors='replace')
+
+    def stage(self, stage: str, **info) -> Dict[str, Any]:
+        """记录一个阶段完成，附带距任务开始和距上一阶段的耗时"""
+        now = time.monotonic()
+        with self._condition:
+            event = dict(info, stage=stage,
+                         elapsed=round(now - self._started_at, 3),
+                         duration=round(now - self._last_stage_at, 3))
+            self._last_stage_at = now
+            self._stages.append(event)
+            self._condition.notify_all()
+        return event
+
+    @property
+    def stages(self) -> List[Dict[str, Any]]:
+        with self._condition:
+            return list(self._stages)
+
+    def close(self, event: str = "done", **info):
+        """结束流，event 为 done 或 error"""
+        with self._condition:
+            self.closed = True
+            self.final_event = (event, info)
+            self._condition.notify_all()
+
+    def _read_from(self, generation: int, offset: int) -> Tuple[List[Tuple[int, bytes]], bool]:
+        """读取偏移之后的片段，返回 (片段列表, 是否有被丢弃的缺口)"""
+        chunks = []
+        gap = generation == self.generation and offset < self.base_offset
+        for start, data in self._chunks:
+            end = start + len(data)
+            if end <= offset:
+                continue
+            if start < offset:
+                # 偏移落在片段中间时从片段内截取；落在多字节字符中间时退回到该字符的起始字节
+                cut = offset - start
+                while cut > 0 and data[cut] & 0xC0 == 0x80:
+                    cut -= 1
+                data = data[cut:]
+                start += cut
+            chunks.append((start, data))
+        return chunks, gap
+
+    def events(self, offset: int = 0, generation: Optional[int] = None,
+               keepalive: float = 15.0) -> Iterator[str]:
+        """
+        以SSE格式产出事件，直到流结束
+
+        Args:
+            offset: 客户端已收到的字节数
+            generation: 客户端所在的generation，与当前不一致时从头发送
+            keepalive: 无新事件时发送注释行保持连接的间隔（秒）
+
+        事件：
+            stage  阶段完成及耗时
+            chunk  HTML片段，id为 "generation-结束偏移"，可作为Last-Event-ID续传
+            reset  已发送的内容作废，从偏移0重新渲染
+            gap    请求的偏移已被移出缓冲区，完整内容需在done后通过/result获取
+            done / error  流结束
+        """
+        stage_index = 0
+        if generation is not None and generation != self.generation:
+            offset = 0
+        current_generation = self.generation if generation is None else generation
+
+        while True:
+            with self._condition:
+                if current_generation != self.generation:
+                    current_generation = self.generation
+                    offset = 0
+                    pending = [_sse("reset", {"generation": current_generation})]
+                else:
+                    pending = []
+                chunks, gap = self._read_from(current_generation, offset)
+                if gap:
+                    pending.append(_sse("gap", {"from": offset, "to": self.base_offset}))
+                stages = self._stages[stage_index:]
+                stage_index = len(self._stages)
+                final_event = self.final_event if self.closed else None
+                total_bytes = self.total_bytes
+                idle = not pending and not chunks and not stages and not final_event
+                timed_out = idle and not self._condition.wait(timeout=keepalive)
+
+            if idle:
+                if timed_out:
+                    yield ": keepalive\n\n"
+                continue
+
+            for event in pending:
+                yield event
+            for stage in stages:
+                yield _sse("stage", stage)
+            for start, data in chunks:
+                offset = start + len(data)
+                yield _sse("chunk", {"offset": start, "html": data.decode('utf-8')},
+                           event_id=f"{current_generation}-{offset}")
+            if final_event and offset >= total_bytes:
+                name, info = final_event
+                yield _sse(name, dict(info, total_bytes=total_bytes, generation=current_generation))
+                return
+
+
+def parse_resume_position(last_event_id: Optional[str], offset: Optional[str]) -> Tuple[Optional[int], int]:
+    """解析续传位置：Last-Event-ID（"generation-offset"）优先，其次为 offset 查询参数"""
+    if last_event_id and '-' in last_event_id:
+        generation, _, position = last_event_id.partition('-')
+        if generation.isdigit() and position.isdigit():
+            return int(generation), int(position)
+    if offset and offset.isdigit():
+        return None, int(offset)
+    return None, 0
+
+
+def _sse(event: str, data: Dict[str, Any], event_id: Optional[str] = None) -> str:
+    lines = []
+    if event_id:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, ensure_ascii=False)}")
+    return "\n".join(lines) + "\n\n"
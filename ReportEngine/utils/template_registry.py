@@ -0,0 +1,226 @@
+"""
+报告模板注册表
+模板目录只在首次使用时完整读取一次，之后按文件修改时间增量刷新（新增、修改、删除的模板都会被感知）；
+同时维护一个基于字符二元组的TF-IDF索引，在本地按查询和引擎报告内容对模板做相似度预排序。
+"""
+
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from loguru import logger
+
+
+# 模板类型关键词 -> (描述, 用于相似度匹配的补充关键词)
+TEMPLATE_PROFILES = [
+    (("企业品牌",), "适用于企业品牌声誉和形象分析",
+     "品牌 声誉 形象 口碑 企业 公司 产品 用户评价 年度 复盘 品牌资产"),
+    (("市场竞争",), "适用于市场竞争格局和对手分析",
+     "竞争 竞品 对手 市场份额 对比 差异化 行业格局 市场策略"),
+    (("日常", "定期"), "适用于日常监测和定期汇报",
+     "日常 定期 每周 每月 周报 月报 监测 追踪 动态 数据汇总"),
+    (("政策", "行业"), "适用于政策影响和行业动态分析",
+     "政策 法规 条例 监管 出台 发布 解读 行业 趋势 影响 改革"),
+    (("热点", "社会"), "适用于社会热点和公共事件分析",
+     "热点 社会 公共 事件 网友 讨论 热议 话题 现象 流行 社会心态"),
+    (("突发", "危机"), "适用于突发事件和危机公关",
+     "突发 危机 事故 负面 曝光 回应 道歉 通报 调查 谣言 公关"),
+]
+
+_WORD_PATTERN = re.compile(r"[a-z0-9]+|[一-鿿]+")
+_HEADING_PATTERN = re.compile(r"^\s*(?:#+|-)\s*\**\s*(.+?)\**\s*$")
+
+
+def describe_template(template_name: str) -> str:
+    """根据模板名称生成描述"""
+    for keywords, description, _ in TEMPLATE_PROFILES:
+        if any(keyword in template_name for keyword in keywords):
+            return description
+    return "通用报告模板"
+
+
+def _profile_keywords(template_name: str) -> str:
+    for keywords, _, hints in TEMPLATE_PROFILES:
+        if any(keyword in template_name for keyword in keywords):
+            return hints
+    return ""
+
+
+def tokenize(text: str) -> List[str]:
+    """中文按相邻两字切分，英文和数字按整词切分"""
+    tokens = []
+    for word in _WORD_PATTERN.findall(text.lower()):
+        if word[0].isascii():
+            tokens.append(word)
+        elif len(word) == 1:
+            tokens.append(word)
+        else:
+            tokens.extend(word[i:i + 2] for i in range(len(word) - 1))
+    return tokens
+
+
+@dataclass
+class ReportTemplate:
+    """已解析的报告模板"""
+    name: str
+    path: str
+    content: str
+    description: str
+    headings: List[str] = field(default_factory=list)
+    mtime_ns: int = 0
+
+    def to_dict(self) -> Dict[str, str]:
+        return {
+            'name': self.name,
+            'path': self.path,
+            'content': self.content,
+            'description': self.description,
+        }
+
+    def profile_text(self) -> str:
+        """用于相似度索引的文本：名称、描述和章节标题比正文更能代表模板类型，重复加权"""
+        summary = " ".join([self.name, self.description, _profile_keywords(self.name)])
+        return "\n".join([summary] * 3 + self.headings + [self.content])
+
+
+class TemplateRegistry:
+    """模板目录的缓存与相似度索引"""
+
+    def __init__(self, template_dir: str, refresh_interval: float = 2.0):
+        """
+        Args:
+            template_dir: 模板目录路径
+            refresh_interval: 两次检查目录变化之间的最小间隔（秒）
+        """
+        self.template_dir = template_dir
+        self.refresh_interval = refresh_interval
+        self._templates: Dict[str, ReportTemplate] = {}
+        self._vectors: Dict[str, Dict[str, float]] = {}
+        self._idf: Dict[str, float] = {}
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+
+    def templates(self) -> List[ReportTemplate]:
+        """获取可用模板（按名称排序）"""
+        self.refresh()
+        return [self._templates[name] for name in sorted(self._templates)]
+
+    def get(self, name: str) -> Optional[ReportTemplate]:
+        self.refresh()
+        return self._templates.get(name)
+
+    def refresh(self, force: bool = False):
+        """检查模板目录，只重新读取有变化的文件"""
+        with self._lock:
+            now = time.monotonic()
+            if not force and self._last_check and now - self._last_check < self.refresh_interval:
+                return
+            self._last_check = now
+
+            if not os.path.isdir(self.template_dir):
+                if self._templates:
+                    logger.warning(f"模板目录不存在: {self.template_dir}")
+                    self._templates = {}
+                    self._rebuild_index()
+                return
+
+            seen = set()
+            changed = False
+            for entry in os.scandir(self.template_dir):
+                if not entry.is_file() or not entry.name.endswith('.md'):
+                    continue
+                name = entry.name[:-len('.md')]
+                seen.add(name)
+                mtime_ns = entry.stat().st_mtime_ns
+                cached = self._templates.get(name)
+                if cached and cached.mtime_ns == mtime_ns:
+                    continue
+                template = self._load_template(name, entry.path, mtime_ns)
+                if template:
+                    self._templates[name] = template
+                    changed = True
+
+            for name in set(self._templates) - seen:
+                del self._templates[name]
+                changed = True
+
+            if changed:
+                self._rebuild_index()
+                logger.info(f"模板注册表已更新: {len(self._templates)} 个模板")
+
+    def _load_template(self, name: str, path: str, mtime_ns: int) -> Optional[ReportTemplate]:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                content = f.read()
+        except Exception as e:
+            logger.exception(f"读取模板文件失败 {path}: {str(e)}")
+            return None
+
+        headings = []
+        for line in content.splitlines():
+            match = _HEADING_PATTERN.match(line)
+            if match:
+                headings.append(match.group(1).strip('* '))
+        return ReportTemplate(
+            name=name,
+            path=path,
+            content=content,
+            description=describe_template(name),
+            headings=headings,
+            mtime_ns=mtime_ns,
+        )
+
+    def _rebuild_index(self):
+        counts = {name: Counter(tokenize(template.profile_text())) for name, template in self._templates.items()}
+        document_frequency = Counter()
+        for counter in counts.values():
+            document_frequency.update(counter.keys())
+        total = len(counts)
+        self._idf = {token: math.log((1 + total) / (1 + df)) + 1 for token, df in document_frequency.items()}
+        self._vectors = {name: self._weigh(counter) for name, counter in counts.items()}
+
+    def _weigh(self, counter: Counter) -> Dict[str, float]:
+        """TF-IDF加权并归一化，未登录词忽略"""
+        vector = {token: (1 + math.log(count)) * self._idf[token]
+                  for token, count in counter.items() if token in self._idf}
+        norm = math.sqrt(sum(value * value for value in vector.values()))
+        return {token: value / norm for token, value in vector.items()} if norm else {}
+
+    def rank(self, text: str, top_k: Optional[int] = None) -> List[Tuple[ReportTemplate, float]]:
+        """
+        按与给定文本的余弦相似度对模板排序
+
+        Args:
+            text: 查询、报告摘要等拼接后的文本
+            top_k: 只返回前k个，None表示全部
+
+        Returns:
+            [(模板, 相似度)]，相似度从高到低
+        """
+        self.refresh()
+        with self._lock:
+            query_vector = self._weigh(Counter(tokenize(text)))
+            scored = [
+                (self._templates[name], sum(weight * vector.get(token, 0.0) for token, weight in query_vector.items()))
+                for name, vector in self._vectors.items()
+            ]
+        scored.sort(key=lambda item: (-item[1], item[0].name))
+        return scored[:top_k] if top_k else scored
+
+
+_registries: Dict[str, TemplateRegistry] = {}
+_registries_lock = threading.Lock()
+
+
+def get_template_registry(template_dir: str) -> TemplateRegistry:
+    """获取模板目录对应的进程内共享注册表"""
+    key = os.path.abspath(template_dir)
+    with _registries_lock:
+        if key not in _registries:
+            _registries[key] = TemplateRegistry(template_dir)
+        return _registries[key]
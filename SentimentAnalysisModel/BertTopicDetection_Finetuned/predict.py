@@ -1,9 +1,11 @@
 import os
 import sys
+import csv
 import json
 import re
 import argparse
-from typing import Dict, Tuple, List
+import itertools
+from typing import Callable, Dict, Iterable, Iterator, Tuple, List
 
 # ========== 单卡锁定（在导入 torch/transformers 前执行） ==========
 def _extract_gpu_arg(argv, default: str = "0") -> str:
@@ -33,6 +35,9 @@ from transformers import (
     AutoModelForSequenceClassification,
 )
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from onnx_backend import load_onnx_classifier
+
 
 def preprocess_text(text: str) -> str:
     return text
@@ -76,7 +81,16 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument("--pretrained_name", type=str, default="google-bert/bert-base-chinese", help="预训练模型名称或路径")
     parser.add_argument("--text", type=str, default=None, help="直接输入一条要预测的文本")
     parser.add_argument("--interactive", action="store_true", help="进入交互式预测模式")
+    parser.add_argument("--input", type=str, default=None, help="批量流式预测的输入文件（jsonl/csv/txt），'-' 表示标准输入")
+    parser.add_argument("--input_format", type=str, default="auto", choices=["auto", "jsonl", "csv", "txt"],
+                        help="输入格式，auto 按文件后缀判断，标准输入默认 jsonl")
+    parser.add_argument("--text_field", type=str, default="content", help="jsonl/csv 中待分类文本所在的字段")
+    parser.add_argument("--output", type=str, default="-", help="批量预测结果输出（jsonl），'-' 表示标准输出")
+    parser.add_argument("--batch_size", type=int, default=64)
+    parser.add_argument("--top_k", type=int, default=3)
     parser.add_argument("--max_length", type=int, default=128)
+    parser.add_argument("--backend", type=str, default="auto", choices=["auto", "torch", "onnx"],
+                        help="推理后端：auto 在无GPU且已导出ONNX时使用 ONNX Runtime，否则使用 torch")
     parser.add_argument("--gpu", type=str, default=os.environ.get("CUDA_VISIBLE_DEVICES", "0"), help="指定单卡 GPU，如 0 或 1")
     return parser.parse_args()
 
@@ -96,32 +110,143 @@ def load_finetuned(model_root: str, subdir: str) -> Tuple[str, Dict[int, str]]:
     return finetuned_path, id2label
 
 
-def predict_topk(model: AutoModelForSequenceClassification, tokenizer: AutoTokenizer, device: torch.device, text: str, max_length: int = 128, top_k: int = 3) -> List[Tuple[str, float]]:
-    processed = preprocess_text(text or "")
-    encoded = tokenizer(
-        processed,
-        max_length=max_length,
-        truncation=True,
-        padding="max_length",
-        return_tensors="pt",
-    )
-    input_ids = encoded["input_ids"].to(device)
-    attention_mask = encoded["attention_mask"].to(device)
-
-    with torch.no_grad():
-        outputs = model(input_ids=input_ids, attention_mask=attention_mask)
-        logits = outputs.logits
-        probs = torch.softmax(logits, dim=-1)[0]
-        k = min(top_k, probs.shape[-1])
-        confs, idxs = torch.topk(probs, k)
+def _bucketed_topk(
+    texts: Iterable[str],
+    topk_fn: Callable[[List[str]], List[List[Tuple[str, float]]]],
+    batch_size: int,
+    bucket_batches: int,
+) -> Iterator[List[Tuple[str, float]]]:
+    """
+    按长度分桶批量推理：每次读取 batch_size * bucket_batches 条文本，桶内按长度排序后再切成批次，
+    同一批次内文本长度相近，动态填充的浪费最小；结果按输入顺序逐条产出，可以处理任意长的迭代器。
+    """
+    iterator = iter(texts)
+    bucket_size = batch_size * max(bucket_batches, 1)
+    while True:
+        bucket = [preprocess_text(text or "") for text in itertools.islice(iterator, bucket_size)]
+        if not bucket:
+            return
+        order = sorted(range(len(bucket)), key=lambda i: len(bucket[i]))
+        results: List[List[Tuple[str, float]]] = [[] for _ in bucket]
+        for start in range(0, len(order), batch_size):
+            index = order[start:start + batch_size]
+            for i, topk in zip(index, topk_fn([bucket[i] for i in index])):
+                results[i] = topk
+        yield from results
+
+
+def predict_topk_batch(
+    model: AutoModelForSequenceClassification,
+    tokenizer: AutoTokenizer,
+    device: torch.device,
+    texts: Iterable[str],
+    max_length: int = 128,
+    top_k: int = 3,
+    batch_size: int = 64,
+    bucket_batches: int = 16,
+) -> Iterator[List[Tuple[str, float]]]:
+    """批量 Top-K 预测，texts 可以是列表或迭代器，按输入顺序产出每条文本的 [(标签, 概率), ...]"""
     id2label = getattr(model.config, "id2label", {}) if isinstance(getattr(model.config, "id2label", None), dict) else {}
-    results: List[Tuple[str, float]] = []
-    for i in range(k):
-        idx = int(idxs[i].item())
-        conf = float(confs[i].item())
-        label_name = id2label.get(idx, str(idx))
-        results.append((label_name, conf))
-    return results
+
+    def topk_fn(batch: List[str]) -> List[List[Tuple[str, float]]]:
+        # 动态填充到批次内最长文本，而不是固定填充到 max_length
+        encoded = tokenizer(
+            batch,
+            max_length=max_length,
+            truncation=True,
+            padding=True,
+            return_tensors="pt",
+        )
+        input_ids = encoded["input_ids"].to(device)
+        attention_mask = encoded["attention_mask"].to(device)
+        with torch.no_grad():
+            logits = model(input_ids=input_ids, attention_mask=attention_mask).logits
+            probs = torch.softmax(logits, dim=-1)
+            confs, idxs = torch.topk(probs, min(top_k, probs.shape[-1]), dim=-1)
+        return [
+            [(id2label.get(idx, str(idx)), conf) for conf, idx in zip(row_confs, row_idxs)]
+            for row_confs, row_idxs in zip(confs.cpu().tolist(), idxs.cpu().tolist())
+        ]
+
+    return _bucketed_topk(texts, topk_fn, batch_size, bucket_batches)
+
+
+def predict_topk_batch_onnx(
+    onnx_model,
+    texts: Iterable[str],
+    max_length: int = 128,
+    top_k: int = 3,
+    batch_size: int = 64,
+    bucket_batches: int = 16,
+) -> Iterator[List[Tuple[str, float]]]:
+    """predict_topk_batch 的 ONNX Runtime 版本"""
+
+    def topk_fn(batch: List[str]) -> List[List[Tuple[str, float]]]:
+        probs = onnx_model.predict_proba(batch, max_length=max_length, batch_size=len(batch))
+        idxs = (-probs).argsort(axis=-1)[:, :min(top_k, probs.shape[-1])]
+        return [
+            [(onnx_model.id2label.get(int(idx), str(idx)), float(row[idx])) for idx in row_idxs]
+            for row, row_idxs in zip(probs, idxs)
+        ]
+
+    return _bucketed_topk(texts, topk_fn, batch_size, bucket_batches)
+
+
+def predict_topk(model: AutoModelForSequenceClassification, tokenizer: AutoTokenizer, device: torch.device, text: str, max_length: int = 128, top_k: int = 3) -> List[Tuple[str, float]]:
+    return next(predict_topk_batch(model, tokenizer, device, [text], max_length, top_k))
+
+
+def predict_topk_onnx(onnx_model, text: str, max_length: int = 128, top_k: int = 3) -> List[Tuple[str, float]]:
+    return next(predict_topk_batch_onnx(onnx_model, [text], max_length, top_k))
+
+
+def read_records(path: str, input_format: str = "auto", text_field: str = "content") -> Iterator[Dict]:
+    """逐条读取 jsonl/csv/txt 记录，path 为 '-' 时读取标准输入"""
+    if input_format == "auto":
+        suffix = os.path.splitext(path)[1].lower()
+        input_format = {".csv": "csv", ".txt": "txt"}.get(suffix, "jsonl")
+    stream = sys.stdin if path == "-" else open(path, "r", encoding="utf-8-sig", newline="")
+    try:
+        if input_format == "csv":
+            yield from csv.DictReader(stream)
+        elif input_format == "txt":
+            for line in stream:
+                if line.strip():
+                    yield {text_field: line.rstrip("\r\n")}
+        else:
+            for line in stream:
+                if line.strip():
+                    yield json.loads(line)
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+
+def stream_predict(
+    records: Iterable[Dict],
+    predict_batch: Callable[[Iterable[str]], Iterator[List[Tuple[str, float]]]],
+    output,
+    text_field: str = "content",
+    flush_every: int = 1000,
+) -> int:
+    """
+    流式批量预测：边读边推理边写出，每条记录追加 topics 字段后以 jsonl 写入 output
+
+    Returns:
+        处理的记录数
+    """
+    records, text_source = itertools.tee(records)
+    texts = (str(record.get(text_field) or "") for record in text_source)
+    count = 0
+    for record, topk in zip(records, predict_batch(texts)):
+        record["topics"] = [{"label": label, "score": round(conf, 6)} for label, conf in topk]
+        output.write(json.dumps(record, ensure_ascii=False) + "\n")
+        count += 1
+        if count % flush_every == 0:
+            output.flush()
+            print(f"已处理 {count} 条", file=sys.stderr)
+    output.flush()
+    return count
 
 
 def main() -> None:
@@ -131,19 +256,45 @@ def main() -> None:
     model_root = args.model_root if os.path.isabs(args.model_root) else os.path.join(script_dir, args.model_root)
     os.makedirs(model_root, exist_ok=True)
 
-    # 确保基础模型在本地
-    ensure_base_model_local(args.pretrained_name, model_root)
-
     finetuned_dir, _ = load_finetuned(model_root, args.finetuned_subdir)
-    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-    tokenizer = AutoTokenizer.from_pretrained(finetuned_dir)
-    model = AutoModelForSequenceClassification.from_pretrained(finetuned_dir)
-    model.to(device)
-    model.eval()
+    onnx_model = None
+    if args.backend == "onnx" or (args.backend == "auto" and not torch.cuda.is_available()):
+        onnx_model = load_onnx_classifier(finetuned_dir)
+        if onnx_model is None and args.backend == "onnx":
+            raise FileNotFoundError(
+                f"未找到可用的ONNX模型（或未安装onnxruntime），请先运行: python ../onnx_backend.py --model_dir {finetuned_dir}"
+            )
+
+    if onnx_model is not None:
+        print(f"使用 ONNX Runtime 推理: {onnx_model.onnx_path}", file=sys.stderr)
+        predict_batch = lambda texts: predict_topk_batch_onnx(onnx_model, texts, args.max_length, args.top_k, args.batch_size)
+    else:
+        # 确保基础模型在本地
+        ensure_base_model_local(args.pretrained_name, model_root)
+
+        device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        tokenizer = AutoTokenizer.from_pretrained(finetuned_dir)
+        model = AutoModelForSequenceClassification.from_pretrained(finetuned_dir)
+        model.to(device)
+        model.eval()
+        predict_batch = lambda texts: predict_topk_batch(model, tokenizer, device, texts, args.max_length, args.top_k, args.batch_size)
+
+    predict = lambda text: next(predict_batch([text]))
+
+    # 批量流式模式：适合离线给整个爬取语料打话题标签
+    if args.input is not None:
+        records = read_records(args.input, args.input_format, args.text_field)
+        if args.output == "-":
+            count = stream_predict(records, predict_batch, sys.stdout, args.text_field)
+        else:
+            with open(args.output, "w", encoding="utf-8") as output:
+                count = stream_predict(records, predict_batch, output, args.text_field)
+        print(f"完成，共处理 {count} 条", file=sys.stderr)
+        return
 
     if args.text is not None:
-        topk = predict_topk(model, tokenizer, device, args.text, args.max_length, top_k=3)
-        print("Top-3 预测:")
+        topk = predict(args.text)
+        print(f"Top-{args.top_k} 预测:")
         for rank, (label, conf) in enumerate(topk, 1):
             print(f"{rank}. {label} (p={conf:.4f})")
         return
@@ -160,8 +311,8 @@ def main() -> None:
                 break
             if not text:
                 continue
-            topk = predict_topk(model, tokenizer, device, text, args.max_length, top_k=3)
-            print("Top-3 预测:")
+            topk = predict(text)
+            print(f"Top-{args.top_k} 预测:")
             for rank, (label, conf) in enumerate(topk, 1):
                 print(f"{rank}. {label} (p={conf:.4f})")
         return
@@ -1,7 +1,12 @@
+import os
+import sys
 import torch
 from transformers import AutoTokenizer, AutoModelForSequenceClassification, pipeline
 import re
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from onnx_backend import load_onnx_classifier
+
 def preprocess_text(text):
     return text
 
@@ -11,11 +16,16 @@ def main():
     # 使用HuggingFace预训练模型
     model_name = "wsqstar/GISchat-weibo-100k-fine-tuned-bert"
     local_model_path = "./model"
+    onnx_model = None
     
     try:
+        # 纯CPU环境下优先使用已导出的ONNX模型（见 SentimentAnalysisModel/onnx_backend.py）
+        if not torch.cuda.is_available():
+            onnx_model = load_onnx_classifier(local_model_path)
+        if onnx_model is not None:
+            print(f"已加载ONNX模型: {onnx_model.onnx_path}，使用 ONNX Runtime 在CPU上推理")
         # 检查本地是否已有模型
-        import os
-        if os.path.exists(local_model_path):
+        elif os.path.exists(local_model_path):
             print("从本地加载模型...")
             tokenizer = AutoTokenizer.from_pretrained(local_model_path)
             model = AutoModelForSequenceClassification.from_pretrained(local_model_path)
@@ -30,11 +40,12 @@ def main():
             model.save_pretrained(local_model_path)
             print(f"模型已保存到: {local_model_path}")
         
-        # 设置设备
-        device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
-        model.to(device)
-        model.eval()
-        print(f"模型加载成功! 使用设备: {device}")
+        if onnx_model is None:
+            # 设置设备
+            device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+            model.to(device)
+            model.eval()
+            print(f"模型加载成功! 使用设备: {device}")
         
     except Exception as e:
         print(f"模型加载失败: {e}")
@@ -57,27 +68,29 @@ def main():
             # 预处理文本
             processed_text = preprocess_text(text)
             
-            # 分词编码
-            inputs = tokenizer(
-                processed_text,
-                max_length=512,
-                padding=True,
-                truncation=True,
-                return_tensors='pt'
-            )
-            
-            # 转移到设备
-            inputs = {k: v.to(device) for k, v in inputs.items()}
-            
-            # 预测
-            with torch.no_grad():
-                outputs = model(**inputs)
-                logits = outputs.logits
-                probabilities = torch.softmax(logits, dim=1)
-                prediction = torch.argmax(probabilities, dim=1).item()
+            if onnx_model is not None:
+                probabilities = onnx_model.predict_proba([processed_text], max_length=512)[0].tolist()
+            else:
+                # 分词编码
+                inputs = tokenizer(
+                    processed_text,
+                    max_length=512,
+                    padding=True,
+                    truncation=True,
+                    return_tensors='pt'
+                )
+                
+                # 转移到设备
+                inputs = {k: v.to(device) for k, v in inputs.items()}
+                
+                # 预测
+                with torch.no_grad():
+                    outputs = model(**inputs)
+                    probabilities = torch.softmax(outputs.logits, dim=1)[0].tolist()
+            prediction = max(range(len(probabilities)), key=probabilities.__getitem__)
             
             # 输出结果
-            confidence = probabilities[0][prediction].item()
+            confidence = probabilities[prediction]
             label = "正面情感" if prediction == 1 else "负面情感"
             
             print(f"预测结果: {label} (置信度: {confidence:.4f})")
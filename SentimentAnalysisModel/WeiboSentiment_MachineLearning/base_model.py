@@ -30,6 +30,19 @@ class BaseModel(ABC):
         """预测文本情感"""
         pass
     
+    def predict_proba(self, texts: List[str]) -> List[float]:
+        """预测文本为正面情感的概率
+        
+        默认由predict的类别标签退化得到(0.0或1.0), 能输出概率的模型应重写该方法
+        
+        Args:
+            texts: 待预测文本列表
+            
+        Returns:
+            正面情感概率列表
+        """
+        return [float(pred) for pred in self.predict(texts)]
+    
     def predict_single(self, text: str) -> Tuple[int, float]:
         """预测单条文本的情感
         
@@ -71,6 +71,27 @@ class BayesModel(BaseModel):
         
         return predictions.tolist()
     
+    def predict_proba(self, texts: List[str]) -> List[float]:
+        """预测文本为正面情感的概率
+        
+        Args:
+            texts: 待预测文本列表
+            
+        Returns:
+            正面情感概率列表
+        """
+        if not self.is_trained:
+            raise ValueError(f"模型 {self.model_name} 尚未训练，请先调用train方法")
+            
+        # 特征转换
+        X = self.vectorizer.transform(texts)
+        
+        # 正类(标签1)所在的列
+        positive_index = list(self.model.classes_).index(1)
+        probabilities = self.model.predict_proba(X)[:, positive_index]
+        
+        return probabilities.tolist()
+    
     def predict_single(self, text: str) -> Tuple[int, float]:
         """预测单条文本的情感
         
@@ -4,39 +4,28 @@ BERT情感分析模型训练脚本
 """
 import argparse
 import os
+import sys
 import pandas as pd
 import torch
 import torch.nn as nn
-from torch.utils.data import Dataset, DataLoader
 from transformers import BertTokenizer, BertModel
 from sklearn.metrics import accuracy_score, f1_score, classification_report, roc_auc_score
-from typing import List, Tuple
+from typing import Iterable, List, Tuple
 import warnings
 import requests
 from pathlib import Path
 
 from base_model import BaseModel
-from utils import load_corpus_bert
+from utils import load_corpus_bert, processing_bert
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from streaming_dataset import StreamingCorpus, TokenizedShards, records_fingerprint
 
 # 忽略transformers的警告
 warnings.filterwarnings("ignore")
 os.environ["KMP_DUPLICATE_LIB_OK"] = "TRUE"
 
 
-class BertDataset(Dataset):
-    """BERT数据集"""
-    
-    def __init__(self, data: List[Tuple[str, int]]):
-        self.data = [item[0] for item in data]
-        self.labels = [item[1] for item in data]
-    
-    def __getitem__(self, index):
-        return self.data[index], self.labels[index]
-    
-    def __len__(self):
-        return len(self.labels)
-
-
 class BertClassifier(nn.Module):
     """BERT分类器网络"""
     
@@ -136,8 +125,11 @@ class BertModel_Custom(BaseModel):
                 print(f"❌ 在线模型也加载失败: {e2}")
                 raise FileNotFoundError(f"无法加载BERT模型，请检查网络连接或手动下载模型到: {self.model_path}")
     
-    def train(self, train_data: List[Tuple[str, int]], **kwargs) -> None:
-        """训练BERT模型"""
+    def train(self, train_data: Iterable[Tuple[str, int]], **kwargs) -> None:
+        """训练BERT模型
+        
+        train_data 可以是列表，也可以是 StreamingCorpus 等可重复迭代的流式语料
+        """
         print(f"开始训练 {self.model_name} 模型...")
         
         # 加载BERT
@@ -149,13 +141,14 @@ class BertModel_Custom(BaseModel):
         batch_size = kwargs.get('batch_size', 100)
         input_size = kwargs.get('input_size', 768)
         decay_rate = kwargs.get('decay_rate', 0.9)
+        max_length = kwargs.get('max_length', 512)
         
         print(f"BERT超参数: lr={learning_rate}, epochs={num_epochs}, "
               f"batch_size={batch_size}, input_size={input_size}")
         
-        # 创建数据集
-        train_dataset = BertDataset(train_data)
-        train_loader = DataLoader(train_dataset, batch_size=batch_size, shuffle=True)
+        # 分词结果按分片缓存到磁盘，重复训练跳过分词；按长度分桶取批次
+        fingerprint = getattr(train_data, "fingerprint", None) or records_fingerprint(train_data)
+        train_shards = TokenizedShards(self.tokenizer, max_length, fingerprint).build(train_data)
         
         # 创建分类器
         self.classifier = BertClassifier(input_size).to(self.device)
@@ -173,13 +166,12 @@ class BertModel_Custom(BaseModel):
             total_loss = 0
             num_batches = 0
             
-            for i, (words, labels) in enumerate(train_loader):
-                # 分词和编码
-                tokens = self.tokenizer(words, padding=True, truncation=True, 
-                                      max_length=512, return_tensors='pt')
-                input_ids = tokens["input_ids"].to(self.device)
-                attention_mask = tokens["attention_mask"].to(self.device)
-                labels = torch.tensor(labels, dtype=torch.float32).to(self.device)
+            batches = train_shards.iter_batches(batch_size, shuffle=True, seed=epoch,
+                                                pad_token_id=self.tokenizer.pad_token_id)
+            for i, batch in enumerate(batches):
+                input_ids = torch.from_numpy(batch["input_ids"]).to(self.device)
+                attention_mask = torch.from_numpy(batch["attention_mask"]).to(self.device)
+                labels = torch.from_numpy(batch["labels"]).float().to(self.device)
                 
                 # 获取BERT输出（冻结参数）
                 with torch.no_grad():
@@ -220,10 +212,15 @@ class BertModel_Custom(BaseModel):
     
     def predict(self, texts: List[str]) -> List[int]:
         """预测文本情感"""
+        # 转换为类别标签
+        return [int(prob > 0.5) for prob in self.predict_proba(texts)]
+    
+    def predict_proba(self, texts: List[str]) -> List[float]:
+        """预测文本为正面情感的概率"""
         if not self.is_trained:
             raise ValueError(f"模型 {self.model_name} 尚未训练，请先调用train方法")
         
-        predictions = []
+        probabilities = []
         batch_size = 32
         
         self.bert.eval()
@@ -245,13 +242,9 @@ class BertModel_Custom(BaseModel):
                 
                 # 分类器预测
                 outputs = self.classifier(bert_output)
-                outputs = outputs.view(-1)
-                
-                # 转换为类别标签
-                preds = (outputs > 0.5).cpu().numpy()
-                predictions.extend(preds.astype(int).tolist())
+                probabilities.extend(outputs.view(-1).cpu().tolist())
         
-        return predictions
+        return probabilities
     
     def predict_single(self, text: str) -> Tuple[int, float]:
         """预测单条文本的情感"""
@@ -326,11 +319,10 @@ class BertModel_Custom(BaseModel):
         print(f"已加载模型: {model_path}")
     
     @staticmethod
-    def load_data(train_path: str, test_path: str) -> Tuple[List[Tuple[str, int]], List[Tuple[str, int]]]:
-        """加载BERT格式的数据"""
-        print("加载训练数据...")
-        train_data = load_corpus_bert(train_path)
-        print(f"训练数据量: {len(train_data)}")
+    def load_data(train_path: str, test_path: str) -> Tuple[StreamingCorpus, List[Tuple[str, int]]]:
+        """加载BERT格式的数据，训练集流式读取，不载入内存"""
+        print(f"流式训练数据: {train_path}")
+        train_data = StreamingCorpus(train_path, fmt="id_label_text", transform=processing_bert)
         
         print("加载测试数据...")
         test_data = load_corpus_bert(test_path)
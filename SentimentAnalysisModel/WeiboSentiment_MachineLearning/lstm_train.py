@@ -177,6 +177,11 @@ class LSTMModel(BaseModel):
     
     def predict(self, texts: List[str]) -> List[int]:
         """预测文本情感"""
+        # 转换为类别标签
+        return [int(prob > 0.5) for prob in self.predict_proba(texts)]
+    
+    def predict_proba(self, texts: List[str]) -> List[float]:
+        """预测文本为正面情感的概率"""
         if not self.is_trained:
             raise ValueError(f"模型 {self.model_name} 尚未训练，请先调用train方法")
         
@@ -185,20 +190,16 @@ class LSTMModel(BaseModel):
         test_dataset = LSTMDataset(test_data, self.word2vec_model)
         test_loader = DataLoader(test_dataset, batch_size=32, collate_fn=collate_fn)
         
-        predictions = []
+        probabilities = []
         self.model.eval()
         
         with torch.no_grad():
             for x, _, lengths in test_loader:
                 x = x.to(self.device)
                 outputs = self.model(x, lengths)
-                outputs = outputs.view(-1)
-                
-                # 转换为类别标签
-                preds = (outputs > 0.5).cpu().numpy()
-                predictions.extend(preds.astype(int).tolist())
+                probabilities.extend(outputs.view(-1).cpu().tolist())
         
-        return predictions
+        return probabilities
     
     def predict_single(self, text: str) -> Tuple[int, float]:
         """预测单条文本的情感"""
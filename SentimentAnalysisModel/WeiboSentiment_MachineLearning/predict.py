@@ -4,10 +4,13 @@
 支持加载所有模型进行情感预测
 """
 import argparse
+import csv
 import os
 import re
-from typing import Dict, Tuple, List
+from typing import Dict, Tuple, List, Iterator
 import warnings
+
+import numpy as np
 warnings.filterwarnings("ignore")
 
 # 导入所有模型类
@@ -16,14 +19,21 @@ from svm_train import SVMModel
 from xgboost_train import XGBoostModel
 from lstm_train import LSTMModel
 from bert_train import BertModel_Custom
-from utils import processing
+from utils import processing, processing_batch, create_processing_pool
 
 
 class SentimentPredictor:
     """情感分析预测器"""
     
-    def __init__(self):
+    def __init__(self, n_jobs: int = None):
+        """
+        Args:
+            n_jobs: 批量预处理的进程数，None为CPU核数，1表示不使用进程池
+        """
         self.models = {}
+        self.n_jobs = n_jobs
+        self.min_parallel_size = 1000
+        self._processing_pool = None
         self.available_models = {
             'bayes': BayesModel,
             'svm': SVMModel,
@@ -117,6 +127,27 @@ class SentimentPredictor:
         
         return results
     
+    def _get_processing_pool(self):
+        """按需创建预处理进程池，在多次批量预测之间复用"""
+        if self.n_jobs == 1:
+            return None
+        if self._processing_pool is None:
+            self._processing_pool = create_processing_pool(self.n_jobs)
+        return self._processing_pool
+    
+    def preprocess_batch(self, texts: List[str]) -> List[str]:
+        """批量预处理文本，文本较多时在进程池中并行分词"""
+        # 少量文本串行处理即可，不必为此启动进程池
+        if len(texts) < self.min_parallel_size:
+            return processing_batch(texts)
+        return processing_batch(texts, executor=self._get_processing_pool(), min_parallel_size=self.min_parallel_size)
+    
+    def close(self) -> None:
+        """关闭预处理进程池"""
+        if self._processing_pool is not None:
+            self._processing_pool.shutdown()
+            self._processing_pool = None
+    
     def predict_batch(self, texts: List[str], model_type: str = None) -> Dict[str, List[int]]:
         """批量预测文本情感
         
@@ -128,7 +159,7 @@ class SentimentPredictor:
             Dict[model_type, predictions]
         """
         # 文本预处理
-        processed_texts = [processing(text) for text in texts]
+        processed_texts = self.preprocess_batch(texts)
         
         if model_type:
             if model_type not in self.models:
@@ -149,43 +180,109 @@ class SentimentPredictor:
         
         return results
     
-    def ensemble_predict(self, text: str, weights: Dict[str, float] = None) -> Tuple[int, float]:
-        """集成预测（多个模型投票）
+    def predict_proba_batch(self, texts: List[str], processed: bool = False) -> Dict[str, np.ndarray]:
+        """批量预测每个已加载模型给出的正面情感概率
         
         Args:
-            text: 待预测文本
+            texts: 待预测文本列表
+            processed: texts是否已经预处理过
+            
+        Returns:
+            Dict[model_type, 概率数组(len(texts),)]，预测失败的模型不会出现在结果中
+        """
+        processed_texts = texts if processed else self.preprocess_batch(texts)
+        
+        results = {}
+        for name, model in self.models.items():
+            try:
+                results[name] = np.asarray(model.predict_proba(processed_texts), dtype=np.float64)
+            except Exception as e:
+                print(f"模型 {name} 预测失败: {e}")
+        
+        return results
+    
+    def ensemble_predict_batch(self, texts: List[str], weights: Dict[str, float] = None,
+                               processed: bool = False) -> List[Tuple[int, float]]:
+        """批量集成预测，在(模型数 x 文本数)的概率矩阵上一次性加权平均
+        
+        Args:
+            texts: 待预测文本列表
             weights: 模型权重，如果为None则平均权重
+            processed: texts是否已经预处理过
             
         Returns:
-            (prediction, confidence)
+            [(prediction, confidence), ...]
         """
         if len(self.models) == 0:
             raise ValueError("没有加载任何模型")
         
-        results = self.predict_single(text)
+        probabilities = self.predict_proba_batch(texts, processed=processed)
         
         if weights is None:
-            weights = {name: 1.0 for name in results.keys()}
+            weights = {name: 1.0 for name in probabilities.keys()}
         
-        # 加权平均
-        total_weight = 0
-        weighted_prob = 0
+        names = [name for name in probabilities if weights.get(name, 0) > 0]
+        if not names:
+            return [(0, 0.5)] * len(texts)
         
-        for model_name, (pred, conf) in results.items():
-            if model_name in weights:
-                weight = weights[model_name]
-                prob = conf if pred == 1 else 1 - conf
-                weighted_prob += prob * weight
-                total_weight += weight
+        prob_matrix = np.vstack([probabilities[name] for name in names])
+        weight_vector = np.array([weights[name] for name in names], dtype=np.float64)
         
-        if total_weight == 0:
-            return 0, 0.5
+        # 加权平均
+        final_prob = weight_vector @ prob_matrix / weight_vector.sum()
+        final_pred = (final_prob > 0.5).astype(int)
+        final_conf = np.where(final_pred == 1, final_prob, 1 - final_prob)
         
-        final_prob = weighted_prob / total_weight
-        final_pred = int(final_prob > 0.5)
-        final_conf = final_prob if final_pred == 1 else 1 - final_prob
+        return list(zip(final_pred.tolist(), final_conf.tolist()))
+    
+    def ensemble_predict(self, text: str, weights: Dict[str, float] = None) -> Tuple[int, float]:
+        """集成预测（多个模型投票）
         
-        return final_pred, final_conf
+        Args:
+            text: 待预测文本
+            weights: 模型权重，如果为None则平均权重
+            
+        Returns:
+            (prediction, confidence)
+        """
+        return self.ensemble_predict_batch([text], weights)[0]
+    
+    def predict_file(self, input_path: str, output_path: str, chunk_size: int = 10000,
+                     weights: Dict[str, float] = None) -> int:
+        """按块流式地对文件中的文本做集成预测，内存占用只与块大小有关
+        
+        Args:
+            input_path: 输入文件，每行一条文本
+            output_path: 输出CSV文件，列为 text, prediction, confidence 以及各模型的正面概率
+            chunk_size: 每块文本数
+            weights: 模型权重，如果为None则平均权重
+            
+        Returns:
+            预测的文本总数
+        """
+        model_names = list(self.models.keys())
+        total = 0
+        with open(output_path, 'w', encoding='utf-8', newline='') as out:
+            writer = csv.writer(out)
+            writer.writerow(['text', 'prediction', 'confidence'] + [f'{name}_prob' for name in model_names])
+            for chunk in _read_chunks(input_path, chunk_size):
+                processed_texts = self.preprocess_batch(chunk)
+                probabilities = self.predict_proba_batch(processed_texts, processed=True)
+                ensemble = self.ensemble_predict_batch(processed_texts, weights, processed=True) \
+                    if len(model_names) > 1 else None
+                for i, text in enumerate(chunk):
+                    model_probs = [probabilities[name][i] if name in probabilities else '' for name in model_names]
+                    if ensemble is not None:
+                        pred, conf = ensemble[i]
+                    else:
+                        prob = model_probs[0] if model_probs and model_probs[0] != '' else 0.5
+                        pred = int(prob > 0.5)
+                        conf = prob if pred == 1 else 1 - prob
+                    writer.writerow([text, pred, f'{conf:.4f}'] +
+                                    [f'{p:.4f}' if p != '' else '' for p in model_probs])
+                total += len(chunk)
+                print(f"已预测 {total} 条")
+        return total
     
     def interactive_predict(self):
         """交互式预测模式"""
@@ -251,6 +348,22 @@ class SentimentPredictor:
                 print(f"❌ 预测过程中出现错误: {e}")
 
 
+def _read_chunks(path: str, chunk_size: int) -> Iterator[List[str]]:
+    """逐行读取文本文件，按块返回非空行"""
+    chunk = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            chunk.append(line)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
+
+
 def main():
     """主函数"""
     parser = argparse.ArgumentParser(description='微博情感分析统一预测程序')
@@ -266,11 +379,19 @@ def main():
                         help='交互式预测模式（默认）')
     parser.add_argument('--ensemble', action='store_true',
                         help='使用集成预测')
+    parser.add_argument('--input_file', type=str,
+                        help='批量预测的输入文件（每行一条文本）')
+    parser.add_argument('--output_file', type=str, default='predictions.csv',
+                        help='批量预测结果输出的CSV文件')
+    parser.add_argument('--chunk_size', type=int, default=10000,
+                        help='批量预测时每块的文本数')
+    parser.add_argument('--n_jobs', type=int, default=None,
+                        help='批量预处理的进程数，默认为CPU核数')
     
     args = parser.parse_args()
     
     # 创建预测器
-    predictor = SentimentPredictor()
+    predictor = SentimentPredictor(n_jobs=args.n_jobs)
     
     # 加载模型
     if args.model_type:
@@ -288,8 +409,15 @@ def main():
         # 加载所有模型
         predictor.load_all_models(args.model_dir, args.bert_path)
     
+    # 如果指定了输入文件，批量预测
+    if args.input_file:
+        try:
+            total = predictor.predict_file(args.input_file, args.output_file, chunk_size=args.chunk_size)
+            print(f"批量预测完成，共 {total} 条，结果已保存到: {args.output_file}")
+        finally:
+            predictor.close()
     # 如果指定了文本，直接预测
-    if args.text:
+    elif args.text:
         if args.ensemble and len(predictor.models) > 1:
             pred, conf = predictor.ensemble_predict(args.text)
             sentiment = "正面" if pred == 1 else "负面"
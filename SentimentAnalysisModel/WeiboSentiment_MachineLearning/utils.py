@@ -3,7 +3,8 @@ import jieba
 import re
 import os
 import pickle
-from typing import List, Tuple, Any
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import List, Tuple, Any, Iterable, Optional
 
 
 # 加载停用词
@@ -16,31 +17,64 @@ if os.path.exists(stopwords_path):
 else:
     print(f"警告: 停用词文件 {stopwords_path} 不存在，将使用空停用词列表")
 
+# 预编译的清洗正则，避免每条文本都重新查找/编译
+TOPIC_PATTERN = re.compile(r"\{%.+?%\}")       # {%xxx%} (地理定位, 微博话题等)
+MENTION_PATTERN = re.compile(r"@.+?( |$)")      # @xxx (用户名)
+BRACKET_PATTERN = re.compile(r"【.+?】")          # 【xx】 (里面的内容通常都不是用户自己写的)
+ZWSP_PATTERN = re.compile("\u200b")             # '\u200b'是这个数据集中的一个bad case, 不用特别在意
 
-def load_corpus(path):
+
+def iter_corpus(path, processor):
     """
-    加载语料库
+    逐行读取 "id,标签,文本" 格式的语料，边读边预处理，不在内存中保留整个语料
     """
-    data = []
     with open(path, "r", encoding="utf8") as f:
         for line in f:
             [_, seniment, content] = line.split(",", 2)
-            content = processing(content)
-            data.append((content, int(seniment)))
-    return data
+            yield processor(content), int(seniment)
+
+
+def load_corpus(path):
+    """
+    加载语料库
+    """
+    return list(iter_corpus(path, processing))
 
 
 def load_corpus_bert(path):
     """
     加载语料库
     """
-    data = []
-    with open(path, "r", encoding="utf8") as f:
-        for line in f:
-            [_, seniment, content] = line.split(",", 2)
-            content = processing_bert(content)
-            data.append((content, int(seniment)))
-    return data
+    return list(iter_corpus(path, processing_bert))
+
+
+def clean_text(text):
+    """
+    数据清洗: 去除话题/定位、@用户名、【】中的转发内容等
+    """
+    text = TOPIC_PATTERN.sub(" ", text)
+    text = MENTION_PATTERN.sub(" ", text)
+    text = BRACKET_PATTERN.sub(" ", text)
+    text = ZWSP_PATTERN.sub(" ", text)
+    return text
+
+
+def merge_negation(words):
+    """
+    对否定词`不`做特殊处理: 与其后面的词进行拼接
+    单次线性扫描，结果与反复查找第一个`不`再拼接的做法一致
+    """
+    merged = []
+    i = 0
+    n = len(words)
+    while i < n:
+        if words[i] == "不" and i + 1 < n:
+            merged.append(words[i] + words[i + 1])
+            i += 2
+        else:
+            merged.append(words[i])
+            i += 1
+    return merged
 
 
 def processing(text):
@@ -48,18 +82,11 @@ def processing(text):
     数据预处理, 可以根据自己的需求进行重载
     """
     # 数据清洗部分
-    text = re.sub("\{%.+?%\}", " ", text)           # 去除 {%xxx%} (地理定位, 微博话题等)
-    text = re.sub("@.+?( |$)", " ", text)           # 去除 @xxx (用户名)
-    text = re.sub("【.+?】", " ", text)              # 去除 【xx】 (里面的内容通常都不是用户自己写的)
-    text = re.sub("\u200b", " ", text)              # '\u200b'是这个数据集中的一个bad case, 不用特别在意
+    text = clean_text(text)
     # 分词
     words = [w for w in jieba.lcut(text) if w.isalpha()]
-    # 对否定词`不`做特殊处理: 与其后面的词进行拼接
-    while "不" in words:
-        index = words.index("不")
-        if index == len(words) - 1:
-            break
-        words[index: index+2] = ["".join(words[index: index+2])]  # 列表切片赋值的酷炫写法
+    # 对否定词`不`做特殊处理
+    words = merge_negation(words)
     # 用空格拼接成字符串
     result = " ".join(words)
     return result
@@ -70,11 +97,37 @@ def processing_bert(text):
     数据预处理, 可以根据自己的需求进行重载
     """
     # 数据清洗部分
-    text = re.sub("\{%.+?%\}", " ", text)           # 去除 {%xxx%} (地理定位, 微博话题等)
-    text = re.sub("@.+?( |$)", " ", text)           # 去除 @xxx (用户名)
-    text = re.sub("【.+?】", " ", text)              # 去除 【xx】 (里面的内容通常都不是用户自己写的)
-    text = re.sub("\u200b", " ", text)              # '\u200b'是这个数据集中的一个bad case, 不用特别在意
-    return text
+    return clean_text(text)
+
+
+def create_processing_pool(n_jobs: Optional[int] = None) -> ProcessPoolExecutor:
+    """
+    创建文本预处理进程池, 每个子进程启动时加载一次jieba词典
+    
+    Args:
+        n_jobs: 进程数, 默认为CPU核数
+    """
+    return ProcessPoolExecutor(max_workers=n_jobs or os.cpu_count(), initializer=jieba.initialize)
+
+
+def processing_batch(texts: Iterable[str], executor: Optional[Executor] = None,
+                     chunksize: int = 256, min_parallel_size: int = 1000) -> List[str]:
+    """
+    批量预处理文本, 文本较多时按块分发到进程池并行分词
+    
+    Args:
+        texts: 原始文本
+        executor: 预处理进程池, 为None时在当前进程串行处理
+        chunksize: 每次分发给子进程的文本数, 块越大进程间通信开销越小
+        min_parallel_size: 文本数少于该值时直接串行处理, 避免进程通信开销超过收益
+        
+    Returns:
+        预处理后的文本列表, 顺序与输入一致
+    """
+    texts = list(texts)
+    if executor is None or len(texts) < min_parallel_size:
+        return [processing(text) for text in texts]
+    return list(executor.map(processing, texts, chunksize=chunksize))
 
 
 def save_model(model: Any, model_path: str) -> None:
@@ -124,10 +177,7 @@ def preprocess_text_simple(text: str) -> str:
         清洗后的文本
     """
     # 数据清洗
-    text = re.sub("\{%.+?%\}", " ", text)           # 去除 {%xxx%}
-    text = re.sub("@.+?( |$)", " ", text)           # 去除 @xxx
-    text = re.sub("【.+?】", " ", text)              # 去除 【xx】
-    text = re.sub("\u200b", " ", text)              # 去除特殊字符
+    text = clean_text(text)
     
     # 删除表情符号
     text = re.sub(r'[\U0001F600-\U0001F64F\U0001F300-\U0001F5FF\U0001F680-\U0001F6FF\U0001F1E0-\U0001F1FF\U00002600-\U000027BF\U0001f900-\U0001f9ff\U0001f018-\U0001f270\U0000231a-\U0000231b\U0000238d-\U0000238d\U000024c2-\U0001f251]+', '', text)
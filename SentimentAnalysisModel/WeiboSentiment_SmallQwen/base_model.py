@@ -4,6 +4,7 @@ Qwen3模型基础类，统一接口
 """
 import os
 import pickle
+import sys
 from abc import ABC, abstractmethod
 from typing import List, Tuple, Dict, Any
 import pandas as pd
@@ -76,6 +77,25 @@ class BaseQwenModel(ABC):
         """从文件加载模型"""
         pass
     
+    @staticmethod
+    def stream_data(csv_path: str = 'dataset/weibo_senti_100k.csv', test_ratio: float = 0.05):
+        """流式加载CSV数据，训练集不载入内存
+        
+        按文本哈希稳定划分，相同文本总落在同一侧；训练集每次迭代都从磁盘重新读取，
+        适合远大于10万条、无法整体放入内存的语料。
+        
+        Returns:
+            (可重复迭代的训练语料, 测试数据列表)
+        """
+        sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+        from streaming_dataset import StreamingCorpus
+        
+        train_data = StreamingCorpus(csv_path, split='train', test_ratio=test_ratio)
+        test_data = list(StreamingCorpus(csv_path, split='test', test_ratio=test_ratio))
+        print(f"流式训练数据: {csv_path}")
+        print(f"测试数据量: {len(test_data)}")
+        return train_data, test_data
+    
     @staticmethod
     def load_data(train_path: str = None, test_path: str = None, csv_path: str = 'dataset/weibo_senti_100k.csv') -> Tuple[List[Tuple[str, int]], List[Tuple[str, int]]]:
         """加载训练和测试数据
@@ -93,8 +113,8 @@ class BaseQwenModel(ABC):
             
             # 检查数据格式
             if 'review' in df.columns and 'label' in df.columns:
-                # 将DataFrame转换为元组列表
-                data = [(row['review'], row['label']) for _, row in df.iterrows()]
+                # 将DataFrame转换为元组列表（按列取值，避免逐行构造Series）
+                data = list(zip(df['review'].tolist(), df['label'].tolist()))
                 
                 # 分割训练和测试数据，固定测试集为5000条
                 total_samples = len(data)
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""
+文本嵌入缓存
+Embedding骨干网络冻结不训练，同一条文本的向量永远不变，因此按文本哈希缓存池化后的向量：
+向量保存在 float16 的内存映射文件中，索引为追加写入的 "哈希\t行号" 文本文件，进程重启后可继续复用。
+"""
+import hashlib
+import json
+import os
+from typing import Dict, List, Optional
+
+import numpy as np
+
+
+class EmbeddingCache:
+    """按文本哈希索引的内存映射向量缓存"""
+
+    VECTORS_FILE = "embeddings.f16"
+    INDEX_FILE = "index.tsv"
+    META_FILE = "meta.json"
+
+    def __init__(self, cache_dir: str, dim: int, meta: Optional[Dict] = None, initial_capacity: int = 4096):
+        """
+        Args:
+            cache_dir: 缓存目录
+            dim: 向量维度
+            meta: 生成向量的配置（模型名、max_length、池化方式等），与已有缓存不一致时清空重建
+            initial_capacity: 初始行数，写满后成倍扩容
+        """
+        self.cache_dir = cache_dir
+        self.dim = dim
+        self.meta = dict(meta or {}, dim=dim)
+        os.makedirs(cache_dir, exist_ok=True)
+        self._vectors_path = os.path.join(cache_dir, self.VECTORS_FILE)
+        self._index_path = os.path.join(cache_dir, self.INDEX_FILE)
+        self._meta_path = os.path.join(cache_dir, self.META_FILE)
+
+        if not self._meta_matches():
+            self._reset()
+        self.index: Dict[str, int] = self._load_index()
+        capacity = max(initial_capacity, len(self.index))
+        if os.path.exists(self._vectors_path):
+            capacity = max(capacity, os.path.getsize(self._vectors_path) // (2 * dim))
+        self._open(capacity)
+        self._index_file = open(self._index_path, "a", encoding="utf-8")
+
+    @staticmethod
+    def text_key(text: str) -> str:
+        return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+    def _meta_matches(self) -> bool:
+        if not os.path.exists(self._meta_path):
+            return False
+        with open(self._meta_path, "r", encoding="utf-8") as f:
+            return json.load(f) == self.meta
+
+    def _reset(self):
+        for path in (self._vectors_path, self._index_path):
+            if os.path.exists(path):
+                os.remove(path)
+        with open(self._meta_path, "w", encoding="utf-8") as f:
+            json.dump(self.meta, f, ensure_ascii=False)
+
+    def _load_index(self) -> Dict[str, int]:
+        index = {}
+        if os.path.exists(self._index_path):
+            with open(self._index_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    parts = line.rstrip("\n").split("\t")
+                    # 进程中途退出时最后一行可能不完整
+                    if len(parts) == 2 and parts[1].isdigit():
+                        index[parts[0]] = int(parts[1])
+        return index
+
+    def _open(self, capacity: int):
+        size = capacity * self.dim * 2
+        with open(self._vectors_path, "ab") as f:
+            if f.tell() < size:
+                f.truncate(size)
+        self.capacity = capacity
+        self.vectors = np.memmap(self._vectors_path, dtype=np.float16, mode="r+", shape=(capacity, self.dim))
+
+    def _ensure_capacity(self, rows: int):
+        if rows <= self.capacity:
+            return
+        capacity = self.capacity
+        while capacity < rows:
+            capacity *= 2
+        self.vectors.flush()
+        del self.vectors
+        self._open(capacity)
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __contains__(self, text: str) -> bool:
+        return self.text_key(text) in self.index
+
+    def lookup(self, texts: List[str]) -> List[Optional[int]]:
+        """返回每条文本在缓存中的行号，未缓存的为 None"""
+        return [self.index.get(self.text_key(text)) for text in texts]
+
+    def get(self, rows: List[int], dtype=np.float32) -> np.ndarray:
+        """按行号取出向量"""
+        return np.asarray(self.vectors[rows], dtype=dtype)
+
+    def add(self, texts: List[str], embeddings: np.ndarray) -> List[int]:
+        """写入一批文本的向量，返回对应行号"""
+        rows = []
+        self._ensure_capacity(len(self.index) + len(texts))
+        for offset, text in enumerate(texts):
+            key = self.text_key(text)
+            if key in self.index:
+                rows.append(self.index[key])
+                continue
+            row = len(self.index)
+            self.vectors[row] = embeddings[offset]
+            self.index[key] = row
+            self._index_file.write(f"{key}\t{row}\n")
+            rows.append(row)
+        return rows
+
+    def flush(self):
+        self.vectors.flush()
+        self._index_file.flush()
+
+    def close(self):
+        self.flush()
+        self._index_file.close()
@@ -50,4 +50,10 @@ MODEL_PATHS = {
         "4B": "./models/qwen3_lora_4b_final",
         "8B": "./models/qwen3_lora_8b_final"
     }
-}
\ No newline at end of file
+}
+
+# Qwen3-Embedding文本向量缓存目录（按模型和截断长度分子目录）
+EMBEDDING_CACHE_DIR = "./cache/embeddings"
+
+# 训练文本分词结果的磁盘分片缓存目录（按分词器、max_length和数据指纹分子目录）
+TOKENIZED_CACHE_DIR = "./cache/tokenized"
@@ -5,49 +5,34 @@ Qwen3-Embedding通用训练脚本
 """
 import argparse
 import os
+import numpy as np
 import torch
 import torch.nn as nn
-from torch.utils.data import Dataset, DataLoader
+from torch.utils.data import TensorDataset, DataLoader
 from transformers import AutoTokenizer, AutoModel
-from typing import List, Tuple
+from typing import List, Optional, Tuple
 import warnings
 from tqdm import tqdm
 
 from base_model import BaseQwenModel
-from models_config import QWEN3_MODELS, MODEL_PATHS
+from embedding_cache import EmbeddingCache
+from models_config import QWEN3_MODELS, MODEL_PATHS, EMBEDDING_CACHE_DIR
 
 warnings.filterwarnings("ignore")
 
+# 句向量的池化方式，写入向量缓存的目录名和元数据，池化方式改变后旧缓存不会被误用
+POOLING = "last_token"
 
-class SentimentDataset(Dataset):
-    """情感分析数据集"""
-    
-    def __init__(self, data: List[Tuple[str, int]], tokenizer, max_length=512):
-        self.texts = [item[0] for item in data]
-        self.labels = [item[1] for item in data]
-        self.tokenizer = tokenizer
-        self.max_length = max_length
-    
-    def __len__(self):
-        return len(self.texts)
-    
-    def __getitem__(self, idx):
-        text = str(self.texts[idx])
-        label = self.labels[idx]
-        
-        encoding = self.tokenizer(
-            text,
-            max_length=self.max_length,
-            padding='max_length',
-            truncation=True,
-            return_tensors='pt'
-        )
-        
-        return {
-            'input_ids': encoding['input_ids'].flatten(),
-            'attention_mask': encoding['attention_mask'].flatten(),
-            'label': torch.tensor(label, dtype=torch.float)
-        }
+
+def pool_embeddings(last_hidden_state: torch.Tensor, attention_mask: torch.Tensor) -> torch.Tensor:
+    """
+    取每条文本最后一个非填充token的隐状态作为句向量（Qwen3-Embedding训练时使用的池化方式）
+    分词器使用左侧填充时直接取最后一个位置，右侧填充时按每条文本的实际长度取
+    """
+    if bool(attention_mask[:, -1].all()):
+        return last_hidden_state[:, -1]
+    last_token = attention_mask.long().sum(dim=1) - 1
+    return last_hidden_state[torch.arange(last_hidden_state.size(0), device=last_hidden_state.device), last_token]
 
 
 class SentimentClassifier(nn.Module):
@@ -55,11 +40,10 @@ class SentimentClassifier(nn.Module):
     
     def __init__(self, embedding_model, embedding_dim, hidden_dim=256):
         super(SentimentClassifier, self).__init__()
+        # embedding模型可以为None：只在缓存的文本向量上训练/预测时不需要加载骨干网络
         self.embedding_model = embedding_model
         
-        # 冻结embedding模型参数
-        for param in self.embedding_model.parameters():
-            param.requires_grad = False
+        self.set_embedding_model(embedding_model)
             
         # 分类头
         self.classifier = nn.Sequential(
@@ -69,22 +53,43 @@ class SentimentClassifier(nn.Module):
             nn.Linear(hidden_dim, 1),
             nn.Sigmoid()
         )
+
+    def set_embedding_model(self, embedding_model):
+        """设置并冻结embedding模型参数"""
+        self.embedding_model = embedding_model
+        if self.embedding_model is not None:
+            for param in self.embedding_model.parameters():
+                param.requires_grad = False
+
+    def classify_embeddings(self, embeddings):
+        """直接在池化后的文本向量上计算正面概率"""
+        return self.classifier(embeddings).squeeze(-1)
     
     def forward(self, input_ids, attention_mask):
+        if self.embedding_model is None:
+            raise RuntimeError("分类器没有embedding模型，只能通过 classify_embeddings 在文本向量上预测；"
+                               "请使用 Qwen3EmbeddingUniversal.predict_proba，它会按需加载骨干网络")
         # 获取embedding
         with torch.no_grad():
             outputs = self.embedding_model(input_ids=input_ids, attention_mask=attention_mask)
-            embeddings = outputs.last_hidden_state[:, 0, :]
+            embeddings = pool_embeddings(outputs.last_hidden_state, attention_mask)
         
         # 通过分类头
-        logits = self.classifier(embeddings)
-        return logits.squeeze()
+        return self.classify_embeddings(embeddings)
 
 
 class Qwen3EmbeddingUniversal(BaseQwenModel):
     """通用Qwen3-Embedding模型"""
     
-    def __init__(self, model_size: str = "0.6B"):
+    def __init__(self, model_size: str = "0.6B", max_length: int = 512, use_cache: bool = True,
+                 cache_dir: Optional[str] = None):
+        """
+        Args:
+            model_size: 模型大小
+            max_length: 文本截断长度
+            use_cache: 是否缓存文本向量（骨干网络冻结，同一文本的向量不会变化）
+            cache_dir: 向量缓存根目录，默认 EMBEDDING_CACHE_DIR
+        """
         if model_size not in QWEN3_MODELS:
             raise ValueError(f"不支持的模型大小: {model_size}")
             
@@ -93,12 +98,16 @@ class Qwen3EmbeddingUniversal(BaseQwenModel):
         self.config = QWEN3_MODELS[model_size]
         self.model_name_hf = self.config["embedding_model"]
         self.embedding_dim = self.config["embedding_dim"]
+        self.max_length = max_length
+        self.use_cache = use_cache
+        self.cache_dir = cache_dir or EMBEDDING_CACHE_DIR
+        self.cache: Optional[EmbeddingCache] = None
         
         self.tokenizer = None
         self.embedding_model = None
         self.classifier_model = None
         self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
-        
+
     def _load_embedding_model(self):
         """加载Qwen3 Embedding模型"""
         print(f"加载{self.model_size}模型: {self.model_name_hf}")
@@ -108,7 +117,7 @@ class Qwen3EmbeddingUniversal(BaseQwenModel):
         if os.path.exists(local_model_dir) and os.path.exists(os.path.join(local_model_dir, "config.json")):
             try:
                 print(f"发现本地模型，从本地加载: {local_model_dir}")
-                self.tokenizer = AutoTokenizer.from_pretrained(local_model_dir)
+                self.tokenizer = AutoTokenizer.from_pretrained(local_model_dir, padding_side="left")
                 self.embedding_model = AutoModel.from_pretrained(local_model_dir).to(self.device)
                 print(f"从本地模型加载{self.model_size}模型成功")
                 return
@@ -122,7 +131,7 @@ class Qwen3EmbeddingUniversal(BaseQwenModel):
             cache_path = default_cache_path
             print(f"检查HuggingFace缓存: {cache_path}")
             
-            self.tokenizer = AutoTokenizer.from_pretrained(self.model_name_hf)
+            self.tokenizer = AutoTokenizer.from_pretrained(self.model_name_hf, padding_side="left")
             self.embedding_model = AutoModel.from_pretrained(self.model_name_hf).to(self.device)
             print(f"从HuggingFace缓存加载{self.model_size}模型成功")
             
@@ -142,6 +151,7 @@ class Qwen3EmbeddingUniversal(BaseQwenModel):
                 
                 self.tokenizer = AutoTokenizer.from_pretrained(
                     self.model_name_hf,
+                    padding_side="left",
                     force_download=True
                 )
                 self.embedding_model = AutoModel.from_pretrained(
@@ -159,25 +169,105 @@ class Qwen3EmbeddingUniversal(BaseQwenModel):
                 print(f"从HuggingFace下载也失败: {e2}")
                 raise RuntimeError(f"无法加载{self.model_size}模型，所有方法都失败了")
     
+    def _ensure_embedding_model(self):
+        """按需加载骨干网络（load_model 只恢复分类头），并交给已经创建的分类器"""
+        if self.embedding_model is None:
+            self._load_embedding_model()
+        if self.classifier_model is not None and self.classifier_model.embedding_model is None:
+            self.classifier_model.set_embedding_model(self.embedding_model)
+
+    def _get_cache(self) -> Optional[EmbeddingCache]:
+        """向量缓存按模型、截断长度和池化方式分目录存放"""
+        if not self.use_cache:
+            return None
+        cache_dir = os.path.join(self.cache_dir,
+                                 f"qwen3-embedding-{self.model_size.lower()}-len{self.max_length}-{POOLING}")
+        if self.cache is None or self.cache.cache_dir != cache_dir:
+            if self.cache is not None:
+                self.cache.close()
+            self.cache = EmbeddingCache(
+                cache_dir,
+                self.embedding_dim,
+                meta={"model": self.model_name_hf, "max_length": self.max_length, "pooling": POOLING},
+            )
+        return self.cache
+
+    def _embed(self, texts: List[str], batch_size: int) -> np.ndarray:
+        """运行骨干网络计算文本向量，按长度排序分批，批内动态填充"""
+        if not texts:
+            return np.zeros((0, self.embedding_dim), dtype=np.float32)
+        self._ensure_embedding_model()
+        self.embedding_model.eval()
+
+        vectors = np.zeros((len(texts), self.embedding_dim), dtype=np.float32)
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        with torch.inference_mode():
+            for start in tqdm(range(0, len(order), batch_size), desc="计算文本嵌入", disable=len(order) <= batch_size):
+                index = order[start:start + batch_size]
+                encodings = self.tokenizer(
+                    [texts[i] for i in index],
+                    max_length=self.max_length,
+                    padding=True,
+                    truncation=True,
+                    return_tensors='pt'
+                )
+                input_ids = encodings['input_ids'].to(self.device)
+                attention_mask = encodings['attention_mask'].to(self.device)
+                outputs = self.embedding_model(input_ids=input_ids, attention_mask=attention_mask)
+                vectors[index] = pool_embeddings(outputs.last_hidden_state, attention_mask).float().cpu().numpy()
+        return vectors
+
+    def encode(self, texts: List[str], batch_size: int = None, dtype=np.float32) -> np.ndarray:
+        """获取文本向量：每条不同的文本只经过一次骨干网络，已缓存的直接从内存映射文件读取
+        
+        Args:
+            texts: 文本列表
+            batch_size: 骨干网络前向的批大小，默认使用配置中的推荐值
+            dtype: 返回数组的类型，训练时可用float16减少内存占用
+            
+        Returns:
+            (len(texts), embedding_dim) 的向量矩阵
+        """
+        batch_size = batch_size or self.config['recommended_batch_size']
+        texts = [str(text) for text in texts]
+        unique_texts = list(dict.fromkeys(texts))
+        cache = self._get_cache()
+        if cache is None:
+            vectors = self._embed(unique_texts, batch_size)
+        else:
+            rows = cache.lookup(unique_texts)
+            missing = [text for text, row in zip(unique_texts, rows) if row is None]
+            if missing:
+                print(f"缓存命中 {len(unique_texts) - len(missing)}/{len(unique_texts)} 条，计算剩余 {len(missing)} 条文本的嵌入")
+                # 分段写入缓存，长时间的特征提取中途中断后已计算的部分不会丢失
+                chunk_size = batch_size * 64
+                for start in range(0, len(missing), chunk_size):
+                    chunk = missing[start:start + chunk_size]
+                    cache.add(chunk, self._embed(chunk, batch_size))
+                    cache.flush()
+                rows = cache.lookup(unique_texts)
+            vectors = cache.get(rows, dtype=dtype)
+        position = {text: i for i, text in enumerate(unique_texts)}
+        return vectors[[position[text] for text in texts]].astype(dtype, copy=False)
+        
     def train(self, train_data: List[Tuple[str, int]], **kwargs) -> None:
         """训练模型"""
         print(f"开始训练 Qwen3-Embedding-{self.model_size} 模型...")
         
-        # 加载embedding模型
-        self._load_embedding_model()
-        
         # 超参数（使用配置文件的推荐值或用户指定值）
         batch_size = kwargs.get('batch_size', self.config['recommended_batch_size'])
         learning_rate = kwargs.get('learning_rate', self.config['recommended_lr'])
         num_epochs = kwargs.get('num_epochs', 5)
-        max_length = kwargs.get('max_length', 512)
+        self.max_length = kwargs.get('max_length', self.max_length)
         
-        print(f"超参数: batch_size={batch_size}, lr={learning_rate}, epochs={num_epochs}")
+        print(f"超参数: batch_size={batch_size}, lr={learning_rate}, epochs={num_epochs}, max_length={self.max_length}")
         print(f"嵌入维度: {self.embedding_dim}")
         
-        # 创建数据集
-        train_dataset = SentimentDataset(train_data, self.tokenizer, max_length)
-        train_loader = DataLoader(train_dataset, batch_size=batch_size, shuffle=True)
+        # 骨干网络冻结，先为每条不同的文本提取一次向量（已缓存的直接复用），之后每个epoch只训练分类头
+        texts = [str(item[0]) for item in train_data]
+        labels = torch.tensor([item[1] for item in train_data], dtype=torch.float)
+        features = torch.from_numpy(self.encode(texts, batch_size, dtype=np.float16))
+        train_loader = DataLoader(TensorDataset(features, labels), batch_size=batch_size, shuffle=True)
         
         # 创建分类器
         self.classifier_model = SentimentClassifier(
@@ -196,14 +286,13 @@ class Qwen3EmbeddingUniversal(BaseQwenModel):
             num_batches = 0
             
             progress_bar = tqdm(train_loader, desc=f"Epoch {epoch+1}/{num_epochs}")
-            for batch in progress_bar:
-                input_ids = batch['input_ids'].to(self.device)
-                attention_mask = batch['attention_mask'].to(self.device)
-                labels = batch['label'].to(self.device)
+            for batch_features, batch_labels in progress_bar:
+                batch_features = batch_features.to(self.device).float()
+                batch_labels = batch_labels.to(self.device)
                 
                 # 前向传播
-                outputs = self.classifier_model(input_ids, attention_mask)
-                loss = criterion(outputs, labels)
+                outputs = self.classifier_model.classify_embeddings(batch_features)
+                loss = criterion(outputs, batch_labels)
                 
                 # 反向传播
                 optimizer.zero_grad()
@@ -222,59 +311,26 @@ class Qwen3EmbeddingUniversal(BaseQwenModel):
         self.is_trained = True
         print(f"Qwen3-Embedding-{self.model_size} 模型训练完成！")
     
-    def predict(self, texts: List[str]) -> List[int]:
-        """预测文本情感"""
+    def predict_proba(self, texts: List[str], batch_size: int = None) -> List[float]:
+        """预测文本为正面情感的概率，已缓存向量的文本不再经过骨干网络"""
         if not self.is_trained:
             raise ValueError(f"模型 {self.model_name} 尚未训练")
         
-        predictions = []
-        batch_size = 32
-        
+        features = torch.from_numpy(self.encode(texts, batch_size)).to(self.device)
         self.classifier_model.eval()
         with torch.no_grad():
-            for i in range(0, len(texts), batch_size):
-                batch_texts = texts[i:i+batch_size]
-                
-                encodings = self.tokenizer(
-                    batch_texts,
-                    max_length=512,
-                    padding=True,
-                    truncation=True,
-                    return_tensors='pt'
-                )
-                
-                input_ids = encodings['input_ids'].to(self.device)
-                attention_mask = encodings['attention_mask'].to(self.device)
-                
-                outputs = self.classifier_model(input_ids, attention_mask)
-                preds = (outputs > 0.5).cpu().numpy()
-                predictions.extend(preds.astype(int).tolist())
-        
-        return predictions
+            probs = self.classifier_model.classify_embeddings(features)
+        return probs.cpu().tolist()
+    
+    def predict(self, texts: List[str]) -> List[int]:
+        """预测文本情感"""
+        return [int(prob > 0.5) for prob in self.predict_proba(texts)]
     
     def predict_single(self, text: str) -> Tuple[int, float]:
         """预测单条文本的情感"""
-        if not self.is_trained:
-            raise ValueError(f"模型 {self.model_name} 尚未训练")
-        
-        self.classifier_model.eval()
-        with torch.no_grad():
-            encoding = self.tokenizer(
-                text,
-                max_length=512,
-                padding=True,
-                truncation=True,
-                return_tensors='pt'
-            )
-            
-            input_ids = encoding['input_ids'].to(self.device)
-            attention_mask = encoding['attention_mask'].to(self.device)
-            
-            output = self.classifier_model(input_ids, attention_mask)
-            prob = output.item()
-            prediction = int(prob > 0.5)
-            confidence = prob if prediction == 1 else 1 - prob
-        
+        prob = self.predict_proba([text])[0]
+        prediction = int(prob > 0.5)
+        confidence = prob if prediction == 1 else 1 - prob
         return prediction, confidence
     
     def save_model(self, model_path: str = None) -> None:
@@ -292,6 +348,8 @@ class Qwen3EmbeddingUniversal(BaseQwenModel):
             'model_size': self.model_size,
             'model_name_hf': self.model_name_hf,
             'embedding_dim': self.embedding_dim,
+            'max_length': self.max_length,
+            'pooling': POOLING,
             'device': str(self.device)
         }
         
@@ -310,10 +368,13 @@ class Qwen3EmbeddingUniversal(BaseQwenModel):
         if model_data['model_size'] != self.model_size:
             raise ValueError(f"模型大小不匹配: 期望{self.model_size}, 实际{model_data['model_size']}")
         
-        # 加载embedding模型
-        self._load_embedding_model()
+        # 与训练时使用相同的截断长度，保证向量（及其缓存）一致
+        self.max_length = model_data.get('max_length', self.max_length)
+        pooling = model_data.get('pooling', 'first_token')
+        if pooling != POOLING:
+            print(f"警告: 分类头训练时使用的池化方式为{pooling}，当前为{POOLING}，预测结果可能不准确，建议重新训练")
         
-        # 重建分类器
+        # 重建分类器（embedding模型在遇到未缓存的文本时才加载）
         self.classifier_model = SentimentClassifier(
             self.embedding_model, 
             model_data['embedding_dim']
@@ -339,6 +400,9 @@ def main():
     parser.add_argument('--batch_size', type=int, help='批大小（可选，使用推荐值）')
     parser.add_argument('--learning_rate', type=float, help='学习率（可选，使用推荐值）')
     parser.add_argument('--eval_only', action='store_true', help='仅评估模式')
+    parser.add_argument('--max_length', type=int, default=512, help='文本截断长度')
+    parser.add_argument('--no_cache', action='store_true', help='不使用文本向量缓存')
+    parser.add_argument('--cache_dir', type=str, default=None, help='文本向量缓存目录（可选）')
     
     args = parser.parse_args()
     
@@ -372,7 +436,12 @@ def main():
     os.makedirs('./models', exist_ok=True)
     
     # 创建模型
-    model = Qwen3EmbeddingUniversal(args.model_size)
+    model = Qwen3EmbeddingUniversal(
+        args.model_size,
+        max_length=args.max_length,
+        use_cache=not args.no_cache,
+        cache_dir=args.cache_dir
+    )
     
     # 确定模型保存路径
     model_path = args.model_path or MODEL_PATHS["embedding"][args.model_size]
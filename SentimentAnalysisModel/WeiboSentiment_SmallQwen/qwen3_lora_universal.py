@@ -5,6 +5,7 @@ Qwen3-LoRA通用训练脚本
 """
 import argparse
 import os
+import sys
 import torch
 from transformers import (
     AutoTokenizer, 
@@ -13,17 +14,35 @@ from transformers import (
     Trainer,
     DataCollatorForLanguageModeling
 )
+from transformers.trainer_pt_utils import LengthGroupedSampler
 from peft import LoraConfig, get_peft_model, TaskType, PeftModel
-from datasets import Dataset
-from typing import List, Tuple
+from typing import Iterable, List, Tuple
 import warnings
 from tqdm import tqdm
 
 from base_model import BaseQwenModel
-from models_config import QWEN3_MODELS, MODEL_PATHS
+from models_config import QWEN3_MODELS, MODEL_PATHS, TOKENIZED_CACHE_DIR
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from streaming_dataset import TokenizedShards, records_fingerprint
 
 warnings.filterwarnings("ignore")
 
+# 指令模板，训练和预测共用
+INSTRUCTION_TEMPLATE = "请分析以下微博文本的情感倾向，回答'正面'或'负面'。\n\n文本：{text}\n\n情感："
+
+
+class ShardLengthTrainer(Trainer):
+    """group_by_length 时直接使用分片中保存的样本长度，避免采样器逐条读取样本计算长度"""
+
+    def _get_train_sampler(self, *args, **kwargs):
+        if self.args.group_by_length and isinstance(self.train_dataset, TokenizedShards):
+            return LengthGroupedSampler(
+                self.args.train_batch_size * self.args.gradient_accumulation_steps,
+                lengths=self.train_dataset.lengths().tolist(),
+            )
+        return super()._get_train_sampler(*args, **kwargs)
+
 
 class Qwen3LoRAUniversal(BaseQwenModel):
     """通用Qwen3-LoRA模型"""
@@ -41,6 +60,8 @@ class Qwen3LoRAUniversal(BaseQwenModel):
         self.base_model = None
         self.lora_model = None
         self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+        # 标签打分用的token: (两个标签共同的前缀token, 正面token, 负面token)
+        self._label_tokens = None
         
     def _load_base_model(self):
         """加载Qwen3基础模型"""
@@ -128,41 +149,21 @@ class Qwen3LoRAUniversal(BaseQwenModel):
                 print(f"从HuggingFace下载也失败: {e2}")
                 raise RuntimeError(f"无法加载{self.model_size}模型，所有方法都失败了")
     
-    def _create_instruction_data(self, data: List[Tuple[str, int]]) -> Dataset:
-        """创建指令格式的训练数据"""
-        instructions = []
-        
-        for text, label in data:
-            sentiment = "正面" if label == 1 else "负面"
-            
-            # 构建指令格式
-            instruction = f"请分析以下微博文本的情感倾向，回答'正面'或'负面'。\n\n文本：{text}\n\n情感："
-            response = sentiment
-            
-            
-            # 组合成完整的训练文本
-            full_text = f"{instruction}{response}{self.tokenizer.eos_token}"
-            
-            instructions.append({
-                "instruction": instruction,
-                "response": response,
-                "text": full_text
-            })
-        
-        return Dataset.from_list(instructions)
+    def _instruction_text(self, text: str, label: int) -> str:
+        """构建指令格式的完整训练文本"""
+        sentiment = "正面" if label == 1 else "负面"
+        return f"{INSTRUCTION_TEMPLATE.format(text=text)}{sentiment}{self.tokenizer.eos_token}"
     
-    def _tokenize_function(self, examples):
-        """分词函数"""
-        tokenized = self.tokenizer(
-            examples["text"],
-            truncation=True,
-            padding="max_length",
-            max_length=512,
-            return_tensors=None
+    def _tokenized_dataset(self, train_data: Iterable[Tuple[str, int]], max_length: int = 512) -> TokenizedShards:
+        """分词结果按分片缓存到磁盘，相同数据、分词器和max_length的重复训练直接复用"""
+        fingerprint = getattr(train_data, "fingerprint", None) or records_fingerprint(train_data)
+        shards = TokenizedShards(
+            self.tokenizer,
+            max_length,
+            {"data": fingerprint, "template": INSTRUCTION_TEMPLATE},
+            cache_root=TOKENIZED_CACHE_DIR,
         )
-        
-        tokenized["labels"] = tokenized["input_ids"].copy()
-        return tokenized
+        return shards.build(train_data, text_fn=self._instruction_text)
     
     def _setup_lora(self, **kwargs):
         """设置LoRA配置"""
@@ -191,8 +192,11 @@ class Qwen3LoRAUniversal(BaseQwenModel):
         
         return lora_config
     
-    def train(self, train_data: List[Tuple[str, int]], **kwargs) -> None:
-        """训练模型"""
+    def train(self, train_data: Iterable[Tuple[str, int]], **kwargs) -> None:
+        """训练模型
+        
+        train_data 可以是列表，也可以是 StreamingCorpus 等可重复迭代的流式语料
+        """
         print(f"开始训练 Qwen3-{self.model_size}-LoRA 模型...")
         
         # 加载基础模型
@@ -206,18 +210,13 @@ class Qwen3LoRAUniversal(BaseQwenModel):
         batch_size = kwargs.get('batch_size', self.config['recommended_batch_size'] // 2)  # LoRA需要更少批大小
         learning_rate = kwargs.get('learning_rate', self.config['recommended_lr'] / 2)  # LoRA使用更小学习率
         output_dir = kwargs.get('output_dir', f'./models/qwen3_lora_{self.model_size.lower()}_checkpoints')
+        max_length = kwargs.get('max_length', 512)
         
-        print(f"超参数: epochs={num_epochs}, batch_size={batch_size}, lr={learning_rate}")
-        
-        # 创建指令格式数据
-        train_dataset = self._create_instruction_data(train_data)
+        print(f"超参数: epochs={num_epochs}, batch_size={batch_size}, lr={learning_rate}, max_length={max_length}")
         
-        # 分词
-        tokenized_dataset = train_dataset.map(
-            self._tokenize_function,
-            batched=True,
-            remove_columns=train_dataset.column_names
-        )
+        # 指令格式数据分词（磁盘分片缓存）
+        tokenized_dataset = self._tokenized_dataset(train_data, max_length)
+        print(f"训练样本数: {len(tokenized_dataset)}")
         
         # 训练参数
         training_args = TrainingArguments(
@@ -231,17 +230,18 @@ class Qwen3LoRAUniversal(BaseQwenModel):
             save_total_limit=2,
             remove_unused_columns=False,
             dataloader_drop_last=False,
+            group_by_length=True,  # 长度相近的样本组成批次，配合动态填充减少pad
             report_to=None,
         )
         
-        # 数据整理器
+        # 数据整理器（按批内最长样本动态填充）
         data_collator = DataCollatorForLanguageModeling(
             tokenizer=self.tokenizer,
             mlm=False,
         )
         
         # 创建训练器
-        trainer = Trainer(
+        trainer = ShardLengthTrainer(
             model=self.lora_model,
             args=training_args,
             train_dataset=tokenized_dataset,
@@ -261,63 +261,92 @@ class Qwen3LoRAUniversal(BaseQwenModel):
         self.is_trained = True
         print(f"Qwen3-{self.model_size}-LoRA 模型训练完成！")
     
-    def _extract_sentiment(self, generated_text: str, instruction: str) -> int:
-        """从生成的文本中提取情感标签"""
-        response = generated_text[len(instruction):].strip()
-        
-        if "正面" in response:
-            return 1
-        elif "负面" in response:
-            return 0
-        else:
-            return 0
+    def _get_label_tokens(self) -> Tuple[List[int], int, int]:
+        """获取标签打分用的token
+        
+        "正面"/"负面"通常各是一个token；如果分词后有共同前缀，则把前缀拼到指令后面，
+        在第一个不同的位置上比较两个标签token的logits
+        """
+        if self._label_tokens is None:
+            pos_ids = self.tokenizer.encode("正面", add_special_tokens=False)
+            neg_ids = self.tokenizer.encode("负面", add_special_tokens=False)
+            prefix_len = 0
+            while (prefix_len < min(len(pos_ids), len(neg_ids))
+                   and pos_ids[prefix_len] == neg_ids[prefix_len]):
+                prefix_len += 1
+            if prefix_len == len(pos_ids) or prefix_len == len(neg_ids):
+                raise ValueError("无法区分'正面'和'负面'的标签token")
+            self._label_tokens = (pos_ids[:prefix_len], pos_ids[prefix_len], neg_ids[prefix_len])
+        return self._label_tokens
     
-    def predict(self, texts: List[str]) -> List[int]:
-        """预测文本情感"""
-        if not self.is_trained:
-            raise ValueError(f"模型 {self.model_name} 尚未训练")
-        
-        predictions = []
+    def predict_proba(self, texts: List[str], batch_size: int = None) -> List[float]:
+        """预测文本为正面情感的概率
         
-        self.lora_model.eval()
-        with torch.no_grad():
-            for text in tqdm(texts, desc=f"Qwen3-{self.model_size}预测中"):
-                pred, _ = self.predict_single(text)
-                predictions.append(pred)
+        将指令左填充后成批做一次前向计算，取下一个token上"正面"与"负面"两个标签的logits做softmax，
+        不需要自回归解码，结果是确定的
         
-        return predictions
-    
-    def predict_single(self, text: str) -> Tuple[int, float]:
-        """预测单条文本的情感"""
+        Args:
+            texts: 待预测文本列表
+            batch_size: 批大小，默认使用配置中的推荐值
+            
+        Returns:
+            正面情感概率列表
+        """
         if not self.is_trained:
             raise ValueError(f"模型 {self.model_name} 尚未训练")
         
-        # 构建指令
-        instruction = f"请分析以下微博文本的情感倾向，回答'正面'或'负面'。\n\n文本：{text}\n\n情感："
+        batch_size = batch_size or self.config['recommended_batch_size']
+        prefix_ids, pos_id, neg_id = self._get_label_tokens()
         
-        # 分词
-        inputs = self.tokenizer(instruction, return_tensors="pt")
-        if torch.cuda.is_available():
-            inputs = {k: v.to(self.device) for k, v in inputs.items()}
+        # 左填充保证每条指令的最后一个token都在同一列
+        padding_side = self.tokenizer.padding_side
+        self.tokenizer.padding_side = "left"
         
-        # 生成回答
+        probabilities = []
         self.lora_model.eval()
-        with torch.no_grad():
-            outputs = self.lora_model.generate(
-                **inputs,
-                max_new_tokens=10,
-                do_sample=True,
-                temperature=0.1,
-                pad_token_id=self.tokenizer.pad_token_id,
-                eos_token_id=self.tokenizer.eos_token_id,
-            )
-        
-        # 解码生成的文本
-        generated_text = self.tokenizer.decode(outputs[0], skip_special_tokens=True)
-        
-        # 提取情感标签
-        prediction = self._extract_sentiment(generated_text, instruction)
-        confidence = 0.8  # 生成式模型的置信度计算较复杂，这里给个固定值
+        try:
+            with torch.no_grad():
+                for i in tqdm(range(0, len(texts), batch_size), desc=f"Qwen3-{self.model_size}预测中",
+                              disable=len(texts) <= batch_size):
+                    instructions = [INSTRUCTION_TEMPLATE.format(text=text) for text in texts[i:i + batch_size]]
+                    inputs = self.tokenizer(instructions, padding=True, return_tensors="pt")
+                    input_ids = inputs["input_ids"]
+                    attention_mask = inputs["attention_mask"]
+                    if prefix_ids:
+                        prefix = torch.tensor([prefix_ids] * input_ids.size(0), dtype=input_ids.dtype)
+                        input_ids = torch.cat([input_ids, prefix], dim=1)
+                        attention_mask = torch.cat([attention_mask, torch.ones_like(prefix)], dim=1)
+                    
+                    input_ids = input_ids.to(self.device)
+                    attention_mask = attention_mask.to(self.device)
+                    # 左填充时位置编码从每条文本的第一个有效token开始计数
+                    position_ids = (attention_mask.long().cumsum(-1) - 1).clamp(min=0)
+                    
+                    try:
+                        # 只计算最后一个位置的logits，避免生成 (batch, seq, vocab) 的大张量
+                        outputs = self.lora_model(input_ids=input_ids, attention_mask=attention_mask,
+                                                  position_ids=position_ids, logits_to_keep=1)
+                    except TypeError:
+                        outputs = self.lora_model(input_ids=input_ids, attention_mask=attention_mask,
+                                                  position_ids=position_ids)
+                    
+                    label_logits = outputs.logits[:, -1, [pos_id, neg_id]].float()
+                    probs = torch.softmax(label_logits, dim=-1)[:, 0]
+                    probabilities.extend(probs.cpu().tolist())
+        finally:
+            self.tokenizer.padding_side = padding_side
+        
+        return probabilities
+    
+    def predict(self, texts: List[str]) -> List[int]:
+        """预测文本情感"""
+        return [int(prob > 0.5) for prob in self.predict_proba(texts)]
+    
+    def predict_single(self, text: str) -> Tuple[int, float]:
+        """预测单条文本的情感"""
+        prob = self.predict_proba([text])[0]
+        prediction = int(prob > 0.5)
+        confidence = prob if prediction == 1 else 1 - prob
         
         return prediction, confidence
     
@@ -369,6 +398,10 @@ def main():
     parser.add_argument('--lora_r', type=int, help='LoRA秩（可选，使用推荐值）')
     parser.add_argument('--max_samples', type=int, default=0, help='最大训练样本数（0表示使用全部数据）')
     parser.add_argument('--eval_only', action='store_true', help='仅评估模式')
+    parser.add_argument('--max_length', type=int, default=512, help='训练文本最大token数')
+    parser.add_argument('--stream', action='store_true',
+                        help='流式读取CSV训练，不把训练集载入内存（适合远大于10万条的语料）')
+    parser.add_argument('--csv_path', type=str, default='dataset/weibo_senti_100k.csv', help='CSV数据路径')
     
     args = parser.parse_args()
     
@@ -413,16 +446,27 @@ def main():
         print(f"评估模式：加载Qwen3-{args.model_size}-LoRA模型")
         model.load_model(model_path)
         
-        _, test_data = BaseQwenModel.load_data(args.train_path, args.test_path)
+        if args.stream:
+            _, test_data = BaseQwenModel.stream_data(args.csv_path)
+        else:
+            _, test_data = BaseQwenModel.load_data(args.train_path, args.test_path, args.csv_path)
         # LoRA评估使用少量数据
         test_subset = test_data[:50]
         model.evaluate(test_subset)
     else:
         # 训练模式
-        train_data, test_data = BaseQwenModel.load_data(args.train_path, args.test_path)
+        if args.stream:
+            train_data, test_data = BaseQwenModel.stream_data(args.csv_path)
+        else:
+            train_data, test_data = BaseQwenModel.load_data(args.train_path, args.test_path, args.csv_path)
         
         # 训练数据处理
-        if args.max_samples > 0:
+        if args.stream:
+            train_subset = train_data
+            if args.max_samples > 0:
+                print("流式训练忽略 --max_samples")
+            print(f"流式读取 {args.csv_path} 进行LoRA训练")
+        elif args.max_samples > 0:
             train_subset = train_data[:args.max_samples]
             print(f"使用 {len(train_subset)} 条数据进行LoRA训练")
         else:
@@ -430,7 +474,7 @@ def main():
             print(f"使用全部 {len(train_subset)} 条数据进行LoRA训练")
         
         # 准备训练参数
-        train_kwargs = {'num_epochs': args.epochs}
+        train_kwargs = {'num_epochs': args.epochs, 'max_length': args.max_length}
         if args.batch_size:
             train_kwargs['batch_size'] = args.batch_size
         if args.learning_rate:
@@ -0,0 +1,567 @@
+# -*- coding: utf-8 -*-
+"""
+本地情感模型推理服务
+
+各情感/话题模型在一个独立进程中只加载一次，通过 localhost HTTP 或 Unix socket 对外提供批量
+classify / topk 接口。多个调用方（各个 Engine 进程、多个并发 Agent）的请求会在延迟预算内
+合并成微批次（micro-batch）再送入模型，显存/内存只需占用一份，并发越高批次越大、吞吐越高。
+
+启动服务:
+    python SentimentAnalysisModel/model_server.py --models multilingual,topic --address http://127.0.0.1:8765
+    python SentimentAnalysisModel/model_server.py --models multilingual --address unix:///tmp/bettafish_models.sock
+
+调用:
+    client = ModelServerClient("http://127.0.0.1:8765")
+    client.classify("multilingual", ["今天心情很好", "太失望了"])
+    client.topk("topic", ["……"], k=3)
+
+接口:
+    GET  /health                                      -> {"models": {name: ["classify", "topk"]}}
+    POST /classify {"model": str, "texts": [str]}     -> {"results": [{"label", "confidence", "probabilities"}]}
+    POST /topk     {"model": str, "texts": [str], "k": int} -> {"results": [[{"label", "score"}]]}
+"""
+
+import argparse
+import http.client
+import importlib.util
+import json
+import os
+import queue
+import socket
+import socketserver
+import sys
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+MODEL_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+DEFAULT_ADDRESS = "http://127.0.0.1:8765"
+
+
+@contextmanager
+def _working_directory(path: str):
+    """
+    各模型目录下的脚本使用相对路径加载模型/词表，并以裸模块名互相导入（predict、utils、base_model等），
+    加载期间临时切换工作目录、把目录放到 sys.path 最前面，并暂时移走 sys.modules 中的同名模块；
+    结束后恢复 sys.path 和 sys.modules，之后加载的其他模型目录不会用到这里的同名模块
+    """
+    local_names = {os.path.splitext(name)[0] for name in os.listdir(path) if name.endswith(".py")}
+    shadowed = {name: sys.modules.pop(name) for name in local_names if name in sys.modules}
+    previous_cwd = os.getcwd()
+    previous_path = list(sys.path)
+    os.chdir(path)
+    sys.path.insert(0, path)
+    try:
+        yield
+    finally:
+        os.chdir(previous_cwd)
+        sys.path[:] = previous_path
+        for name in local_names:
+            sys.modules.pop(name, None)
+        sys.modules.update(shadowed)
+
+
+def _load_module(directory: str, name: str):
+    """按文件路径加载模型目录下的模块，注册为唯一的模块名 _served_<目录名>_<模块名>（需在 _working_directory 中调用）"""
+    unique_name = f"_served_{os.path.basename(directory)}_{name}"
+    spec = importlib.util.spec_from_file_location(unique_name, os.path.join(directory, f"{name}.py"))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[unique_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+class ServedModel:
+    """服务端托管模型的统一接口，子类按能力实现 classify 和/或 topk"""
+
+    def __init__(self, batch_size: int = 32):
+        self.batch_size = batch_size
+
+    def load(self) -> None:
+        raise NotImplementedError
+
+    @property
+    def operations(self) -> List[str]:
+        ops = []
+        if type(self).classify is not ServedModel.classify:
+            ops.append("classify")
+        if type(self).topk is not ServedModel.topk:
+            ops.append("topk")
+        return ops
+
+    def classify(self, texts: List[str]) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def topk(self, texts: List[str], k: int) -> List[List[Dict[str, Any]]]:
+        raise NotImplementedError
+
+
+class HFSequenceClassifier(ServedModel):
+    """HuggingFace 序列分类模型（多语言情感、BertChinese、话题分类等BERT系模型）"""
+
+    def __init__(self, model_path: str, pretrained_name: Optional[str] = None,
+                 labels: Optional[List[str]] = None, max_length: int = 512, batch_size: int = 32):
+        super().__init__(batch_size)
+        self.model_path = model_path
+        self.pretrained_name = pretrained_name
+        self.labels = labels
+        self.max_length = max_length
+        self.model = None
+        self.tokenizer = None
+        self.device = None
+        self.onnx_model = None
+
+    def load(self) -> None:
+        import torch
+        from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+        # 纯CPU环境下优先使用 onnx_backend.py 导出的ONNX模型
+        if not torch.cuda.is_available():
+            from onnx_backend import load_onnx_classifier
+
+            self.onnx_model = load_onnx_classifier(self.model_path)
+            if self.onnx_model is not None:
+                if self.labels is None:
+                    self.labels = [self.onnx_model.id2label.get(i, str(i)) for i in range(len(self.onnx_model.id2label))]
+                return
+
+        source = self.model_path
+        if not os.path.exists(source):
+            if not self.pretrained_name:
+                raise FileNotFoundError(f"模型目录不存在: {source}")
+            source = self.pretrained_name
+        self.tokenizer = AutoTokenizer.from_pretrained(source)
+        self.model = AutoModelForSequenceClassification.from_pretrained(source)
+        self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        self.model.to(self.device)
+        self.model.eval()
+        if self.labels is None:
+            id2label = getattr(self.model.config, "id2label", None) or {}
+            self.labels = [str(id2label.get(i, i)) for i in range(self.model.config.num_labels)]
+
+    def _probabilities(self, texts: List[str]):
+        if self.onnx_model is not None:
+            return self.onnx_model.predict_proba(texts, self.max_length, self.batch_size).tolist()
+
+        import torch
+
+        # 按长度排序后分批，减少同一批次内的填充
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        probs = [None] * len(texts)
+        with torch.no_grad():
+            for start in range(0, len(order), self.batch_size):
+                index = order[start:start + self.batch_size]
+                inputs = self.tokenizer(
+                    [texts[i] for i in index],
+                    max_length=self.max_length,
+                    padding=True,
+                    truncation=True,
+                    return_tensors="pt",
+                )
+                inputs = {k: v.to(self.device) for k, v in inputs.items()}
+                batch_probs = torch.softmax(self.model(**inputs).logits, dim=-1).cpu().tolist()
+                for i, row in zip(index, batch_probs):
+                    probs[i] = row
+        return probs
+
+    def classify(self, texts: List[str]) -> List[Dict[str, Any]]:
+        results = []
+        for row in self._probabilities(texts):
+            best = max(range(len(row)), key=row.__getitem__)
+            results.append({
+                "label": self.labels[best],
+                "confidence": row[best],
+                "probabilities": dict(zip(self.labels, row)),
+            })
+        return results
+
+    def topk(self, texts: List[str], k: int) -> List[List[Dict[str, Any]]]:
+        results = []
+        for row in self._probabilities(texts):
+            ranked = sorted(range(len(row)), key=row.__getitem__, reverse=True)[:k]
+            results.append([{"label": self.labels[i], "score": row[i]} for i in ranked])
+        return results
+
+
+class QwenLoRAClassifier(ServedModel):
+    """WeiboSentiment_SmallQwen 中的 Qwen3-LoRA 模型，使用标签logits单次前向打分"""
+
+    def __init__(self, model_size: str = "0.6B", batch_size: int = 16):
+        super().__init__(batch_size)
+        self.model_size = model_size
+        self.model = None
+
+    def load(self) -> None:
+        directory = os.path.join(MODEL_ROOT, "WeiboSentiment_SmallQwen")
+        with _working_directory(directory):
+            model_paths = _load_module(directory, "models_config").MODEL_PATHS
+            self.model = _load_module(directory, "qwen3_lora_universal").Qwen3LoRAUniversal(self.model_size)
+            self.model.load_model(model_paths["lora"][self.model_size])
+
+    def classify(self, texts: List[str]) -> List[Dict[str, Any]]:
+        results = []
+        for prob in self.model.predict_proba(texts, batch_size=self.batch_size):
+            label = "正面" if prob > 0.5 else "负面"
+            results.append({
+                "label": label,
+                "confidence": prob if prob > 0.5 else 1 - prob,
+                "probabilities": {"正面": prob, "负面": 1 - prob},
+            })
+        return results
+
+
+class MachineLearningEnsemble(ServedModel):
+    """WeiboSentiment_MachineLearning 中的传统模型（bayes/svm/xgboost等）加权集成"""
+
+    def __init__(self, model_types: Optional[List[str]] = None, batch_size: int = 10000):
+        super().__init__(batch_size)
+        self.model_types = model_types or ["bayes", "svm", "xgboost"]
+        self.predictor = None
+
+    def load(self) -> None:
+        directory = os.path.join(MODEL_ROOT, "WeiboSentiment_MachineLearning")
+        with _working_directory(directory):
+            # 预处理在服务进程内串行执行：加载结束后 utils 等同名模块会从 sys.modules 中移走，
+            # 进程池无法再按模块名pickle预处理函数，批量请求已由微批次合并，不需要再开进程池
+            self.predictor = _load_module(directory, "predict").SentimentPredictor(n_jobs=1)
+            model_files = {
+                "bayes": "bayes_model.pkl",
+                "svm": "svm_model.pkl",
+                "xgboost": "xgboost_model.pkl",
+                "lstm": "lstm_model.pth",
+            }
+            for model_type in self.model_types:
+                self.predictor.load_model(model_type, os.path.abspath(os.path.join("model", model_files[model_type])))
+        if not self.predictor.models:
+            raise FileNotFoundError("没有可用的传统机器学习模型，请先训练")
+
+    def classify(self, texts: List[str]) -> List[Dict[str, Any]]:
+        results = []
+        for pred, conf in self.predictor.ensemble_predict_batch(texts):
+            prob = conf if pred == 1 else 1 - conf
+            results.append({
+                "label": "正面" if pred == 1 else "负面",
+                "confidence": conf,
+                "probabilities": {"正面": prob, "负面": 1 - prob},
+            })
+        return results
+
+
+# 可托管的模型，名称 -> 构造函数；其他模块可以通过 register_model 追加
+MODEL_FACTORIES: Dict[str, Callable[[], ServedModel]] = {
+    "multilingual": lambda: HFSequenceClassifier(
+        os.path.join(MODEL_ROOT, "WeiboMultilingualSentiment", "model"),
+        pretrained_name="tabularisai/multilingual-sentiment-analysis",
+        labels=["非常负面", "负面", "中性", "正面", "非常正面"],
+    ),
+    "bert-chinese": lambda: HFSequenceClassifier(
+        os.path.join(MODEL_ROOT, "WeiboSentiment_Finetuned", "BertChinese-Lora", "model"),
+        pretrained_name="wsqstar/GISchat-weibo-100k-fine-tuned-bert",
+        labels=["负面", "正面"],
+    ),
+    "topic": lambda: HFSequenceClassifier(
+        os.path.join(MODEL_ROOT, "BertTopicDetection_Finetuned", "model", "bert-chinese-classifier"),
+        max_length=128,
+    ),
+    "qwen3-lora-0.6B": lambda: QwenLoRAClassifier("0.6B"),
+    "qwen3-lora-4B": lambda: QwenLoRAClassifier("4B"),
+    "qwen3-lora-8B": lambda: QwenLoRAClassifier("8B"),
+    "ml-ensemble": lambda: MachineLearningEnsemble(),
+}
+
+
+def register_model(name: str, factory: Callable[[], ServedModel]) -> None:
+    """注册一个可托管的模型"""
+    MODEL_FACTORIES[name] = factory
+
+
+class MicroBatcher:
+    """
+    微批次合并器
+
+    调用方线程提交一组文本后阻塞等待结果；后台线程在收到第一个请求后最多再等待 max_wait_ms，
+    或攒够 max_batch_size 条文本，就把这段时间内所有请求合并成一次模型调用，再按原顺序拆分结果。
+    """
+
+    def __init__(self, handler: Callable[[List[str]], List[Any]], max_batch_size: int = 64,
+                 max_wait_ms: float = 10.0, name: str = "batcher"):
+        self.handler = handler
+        self.max_batch_size = max(max_batch_size, 1)
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue: "queue.Queue[Optional[Tuple[List[str], Future]]]" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, texts: List[str]) -> List[Any]:
+        if not texts:
+            return []
+        future: Future = Future()
+        self._queue.put((texts, future))
+        return future.result()
+
+    def close(self) -> None:
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+
+    def _run(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch = [first]
+            size = len(first[0])
+            deadline = time.monotonic() + self.max_wait
+            stopping = False
+            while size < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+                size += len(item[0])
+
+            texts = [text for request_texts, _ in batch for text in request_texts]
+            try:
+                results = self.handler(texts)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+            else:
+                offset = 0
+                for request_texts, future in batch:
+                    future.set_result(results[offset:offset + len(request_texts)])
+                    offset += len(request_texts)
+            if stopping:
+                return
+
+
+class ModelServer:
+    """加载并托管多个模型，每个 (模型, 操作) 对应一个微批次合并器"""
+
+    def __init__(self, model_names: List[str], max_batch_size: int = 64, max_wait_ms: float = 10.0):
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.models: Dict[str, ServedModel] = {}
+        self._batchers: Dict[Tuple[str, str, int], MicroBatcher] = {}
+        self._lock = threading.Lock()
+        for name in model_names:
+            if name not in MODEL_FACTORIES:
+                raise ValueError(f"未注册的模型: {name}，可用模型: {', '.join(MODEL_FACTORIES)}")
+            print(f"加载模型 {name} ...")
+            model = MODEL_FACTORIES[name]()
+            model.load()
+            self.models[name] = model
+            print(f"模型 {name} 加载完成，支持: {', '.join(model.operations)}")
+
+    def _get_batcher(self, model_name: str, operation: str, k: int = 0) -> MicroBatcher:
+        key = (model_name, operation, k)
+        with self._lock:
+            if key not in self._batchers:
+                model = self.models[model_name]
+                if operation == "classify":
+                    handler = model.classify
+                else:
+                    handler = lambda texts: model.topk(texts, k)
+                self._batchers[key] = MicroBatcher(
+                    handler, self.max_batch_size, self.max_wait_ms, name=f"{model_name}-{operation}"
+                )
+            return self._batchers[key]
+
+    def run(self, operation: str, model_name: str, texts: List[str], k: int = 0) -> List[Any]:
+        if model_name not in self.models:
+            raise ValueError(f"模型未加载: {model_name}")
+        if operation not in self.models[model_name].operations:
+            raise ValueError(f"模型 {model_name} 不支持 {operation}")
+        return self._get_batcher(model_name, operation, k).submit([str(text or "") for text in texts])
+
+    def health(self) -> Dict[str, Any]:
+        return {"models": {name: model.operations for name, model in self.models.items()}}
+
+    def close(self) -> None:
+        for batcher in self._batchers.values():
+            batcher.close()
+
+
+def _make_handler(model_server: ModelServer):
+    class ModelRequestHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def address_string(self):
+            # Unix socket 的 client_address 是空字符串
+            return self.client_address[0] if isinstance(self.client_address, tuple) else "unix"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, status: int, payload: Dict[str, Any]) -> None:
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == "/health":
+                self._send_json(200, model_server.health())
+            else:
+                self._send_json(404, {"error": f"未知路径: {self.path}"})
+
+        def do_POST(self):
+            operation = self.path.strip("/")
+            if operation not in ("classify", "topk"):
+                self._send_json(404, {"error": f"未知路径: {self.path}"})
+                return
+            try:
+                length = int(self.headers.get("Content-Length") or 0)
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                if not isinstance(payload, dict):
+                    raise ValueError("请求体必须是JSON对象")
+                texts = payload.get("texts") or []
+                if not isinstance(texts, list):
+                    raise ValueError("texts 必须是字符串列表")
+                k = int(payload.get("k", 3)) if operation == "topk" else 0
+                results = model_server.run(operation, payload.get("model", ""), texts, k)
+            except ValueError as e:
+                self._send_json(400, {"error": str(e)})
+                return
+            except Exception as e:
+                self._send_json(500, {"error": f"推理失败: {e}"})
+                return
+            self._send_json(200, {"results": results})
+
+    return ModelRequestHandler
+
+
+# 默认的 listen 队列只有5，多个调用方同时连接时会被拒绝/重置
+LISTEN_BACKLOG = 128
+
+
+class ThreadingModelHTTPServer(ThreadingHTTPServer):
+    request_queue_size = LISTEN_BACKLOG
+
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+    request_queue_size = LISTEN_BACKLOG
+
+    def server_bind(self):
+        if os.path.exists(self.server_address):
+            os.unlink(self.server_address)
+        socketserver.UnixStreamServer.server_bind(self)
+        self.server_name = "localhost"
+        self.server_port = 0
+
+
+def _parse_address(address: str) -> Tuple[str, Any]:
+    """解析服务地址: unix:///path/to.sock 或 http://host:port"""
+    if address.startswith("unix://"):
+        return "unix", address[len("unix://"):]
+    parsed = urlparse(address if "://" in address else f"http://{address}")
+    return "http", (parsed.hostname or "127.0.0.1", parsed.port or 80)
+
+
+def serve(model_names: List[str], address: str = DEFAULT_ADDRESS, max_batch_size: int = 64,
+          max_wait_ms: float = 10.0) -> None:
+    """加载模型并启动推理服务（阻塞）"""
+    model_server = ModelServer(model_names, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+    kind, bind_address = _parse_address(address)
+    handler = _make_handler(model_server)
+    if kind == "unix":
+        httpd = ThreadingUnixHTTPServer(bind_address, handler)
+    else:
+        httpd = ThreadingModelHTTPServer(bind_address, handler)
+    print(f"模型推理服务已启动: {address}")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+        model_server.close()
+        if kind == "unix" and os.path.exists(bind_address):
+            os.unlink(bind_address)
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, socket_path: str, timeout: float):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+class ModelServerError(Exception):
+    """模型服务返回错误或无法连接"""
+
+
+class ModelServerClient:
+    """模型推理服务客户端，只依赖标准库"""
+
+    def __init__(self, address: str = DEFAULT_ADDRESS, timeout: float = 60.0):
+        self.address = address
+        self.timeout = timeout
+        self._kind, self._target = _parse_address(address)
+
+    def _connection(self) -> http.client.HTTPConnection:
+        if self._kind == "unix":
+            return _UnixHTTPConnection(self._target, self.timeout)
+        host, port = self._target
+        return http.client.HTTPConnection(host, port, timeout=self.timeout)
+
+    def _request(self, method: str, path: str, payload: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        connection = self._connection()
+        try:
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8") if payload is not None else None
+            headers = {"Content-Type": "application/json"} if body is not None else {}
+            connection.request(method, path, body=body, headers=headers)
+            response = connection.getresponse()
+            data = json.loads(response.read() or b"{}")
+        except (OSError, http.client.HTTPException, json.JSONDecodeError) as e:
+            raise ModelServerError(f"无法连接模型服务 {self.address}: {e}") from e
+        finally:
+            connection.close()
+        if response.status != 200:
+            raise ModelServerError(data.get("error") or f"HTTP {response.status}")
+        return data
+
+    def health(self) -> Dict[str, Any]:
+        return self._request("GET", "/health")
+
+    def classify(self, model: str, texts: List[str]) -> List[Dict[str, Any]]:
+        return self._request("POST", "/classify", {"model": model, "texts": texts})["results"]
+
+    def topk(self, model: str, texts: List[str], k: int = 3) -> List[List[Dict[str, Any]]]:
+        return self._request("POST", "/topk", {"model": model, "texts": texts, "k": k})["results"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地情感模型推理服务（微批次合并）")
+    parser.add_argument("--models", type=str, default="multilingual",
+                        help=f"要托管的模型，逗号分隔，可选: {', '.join(MODEL_FACTORIES)}")
+    parser.add_argument("--address", type=str, default=os.environ.get("SENTIMENT_MODEL_SERVER", DEFAULT_ADDRESS),
+                        help="监听地址，http://127.0.0.1:8765 或 unix:///tmp/bettafish_models.sock")
+    parser.add_argument("--max_batch_size", type=int, default=64, help="单个微批次的最大文本数")
+    parser.add_argument("--max_wait_ms", type=float, default=10.0, help="合并请求的最长等待时间（毫秒）")
+    args = parser.parse_args()
+
+    model_names = [name.strip() for name in args.models.split(",") if name.strip()]
+    serve(model_names, args.address, args.max_batch_size, args.max_wait_ms)
+
+
+if __name__ == "__main__":
+    main()
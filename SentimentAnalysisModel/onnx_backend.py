@@ -0,0 +1,336 @@
+# -*- coding: utf-8 -*-
+"""
+BERT系序列分类模型的 ONNX Runtime 推理后端（CPU）
+
+把 AutoModelForSequenceClassification 模型导出为动态 batch/序列长度的 ONNX，并做 int8 动态量化。
+纯 CPU 部署时各预测入口会优先加载量化后的 ONNX 模型，不存在或未安装 onnxruntime 时回退到 PyTorch。
+
+导出 + 量化 + 精度对齐检查:
+    python SentimentAnalysisModel/onnx_backend.py --model_dir SentimentAnalysisModel/WeiboMultilingualSentiment/model
+    python SentimentAnalysisModel/onnx_backend.py --model_dir SentimentAnalysisModel/WeiboSentiment_Finetuned/BertChinese-Lora/model
+    python SentimentAnalysisModel/onnx_backend.py --model_dir SentimentAnalysisModel/BertTopicDetection_Finetuned/model/bert-chinese-classifier
+
+导出结果默认保存在 <model_dir>/onnx/ 下: model.onnx (fp32)、model.int8.onnx (int8)、分词器与 config.json。
+用 --output_dir 导出到其他目录时，会在 <model_dir>/onnx_location.txt 中记录该目录，加载时按记录查找。
+延迟/内存对比见 onnx_benchmark.py。
+"""
+
+import argparse
+import os
+import shutil
+from typing import Dict, List, Optional
+
+import numpy as np
+
+try:
+    import onnxruntime as ort
+    ONNXRUNTIME_AVAILABLE = True
+except ImportError:
+    ort = None  # type: ignore
+    ONNXRUNTIME_AVAILABLE = False
+
+ONNX_SUBDIR = "onnx"
+FP32_FILENAME = "model.onnx"
+INT8_FILENAME = "model.int8.onnx"
+# 导出到自定义目录时，在模型目录下记录导出位置的文件
+LOCATION_FILENAME = "onnx_location.txt"
+
+# 导出时模型可能接收的输入，按 BERT 系模型 forward 的常见顺序
+MODEL_INPUT_NAMES = ("input_ids", "attention_mask", "token_type_ids")
+
+# 默认的精度对齐检查样本
+PARITY_TEXTS = [
+    "今天天气真好，心情特别棒！",
+    "服务态度太差了，很失望",
+    "这部电影还行吧，没有想象中那么好看，但也不算差。",
+    "官方通报来了，相关部门已经介入调查。",
+    "I absolutely love this product!",
+    "The customer service was disappointing.",
+    "このホテルのサービスはがっかりしました。",
+    "¡Me encanta cómo quedó la decoración!",
+]
+
+
+def _recorded_onnx_dir(model_dir: str) -> Optional[str]:
+    location_path = os.path.join(model_dir, LOCATION_FILENAME)
+    if not os.path.isfile(location_path):
+        return None
+    with open(location_path, "r", encoding="utf-8") as f:
+        recorded = f.read().strip()
+    if not recorded:
+        return None
+    # 相对路径相对于模型目录
+    return recorded if os.path.isabs(recorded) else os.path.join(model_dir, recorded)
+
+
+def onnx_export_dir(model_dir: str) -> str:
+    """返回模型的 ONNX 导出目录：onnx_location.txt 记录的目录，否则为 <model_dir>/onnx"""
+    return _recorded_onnx_dir(model_dir) or os.path.join(model_dir, ONNX_SUBDIR)
+
+
+def find_onnx_model(model_dir: str, prefer_quantized: bool = True, onnx_dir: Optional[str] = None) -> Optional[str]:
+    """
+    查找模型已导出的 ONNX 模型
+
+    Args:
+        model_dir: HuggingFace 模型目录
+        prefer_quantized: 是否优先使用 int8 量化模型
+        onnx_dir: 指定的导出目录；不指定时依次查找 onnx_location.txt 记录的目录和 <model_dir>/onnx
+
+    Returns:
+        ONNX 文件路径，不存在时返回 None
+    """
+    if onnx_dir:
+        directories = [onnx_dir]
+    else:
+        directories = [d for d in (_recorded_onnx_dir(model_dir), os.path.join(model_dir, ONNX_SUBDIR)) if d]
+    candidates = [INT8_FILENAME, FP32_FILENAME] if prefer_quantized else [FP32_FILENAME, INT8_FILENAME]
+    for directory in directories:
+        for filename in candidates:
+            path = os.path.join(directory, filename)
+            if os.path.isfile(path):
+                return path
+    return None
+
+
+def export_onnx(model_dir: str, output_dir: Optional[str] = None, opset: int = 14) -> str:
+    """
+    把 HuggingFace 序列分类模型导出为 ONNX，batch 和序列长度均为动态维度
+
+    Args:
+        model_dir: HuggingFace 模型目录
+        output_dir: 输出目录，默认 <model_dir>/onnx；为其他目录时记录到 <model_dir>/onnx_location.txt
+        opset: ONNX opset 版本
+
+    Returns:
+        导出的 model.onnx 路径
+    """
+    import torch
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+    output_dir = output_dir or os.path.join(model_dir, ONNX_SUBDIR)
+    os.makedirs(output_dir, exist_ok=True)
+
+    tokenizer = AutoTokenizer.from_pretrained(model_dir)
+    model = AutoModelForSequenceClassification.from_pretrained(model_dir)
+    model.eval()
+
+    dummy = tokenizer(PARITY_TEXTS[:2], padding=True, truncation=True, return_tensors="pt")
+    input_names = [name for name in MODEL_INPUT_NAMES if name in dummy]
+
+    class _LogitsWrapper(torch.nn.Module):
+        """按位置参数接收输入并只返回 logits，避免不同模型 forward 参数顺序不一致"""
+
+        def __init__(self, wrapped):
+            super().__init__()
+            self.wrapped = wrapped
+
+        def forward(self, *inputs):
+            return self.wrapped(**dict(zip(input_names, inputs))).logits
+
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["logits"] = {0: "batch"}
+    onnx_path = os.path.join(output_dir, FP32_FILENAME)
+    with torch.no_grad():
+        torch.onnx.export(
+            _LogitsWrapper(model),
+            tuple(dummy[name] for name in input_names),
+            onnx_path,
+            input_names=input_names,
+            output_names=["logits"],
+            dynamic_axes=dynamic_axes,
+            opset_version=opset,
+            do_constant_folding=True,
+        )
+
+    # 分词器和 config（id2label）与 ONNX 放在一起，加载时不再依赖原模型目录
+    tokenizer.save_pretrained(output_dir)
+    model.config.save_pretrained(output_dir)
+    label_map_path = os.path.join(model_dir, "label_map.json")
+    if os.path.isfile(label_map_path):
+        shutil.copy(label_map_path, output_dir)
+
+    # 记录自定义导出位置，各预测入口按模型目录加载时能找到
+    location_path = os.path.join(model_dir, LOCATION_FILENAME)
+    if os.path.abspath(output_dir) != os.path.abspath(os.path.join(model_dir, ONNX_SUBDIR)):
+        with open(location_path, "w", encoding="utf-8") as f:
+            f.write(os.path.abspath(output_dir))
+    elif os.path.isfile(location_path):
+        os.remove(location_path)
+    return onnx_path
+
+
+def quantize_int8(onnx_path: str, output_path: Optional[str] = None) -> str:
+    """
+    对 ONNX 模型做 int8 动态量化（权重量化为 int8，激活在运行时动态量化）
+
+    Args:
+        onnx_path: fp32 ONNX 模型路径
+        output_path: 输出路径，默认与输入同目录的 model.int8.onnx
+
+    Returns:
+        量化后的模型路径
+    """
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    output_path = output_path or os.path.join(os.path.dirname(onnx_path), INT8_FILENAME)
+    quantize_dynamic(onnx_path, output_path, weight_type=QuantType.QInt8)
+    return output_path
+
+
+def _softmax(logits: np.ndarray) -> np.ndarray:
+    shifted = logits - logits.max(axis=-1, keepdims=True)
+    exp = np.exp(shifted)
+    return exp / exp.sum(axis=-1, keepdims=True)
+
+
+class OnnxSequenceClassifier:
+    """ONNX Runtime 序列分类推理会话，接口与各预测脚本中的 torch 推理保持一致（输出 softmax 概率）"""
+
+    def __init__(self, onnx_path: str, num_threads: Optional[int] = None):
+        """
+        Args:
+            onnx_path: ONNX 模型路径，同目录下需有分词器与 config.json（export_onnx 会一并保存）
+            num_threads: 算子内并行线程数，None 由 onnxruntime 自动决定
+        """
+        if not ONNXRUNTIME_AVAILABLE:
+            raise ImportError("未安装 onnxruntime，请先 pip install onnxruntime")
+        from transformers import AutoConfig, AutoTokenizer
+
+        self.onnx_path = onnx_path
+        model_dir = os.path.dirname(onnx_path)
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        config = AutoConfig.from_pretrained(model_dir)
+        self.id2label: Dict[int, str] = {int(k): str(v) for k, v in (config.id2label or {}).items()}
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(onnx_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = [i.name for i in self.session.get_inputs()]
+
+    @property
+    def is_quantized(self) -> bool:
+        return os.path.basename(self.onnx_path) == INT8_FILENAME
+
+    def logits(self, texts: List[str], max_length: int = 512) -> np.ndarray:
+        encoded = self.tokenizer(
+            texts,
+            max_length=max_length,
+            padding=True,
+            truncation=True,
+            return_tensors="np",
+        )
+        feed = {name: encoded[name].astype(np.int64) for name in self.input_names}
+        return self.session.run(["logits"], feed)[0]
+
+    def predict_proba(self, texts: List[str], max_length: int = 512, batch_size: int = 32) -> np.ndarray:
+        """
+        批量预测各类别概率，按文本长度排序后分批以减少填充
+
+        Args:
+            texts: 文本列表
+            max_length: 最大序列长度
+            batch_size: 单次前向的文本数
+
+        Returns:
+            (len(texts), num_labels) 的概率矩阵
+        """
+        if not texts:
+            return np.zeros((0, len(self.id2label)), dtype=np.float32)
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        probs = None
+        for start in range(0, len(order), batch_size):
+            index = order[start:start + batch_size]
+            batch_probs = _softmax(self.logits([texts[i] for i in index], max_length))
+            if probs is None:
+                probs = np.zeros((len(texts), batch_probs.shape[-1]), dtype=batch_probs.dtype)
+            probs[index] = batch_probs
+        return probs
+
+
+def load_onnx_classifier(model_dir: str, prefer_quantized: bool = True,
+                         num_threads: Optional[int] = None,
+                         onnx_dir: Optional[str] = None) -> Optional[OnnxSequenceClassifier]:
+    """
+    加载模型已导出的 ONNX 模型（查找顺序见 find_onnx_model），未导出或未安装 onnxruntime 时返回 None（调用方回退到 torch）
+    """
+    if not ONNXRUNTIME_AVAILABLE:
+        return None
+    onnx_path = find_onnx_model(model_dir, prefer_quantized, onnx_dir)
+    if onnx_path is None:
+        return None
+    return OnnxSequenceClassifier(onnx_path, num_threads=num_threads)
+
+
+def check_parity(model_dir: str, onnx_path: str, texts: Optional[List[str]] = None,
+                 max_length: int = 512) -> Dict[str, float]:
+    """
+    对比 torch 原模型与 ONNX 模型在同一批文本上的输出
+
+    Returns:
+        max_abs_diff: 概率的最大绝对误差
+        label_agreement: 预测类别一致的比例
+    """
+    import torch
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+    texts = texts or PARITY_TEXTS
+    tokenizer = AutoTokenizer.from_pretrained(model_dir)
+    model = AutoModelForSequenceClassification.from_pretrained(model_dir)
+    model.eval()
+    torch_probs = []
+    with torch.no_grad():
+        for text in texts:
+            inputs = tokenizer(text, max_length=max_length, truncation=True, return_tensors="pt")
+            torch_probs.append(torch.softmax(model(**inputs).logits, dim=-1)[0].numpy())
+    torch_probs = np.stack(torch_probs)
+
+    onnx_probs = OnnxSequenceClassifier(onnx_path).predict_proba(texts, max_length=max_length)
+    return {
+        "num_texts": len(texts),
+        "max_abs_diff": float(np.abs(torch_probs - onnx_probs).max()),
+        "label_agreement": float((torch_probs.argmax(axis=-1) == onnx_probs.argmax(axis=-1)).mean()),
+    }
+
+
+def _read_texts(path: str) -> List[str]:
+    with open(path, "r", encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="导出 BERT 系分类模型为 ONNX 并做 int8 动态量化")
+    parser.add_argument("--model_dir", type=str, required=True, help="HuggingFace 模型目录")
+    parser.add_argument("--output_dir", type=str, default=None, help="输出目录，默认 <model_dir>/onnx；其他目录会记录到 <model_dir>/onnx_location.txt")
+    parser.add_argument("--opset", type=int, default=14)
+    parser.add_argument("--no_quantize", action="store_true", help="只导出 fp32 模型")
+    parser.add_argument("--parity_file", type=str, default=None, help="精度对齐检查用的文本文件，每行一条")
+    parser.add_argument("--max_length", type=int, default=512)
+    parser.add_argument("--min_agreement", type=float, default=0.95, help="预测类别一致率低于该值时给出警告")
+    args = parser.parse_args()
+
+    print(f"导出 ONNX: {args.model_dir}")
+    onnx_path = export_onnx(args.model_dir, args.output_dir, args.opset)
+    print(f"fp32 模型: {onnx_path}")
+    exported = [onnx_path]
+    if not args.no_quantize:
+        int8_path = quantize_int8(onnx_path)
+        print(f"int8 模型: {int8_path}")
+        exported.append(int8_path)
+
+    texts = _read_texts(args.parity_file) if args.parity_file else None
+    for path in exported:
+        report = check_parity(args.model_dir, path, texts, args.max_length)
+        size_mb = os.path.getsize(path) / 1024 / 1024
+        print(
+            f"{os.path.basename(path)} ({size_mb:.1f} MB): {report['num_texts']} 条文本, "
+            f"概率最大误差 {report['max_abs_diff']:.4f}, 类别一致率 {report['label_agreement']:.2%}"
+        )
+        if report["label_agreement"] < args.min_agreement:
+            print(f"警告: {os.path.basename(path)} 与 torch 模型预测差异较大，建议删除该文件以回退到 torch 推理")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+"""
+torch / ONNX fp32 / ONNX int8 的 CPU 推理延迟与内存对比
+
+每个后端在独立子进程中运行，分别统计单条文本延迟（p50/p95）、批量吞吐和进程峰值常驻内存。
+
+用法:
+    python SentimentAnalysisModel/onnx_benchmark.py --model_dir SentimentAnalysisModel/WeiboMultilingualSentiment/model
+    python SentimentAnalysisModel/onnx_benchmark.py --model_dir ... --texts_file texts.txt --num_texts 500 --threads 4
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+from typing import Callable, Dict, List
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from onnx_backend import FP32_FILENAME, INT8_FILENAME, PARITY_TEXTS, onnx_export_dir
+
+BACKENDS = ("torch", "onnx", "onnx-int8")
+
+
+def _peak_rss_mb() -> float:
+    # Linux 上 ru_maxrss 单位为 KB，macOS 上为字节
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
+def _percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * q), len(ordered) - 1)]
+
+
+def _load_predictor(backend: str, model_dir: str, max_length: int, threads: int) -> Callable[[List[str]], object]:
+    if backend == "torch":
+        import torch
+        from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+        if threads:
+            torch.set_num_threads(threads)
+        tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        model = AutoModelForSequenceClassification.from_pretrained(model_dir)
+        model.eval()
+
+        def predict(texts: List[str]):
+            inputs = tokenizer(texts, max_length=max_length, padding=True, truncation=True, return_tensors="pt")
+            with torch.no_grad():
+                return torch.softmax(model(**inputs).logits, dim=-1)
+
+        return predict
+
+    from onnx_backend import OnnxSequenceClassifier
+
+    filename = INT8_FILENAME if backend == "onnx-int8" else FP32_FILENAME
+    onnx_path = os.path.join(onnx_export_dir(model_dir), filename)
+    if not os.path.isfile(onnx_path):
+        raise FileNotFoundError(f"未找到 {onnx_path}，请先运行 onnx_backend.py 导出")
+    classifier = OnnxSequenceClassifier(onnx_path, num_threads=threads or None)
+    return lambda texts: classifier.predict_proba(texts, max_length=max_length, batch_size=len(texts))
+
+
+def run_worker(backend: str, model_dir: str, texts: List[str], batch_size: int, max_length: int,
+               threads: int) -> Dict[str, float]:
+    """在当前进程中测量一个后端"""
+    predict = _load_predictor(backend, model_dir, max_length, threads)
+    for text in texts[:5]:
+        predict([text])
+
+    latencies = []
+    for text in texts:
+        started = time.perf_counter()
+        predict([text])
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    for start in range(0, len(texts), batch_size):
+        predict(texts[start:start + batch_size])
+    batch_elapsed = time.perf_counter() - started
+
+    return {
+        "backend": backend,
+        "p50_ms": _percentile(latencies, 0.5),
+        "p95_ms": _percentile(latencies, 0.95),
+        "throughput": len(texts) / batch_elapsed,
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+
+def _load_texts(texts_file: str, num_texts: int) -> List[str]:
+    if texts_file:
+        with open(texts_file, "r", encoding="utf-8") as f:
+            texts = [line.strip() for line in f if line.strip()]
+    else:
+        texts = list(PARITY_TEXTS)
+    return [texts[i % len(texts)] for i in range(num_texts)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="torch 与 ONNX Runtime 的 CPU 推理性能对比")
+    parser.add_argument("--model_dir", type=str, required=True, help="HuggingFace 模型目录（需已导出 onnx 子目录）")
+    parser.add_argument("--backends", type=str, default=",".join(BACKENDS), help=f"逗号分隔，可选: {', '.join(BACKENDS)}")
+    parser.add_argument("--texts_file", type=str, default=None, help="测试文本文件，每行一条，默认使用内置样例")
+    parser.add_argument("--num_texts", type=int, default=200)
+    parser.add_argument("--batch_size", type=int, default=32)
+    parser.add_argument("--max_length", type=int, default=512)
+    parser.add_argument("--threads", type=int, default=0, help="推理线程数，0 表示使用默认值")
+    parser.add_argument("--worker", type=str, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    texts = _load_texts(args.texts_file, args.num_texts)
+    if args.worker:
+        result = run_worker(args.worker, args.model_dir, texts, args.batch_size, args.max_length, args.threads)
+        print(json.dumps(result))
+        return
+
+    print(f"{'backend':<10} {'p50(ms)':>9} {'p95(ms)':>9} {'texts/s':>9} {'peak RSS(MB)':>13}")
+    for backend in [b.strip() for b in args.backends.split(",") if b.strip()]:
+        # 每个后端单独起一个进程，峰值内存互不影响
+        command = [
+            sys.executable, os.path.abspath(__file__), "--worker", backend,
+            "--model_dir", args.model_dir,
+            "--num_texts", str(args.num_texts),
+            "--batch_size", str(args.batch_size),
+            "--max_length", str(args.max_length),
+            "--threads", str(args.threads),
+        ]
+        if args.texts_file:
+            command += ["--texts_file", args.texts_file]
+        completed = subprocess.run(command, capture_output=True, text=True)
+        if completed.returncode != 0:
+            print(f"{backend:<10} 运行失败: {completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else completed.returncode}")
+            continue
+        result = json.loads(completed.stdout.strip().splitlines()[-1])
+        print(
+            f"{backend:<10} {result['p50_ms']:>9.2f} {result['p95_ms']:>9.2f} "
+            f"{result['throughput']:>9.1f} {result['peak_rss_mb']:>13.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
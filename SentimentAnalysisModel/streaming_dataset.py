@@ -0,0 +1,345 @@
+# -*- coding: utf-8 -*-
+"""
+情感模型训练的流式数据层
+
+- iter_records / StreamingCorpus: 从 CSV / JSONL / TSV 逐行读取 (文本, 标签)，不把整个语料读进内存；
+  StreamingCorpus 可以重复迭代，并按文本哈希稳定地划分训练/测试集
+- TokenizedShards: 分词结果按分片保存为 numpy 内存映射文件（扁平 token 数组 + 偏移量 + 标签），
+  以 分词器 + max_length + 数据指纹 为键缓存，重复训练直接跳过分词，中途中断可以从已完成的分片继续；
+  训练时按长度分桶取批次，批内动态填充，内存占用与语料规模无关
+
+用法:
+    corpus = StreamingCorpus("dataset/weibo_senti_100k.csv", split="train")
+    shards = TokenizedShards(tokenizer, max_length=256, fingerprint=corpus.fingerprint).build(corpus)
+    for batch in shards.iter_batches(batch_size=32, pad_token_id=tokenizer.pad_token_id):
+        input_ids, attention_mask, labels = batch["input_ids"], batch["attention_mask"], batch["labels"]
+"""
+
+import csv
+import hashlib
+import itertools
+import json
+import os
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+DEFAULT_CACHE_ROOT = "./cache/tokenized"
+
+
+def _detect_format(path: str) -> str:
+    suffix = os.path.splitext(path)[1].lower()
+    return {".csv": "csv", ".jsonl": "jsonl", ".json": "jsonl"}.get(suffix, "tsv")
+
+
+def iter_records(path: str, fmt: str = "auto", text_field: str = "review",
+                 label_field: str = "label") -> Iterator[Tuple[str, int]]:
+    """
+    逐条读取 (文本, 标签)
+
+    Args:
+        path: 数据文件路径
+        fmt: csv（带表头，如 weibo_senti_100k.csv）、jsonl、tsv（"文本\\t标签"）、
+             id_label_text（无表头的 "id,标签,文本"，如 weibo2018 数据集），auto 按后缀判断
+        text_field: csv/jsonl 中文本所在的字段
+        label_field: csv/jsonl 中标签所在的字段
+    """
+    if fmt == "auto":
+        fmt = _detect_format(path)
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        if fmt == "csv":
+            for row in csv.DictReader(f):
+                label = str(row.get(label_field, "")).strip()
+                if row.get(text_field) is not None and label.lstrip("-").isdigit():
+                    yield row[text_field], int(label)
+        elif fmt == "jsonl":
+            for line in f:
+                if not line.strip():
+                    continue
+                item = json.loads(line)
+                if item.get(text_field) is not None and item.get(label_field) is not None:
+                    yield str(item[text_field]), int(item[label_field])
+        elif fmt == "id_label_text":
+            for line in f:
+                parts = line.rstrip("\r\n").split(",", 2)
+                if len(parts) == 3 and parts[1].strip().lstrip("-").isdigit():
+                    yield parts[2], int(parts[1])
+        elif fmt == "tsv":
+            for line in f:
+                parts = line.strip().split("\t")
+                if len(parts) >= 2 and parts[1].strip().lstrip("-").isdigit():
+                    yield parts[0], int(parts[1])
+        else:
+            raise ValueError(f"不支持的数据格式: {fmt}")
+
+
+def in_test_split(text: str, test_ratio: float, seed: int = 42) -> bool:
+    """按文本哈希稳定地划分测试集，相同文本总是落在同一侧，不需要预先知道语料规模"""
+    digest = hashlib.md5(f"{seed}:{text}".encode("utf-8")).digest()
+    return int.from_bytes(digest[:4], "big") / 0xFFFFFFFF < test_ratio
+
+
+def file_fingerprint(path: str) -> str:
+    stat = os.stat(path)
+    return f"{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def records_fingerprint(records: Iterable[Tuple[str, int]]) -> str:
+    """内存中的 (文本, 标签) 列表的内容指纹"""
+    sha = hashlib.sha1()
+    for text, label in records:
+        sha.update(f"{label}\t{text}\n".encode("utf-8"))
+    return sha.hexdigest()
+
+
+class StreamingCorpus:
+    """可重复迭代的磁盘语料，每次迭代都从文件流式读取，不在内存中保留样本"""
+
+    def __init__(self, path: str, fmt: str = "auto", text_field: str = "review", label_field: str = "label",
+                 split: Optional[str] = None, test_ratio: float = 0.05, seed: int = 42,
+                 transform: Optional[Callable[[str], str]] = None):
+        """
+        Args:
+            path: 数据文件路径
+            fmt: 见 iter_records
+            split: None 表示全部数据，"train" / "test" 表示按文本哈希划分后的一侧
+            test_ratio: 测试集比例
+            seed: 划分用的随机种子
+            transform: 文本预处理函数（如清洗），在读取时逐条应用
+        """
+        if split not in (None, "train", "test"):
+            raise ValueError(f"split 只能是 None、train 或 test: {split}")
+        self.path = path
+        self.fmt = fmt
+        self.text_field = text_field
+        self.label_field = label_field
+        self.split = split
+        self.test_ratio = test_ratio
+        self.seed = seed
+        self.transform = transform
+
+    def __iter__(self) -> Iterator[Tuple[str, int]]:
+        for text, label in iter_records(self.path, self.fmt, self.text_field, self.label_field):
+            if self.split is not None and (self.split == "test") != in_test_split(text, self.test_ratio, self.seed):
+                continue
+            yield (self.transform(text) if self.transform else text), label
+
+    @property
+    def fingerprint(self) -> str:
+        transform = f"{self.transform.__module__}.{self.transform.__qualname__}" if self.transform else ""
+        return json.dumps({
+            "file": file_fingerprint(self.path),
+            "fmt": self.fmt,
+            "fields": [self.text_field, self.label_field],
+            "split": [self.split, self.test_ratio, self.seed],
+            "transform": transform,
+        }, sort_keys=True)
+
+
+def _chunks(iterator: Iterator, size: int) -> Iterator[List]:
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class TokenizedShards:
+    """按分片缓存在磁盘上的分词结果"""
+
+    VERSION = 1
+    # 同时保持打开的分片数，分片按顺序读取，保留最近两个即可
+    MAX_OPEN_SHARDS = 2
+
+    def __init__(self, tokenizer, max_length: int, fingerprint, cache_root: str = DEFAULT_CACHE_ROOT,
+                 shard_size: int = 50000):
+        """
+        Args:
+            tokenizer: HuggingFace 分词器
+            max_length: 截断长度
+            fingerprint: 数据指纹（StreamingCorpus.fingerprint、records_fingerprint 或任意可 JSON 序列化的值），
+                         文本模板等会影响分词结果的配置也应放进来
+            cache_root: 缓存根目录
+            shard_size: 每个分片的样本数
+        """
+        self.tokenizer = tokenizer
+        self.max_length = max_length
+        self.shard_size = shard_size
+        key = json.dumps({
+            "tokenizer": getattr(tokenizer, "name_or_path", ""),
+            "tokenizer_class": type(tokenizer).__name__,
+            "vocab_size": len(tokenizer),
+            "max_length": max_length,
+            "data": fingerprint,
+            "version": self.VERSION,
+        }, sort_keys=True, ensure_ascii=False)
+        self.cache_dir = os.path.join(cache_root, hashlib.sha1(key.encode("utf-8")).hexdigest()[:16])
+        self._manifest_path = os.path.join(self.cache_dir, "manifest.json")
+        self._manifest = self._load_manifest(key)
+        self._opened: "OrderedDict[int, Tuple[np.ndarray, np.ndarray, np.ndarray]]" = OrderedDict()
+        self._starts = None
+        self._lengths = None
+
+    def _load_manifest(self, key: str) -> Dict:
+        if os.path.exists(self._manifest_path):
+            with open(self._manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            if manifest.get("key") == key:
+                return manifest
+        return {"key": key, "shards": [], "complete": False}
+
+    def _save_manifest(self):
+        tmp_path = self._manifest_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._manifest, f, ensure_ascii=False)
+        os.replace(tmp_path, self._manifest_path)
+
+    @property
+    def is_complete(self) -> bool:
+        return self._manifest["complete"]
+
+    def _shard_path(self, index: int, name: str) -> str:
+        return os.path.join(self.cache_dir, f"shard_{index:05d}.{name}.npy")
+
+    def _write_shard(self, index: int, texts: List[str], labels: List[int]):
+        input_ids = self.tokenizer(texts, truncation=True, max_length=self.max_length)["input_ids"]
+        offsets = np.zeros(len(input_ids) + 1, dtype=np.int64)
+        np.cumsum([len(ids) for ids in input_ids], out=offsets[1:])
+        flat = np.fromiter(itertools.chain.from_iterable(input_ids), dtype=np.int32, count=int(offsets[-1]))
+        np.save(self._shard_path(index, "ids"), flat)
+        np.save(self._shard_path(index, "offsets"), offsets)
+        np.save(self._shard_path(index, "labels"), np.asarray(labels, dtype=np.int64))
+
+    def build(self, records: Iterable[Tuple[str, int]],
+              text_fn: Optional[Callable[[str, int], str]] = None) -> "TokenizedShards":
+        """
+        流式分词并写入分片，已完成的缓存直接复用
+
+        Args:
+            records: (文本, 标签) 的可迭代对象
+            text_fn: 由 (文本, 标签) 生成实际分词文本的函数（如指令模板），默认直接使用文本
+
+        Returns:
+            self
+        """
+        if self.is_complete:
+            print(f"复用已缓存的分词结果: {self.cache_dir} ({len(self)} 条)")
+            return self
+        os.makedirs(self.cache_dir, exist_ok=True)
+        done = len(self._manifest["shards"])
+        iterator = iter(records)
+        if done:
+            print(f"从第 {done + 1} 个分片继续分词: {self.cache_dir}")
+            # 跳过已写入分片的样本
+            for _ in itertools.islice(iterator, done * self.shard_size):
+                pass
+        for index, chunk in enumerate(_chunks(iterator, self.shard_size), start=done):
+            texts = [text_fn(text, label) if text_fn else str(text) for text, label in chunk]
+            self._write_shard(index, texts, [label for _, label in chunk])
+            self._manifest["shards"].append(len(chunk))
+            self._save_manifest()
+            print(f"已分词 {sum(self._manifest['shards'])} 条")
+        self._manifest["complete"] = True
+        self._save_manifest()
+        self._starts = None
+        self._lengths = None
+        return self
+
+    def _shard(self, index: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        if index in self._opened:
+            self._opened.move_to_end(index)
+            return self._opened[index]
+        shard = tuple(
+            np.load(self._shard_path(index, name), mmap_mode="r") for name in ("ids", "offsets", "labels")
+        )
+        self._opened[index] = shard
+        while len(self._opened) > self.MAX_OPEN_SHARDS:
+            self._opened.popitem(last=False)
+        return shard
+
+    @property
+    def num_shards(self) -> int:
+        return len(self._manifest["shards"])
+
+    def __len__(self) -> int:
+        return sum(self._manifest["shards"])
+
+    def __getitem__(self, index: int) -> Dict[str, List[int]]:
+        """按样本序号随机访问，返回 input_ids / attention_mask，可直接作为 HuggingFace Trainer 的数据集"""
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        if self._starts is None:
+            self._starts = np.cumsum([0] + self._manifest["shards"])
+        shard_index = int(np.searchsorted(self._starts, index, side="right") - 1)
+        ids, offsets, _ = self._shard(shard_index)
+        local = index - self._starts[shard_index]
+        input_ids = ids[offsets[local]:offsets[local + 1]].tolist()
+        return {"input_ids": input_ids, "attention_mask": [1] * len(input_ids)}
+
+    def __iter__(self) -> Iterator[Dict[str, List[int]]]:
+        for index in range(len(self)):
+            yield self[index]
+
+    def labels(self) -> np.ndarray:
+        if not self.num_shards:
+            return np.zeros(0, dtype=np.int64)
+        return np.concatenate([np.load(self._shard_path(i, "labels")) for i in range(self.num_shards)])
+
+    def lengths(self) -> np.ndarray:
+        """所有样本的 token 数，由各分片的偏移量算出，不读取 token 数据（供按长度分组的采样器使用）"""
+        if self._lengths is None:
+            if not self.num_shards:
+                return np.zeros(0, dtype=np.int64)
+            self._lengths = np.concatenate(
+                [np.diff(np.load(self._shard_path(i, "offsets"))) for i in range(self.num_shards)]
+            )
+        return self._lengths
+
+    def iter_batches(self, batch_size: int, shuffle: bool = True, seed: int = 0, bucket_batches: int = 50,
+                     pad_token_id: int = 0, padding_side: str = "right",
+                     drop_last: bool = False) -> Iterator[Dict[str, np.ndarray]]:
+        """
+        按长度分桶产出批次：分片顺序与分片内样本顺序随机打乱后，每 batch_size * bucket_batches 条按长度排序切批，
+        批次顺序再打乱；同一时刻只需读取一个分片，批内只填充到最长样本
+
+        Returns:
+            迭代器，每个批次包含 input_ids / attention_mask / labels（int64 数组）与样本序号 index
+        """
+        rng = np.random.default_rng(seed)
+        starts = np.cumsum([0] + self._manifest["shards"])
+        shard_order = rng.permutation(self.num_shards) if shuffle else range(self.num_shards)
+        for shard_index in shard_order:
+            ids, offsets, labels = self._shard(int(shard_index))
+            lengths = np.diff(offsets)
+            order = rng.permutation(len(lengths)) if shuffle else np.arange(len(lengths))
+            bucket_size = batch_size * max(bucket_batches, 1)
+            batches = []
+            for start in range(0, len(order), bucket_size):
+                bucket = order[start:start + bucket_size]
+                bucket = bucket[np.argsort(lengths[bucket], kind="stable")]
+                batches.extend(bucket[i:i + batch_size] for i in range(0, len(bucket), batch_size))
+            if shuffle:
+                batches = [batches[i] for i in rng.permutation(len(batches))]
+            for batch in batches:
+                if drop_last and len(batch) < batch_size:
+                    continue
+                max_len = int(lengths[batch].max()) if len(batch) else 0
+                input_ids = np.full((len(batch), max_len), pad_token_id, dtype=np.int64)
+                attention_mask = np.zeros((len(batch), max_len), dtype=np.int64)
+                for row, local in enumerate(batch):
+                    tokens = ids[offsets[local]:offsets[local + 1]]
+                    if padding_side == "left":
+                        input_ids[row, max_len - len(tokens):] = tokens
+                        attention_mask[row, max_len - len(tokens):] = 1
+                    else:
+                        input_ids[row, :len(tokens)] = tokens
+                        attention_mask[row, :len(tokens)] = 1
+                yield {
+                    "input_ids": input_ids,
+                    "attention_mask": attention_mask,
+                    "labels": np.asarray(labels[batch], dtype=np.int64),
+                    "index": batch + starts[shard_index],
+                }
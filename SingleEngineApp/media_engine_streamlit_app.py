@@ -7,6 +7,7 @@ import os
 import sys
 import streamlit as st
 from datetime import datetime
+from typing import Optional, TYPE_CHECKING
 import json
 import locale
 from loguru import logger
@@ -27,10 +28,13 @@ except locale.Error:
 # 添加src目录到Python路径
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
-from MediaEngine import DeepSearchAgent, Settings
+from MediaEngine import Settings
 from config import settings
 from utils.github_issues import error_with_issue_link
 
+if TYPE_CHECKING:
+    from MediaEngine import DeepSearchAgent
+
 
 def main():
     """主函数"""
@@ -51,11 +55,13 @@ def main():
         query_params = st.query_params
         auto_query = query_params.get('query', '')
         auto_search = query_params.get('auto_search', 'false').lower() == 'true'
+        resume_run = query_params.get('resume', '')
     except AttributeError:
         # 兼容旧版本
         query_params = st.experimental_get_query_params()
         auto_query = query_params.get('query', [''])[0]
         auto_search = query_params.get('auto_search', ['false'])[0].lower() == 'true'
+        resume_run = query_params.get('resume', [''])[0]
 
     # ----- 配置被硬编码 -----
     # 强制使用 Gemini
@@ -83,7 +89,11 @@ def main():
     start_research = False
     query = auto_query
 
-    if auto_search and auto_query and 'auto_search_executed' not in st.session_state:
+    if resume_run and 'resume_executed' not in st.session_state:
+        # 从断点继续之前中断的研究（?resume=<run_id>）
+        st.session_state.resume_executed = True
+        start_research = True
+    elif auto_search and auto_query and 'auto_search_executed' not in st.session_state:
         st.session_state.auto_search_executed = True
         start_research = True
     elif auto_query and not auto_search:
@@ -91,7 +101,7 @@ def main():
 
     # 验证配置
     if start_research:
-        if not query.strip():
+        if not query.strip() and not resume_run:
             st.error("请输入研究查询")
             logger.error("请输入研究查询")
             return
@@ -122,11 +132,12 @@ def main():
         )
 
         # 执行研究
-        execute_research(query, config)
+        execute_research(query, config, resume_run or None)
 
 
-def execute_research(query: str, config: Settings):
-    """执行研究"""
+def execute_research(query: str, config: Settings, resume_run_id: Optional[str] = None):
+    """执行研究，指定resume_run_id时从该运行的断点继续"""
+    agent = None
     try:
         # 创建进度条
         progress_bar = st.progress(0)
@@ -134,19 +145,27 @@ def execute_research(query: str, config: Settings):
 
         # 初始化Agent
         status_text.text("正在初始化Agent...")
+        # Agent及其LLM、搜索依赖在开始研究时才导入，页面首次打开不必等待
+        from MediaEngine import DeepSearchAgent
         agent = DeepSearchAgent(config)
         st.session_state.agent = agent
 
         progress_bar.progress(10)
 
-        # 生成报告结构
-        status_text.text("正在生成报告结构...")
-        agent._generate_report_structure(query)
+        if resume_run_id:
+            status_text.text(f"正在加载断点 {resume_run_id}...")
+            agent.load_checkpoint(resume_run_id)
+        else:
+            # 生成报告结构
+            status_text.text("正在生成报告结构...")
+            agent._generate_report_structure(query)
         progress_bar.progress(20)
 
         # 处理段落
         total_paragraphs = len(agent.state.paragraphs)
         for i in range(total_paragraphs):
+            if agent.state.paragraphs[i].is_completed():
+                continue
             status_text.text(f"正在处理段落 {i + 1}/{total_paragraphs}: {agent.state.paragraphs[i].title}")
 
             # 初始搜索和总结
@@ -157,6 +176,7 @@ def execute_research(query: str, config: Settings):
             # 反思循环
             agent._reflection_loop(i)
             agent.state.paragraphs[i].research.mark_completed()
+            agent._checkpoint(f"段落{i + 1}完成")
 
             progress_value = 20 + (i + 1) / total_paragraphs * 60
             progress_bar.progress(int(progress_value))
@@ -164,7 +184,7 @@ def execute_research(query: str, config: Settings):
         # 生成最终报告
         status_text.text("正在生成最终报告...")
         logger.info("正在生成最终报告...")
-        final_report = agent._generate_final_report()
+        final_report = agent.state.final_report if agent.state.is_completed else agent._generate_final_report()
         progress_bar.progress(90)
 
         # 保存报告
@@ -187,10 +207,15 @@ def execute_research(query: str, config: Settings):
             app_name="Media Engine Streamlit App"
         )
         st.error(error_display)
+        if agent is not None and agent.state.run_id and config.ENABLE_CHECKPOINTS:
+            st.info(f"已完成的阶段已保存断点，可在地址后加上 ?resume={agent.state.run_id} 继续研究")
         logger.exception(f"研究过程中发生错误: {str(e)}")
+    finally:
+        if agent is not None:
+            agent._finish_run()
 
 
-def display_results(agent: DeepSearchAgent, final_report: str):
+def display_results(agent: "DeepSearchAgent", final_report: str):
     """显示研究结果"""
     st.header("研究结果")
 
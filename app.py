@@ -1,5 +1,6 @@
 """
 Flask主应用 - 统一管理三个Streamlit应用
+ENGINE_RUNTIME=host 时三个引擎改由本进程中的引擎宿主（engine_host.py）运行，研究任务通过 /api/jobs 直接派发
 """
 
 import os
@@ -16,7 +17,7 @@ import requests
 from loguru import logger
 import importlib
 from pathlib import Path
-from MindSpider.main import MindSpider
+from utils.checkpoint import checkpoint_path, list_checkpoints
 
 # 导入ReportEngine
 try:
@@ -224,6 +225,8 @@ def initialize_system_components():
     logs = []
     errors = []
     
+    # MindSpider依赖SQLAlchemy和数据库驱动，启动组件时才导入，不拖慢Flask服务启动
+    from MindSpider.main import MindSpider
     spider = MindSpider()
     if spider.initialize_database():
         logger.info("数据库初始化成功")
@@ -240,22 +243,28 @@ def initialize_system_components():
 
     processes['forum']['status'] = 'stopped'
 
-    for app_name, script_path in STREAMLIT_SCRIPTS.items():
-        logs.append(f"检查文件: {script_path}")
-        if os.path.exists(script_path):
-            success, message = start_streamlit_app(app_name, script_path, processes[app_name]['port'])
+    if _engine_runtime() == 'host':
+        for app_name, (success, message) in start_engine_host().items():
             logs.append(f"{app_name}: {message}")
-            if success:
-                startup_success, startup_message = wait_for_app_startup(app_name, 30)
-                logs.append(f"{app_name} 启动检查: {startup_message}")
-                if not startup_success:
-                    errors.append(f"{app_name} 启动失败: {startup_message}")
-            else:
+            if not success:
                 errors.append(f"{app_name} 启动失败: {message}")
-        else:
-            msg = f"文件不存在: {script_path}"
-            logs.append(f"错误: {msg}")
-            errors.append(f"{app_name}: {msg}")
+    else:
+        for app_name, script_path in STREAMLIT_SCRIPTS.items():
+            logs.append(f"检查文件: {script_path}")
+            if os.path.exists(script_path):
+                success, message = start_streamlit_app(app_name, script_path, processes[app_name]['port'])
+                logs.append(f"{app_name}: {message}")
+                if success:
+                    startup_success, startup_message = wait_for_app_startup(app_name, 30)
+                    logs.append(f"{app_name} 启动检查: {startup_message}")
+                    if not startup_success:
+                        errors.append(f"{app_name} 启动失败: {startup_message}")
+                else:
+                    errors.append(f"{app_name} 启动失败: {message}")
+            else:
+                msg = f"文件不存在: {script_path}"
+                logs.append(f"错误: {msg}")
+                errors.append(f"{app_name}: {msg}")
 
     forum_started = False
     try:
@@ -434,9 +443,15 @@ def monitor_forum_log():
             logger.error(f"Forum日志监听错误: {e}")
             time.sleep(5)
 
-# 启动Forum日志监听线程
-forum_monitor_thread = threading.Thread(target=monitor_forum_log, daemon=True)
-forum_monitor_thread.start()
+forum_monitor_thread = None
+
+
+def start_forum_monitor_thread():
+    """启动Forum日志监听线程（在服务启动时调用，导入本模块不再启动线程）"""
+    global forum_monitor_thread
+    if forum_monitor_thread is None or not forum_monitor_thread.is_alive():
+        forum_monitor_thread = threading.Thread(target=monitor_forum_log, daemon=True)
+        forum_monitor_thread.start()
 
 # 全局变量存储进程信息
 processes = {
@@ -452,6 +467,9 @@ STREAMLIT_SCRIPTS = {
     'query': 'SingleEngineApp/query_engine_streamlit_app.py'
 }
 
+# ENGINE_RUNTIME=host 时运行三个引擎的引擎宿主
+engine_host = None
+
 # 输出队列
 output_queues = {
     'insight': Queue(),
@@ -655,6 +673,56 @@ def stop_streamlit_app(app_name):
     except Exception as e:
         return False, f"停止失败: {str(e)}"
 
+def _engine_runtime():
+    """当前配置的引擎运行方式：streamlit 或 host"""
+    from config import settings
+    return (settings.ENGINE_RUNTIME or 'streamlit').strip().lower()
+
+def get_checkpoint_dir(app_name):
+    """引擎的断点目录，按引擎配置（CHECKPOINT_DIR 或 报告目录/checkpoints）取值，配置修改后立即生效"""
+    from engine_host import engine_checkpoint_dir
+    return engine_checkpoint_dir(app_name)
+
+def handle_engine_log(app_name, line):
+    """引擎宿主的日志回调：与Streamlit子进程的输出一样写入日志文件并推送到前端"""
+    write_log_to_file(app_name, line)
+    socketio.emit('console_output', {
+        'app': app_name,
+        'line': line
+    })
+
+def start_engine_host():
+    """在本进程中启动引擎宿主，返回 {应用名: (是否成功, 说明)}"""
+    global engine_host
+    from config import settings
+    from engine_host import EngineHost
+
+    if engine_host is None:
+        engine_host = EngineHost(list(STREAMLIT_SCRIPTS), settings.ENGINE_HOST_WORKERS, log_handler=handle_engine_log)
+    for app_name in STREAMLIT_SCRIPTS:
+        if engine_host.is_running(app_name):
+            continue
+        # 与启动Streamlit应用时一样清空之前的日志
+        log_file_path = LOG_DIR / f"{app_name}.log"
+        if log_file_path.exists():
+            log_file_path.unlink()
+        write_log_to_file(app_name, f"[{datetime.now().strftime('%H:%M:%S')}] 启动 {app_name} 引擎（引擎宿主）...")
+
+    results = engine_host.start(preload_sentiment=settings.ENGINE_HOST_PRELOAD_SENTIMENT)
+    for app_name, (success, _) in results.items():
+        processes[app_name]['status'] = 'running' if success else 'stopped'
+    return results
+
+def stop_engine_host():
+    """停止引擎宿主，排队中的任务被取消，运行中的任务在后台结束"""
+    global engine_host
+    if engine_host is None:
+        return
+    engine_host.stop()
+    engine_host = None
+    for app_name in STREAMLIT_SCRIPTS:
+        processes[app_name]['status'] = 'stopped'
+
 def check_app_status():
     """检查应用状态"""
     for app_name, info in processes.items():
@@ -704,6 +772,7 @@ def cleanup_processes():
     """清理所有进程"""
     for app_name in STREAMLIT_SCRIPTS:
         stop_streamlit_app(app_name)
+    stop_engine_host()
 
     processes['forum']['status'] = 'stopped'
     try:
@@ -752,6 +821,10 @@ def start_app(app_name):
     if not script_path:
         return jsonify({'success': False, 'message': '该应用不支持启动操作'})
 
+    if _engine_runtime() == 'host':
+        success, message = start_engine_host().get(app_name, (False, '引擎未启动'))
+        return jsonify({'success': success, 'message': message})
+
     success, message = start_streamlit_app(
         app_name,
         script_path,
@@ -781,6 +854,9 @@ def stop_app(app_name):
             logger.exception("手动停止ForumEngine失败")
             return jsonify({'success': False, 'message': f'ForumEngine停止失败: {exc}'})
 
+    if engine_host is not None and app_name in STREAMLIT_SCRIPTS:
+        return jsonify({'success': False, 'message': '引擎宿主中的引擎随系统一起启停'})
+
     success, message = stop_streamlit_app(app_name)
     return jsonify({'success': success, 'message': message})
 
@@ -906,6 +982,23 @@ def search():
     if not running_apps:
         return jsonify({'success': False, 'message': '没有运行中的应用'})
     
+    # 引擎宿主模式下直接在本进程派发研究任务，返回任务ID，进度通过 /api/jobs/<job_id> 查询
+    if engine_host is not None:
+        results = {}
+        for app_name in running_apps:
+            if not engine_host.is_running(app_name):
+                continue
+            try:
+                job = engine_host.submit(app_name, query)
+                results[app_name] = {'success': True, 'job_id': job.job_id}
+            except ValueError as e:
+                results[app_name] = {'success': False, 'message': str(e)}
+        return jsonify({
+            'success': True,
+            'query': query,
+            'results': results
+        })
+    
     # 向运行中的应用发送搜索请求
     results = {}
     api_ports = {'insight': 8601, 'media': 8602, 'query': 8603}
@@ -936,6 +1029,98 @@ def search():
     })
 
 
+@app.route('/api/checkpoints/<app_name>')
+def get_checkpoints(app_name):
+    """列出引擎中断后可以继续的研究"""
+    if app_name not in STREAMLIT_SCRIPTS:
+        return jsonify({'success': False, 'message': '未知应用'})
+
+    include_completed = request.args.get('include_completed', 'false').lower() == 'true'
+    runs = list_checkpoints(get_checkpoint_dir(app_name), include_completed)
+    return jsonify({'success': True, 'runs': runs})
+
+@app.route('/api/resume/<app_name>', methods=['POST'])
+def resume_research(app_name):
+    """从断点继续研究，返回带resume参数的应用地址，由前端在对应的页面中打开"""
+    if app_name not in STREAMLIT_SCRIPTS:
+        return jsonify({'success': False, 'message': '未知应用'})
+
+    data = request.get_json() or {}
+    run_id = str(data.get('run_id', '')).strip()
+    try:
+        path = checkpoint_path(get_checkpoint_dir(app_name), run_id)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)})
+    if not os.path.exists(path):
+        return jsonify({'success': False, 'message': f'未找到运行 {run_id} 的断点'})
+
+    check_app_status()
+    if processes[app_name]['status'] != 'running':
+        return jsonify({'success': False, 'message': f'{app_name} 应用未运行'})
+
+    # 引擎宿主模式下直接派发继续研究的任务
+    if engine_host is not None:
+        try:
+            job = engine_host.submit(app_name, resume_run_id=run_id)
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)})
+        return jsonify({'success': True, 'run_id': run_id, 'job_id': job.job_id})
+
+    host = request.host.split(':')[0]
+    url = f"http://{host}:{processes[app_name]['port']}?resume={run_id}"
+    return jsonify({'success': True, 'run_id': run_id, 'url': url})
+
+
+@app.route('/api/jobs', methods=['POST'])
+def submit_jobs():
+    """引擎宿主模式下派发研究任务，body: {"query": ..., "engines": ["insight", ...]}（engines可省略，默认全部运行中的引擎）"""
+    if engine_host is None:
+        return jsonify({'success': False, 'message': '引擎宿主未运行（ENGINE_RUNTIME=host 并启动系统后可用）'}), 400
+
+    data = request.get_json(silent=True) or {}
+    query = str(data.get('query', '')).strip()
+    if not query:
+        return jsonify({'success': False, 'message': '搜索查询不能为空'}), 400
+    engines = data.get('engines') or [name for name in STREAMLIT_SCRIPTS if engine_host.is_running(name)]
+
+    jobs = {}
+    for engine in engines:
+        try:
+            jobs[engine] = {'success': True, **engine_host.submit(engine, query).to_dict()}
+        except ValueError as e:
+            jobs[engine] = {'success': False, 'message': str(e)}
+    return jsonify({'success': True, 'query': query, 'jobs': jobs})
+
+
+@app.route('/api/jobs', methods=['GET'])
+def list_jobs():
+    """列出引擎宿主中的研究任务，可按 ?engine= 过滤"""
+    if engine_host is None:
+        return jsonify({'success': True, 'jobs': []})
+    engine = request.args.get('engine') or None
+    return jsonify({'success': True, 'jobs': [job.to_dict() for job in engine_host.list_jobs(engine)]})
+
+
+@app.route('/api/jobs/<job_id>')
+def get_job(job_id):
+    """查询研究任务的状态和进度，?include_report=true 时返回报告内容"""
+    job = engine_host.get_job(job_id) if engine_host is not None else None
+    if job is None:
+        return jsonify({'success': False, 'message': f'未找到任务 {job_id}'}), 404
+    include_report = request.args.get('include_report', 'false').lower() == 'true'
+    return jsonify({'success': True, 'job': job.to_dict(include_report)})
+
+
+@app.route('/api/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    """取消排队中的研究任务"""
+    if engine_host is None or engine_host.get_job(job_id) is None:
+        return jsonify({'success': False, 'message': f'未找到任务 {job_id}'}), 404
+    if not engine_host.cancel(job_id):
+        return jsonify({'success': False, 'message': '只能取消排队中的任务'})
+    return jsonify({'success': True, 'job_id': job_id})
+
+
 @app.route('/api/config', methods=['GET'])
 def get_config():
     """Expose selected configuration values to the frontend."""
@@ -1032,6 +1217,8 @@ if __name__ == '__main__':
     HOST = settings.HOST
     PORT = settings.PORT
     
+    start_forum_monitor_thread()
+    
     logger.info("等待配置确认，系统将在前端指令后启动组件...")
     logger.info(f"Flask服务器已启动，访问地址: http://{HOST}:{PORT}")
     
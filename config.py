@@ -28,6 +28,9 @@ class Settings(BaseSettings):
     # ================== Flask 服务器配置 ====================
     HOST: str = Field("0.0.0.0", description="Flask服务器主机地址，默认0.0.0.0（允许外部访问）")
     PORT: int = Field(5000, description="Flask服务器端口号，默认5000")
+    ENGINE_RUNTIME: str = Field("streamlit", description="引擎运行方式：streamlit 为三个引擎各启动一个Streamlit子进程；host 在Flask进程中以工作线程运行三个引擎，共用LLM客户端、数据库连接池和情感模型，研究任务通过 /api/jobs 直接派发")
+    ENGINE_HOST_WORKERS: int = Field(1, description="host模式下每个引擎同时执行的研究任务数，其余任务排队")
+    ENGINE_HOST_PRELOAD_SENTIMENT: bool = Field(True, description="host模式启动时在后台预先加载情感分析模型")
 
     # ====================== 数据库配置 ======================
     DB_DIALECT: str = Field("mysql", description="数据库类型，例如 'mysql' 或 'postgresql'。用于支持多种数据库后端（如 SQLAlchemy，请与连接信息共同配置）")
@@ -87,10 +90,28 @@ class Settings(BaseSettings):
     DEFAULT_SEARCH_TOPIC_ON_PLATFORM_LIMIT: int = Field(200, description="平台搜索话题最大数")
     MAX_SEARCH_RESULTS_FOR_LLM: int = Field(0, description="供LLM用搜索结果最大数")
     MAX_HIGH_CONFIDENCE_SENTIMENT_RESULTS: int = Field(0, description="高置信度情感分析最大数")
+    SENTIMENT_MODEL_SERVER: Optional[str] = Field(None, description="情感模型推理服务地址（python SentimentAnalysisModel/model_server.py 启动），如http://127.0.0.1:8765或unix:///tmp/bettafish_models.sock，为空则各引擎在本进程加载模型")
     MAX_REFLECTIONS: int = Field(3, description="最大反思次数")
+    RESEARCH_PREFETCH_PARAGRAPHS: int = Field(1, description="段落总结时提前进行搜索规划和搜索的后续段落数，0表示不提前")
+    RESULT_STORE_PATH: str = Field("cache/search_results.db", description="搜索结果去重存储（SQLite）路径，研究状态中只保存结果ID")
+    RESULT_RETENTION_DAYS: int = Field(30, description="搜索结果存储的保留天数，超过该天数未再出现且没有断点引用的结果在引擎启动时清理，0表示不清理")
+    NEAR_DUPLICATE_INDEX_PATH: Optional[str] = Field("cache/near_duplicates.db", description="搜索结果近似重复索引（SQLite）路径，为空则只保存在内存中")
+    NEAR_DUPLICATE_MAX_DISTANCE: int = Field(3, description="SimHash汉明距离不超过该值的搜索结果视为近似重复")
+    NEAR_DUPLICATE_CROSS_RUN: bool = Field(False, description="是否跨研究运行去重（开启后近期运行中出现过的内容也会被去掉）")
+    ENABLE_CHECKPOINTS: bool = Field(True, description="是否在每次总结后保存断点，用于中断后从断点继续研究")
+    RESEARCH_LLM_CONCURRENCY: int = Field(2, description="研究流程中同时进行的LLM调用数上限")
+    RESEARCH_SEARCH_CONCURRENCY: int = Field(4, description="研究流程中同时进行的网络搜索数上限")
+    RESEARCH_DB_CONCURRENCY: int = Field(2, description="研究流程中同时进行的数据库查询数上限")
     MAX_PARAGRAPHS: int = Field(6, description="最大段落数")
     SEARCH_TIMEOUT: int = Field(240, description="单次搜索请求超时")
+    SEARCH_BACKEND: str = Field("live", description="搜索后端：live调用真实API，fake使用离线模拟结果（用于压测，无需API密钥）")
+    SEARCH_CACHE_DIR: Optional[str] = Field("cache/search", description="搜索结果磁盘缓存目录，多个引擎和多次运行共享，为空则只缓存在内存")
+    SEARCH_CACHE_TTL: int = Field(21600, description="搜索结果缓存有效期（秒），0表示关闭缓存")
+    SEARCH_MAX_WORKERS: int = Field(8, description="批量搜索的最大并发数")
+    SEARCH_FAKE_LATENCY: float = Field(0.0, description="fake后端每次搜索的模拟耗时（秒）")
+    SPECULATIVE_SEARCH: bool = Field(True, description="搜索规划输出search_query与search_tool后立即用所选工具在后台开始搜索（需开启搜索缓存）")
     MAX_CONTENT_LENGTH: int = Field(500000, description="搜索最大内容长度")
+    SEARCH_RESULTS_TOKEN_BUDGET: int = Field(12000, description="每次总结提示词中搜索结果的token预算，超出时去重并按热度、互动量、时间和情感置信度分层挑选，0表示不限制")
     
     model_config = ConfigDict(
         env_file=ENV_FILE,
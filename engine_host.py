@@ -0,0 +1,347 @@
+"""
+引擎宿主
+在主应用进程中以受管理的工作线程运行 Insight / Media / Query 三个 DeepSearchAgent，替代三个Streamlit子进程：
+- 同一引擎的任务共用一个LLM客户端；数据库连接池、情感分析模型、搜索网关、结果存储和近似重复索引
+  本来就是进程内单例，三个引擎只加载一份（搜索网关沿用第一个创建它的引擎配置中的后端、缓存和并发参数）
+- 研究任务由 submit / resume 直接派发到引擎的线程池，不再经过本机HTTP转发
+- 任务状态（段落进度、运行ID、报告、错误）可随时查询，失败的任务可按运行ID从断点继续
+- 引擎日志按原格式写入 logs/<engine>.log，ForumEngine 的日志监控无需改动
+选择线程而不是进程池：研究流程主要在等待LLM和搜索接口，线程足够，且共享资源只能在同一进程内共用。
+Streamlit 应用仍可单独运行，作为可选的界面。
+"""
+
+import importlib
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from loguru import logger
+
+# 引擎名 -> 包名
+ENGINE_PACKAGES = {
+    "insight": "InsightEngine",
+    "media": "MediaEngine",
+    "query": "QueryEngine",
+}
+
+# 报告与断点目录与Streamlit应用一致，两种运行方式下的断点可以互相继续，ReportEngine也从这里读取报告
+ENGINE_OUTPUT_DIRS = {
+    "insight": "insight_engine_streamlit_reports",
+    "media": "media_engine_streamlit_reports",
+    "query": "query_engine_streamlit_reports",
+}
+
+# 与 loguru 默认格式一致，ForumEngine 按该格式解析引擎日志
+LOG_FORMAT = "{time:YYYY-MM-DD HH:mm:ss.SSS} | {level: <8} | {name}:{function}:{line} - {message}"
+
+
+def build_engine_config(engine: str):
+    """
+    按根目录配置构造引擎的Settings（取值与对应的Streamlit应用相同）
+
+    Raises:
+        ValueError: 未知引擎或缺少必需的API密钥
+    """
+    if engine not in ENGINE_PACKAGES:
+        raise ValueError(f"未知引擎: {engine}")
+    from config import settings
+
+    prefix = f"{engine.upper()}_ENGINE"
+    if not getattr(settings, f"{prefix}_API_KEY"):
+        raise ValueError(f"请在您的配置文件中设置{prefix}_API_KEY")
+    offline = settings.SEARCH_BACKEND == "fake"
+    if engine == "media" and not (settings.BOCHA_WEB_SEARCH_API_KEY or offline):
+        raise ValueError("请在您的配置文件中设置BOCHA_WEB_SEARCH_API_KEY")
+    if engine == "query" and not (settings.TAVILY_API_KEY or offline):
+        raise ValueError("请在您的配置文件中设置TAVILY_API_KEY")
+
+    values: Dict[str, Any] = {
+        f"{prefix}_API_KEY": getattr(settings, f"{prefix}_API_KEY"),
+        f"{prefix}_BASE_URL": getattr(settings, f"{prefix}_BASE_URL"),
+        f"{prefix}_MODEL_NAME": getattr(settings, f"{prefix}_MODEL_NAME"),
+        "MAX_REFLECTIONS": 2,
+        "OUTPUT_DIR": ENGINE_OUTPUT_DIRS[engine],
+    }
+    if engine == "insight":
+        values.update(
+            DB_HOST=settings.DB_HOST,
+            DB_USER=settings.DB_USER,
+            DB_PASSWORD=settings.DB_PASSWORD,
+            DB_NAME=settings.DB_NAME,
+            DB_PORT=settings.DB_PORT,
+            DB_CHARSET=settings.DB_CHARSET,
+            DB_DIALECT=settings.DB_DIALECT,
+            MAX_CONTENT_LENGTH=500000,  # Kimi支持长文本
+        )
+    elif engine == "media":
+        values.update(BOCHA_WEB_SEARCH_API_KEY=settings.BOCHA_WEB_SEARCH_API_KEY, SEARCH_CONTENT_MAX_LENGTH=20000)
+    else:
+        values.update(TAVILY_API_KEY=settings.TAVILY_API_KEY, SEARCH_CONTENT_MAX_LENGTH=20000)
+
+    config_module = importlib.import_module(f"{ENGINE_PACKAGES[engine]}.utils.config")
+    return config_module.Settings(**values)
+
+
+def engine_checkpoint_dir(engine: str) -> str:
+    """
+    引擎的断点目录：引擎配置中的 CHECKPOINT_DIR，未设置时为 <报告目录>/checkpoints（与Agent中的取值规则一致）
+
+    Raises:
+        ValueError: 未知引擎
+    """
+    if engine not in ENGINE_PACKAGES:
+        raise ValueError(f"未知引擎: {engine}")
+    try:
+        config_module = importlib.import_module(f"{ENGINE_PACKAGES[engine]}.utils.config")
+        config = config_module.Settings(OUTPUT_DIR=ENGINE_OUTPUT_DIRS[engine])
+    except Exception as e:
+        # 其他配置项（如API密钥）不完整时仍可列出断点，只是无法读取自定义的 CHECKPOINT_DIR
+        logger.warning(f"{engine} 引擎配置加载失败，使用默认断点目录: {e}")
+        return os.path.join(ENGINE_OUTPUT_DIRS[engine], "checkpoints")
+    return config.CHECKPOINT_DIR or os.path.join(config.OUTPUT_DIR, "checkpoints")
+
+
+@dataclass
+class EngineJob:
+    """一个研究任务"""
+    job_id: str
+    engine: str
+    query: str = ""
+    resume_run_id: Optional[str] = None       # 从该运行的断点继续
+    status: str = "queued"                    # queued / running / completed / failed / cancelled
+    run_id: Optional[str] = None              # 研究开始后由Agent生成，可用于断点继续
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    total_paragraphs: int = 0
+    completed_paragraphs: int = 0
+    report: Optional[str] = None
+    error: Optional[str] = None
+    agent: Any = field(default=None, repr=False)
+    future: Optional[Future] = field(default=None, repr=False)
+
+    def refresh_progress(self):
+        """从运行中的Agent读取运行ID和段落进度"""
+        agent = self.agent
+        if agent is None:
+            return
+        state = agent.state
+        self.run_id = state.run_id or self.run_id
+        if state.query and not self.query:
+            self.query = state.query
+        self.total_paragraphs = state.get_total_paragraphs_count()
+        self.completed_paragraphs = state.get_completed_paragraphs_count()
+
+    def to_dict(self, include_report: bool = False) -> Dict[str, Any]:
+        self.refresh_progress()
+        data = {
+            "job_id": self.job_id,
+            "engine": self.engine,
+            "query": self.query,
+            "resume_run_id": self.resume_run_id,
+            "status": self.status,
+            "run_id": self.run_id,
+            "created_at": datetime.fromtimestamp(self.created_at).isoformat(),
+            "started_at": datetime.fromtimestamp(self.started_at).isoformat() if self.started_at else None,
+            "finished_at": datetime.fromtimestamp(self.finished_at).isoformat() if self.finished_at else None,
+            "total_paragraphs": self.total_paragraphs,
+            "completed_paragraphs": self.completed_paragraphs,
+            "error": self.error,
+        }
+        if include_report:
+            data["report"] = self.report
+        return data
+
+
+class EngineHost:
+    """在本进程中托管三个引擎的研究任务"""
+
+    def __init__(self, engines: Optional[List[str]] = None, workers_per_engine: int = 1,
+                 log_handler: Optional[Callable[[str, str], None]] = None, max_finished_jobs: int = 200):
+        """
+        Args:
+            engines: 托管的引擎，默认全部
+            workers_per_engine: 每个引擎同时执行的任务数，其余任务排队
+            log_handler: 引擎日志回调 (引擎名, 日志行)，日志行已带 [HH:MM:SS] 前缀
+            max_finished_jobs: 保留的已结束任务数，更早的任务从列表中移除
+        """
+        self.engines = list(engines or ENGINE_PACKAGES)
+        unknown = [engine for engine in self.engines if engine not in ENGINE_PACKAGES]
+        if unknown:
+            raise ValueError(f"未知引擎: {', '.join(unknown)}")
+        self.workers_per_engine = max(1, workers_per_engine)
+        self.log_handler = log_handler
+        self.max_finished_jobs = max_finished_jobs
+        self._executors: Dict[str, ThreadPoolExecutor] = {}
+        self._agent_classes: Dict[str, type] = {}
+        self._llm_clients: Dict[str, Any] = {}
+        self._jobs: Dict[str, EngineJob] = {}
+        self._lock = threading.Lock()
+        self._sink_ids: List[int] = []
+
+    @property
+    def running(self) -> bool:
+        return bool(self._executors)
+
+    def start(self, preload_sentiment: bool = False) -> Dict[str, Tuple[bool, str]]:
+        """
+        导入各引擎的Agent并创建工作线程池，导入失败的引擎不启动
+
+        Args:
+            preload_sentiment: 是否在后台预先加载情感分析模型（否则由第一个Insight任务加载）
+
+        Returns:
+            {引擎名: (是否成功, 说明)}
+        """
+        results = {}
+        for engine in self.engines:
+            if engine in self._executors:
+                results[engine] = (True, "已在运行")
+                continue
+            package = ENGINE_PACKAGES[engine]
+            try:
+                self._agent_classes[engine] = importlib.import_module(f"{package}.agent").DeepSearchAgent
+            except Exception as e:
+                logger.exception(f"引擎宿主: 导入 {package} 失败: {e}")
+                results[engine] = (False, f"导入失败: {e}")
+                continue
+            self._executors[engine] = ThreadPoolExecutor(max_workers=self.workers_per_engine,
+                                                         thread_name_prefix=f"{package}-host")
+            if self.log_handler is not None:
+                self._sink_ids.append(logger.add(self._make_sink(engine), format=LOG_FORMAT,
+                                                 filter=self._make_filter(package), colorize=False))
+            results[engine] = (True, "启动成功")
+
+        if preload_sentiment and "insight" in self._executors:
+            # 在Insight的工作线程中加载，不阻塞启动；之后的Insight任务排在加载之后
+            from InsightEngine.tools import multilingual_sentiment_analyzer
+            self._executors["insight"].submit(multilingual_sentiment_analyzer.initialize)
+        logger.info(f"引擎宿主已启动: {', '.join(sorted(self._executors))}")
+        return results
+
+    def stop(self, wait: bool = False):
+        """停止接收任务，取消排队中的任务；wait为True时等待运行中的任务结束"""
+        with self._lock:
+            executors, self._executors = self._executors, {}
+            for job in self._jobs.values():
+                if job.status == "queued" and job.future is not None and job.future.cancel():
+                    self._finish(job, "cancelled")
+        for executor in executors.values():
+            executor.shutdown(wait=wait)
+        for sink_id in self._sink_ids:
+            logger.remove(sink_id)
+        self._sink_ids = []
+        with self._lock:
+            self._llm_clients = {}
+
+    def is_running(self, engine: str) -> bool:
+        return engine in self._executors
+
+    def submit(self, engine: str, query: str = "", resume_run_id: Optional[str] = None) -> EngineJob:
+        """
+        派发一个研究任务
+
+        Args:
+            engine: 引擎名
+            query: 研究查询
+            resume_run_id: 指定时从该运行的断点继续（忽略query）
+
+        Raises:
+            ValueError: 引擎未运行、查询为空或配置缺失
+        """
+        if not self.is_running(engine):
+            raise ValueError(f"{engine} 引擎未运行")
+        if not query.strip() and not resume_run_id:
+            raise ValueError("研究查询不能为空")
+        config = build_engine_config(engine)
+        job = EngineJob(job_id=uuid.uuid4().hex[:12], engine=engine, query=query.strip(),
+                        resume_run_id=resume_run_id)
+        with self._lock:
+            self._jobs[job.job_id] = job
+            self._prune_jobs()
+            job.future = self._executors[engine].submit(self._run_job, job, config)
+        logger.info(f"引擎宿主: 已派发任务 {job.job_id}（{engine}）")
+        return job
+
+    def submit_all(self, query: str) -> Dict[str, EngineJob]:
+        """向所有运行中的引擎派发同一查询，返回 {引擎名: 任务}（先检查各引擎配置，全部可用时才派发）"""
+        for engine in self._executors:
+            build_engine_config(engine)
+        return {engine: self.submit(engine, query) for engine in list(self._executors)}
+
+    def get_job(self, job_id: str) -> Optional[EngineJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list_jobs(self, engine: Optional[str] = None) -> List[EngineJob]:
+        """按派发时间倒序列出任务"""
+        with self._lock:
+            jobs = [job for job in self._jobs.values() if engine is None or job.engine == engine]
+        return sorted(jobs, key=lambda job: job.created_at, reverse=True)
+
+    def cancel(self, job_id: str) -> bool:
+        """取消排队中的任务（运行中的任务无法中途停止，可在结束后按运行ID继续）"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.status != "queued" or job.future is None or not job.future.cancel():
+                return False
+            self._finish(job, "cancelled")
+        return True
+
+    def _run_job(self, job: EngineJob, config):
+        job.status = "running"
+        job.started_at = time.time()
+        try:
+            with self._lock:
+                llm_client = self._llm_clients.get(job.engine)
+            agent = self._agent_classes[job.engine](config, llm_client=llm_client)
+            # 第一个任务创建的LLM客户端由该引擎后续的任务共用
+            with self._lock:
+                self._llm_clients.setdefault(job.engine, agent.llm_client)
+            job.agent = agent
+            if job.resume_run_id:
+                job.report = agent.resume(job.resume_run_id)
+            else:
+                job.report = agent.research(job.query, save_report=True)
+            status = "completed"
+        except Exception as e:
+            logger.exception(f"引擎宿主: 任务 {job.job_id}（{job.engine}）失败: {e}")
+            job.error = str(e)
+            status = "failed"
+        job.refresh_progress()
+        job.agent = None
+        with self._lock:
+            self._finish(job, status)
+        return job.report
+
+    def _finish(self, job: EngineJob, status: str):
+        job.status = status
+        job.finished_at = time.time()
+
+    def _prune_jobs(self):
+        finished = [job for job in self._jobs.values() if job.finished_at is not None]
+        if len(finished) <= self.max_finished_jobs:
+            return
+        finished.sort(key=lambda job: job.finished_at)
+        for job in finished[:len(finished) - self.max_finished_jobs]:
+            del self._jobs[job.job_id]
+
+    @staticmethod
+    def _make_filter(package: str) -> Callable[[Dict[str, Any]], bool]:
+        # 引擎模块的日志，以及引擎工作线程、段落预取线程中其他模块（如共享的utils）的日志
+        def accept(record: Dict[str, Any]) -> bool:
+            return (record["name"] or "").startswith(package) or record["thread"].name.startswith(package)
+        return accept
+
+    def _make_sink(self, engine: str) -> Callable[[Any], None]:
+        def sink(message):
+            timestamp = datetime.now().strftime("%H:%M:%S")
+            for line in str(message).splitlines():
+                if line.strip():
+                    self.log_handler(engine, f"[{timestamp}] {line.strip()}")
+        return sink
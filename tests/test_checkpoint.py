@@ -0,0 +1,140 @@
+"""
+测试utils/checkpoint.py中的断点保存与恢复
+
+覆盖写入与读取往返、原子替换写入、断点列表的排序与过滤，以及按引擎配置取断点目录
+"""
+
+import json
+import os
+import re
+import sys
+from pathlib import Path
+
+import pytest
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from utils import checkpoint
+from utils.checkpoint import (
+    checkpoint_path,
+    list_checkpoints,
+    new_run_id,
+    read_checkpoint,
+    write_checkpoint,
+)
+
+
+def make_state(query: str, updated_at: str, completed_paragraphs: int = 0, total: int = 3,
+               is_completed: bool = False):
+    paragraphs = [{"title": f"段落{i}", "research": {"is_completed": i < completed_paragraphs}}
+                  for i in range(total)]
+    return {"query": query, "report_title": f"{query}报告", "paragraphs": paragraphs,
+            "is_completed": is_completed, "updated_at": updated_at}
+
+
+class TestWriteAndRead:
+    """测试断点写入与读取"""
+
+    def test_round_trip(self, tmp_path):
+        state = make_state("新能源汽车", "2024-01-01T10:00:00", completed_paragraphs=1)
+        state["paragraphs"][0]["research"]["latest_summary"] = "包含\"引号\"与换行\n的总结"
+        path = write_checkpoint(str(tmp_path / "checkpoints"), "run_1", state)
+        assert path == os.path.join(str(tmp_path / "checkpoints"), "run_1.json")
+        assert read_checkpoint(str(tmp_path / "checkpoints"), "run_1") == state
+        # 中文不转义，断点文件可直接阅读
+        assert "新能源汽车" in Path(path).read_text(encoding="utf-8")
+
+    def test_missing_checkpoint(self, tmp_path):
+        with pytest.raises(FileNotFoundError):
+            read_checkpoint(str(tmp_path), "run_1")
+
+    @pytest.mark.parametrize("run_id", ["", "../escape", "a/b", "带中文", "x" * 65])
+    def test_invalid_run_id(self, tmp_path, run_id):
+        with pytest.raises(ValueError):
+            checkpoint_path(str(tmp_path), run_id)
+        with pytest.raises(ValueError):
+            write_checkpoint(str(tmp_path), run_id, {})
+
+    def test_new_run_id_is_valid_and_unique(self):
+        ids = {new_run_id() for _ in range(50)}
+        assert len(ids) == 50
+        assert all(re.match(r"^\d{8}_\d{6}_[0-9a-f]{6}$", run_id) for run_id in ids)
+
+
+class TestAtomicWrite:
+    """测试先写临时文件再替换"""
+
+    def test_replaces_existing_without_leaving_temp_files(self, tmp_path):
+        write_checkpoint(str(tmp_path), "run_1", {"version": 1})
+        write_checkpoint(str(tmp_path), "run_1", {"version": 2})
+        assert read_checkpoint(str(tmp_path), "run_1") == {"version": 2}
+        assert os.listdir(tmp_path) == ["run_1.json"]
+
+    def test_failed_write_keeps_previous_checkpoint(self, tmp_path, monkeypatch):
+        """写入过程中出错时，原断点保持完整"""
+        write_checkpoint(str(tmp_path), "run_1", {"version": 1})
+
+        def broken_dump(data, f, **kwargs):
+            f.write('{"version": ')
+            raise OSError("磁盘已满")
+
+        monkeypatch.setattr(checkpoint.json, "dump", broken_dump)
+        with pytest.raises(OSError):
+            write_checkpoint(str(tmp_path), "run_1", {"version": 2})
+        monkeypatch.undo()
+        assert read_checkpoint(str(tmp_path), "run_1") == {"version": 1}
+
+
+class TestListCheckpoints:
+    """测试断点列表"""
+
+    def test_sorted_newest_first_with_progress(self, tmp_path):
+        write_checkpoint(str(tmp_path), "run_old", make_state("旧查询", "2024-01-01T10:00:00", 3, 3))
+        write_checkpoint(str(tmp_path), "run_new", make_state("新查询", "2024-01-02T10:00:00", 1, 4))
+        write_checkpoint(str(tmp_path), "run_mid", make_state("中间", "2024-01-01T12:00:00"))
+        runs = list_checkpoints(str(tmp_path))
+        assert [run["run_id"] for run in runs] == ["run_new", "run_mid", "run_old"]
+        assert runs[0] == {
+            "run_id": "run_new", "query": "新查询", "report_title": "新查询报告", "total_paragraphs": 4,
+            "completed_paragraphs": 1, "is_completed": False, "updated_at": "2024-01-02T10:00:00",
+        }
+
+    def test_completed_runs_filtered_by_default(self, tmp_path):
+        write_checkpoint(str(tmp_path), "run_done", make_state("完成", "2024-01-02", 3, is_completed=True))
+        write_checkpoint(str(tmp_path), "run_open", make_state("未完成", "2024-01-01"))
+        assert [run["run_id"] for run in list_checkpoints(str(tmp_path))] == ["run_open"]
+        assert [run["run_id"] for run in list_checkpoints(str(tmp_path), include_completed=True)] == \
+            ["run_done", "run_open"]
+
+    def test_skips_broken_and_unrelated_files(self, tmp_path):
+        write_checkpoint(str(tmp_path), "run_1", make_state("查询", "2024-01-01"))
+        (tmp_path / "broken.json").write_text("{", encoding="utf-8")
+        (tmp_path / "run_1.json.123.456.tmp").write_text(json.dumps({"query": "临时"}), encoding="utf-8")
+        (tmp_path / "notes.txt").write_text("无关文件", encoding="utf-8")
+        (tmp_path / "bad name.json").write_text(json.dumps({"query": "非法ID"}), encoding="utf-8")
+        assert [run["run_id"] for run in list_checkpoints(str(tmp_path))] == ["run_1"]
+
+    def test_missing_directory(self, tmp_path):
+        assert list_checkpoints(str(tmp_path / "none")) == []
+
+
+class TestEngineCheckpointDir:
+    """测试按引擎配置取断点目录"""
+
+    def test_defaults_to_output_dir(self, monkeypatch):
+        from engine_host import ENGINE_OUTPUT_DIRS, engine_checkpoint_dir
+
+        monkeypatch.delenv("CHECKPOINT_DIR", raising=False)
+        if os.path.exists(project_root / ".env"):
+            pytest.skip(".env 中的配置可能覆盖默认值")
+        assert engine_checkpoint_dir("media") == os.path.join(ENGINE_OUTPUT_DIRS["media"], "checkpoints")
+
+    def test_respects_configured_checkpoint_dir(self, tmp_path, monkeypatch):
+        from engine_host import engine_checkpoint_dir
+
+        monkeypatch.setenv("CHECKPOINT_DIR", str(tmp_path / "custom"))
+        assert engine_checkpoint_dir("insight") == str(tmp_path / "custom")
+        with pytest.raises(ValueError):
+            engine_checkpoint_dir("report")
@@ -0,0 +1,128 @@
+"""
+测试ReportEngine/utils/context_packer.py中的报告输入打包
+
+覆盖token预算、按相关度保留片段、近似重复去除，以及切块后按原始分隔符拼回（论坛日志保持每行一条发言）
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from ReportEngine.utils import context_packer
+from ReportEngine.utils.context_packer import ContextPacker, split_forum_log, split_markdown
+from utils.text_metrics import estimate_tokens
+
+TOPICS = [
+    "新能源汽车销量增长，电池续航与充电网络成为讨论焦点",
+    "外卖平台骑手权益保障引发热议，平台算法与配送时间受到质疑",
+    "高校毕业生就业形势严峻，考研考公人数持续上升",
+    "短视频平台直播带货乱象，虚假宣传与售后问题频发",
+    "城市房价走势分化，一线城市成交回暖而三四线城市库存高企",
+    "极端天气频发，防汛抗旱与城市排水系统建设备受关注",
+]
+
+
+def make_report(title: str, topics) -> str:
+    sections = [f"# {title}\n\n本报告汇总{title}的主要发现。"]
+    for number, topic in enumerate(topics, start=1):
+        sections.append(f"## 第{number}节\n\n{topic}。")
+    return "\n\n".join(sections)
+
+
+@pytest.fixture(autouse=True)
+def estimated_tokens(monkeypatch):
+    """token数统一按估算，结果不依赖是否安装tiktoken及能否下载编码文件"""
+    monkeypatch.setattr(context_packer, "get_token_counter", lambda model_name="": estimate_tokens)
+
+
+def make_packer(budget: int, chunk_tokens: int = 200) -> ContextPacker:
+    return ContextPacker(token_budget=budget, chunk_tokens=chunk_tokens)
+
+
+class TestSplitters:
+    """测试切块与原始分隔符"""
+
+    def test_split_markdown_by_heading(self):
+        report = make_report("洞察报告", TOPICS[:2])
+        pieces = split_markdown(report, 500, estimate_tokens)
+        assert [text.splitlines()[0] for _, text in pieces] == ["# 洞察报告", "## 第1节", "## 第2节"]
+        assert all(separator == "\n\n" for separator, _ in pieces[1:])
+        assert "".join(separator + piece for separator, piece in pieces) == report
+
+    def test_oversized_split_keeps_separators(self):
+        """超长块按段落切开，拼回后与原文一致"""
+        text = "第一段内容很长很长。\n\n第二段内容很长很长。\n第三段内容很长很长。"
+        pieces = split_markdown(text, 12, estimate_tokens)
+        assert len(pieces) > 1
+        assert "".join(separator + piece for separator, piece in pieces) == text
+
+    def test_split_forum_log_breaks_between_speeches(self):
+        lines = [f"[10:00:{second:02d}] [INSIGHT] 第{second}条发言，内容较长需要单独成块。" for second in range(6)]
+        pieces = split_forum_log("\n".join(lines), 40, estimate_tokens)
+        assert len(pieces) > 1
+        assert all(separator == "\n" for separator, _ in pieces[1:])
+        assert "".join(separator + piece for separator, piece in pieces) == "\n".join(lines)
+
+
+class TestContextPacker:
+    """测试token预算内的装箱"""
+
+    def test_under_budget_returns_sources_unchanged(self):
+        sources = {"insight": make_report("洞察报告", TOPICS[:2])}
+        packed, stats = make_packer(100000).pack("新能源汽车", sources)
+        assert packed == sources
+        assert stats["dropped_chunks"] == 0
+
+    def test_packed_context_stays_within_budget(self):
+        sources = {
+            "insight": make_report("洞察报告", TOPICS),
+            "media": make_report("媒体报告", TOPICS[::-1]),
+            "query": make_report("新闻报告", TOPICS[1:] + TOPICS[:1]),
+        }
+        budget = 300
+        packer = make_packer(budget)
+        packed, stats = packer.pack("新能源汽车电池续航", sources)
+        assert stats["input_tokens"] > budget
+        assert 0 < stats["packed_tokens"] <= budget
+        assert stats["dropped_chunks"] > 0
+        chunk_tokens = sum(estimate_tokens(piece) for text in packed.values()
+                           for _, piece in split_markdown(text, 10000, estimate_tokens))
+        assert chunk_tokens <= budget + len(packed)
+
+    def test_keeps_leading_and_most_relevant_chunks(self):
+        """每个来源的第一个片段与相关度最高的片段保留，不相关的片段被舍弃"""
+        sources = {
+            "insight": make_report("洞察报告", TOPICS[1:4]),
+            "media": make_report("媒体报告", [TOPICS[4], TOPICS[0], TOPICS[5]]),
+        }
+        packed, _ = make_packer(200).pack("新能源汽车销量 电池续航 充电网络", sources)
+        assert packed["insight"].startswith("# 洞察报告")
+        assert packed["media"].startswith("# 媒体报告")
+        assert TOPICS[0] in packed["media"]
+        assert TOPICS[5] not in packed["media"]
+
+    def test_near_duplicates_removed_across_sources(self):
+        """不同来源中内容相同的片段只保留一份"""
+        shared = make_report("共同报告", TOPICS[:1])
+        packed, stats = make_packer(100000).pack("新能源汽车", {"insight": shared, "media": shared})
+        assert stats["duplicates"] > 0
+        assert packed["insight"] == shared
+        assert packed["media"] == ""
+
+    def test_forum_lines_keep_original_separators(self):
+        """论坛日志打包后每行仍是一条完整发言，不插入空行"""
+        speeches = [f"[10:00:{second:02d}] [HOST] 主持人第{second}次总结：{TOPICS[second % len(TOPICS)]}。"
+                    for second in range(12)]
+        forum_log = "\n".join(speeches)
+        packed, _ = make_packer(150, chunk_tokens=60).pack(
+            "新能源汽车", {"forum": forum_log}, forum_source="forum")
+        lines = packed["forum"].split("\n")
+        assert lines
+        assert "" not in lines
+        assert all(line in speeches for line in lines)
+        assert lines == sorted(lines)
@@ -0,0 +1,203 @@
+"""
+测试engine_host.py中的引擎宿主
+
+使用 SEARCH_BACKEND=fake 的离线搜索后端和按提示词返回固定输出的LLM客户端运行QueryEngine，
+覆盖任务派发、状态与段落进度、取消排队中的任务、stop() 取消排队任务，以及已结束任务的清理
+"""
+
+import json
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+pytest.importorskip("openai")
+pytest.importorskip("tavily")
+
+from engine_host import EngineHost, build_engine_config
+
+PARAGRAPHS = [
+    {"title": "事件概述", "content": "梳理事件经过"},
+    {"title": "舆论反应", "content": "分析各方观点"},
+]
+
+
+def make_stub_llm(gate: threading.Event = None):
+    """按系统提示词返回固定输出的LLM客户端，gate 未放行时生成报告结构一步会阻塞"""
+    from QueryEngine.llms.base import LLMClient
+    from QueryEngine import prompts
+
+    class StubLLMClient(LLMClient):
+        def __init__(self):
+            super().__init__(api_key="offline", model_name="stub")
+            self.calls = []
+            self._lock = threading.Lock()
+
+        def _output(self, system_prompt: str) -> str:
+            if system_prompt == prompts.SYSTEM_PROMPT_REPORT_STRUCTURE:
+                if gate is not None:
+                    gate.wait(timeout=10)
+                return json.dumps(PARAGRAPHS, ensure_ascii=False)
+            if system_prompt in (prompts.SYSTEM_PROMPT_FIRST_SEARCH, prompts.SYSTEM_PROMPT_REFLECTION):
+                return json.dumps({"search_query": "新能源汽车", "search_tool": "basic_search_news",
+                                   "reasoning": "离线测试"}, ensure_ascii=False)
+            if system_prompt == prompts.SYSTEM_PROMPT_FIRST_SUMMARY:
+                return json.dumps({"paragraph_latest_state": "初始总结"}, ensure_ascii=False)
+            if system_prompt == prompts.SYSTEM_PROMPT_REFLECTION_SUMMARY:
+                return json.dumps({"updated_paragraph_latest_state": "反思后的总结"}, ensure_ascii=False)
+            return "# 离线报告\n\n## 事件概述\n\n反思后的总结"
+
+        def stream_invoke(self, system_prompt: str, user_prompt: str, **kwargs):
+            with self._lock:
+                self.calls.append(system_prompt)
+            output = self._output(system_prompt)
+            for start in range(0, len(output), 16):
+                yield output[start:start + 16]
+
+    return StubLLMClient()
+
+
+@pytest.fixture
+def offline_env(tmp_path, monkeypatch):
+    """在临时目录中运行，QueryEngine使用离线搜索后端，不需要真实的API密钥"""
+    monkeypatch.chdir(tmp_path)
+    values = {"QUERY_ENGINE_API_KEY": "offline", "QUERY_ENGINE_MODEL_NAME": "stub",
+              "TAVILY_API_KEY": "offline", "SEARCH_BACKEND": "fake"}
+    for name, value in values.items():
+        monkeypatch.setenv(name, value)
+    from config import settings
+    for name, value in values.items():
+        monkeypatch.setattr(settings, name, value)
+    return tmp_path
+
+
+@pytest.fixture
+def host(offline_env, monkeypatch):
+    host = EngineHost(engines=["query"], max_finished_jobs=2)
+    assert host.start() == {"query": (True, "启动成功")}
+    # 搜索网关是进程内单例，每个测试按本测试的配置重新创建
+    gateway_module = sys.modules["search_gateway"]
+    monkeypatch.setattr(gateway_module, "_gateway", None)
+    monkeypatch.setattr(gateway_module, "_gateway_params", None)
+    # 离线环境中无法下载tiktoken的编码文件，token计数使用估算
+    text_metrics = sys.modules["text_metrics"]
+    monkeypatch.setattr(text_metrics, "TIKTOKEN_AVAILABLE", False)
+    text_metrics.get_token_counter.cache_clear()
+    yield host
+    text_metrics.get_token_counter.cache_clear()
+    host.stop(wait=True)
+
+
+def use_llm(host: EngineHost, llm):
+    host._llm_clients["query"] = llm
+
+
+def wait_for(job, timeout: float = 30):
+    job.future.result(timeout=timeout)
+    return job
+
+
+class TestSubmit:
+    """测试任务派发与状态"""
+
+    def test_research_completes_with_progress(self, host):
+        llm = make_stub_llm()
+        use_llm(host, llm)
+        job = wait_for(host.submit("query", "  新能源汽车  "))
+
+        assert job.status == "completed", job.error
+        assert job.query == "新能源汽车"
+        assert job.report.startswith("# 离线报告")
+        data = job.to_dict(include_report=True)
+        assert data["total_paragraphs"] == 2
+        assert data["completed_paragraphs"] == 2
+        assert data["run_id"]
+        assert data["finished_at"] is not None
+        assert "agent" not in data
+        assert host.get_job(job.job_id) is job
+        assert [j.job_id for j in host.list_jobs("query")] == [job.job_id]
+        assert host._llm_clients["query"] is llm
+
+    def test_checkpoint_can_be_resumed(self, host):
+        use_llm(host, make_stub_llm())
+        first = wait_for(host.submit("query", "新能源汽车"))
+        resumed = wait_for(host.submit("query", resume_run_id=first.run_id))
+        assert resumed.status == "completed", resumed.error
+        assert resumed.run_id == first.run_id
+
+    def test_invalid_submissions(self, host):
+        with pytest.raises(ValueError):
+            host.submit("query", "   ")
+        with pytest.raises(ValueError):
+            host.submit("media", "新能源汽车")
+        with pytest.raises(ValueError):
+            build_engine_config("report")
+
+    def test_failed_job_records_error(self, host):
+        use_llm(host, make_stub_llm())
+        job = wait_for(host.submit("query", resume_run_id="missing_run"))
+        assert job.status == "failed"
+        assert "missing_run" in job.error
+
+
+class TestCancel:
+    """测试取消排队中的任务"""
+
+    def test_cancel_queued_job(self, host):
+        gate = threading.Event()
+        use_llm(host, make_stub_llm(gate))
+        running = host.submit("query", "第一个查询")
+        queued = host.submit("query", "第二个查询")
+
+        assert host.cancel(queued.job_id)
+        assert queued.status == "cancelled"
+        assert not host.cancel(queued.job_id)
+        assert not host.cancel(running.job_id)
+        assert not host.cancel("unknown")
+
+        gate.set()
+        assert wait_for(running).status == "completed"
+
+    def test_stop_cancels_queued_jobs(self, host):
+        gate = threading.Event()
+        use_llm(host, make_stub_llm(gate))
+        running = host.submit("query", "第一个查询")
+        queued = [host.submit("query", f"排队查询{i}") for i in range(2)]
+
+        host.stop(wait=False)
+        assert [job.status for job in queued] == ["cancelled", "cancelled"]
+        assert not host.is_running("query")
+        with pytest.raises(ValueError):
+            host.submit("query", "停止后的查询")
+
+        gate.set()
+        assert wait_for(running).status == "completed"
+
+
+class TestPrune:
+    """测试已结束任务的清理"""
+
+    def test_only_recent_finished_jobs_are_kept(self, host):
+        gate = threading.Event()
+        use_llm(host, make_stub_llm(gate))
+        running = host.submit("query", "运行中的查询")
+        cancelled = []
+        for i in range(4):
+            job = host.submit("query", f"查询{i}")
+            assert host.cancel(job.job_id)
+            cancelled.append(job)
+
+        # 下一次派发时清理，只保留最近结束的 max_finished_jobs 个任务，未结束的任务不受影响
+        latest = host.submit("query", "最后的查询")
+        remaining = {job.job_id for job in host.list_jobs()}
+        assert remaining == {running.job_id, cancelled[2].job_id, cancelled[3].job_id, latest.job_id}
+        assert host.get_job(cancelled[0].job_id) is None
+
+        gate.set()
+        wait_for(running)
+        wait_for(latest)
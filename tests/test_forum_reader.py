@@ -0,0 +1,161 @@
+"""
+测试utils/forum_reader.py中的forum.log读取
+
+覆盖按块倒序读取（跨块边界、CRLF、未写完的末行）以及最新HOST发言在文件追加与同进程推送之间的合并
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from utils.forum_reader import ForumLogReader, iter_lines_reversed
+
+LINES = [
+    "[10:00:01] [INSIGHT] 第一条发言",
+    "[10:00:02] [HOST] 主持人总结：舆论整体偏正面",
+    "[10:00:03] [MEDIA] 第三条发言，包含较长的中文内容用于跨越多个读取块",
+    "[10:00:04] [QUERY] fourth",
+]
+
+
+def host_line(second: int, content: str) -> str:
+    return f"[10:01:{second:02d}] [HOST] {content}\n"
+
+
+def append(path: Path, text: str):
+    with open(path, "a", encoding="utf-8", newline="") as f:
+        f.write(text)
+
+
+class TestIterLinesReversed:
+    """测试按块倒序读取"""
+
+    @pytest.mark.parametrize("block_size", [1, 2, 3, 7, 16, 64 * 1024])
+    def test_lines_across_block_boundaries(self, tmp_path, block_size):
+        path = tmp_path / "forum.log"
+        path.write_text("\n".join(LINES) + "\n", encoding="utf-8")
+        assert list(iter_lines_reversed(path, block_size=block_size)) == LINES[::-1]
+
+    @pytest.mark.parametrize("block_size", [1, 5, 64 * 1024])
+    def test_crlf_line_endings(self, tmp_path, block_size):
+        path = tmp_path / "forum.log"
+        path.write_bytes("\r\n".join(LINES).encode("utf-8") + b"\r\n")
+        assert list(iter_lines_reversed(path, block_size=block_size)) == LINES[::-1]
+
+    def test_partial_last_line_and_blank_lines(self, tmp_path):
+        """没有换行结尾的末行最先产出，空行被跳过"""
+        path = tmp_path / "forum.log"
+        path.write_text(LINES[0] + "\n\n" + LINES[1] + "\n[10:00:05] [HOST] 写了一半", encoding="utf-8")
+        assert list(iter_lines_reversed(path, block_size=4)) == ["[10:00:05] [HOST] 写了一半", LINES[1], LINES[0]]
+
+    def test_start_and_end_offsets(self, tmp_path):
+        path = tmp_path / "forum.log"
+        path.write_text("\n".join(LINES) + "\n", encoding="utf-8")
+        first_end = len((LINES[0] + "\n").encode("utf-8"))
+        third_end = len(("\n".join(LINES[:3]) + "\n").encode("utf-8"))
+        assert list(iter_lines_reversed(path, block_size=5, start=first_end, end=third_end)) == [LINES[2], LINES[1]]
+
+    def test_empty_file(self, tmp_path):
+        path = tmp_path / "forum.log"
+        path.write_bytes(b"")
+        assert list(iter_lines_reversed(path)) == []
+
+
+class TestForumLogReader:
+    """测试最新HOST发言的缓存、增量扫描与推送"""
+
+    def test_latest_host_follows_appends(self, tmp_path):
+        path = tmp_path / "forum.log"
+        path.write_text("\n".join(LINES) + "\n", encoding="utf-8")
+        reader = ForumLogReader(path)
+        assert reader.latest_host_speech() == "主持人总结：舆论整体偏正面"
+
+        append(path, "[10:00:06] [INSIGHT] 非主持人发言\n")
+        assert reader.latest_host_speech() == "主持人总结：舆论整体偏正面"
+
+        append(path, host_line(7, "新的总结\\n第二行"))
+        assert reader.latest_host_speech() == "新的总结\n第二行"
+
+    def test_partial_host_line_waits_until_complete(self, tmp_path):
+        """写了一半的HOST行不作为最新发言，写完后才被读到"""
+        path = tmp_path / "forum.log"
+        path.write_text(host_line(1, "第一次总结"), encoding="utf-8")
+        reader = ForumLogReader(path)
+        assert reader.latest_host_speech() == "第一次总结"
+
+        append(path, "[10:01:02] [HOST] 第二次")
+        assert reader.latest_host_speech() == "第一次总结"
+        append(path, "总结\n")
+        assert reader.latest_host_speech() == "第二次总结"
+
+    def test_published_speech_merges_with_file_appends(self, tmp_path):
+        """推送后仍继续读取文件：其他写入方追加的HOST发言会覆盖推送的发言"""
+        path = tmp_path / "forum.log"
+        path.write_text(host_line(1, "文件中的总结"), encoding="utf-8")
+        reader = ForumLogReader(path)
+        received = []
+        unsubscribe = reader.subscribe(received.append)
+
+        append(path, host_line(2, "推送的总结"))
+        reader.publish("推送的总结")
+        assert received == ["推送的总结"]
+        assert reader.latest_host_speech() == "推送的总结"
+
+        append(path, "[10:01:03] [QUERY] 其他发言\n")
+        assert reader.latest_host_speech() == "推送的总结"
+
+        append(path, host_line(4, "另一个进程写入的总结"))
+        assert reader.latest_host_speech() == "另一个进程写入的总结"
+
+        unsubscribe()
+        reader.publish(None)
+        assert received == ["推送的总结"]
+
+    def test_truncated_log_is_rescanned(self, tmp_path):
+        path = tmp_path / "forum.log"
+        path.write_text(host_line(1, "旧的总结") + "\n".join(LINES) + "\n", encoding="utf-8")
+        reader = ForumLogReader(path)
+        assert reader.latest_host_speech() == "主持人总结：舆论整体偏正面"
+
+        path.write_text(host_line(9, "清空后的总结"), encoding="utf-8")
+        assert reader.latest_host_speech() == "清空后的总结"
+        path.unlink()
+        assert reader.latest_host_speech() is None
+
+    def test_rewritten_log_longer_than_before_is_rescanned(self, tmp_path):
+        """原地清空后重写且长度超过上次读到的位置时，不能当作追加只扫描新增部分"""
+        path = tmp_path / "forum.log"
+        path.write_text(host_line(1, "old topic summary"), encoding="utf-8")
+        reader = ForumLogReader(path)
+        assert reader.latest_host_speech() == "old topic summary"
+        assert [s["content"] for s in reader.all_host_speeches()] == ["old topic summary"]
+        inode = path.stat().st_ino
+
+        with open(path, "r+", encoding="utf-8") as f:
+            f.truncate(0)
+            f.write("[10:02:00] [INSIGHT] 新话题的第一条发言\n" + host_line(5, "new topic summary with a longer host line"))
+        assert path.stat().st_ino == inode
+        assert reader.latest_host_speech() == "new topic summary with a longer host line"
+        assert [s["content"] for s in reader.all_host_speeches()] == ["new topic summary with a longer host line"]
+
+    def test_all_host_speeches_incremental(self, tmp_path):
+        path = tmp_path / "forum.log"
+        path.write_text(host_line(1, "第一次") + "[10:01:02] [HOST] 未写完", encoding="utf-8")
+        reader = ForumLogReader(path)
+        assert [s["content"] for s in reader.all_host_speeches()] == ["第一次"]
+
+        append(path, "的第二次\r\n" + host_line(3, "第三次"))
+        speeches = reader.all_host_speeches()
+        assert [s["content"] for s in speeches] == ["第一次", "未写完的第二次", "第三次"]
+        assert speeches[-1]["timestamp"] == "10:01:03"
+
+    def test_recent_agent_speeches(self, tmp_path):
+        path = tmp_path / "forum.log"
+        path.write_text("\n".join(LINES) + "\n", encoding="utf-8")
+        speeches = ForumLogReader(path).recent_agent_speeches(2)
+        assert [s["agent"] for s in speeches] == ["MEDIA", "QUERY"]
@@ -0,0 +1,40 @@
+"""
+测试SentimentAnalysisModel/model_server.py中的传统机器学习集成模型
+
+覆盖加载后一次分类上千条文本（达到预处理改用进程池的阈值）时，结果数量与顺序保持一致
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+# 添加项目根目录到路径（model_server 与 InsightEngine 中的导入方式一致，从模型目录直接导入）
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+sys.path.insert(0, str(project_root / "SentimentAnalysisModel"))
+
+for dependency in ("jieba", "sklearn", "xgboost", "torch", "gensim", "transformers"):
+    pytest.importorskip(dependency)
+
+from model_server import MODEL_ROOT, MachineLearningEnsemble
+
+MODEL_DIR = Path(MODEL_ROOT) / "WeiboSentiment_MachineLearning" / "model"
+
+
+@pytest.mark.skipif(not (MODEL_DIR / "bayes_model.pkl").exists(), reason="没有训练好的贝叶斯模型")
+class TestMachineLearningEnsemble:
+    """测试传统模型集成的批量分类"""
+
+    def test_large_batch_after_load(self):
+        """加载结束后模型目录下的 utils 等模块已从 sys.modules 移走，大批量预处理仍能完成"""
+        model = MachineLearningEnsemble(model_types=["bayes"])
+        model.load()
+        texts = ["今天天气很好，心情也很好", "排了两个小时的队，太失望了"] * 600
+        assert len(texts) >= model.predictor.min_parallel_size
+
+        results = model.classify(texts)
+        assert len(results) == len(texts)
+        assert results[0::2] == [results[0]] * 600
+        assert results[1::2] == [results[1]] * 600
+        assert all(result["label"] in ("正面", "负面") for result in results)
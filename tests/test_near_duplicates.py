@@ -0,0 +1,90 @@
+"""
+测试utils/near_duplicates.py中的近似重复索引
+
+覆盖本批内去重、按作用域（运行ID:段落）去重、同一来源重新执行、SQLite持久化重新加载，
+以及运行结束后释放作用域的内存索引
+"""
+
+import sys
+from pathlib import Path
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from utils.near_duplicates import NearDuplicateIndex, SimHashIndex
+from utils.text_metrics import simhash
+
+POSTS = [
+    "外卖平台骑手权益保障引发热议，平台算法与配送时间受到广泛质疑，多地出台新规",
+    "新能源汽车销量持续增长，电池续航与充电网络建设成为消费者讨论的焦点",
+    "极端天气频发，防汛抗旱与城市排水系统建设备受关注，气象部门发布预警",
+]
+
+
+def text_of(item):
+    return item
+
+
+class TestSimHashIndex:
+    """测试内存中的分段索引"""
+
+    def test_find_near_duplicate(self):
+        index = SimHashIndex(3)
+        index.add(simhash(POSTS[0]), "first")
+        assert index.find(simhash(POSTS[0])) == (simhash(POSTS[0]), "first")
+        assert index.find(simhash(POSTS[1])) is None
+        assert index.find(simhash(POSTS[0]), accept=lambda payload: payload != "first") is None
+        assert len(index) == 1
+
+
+class TestNearDuplicateIndex:
+    """测试按作用域的去重"""
+
+    def test_batch_only_without_scope(self):
+        index = NearDuplicateIndex(path=None)
+        assert index.filter([POSTS[0], POSTS[0], "", POSTS[1]], text_of) == [POSTS[0], "", POSTS[1]]
+        assert index.filter([POSTS[0]], text_of) == [POSTS[0]]
+
+    def test_scopes_are_independent(self):
+        """同一运行的不同段落作用域互不影响，同一段落的后续搜索去掉已返回过的内容"""
+        index = NearDuplicateIndex(path=None)
+        assert index.filter(POSTS[:2], text_of, scope="run:0", source="run:段落1") == POSTS[:2]
+        assert index.filter(POSTS, text_of, scope="run:0", source="run:段落1-反思1") == [POSTS[2]]
+        assert index.filter(POSTS, text_of, scope="run:1", source="run:段落2") == POSTS
+
+    def test_same_source_is_not_its_own_duplicate(self):
+        index = NearDuplicateIndex(path=None)
+        index.filter(POSTS[:1], text_of, scope="run:0", source="run:段落1")
+        assert index.filter(POSTS[:1], text_of, scope="run:0", source="run:段落1") == POSTS[:1]
+
+    def test_persisted_scope_is_reloaded(self, tmp_path):
+        path = str(tmp_path / "near.db")
+        first = NearDuplicateIndex(path)
+        first.filter(POSTS[:1], text_of, scope="run:0", source="run:段落1")
+        first.close()
+        reopened = NearDuplicateIndex(path)
+        assert reopened.filter(POSTS, text_of, scope="run:0", source="run:段落1-反思1") == POSTS[1:]
+        reopened.close()
+
+
+class TestDropScopes:
+    """测试释放作用域的内存索引"""
+
+    def test_drop_by_prefix(self):
+        index = NearDuplicateIndex(path=None)
+        for scope in ("run_a:0", "run_a:1", "run_b:0"):
+            index.filter(POSTS[:1], text_of, scope=scope, source="s")
+        assert index.drop_scopes("run_a:") == 2
+        assert index.drop_scopes("run_a:") == 0
+        # 未持久化时释放后不再记得之前的内容，另一个运行的作用域不受影响
+        assert index.filter(POSTS[:1], text_of, scope="run_a:0", source="other") == POSTS[:1]
+        assert index.filter(POSTS[:1], text_of, scope="run_b:0", source="other") == []
+
+    def test_dropped_scope_reloads_from_disk(self, tmp_path):
+        """断点恢复时重新从SQLite加载已释放的作用域"""
+        index = NearDuplicateIndex(str(tmp_path / "near.db"))
+        index.filter(POSTS[:2], text_of, scope="run_a:0", source="run_a:段落1")
+        assert index.drop_scopes("run_a:") == 1
+        assert index.filter(POSTS, text_of, scope="run_a:0", source="run_a:段落1-反思1") == [POSTS[2]]
+        index.close()
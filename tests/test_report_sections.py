@@ -0,0 +1,204 @@
+"""
+测试ReportEngine中按章节并行生成HTML报告
+
+覆盖模板拆分章节、按章节挑选材料的字符预算、本地拼接的文档结构，
+以及HTMLGenerationNode在sectioned模式下每个章节单独调用LLM、失败章节退化为展示材料、流式输出顺序
+"""
+
+import json
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from ReportEngine.utils.report_sections import (
+    DEFAULT_SECTIONS,
+    TemplateSection,
+    assemble_html,
+    html_prefix,
+    html_suffix,
+    section_html,
+    select_section_materials,
+    split_template_sections,
+)
+
+TEMPLATE_DIR = project_root / "ReportEngine" / "report_template"
+
+HEADING_TEMPLATE = """# 舆情周报
+
+## 本周概览
+本周声量与情感走势
+
+## 热点事件
+### 事件一
+### 事件二
+
+## 下周关注
+"""
+
+
+class FakeLLMClient:
+    """按章节标题返回HTML片段，记录每次调用的输入"""
+
+    def __init__(self, fail_titles=()):
+        self.fail_titles = set(fail_titles)
+        self.messages = []
+        self.lock = threading.Lock()
+
+    def stream_invoke_to_string(self, system_prompt, user_prompt):
+        section_input = json.loads(user_prompt)
+        with self.lock:
+            self.messages.append(section_input)
+        title = section_input["section_title"]
+        if title in self.fail_titles:
+            raise RuntimeError("模拟LLM调用失败")
+        return f"```html\n<p>{title}的分析</p>\n```"
+
+
+class RecordingStreamHandler:
+    def __init__(self):
+        self.html = []
+        self.stages = []
+
+    def on_html(self, text):
+        self.html.append(text)
+
+    def on_stage(self, stage, **data):
+        self.stages.append((stage, data))
+
+
+class TestSplitTemplateSections:
+    """测试模板拆分为章节"""
+
+    def test_list_item_chapters(self):
+        """仓库模板以顶格列表项为章节，缩进列表为小节提纲"""
+        template = (TEMPLATE_DIR / "企业品牌声誉分析报告模板.md").read_text(encoding="utf-8")
+        sections = split_template_sections(template)
+        assert [s.title for s in sections][:2] == ["1.0 摘要与核心发现", "2.0 品牌声量与影响力分析"]
+        assert sections[0].outline == ["1.1 品牌声誉总览", "1.2 关键指标表现", "1.3 主要结论与战略启示"]
+        assert len(sections) == 7
+
+    def test_repeated_heading_chapters(self):
+        """没有列表项时取出现两次以上的最高级标题，模板标题忽略，子标题作为提纲"""
+        sections = split_template_sections(HEADING_TEMPLATE)
+        assert [s.title for s in sections] == ["本周概览", "热点事件", "下周关注"]
+        assert sections[0].outline == ["本周声量与情感走势"]
+        assert sections[1].outline_text() == "事件一\n事件二"
+
+    @pytest.mark.parametrize("template", ["", "随便写点什么", "# 只有一个标题\n正文"])
+    def test_default_sections(self, template):
+        sections = split_template_sections(template)
+        assert [s.title for s in sections] == [title for title, _ in DEFAULT_SECTIONS]
+
+
+class TestSelectSectionMaterials:
+    """测试按章节挑选材料"""
+
+    def test_budget_and_relevance(self):
+        """各来源开头片段优先保留，其余按相关度选入，总长度不超过预算，同一来源保持原文顺序"""
+        sources = {
+            "QueryEngine报告": "\n\n".join(["新闻摘要" * 10, "股价波动" * 40, "电池安全召回" * 40, "门店装修" * 40]),
+            "ForumEngine论坛讨论": "\n\n".join(["论坛开场" * 10, "电池安全争议" * 40]),
+            "MediaEngine报告": "",
+        }
+        section = TemplateSection("电池安全风险", ["召回与安全争议"])
+        materials = select_section_materials(sources, section, "某品牌电池", budget_chars=700, chunk_chars=300)
+
+        assert [m["source"] for m in materials] == ["QueryEngine报告", "ForumEngine论坛讨论"]
+        query_parts = materials[0]["content"].split("\n\n")
+        assert query_parts[0] == "新闻摘要" * 10
+        assert any("电池安全召回" in part for part in query_parts)
+        assert not any("门店装修" in part or "股价波动" in part for part in query_parts)
+        assert materials[1]["content"].startswith("论坛开场" * 10)
+        assert sum(len(m["content"].replace("\n\n", "")) for m in materials) <= 700
+
+    def test_empty_sources(self):
+        assert select_section_materials({"QueryEngine报告": ""}, TemplateSection("摘要"), "查询") == []
+
+
+class TestAssembleHtml:
+    """测试本地拼接"""
+
+    def test_assemble_matches_streamed_parts(self):
+        """整篇文档与依次输出的开头、各章节、结尾相同，共享样式只出现一次，标题被转义"""
+        sections = [TemplateSection("摘要"), TemplateSection("风险<研判>")]
+        fragments = ["<p>一</p>", "<p>二</p>"]
+        document = assemble_html("查询&测试", sections, fragments, "2025年01月01日 00:00:00", "模板A")
+
+        streamed = (html_prefix("查询&测试", sections, "2025年01月01日 00:00:00", "模板A")
+                    + section_html(1, sections[0], fragments[0])
+                    + section_html(2, sections[1], fragments[1])
+                    + html_suffix("2025年01月01日 00:00:00"))
+        assert document == streamed
+        assert document.count("<style>") == 1 and document.count("<script>") == 1
+        assert '<a href="#section-2">风险&lt;研判&gt;</a>' in document
+        assert "<title>查询&amp;测试 - 智能舆情分析报告</title>" in document
+        assert document.index('id="section-1"') < document.index('id="section-2"')
+
+
+class TestSectionedHtmlGeneration:
+    """测试HTMLGenerationNode的分章节生成"""
+
+    @pytest.fixture(autouse=True)
+    def node_class(self):
+        pytest.importorskip("openai")
+        from ReportEngine.nodes.html_generation_node import HTMLGenerationNode
+        return HTMLGenerationNode
+
+    def make_input(self):
+        return {
+            "query": "某品牌舆情",
+            "query_engine_report": "新闻报道摘要\n\n本周概览：声量上升",
+            "media_engine_report": "媒体报道摘要",
+            "insight_engine_report": "数据库分析摘要",
+            "forum_logs": "[10:00:00] [HOST] 下周关注电池问题",
+            "selected_template": HEADING_TEMPLATE,
+            "template_name": "舆情周报",
+        }
+
+    def test_one_call_per_section(self, node_class):
+        """每个章节单独调用一次LLM，输入只包含本章节的信息，结果按模板顺序拼接"""
+        client = FakeLLMClient()
+        node = node_class(client, mode="sectioned", max_workers=3, section_context_chars=2000)
+        document = node.run(self.make_input())
+
+        titles = ["本周概览", "热点事件", "下周关注"]
+        assert sorted(m["section_title"] for m in client.messages) == sorted(titles)
+        for message in client.messages:
+            assert message["total_sections"] == 3
+            assert message["section_title"] not in message["other_sections"]
+            assert sum(len(m["content"]) for m in message["materials"]) <= 2000
+        positions = [document.index(f"<p>{title}的分析</p>") for title in titles]
+        assert positions == sorted(positions)
+        assert "```" not in document
+        assert document.startswith("<!DOCTYPE html>") and document.endswith("</html>")
+
+    def test_failed_section_falls_back_to_materials(self, node_class):
+        """单个章节失败时展示转义后的材料，其余章节不受影响"""
+        client = FakeLLMClient(fail_titles={"热点事件"})
+        node = node_class(client, mode="sectioned", max_workers=2)
+        document = node.run(self.make_input())
+
+        assert "<p>本周概览的分析</p>" in document and "<p>下周关注的分析</p>" in document
+        assert "<p>热点事件的分析</p>" not in document
+        assert "<h3>QueryEngine报告</h3><pre>" in document
+
+    def test_stream_handler_receives_document_in_order(self, node_class):
+        """流式输出的片段按顺序拼起来与返回的文档一致，每个章节都有阶段事件"""
+        client = FakeLLMClient(fail_titles={"下周关注"})
+        node = node_class(client, mode="sectioned", max_workers=3)
+        handler = RecordingStreamHandler()
+        document = node.run(self.make_input(), stream_handler=handler)
+
+        assert "".join(handler.html) == document
+        stages = sorted((data["index"], data.get("failed", False)) for _, data in handler.stages)
+        assert stages == [(1, False), (2, False), (3, True)]
+
+    def test_invalid_mode(self, node_class):
+        with pytest.raises(ValueError):
+            node_class(FakeLLMClient(), mode="parallel")
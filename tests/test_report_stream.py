@@ -0,0 +1,120 @@
+"""
+测试ReportEngine/utils/report_stream.py中的报告流式输出缓冲
+
+覆盖片段追加、按字节偏移续传（包括落在多字节字符中间的偏移）、缓冲区丢弃、重置以及流结束事件
+"""
+
+import json
+import sys
+import threading
+from pathlib import Path
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from ReportEngine.utils.report_stream import ReportStream, parse_resume_position
+
+
+def parse_events(raw_events):
+    """把SSE文本解析为 [(事件名, 数据, id)]，忽略keepalive注释"""
+    events = []
+    for raw in raw_events:
+        if raw.startswith(":"):
+            continue
+        fields = dict(line.split(": ", 1) for line in raw.strip().split("\n"))
+        events.append((fields["event"], json.loads(fields["data"]), fields.get("id")))
+    return events
+
+
+def collect(stream, **kwargs):
+    return parse_events(list(stream.events(**kwargs)))
+
+
+def html_of(events):
+    return "".join(data["html"] for name, data, _ in events if name == "chunk")
+
+
+class TestReportStream:
+    """测试报告流的写入与订阅"""
+
+    def test_append_and_complete(self):
+        """按顺序写入的片段全部送出，最后是done事件"""
+        stream = ReportStream()
+        stream.write("<h1>标题</h1>")
+        stream.stage("section", total=2)
+        stream.write("<p>正文</p>")
+        stream.close("done", report_id="r1")
+
+        events = collect(stream)
+        assert html_of(events) == "<h1>标题</h1><p>正文</p>"
+        assert stream.text() == "<h1>标题</h1><p>正文</p>"
+        assert [name for name, _, _ in events] == ["stage", "chunk", "chunk", "done"]
+        name, data, _ = events[-1]
+        assert data == {"report_id": "r1", "total_bytes": stream.total_bytes, "generation": 0}
+        last_chunk_id = [event_id for name, _, event_id in events if name == "chunk"][-1]
+        assert last_chunk_id == f"0-{stream.total_bytes}"
+
+    def test_resume_from_offset(self):
+        """从某个chunk的结束偏移续传时只收到之后的内容"""
+        stream = ReportStream()
+        stream.write("<p>第一段</p>")
+        first_end = stream.total_bytes
+        stream.write("<p>第二段</p>")
+        stream.close()
+
+        events = collect(stream, offset=first_end, generation=0)
+        assert html_of(events) == "<p>第二段</p>"
+        assert parse_resume_position(f"0-{first_end}", None) == (0, first_end)
+        assert parse_resume_position(None, "12") == (None, 12)
+        assert parse_resume_position("bad", None) == (None, 0)
+
+    def test_resume_mid_character_snaps_to_boundary(self):
+        """偏移落在多字节字符中间时退回到字符起始字节，不丢字符"""
+        stream = ReportStream()
+        stream.write("ab中文")
+        stream.close()
+
+        for offset in (3, 4):
+            events = collect(stream, offset=offset)
+            chunk = next(data for name, data, _ in events if name == "chunk")
+            assert chunk == {"offset": 2, "html": "中文"}
+        assert html_of(collect(stream, offset=5)) == "文"
+
+    def test_generation_mismatch_restarts_from_zero(self):
+        """reset后旧generation的客户端从头接收新内容"""
+        stream = ReportStream()
+        stream.write("旧内容")
+        stream.reset("新内容")
+        stream.close()
+
+        assert stream.generation == 1
+        assert html_of(collect(stream, offset=3, generation=0)) == "新内容"
+
+    def test_gap_when_offset_dropped(self):
+        """超过字节上限时丢弃最早的片段，落在被丢弃区域的偏移收到gap事件"""
+        stream = ReportStream(max_bytes=8)
+        for text in ("aaaa", "bbbb", "cccc"):
+            stream.write(text)
+        stream.close()
+
+        assert stream.base_offset == 4
+        assert stream.text() is None
+        events = collect(stream, offset=0, generation=0)
+        assert events[0][:2] == ("gap", {"from": 0, "to": 4})
+        assert html_of(events) == "bbbbcccc"
+
+    def test_subscriber_receives_live_writes(self):
+        """订阅后写入的片段和结束事件能被正在等待的客户端收到"""
+        stream = ReportStream()
+        received = []
+        reader = threading.Thread(target=lambda: received.extend(collect(stream, keepalive=0.05)))
+        reader.start()
+        stream.write("<p>实时</p>")
+        stream.close("error", message="失败")
+        reader.join(timeout=5)
+
+        assert not reader.is_alive()
+        assert html_of(received) == "<p>实时</p>"
+        assert received[-1][:2] == ("error", {"message": "失败", "total_bytes": stream.total_bytes,
+                                              "generation": 0})
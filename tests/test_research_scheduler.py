@@ -0,0 +1,140 @@
+"""
+测试utils/research_scheduler.py中的段落研究调度器
+
+覆盖按资源的并发上限、提前阶段的执行顺序、耗时记录，以及研究结束后关闭后台线程池
+"""
+
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from utils.research_scheduler import ResearchScheduler
+
+
+class ConcurrencyProbe:
+    """记录同时执行的调用数的峰值"""
+
+    def __init__(self):
+        self.active = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, delay: float = 0.05):
+        with self._lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(delay)
+        with self._lock:
+            self.active -= 1
+
+
+def run_in_threads(scheduler, resource, probe, count):
+    threads = [threading.Thread(target=scheduler.run, args=("stage", resource, probe)) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=5)
+
+
+class TestResourceLimits:
+    """测试按资源类型的并发上限"""
+
+    def test_limited_resource_respects_semaphore(self):
+        scheduler = ResearchScheduler({"llm": 2, "db": 1})
+        llm_probe, db_probe = ConcurrencyProbe(), ConcurrencyProbe()
+        run_in_threads(scheduler, "llm", llm_probe, 6)
+        run_in_threads(scheduler, "db", db_probe, 3)
+        assert llm_probe.peak == 2
+        assert db_probe.peak == 1
+        assert scheduler.summary()["stage"]["count"] == 9
+
+    def test_unlisted_resource_is_not_limited(self):
+        scheduler = ResearchScheduler({"llm": 1})
+        probe = ConcurrencyProbe()
+        run_in_threads(scheduler, "search", probe, 4)
+        assert probe.peak == 4
+
+    def test_resources_are_independent(self):
+        """一种资源占满时不影响另一种资源"""
+        scheduler = ResearchScheduler({"llm": 1, "db": 1})
+        release = threading.Event()
+        holder = threading.Thread(target=scheduler.run, args=("hold", "llm", release.wait, 5))
+        holder.start()
+        started = time.monotonic()
+        scheduler.run("search", "db", lambda: None)
+        assert time.monotonic() - started < 1
+        release.set()
+        holder.join(timeout=5)
+
+    def test_error_is_recorded_and_semaphore_released(self):
+        scheduler = ResearchScheduler({"llm": 1})
+
+        def fail():
+            raise ValueError("失败")
+
+        with pytest.raises(ValueError):
+            scheduler.run("first_search", "llm", fail, label="段落1")
+        trace = scheduler.traces()[-1]
+        assert trace["error"] == "ValueError: 失败"
+        assert trace["label"] == "段落1"
+        assert scheduler.run("first_search", "llm", lambda: "ok") == "ok"
+
+
+class TestPrefetch:
+    """测试后台提前执行的阶段"""
+
+    def test_prefetch_runs_in_submission_order(self):
+        """单个后台线程时，提前阶段按提交顺序执行，Future按段落取回各自的结果"""
+        scheduler = ResearchScheduler({"llm": 1}, max_workers=1, name="test")
+        order = []
+
+        def initial_search(index):
+            order.append(index)
+            return scheduler.run("search", "llm", lambda: f"段落{index}的结果")
+
+        futures = {i: scheduler.submit("prefetch_search", initial_search, i, label=f"段落{i}") for i in (1, 2, 3)}
+        assert futures[2].result(timeout=5) == "段落2的结果"
+        assert [futures[i].result(timeout=5) for i in (1, 2, 3)] == ["段落1的结果", "段落2的结果", "段落3的结果"]
+        assert order == [1, 2, 3]
+        prefetch = [trace for trace in scheduler.traces() if trace["stage"] == "prefetch_search"]
+        assert [trace["label"] for trace in prefetch] == ["段落1", "段落2", "段落3"]
+        assert all(trace["thread"].startswith("test-prefetch") for trace in prefetch)
+        scheduler.shutdown(wait=True)
+
+    def test_prefetch_overlaps_with_foreground_stage(self):
+        """后台的提前搜索与前台的总结同时进行"""
+        scheduler = ResearchScheduler({"llm": 1, "search": 1}, max_workers=1)
+        probe = ConcurrencyProbe()
+        future = scheduler.submit("prefetch_search", scheduler.run, "search", "search", probe, 0.2)
+        scheduler.run("summary", "llm", probe, 0.2)
+        future.result(timeout=5)
+        assert probe.peak == 2
+        scheduler.shutdown(wait=True)
+
+    def test_shutdown_cancels_pending_and_pool_is_recreated(self):
+        scheduler = ResearchScheduler(max_workers=1)
+        release = threading.Event()
+        running = scheduler.submit("prefetch_search", release.wait, 5)
+        pending = scheduler.submit("prefetch_search", lambda: "不会执行")
+        scheduler.shutdown()
+        release.set()
+        assert pending.cancelled()
+        assert running.result(timeout=5) is True
+
+        assert scheduler.submit("prefetch_search", lambda: "新一次研究").result(timeout=5) == "新一次研究"
+        scheduler.shutdown(wait=True)
+        scheduler.shutdown()
+
+    def test_reset_clears_traces(self):
+        scheduler = ResearchScheduler()
+        scheduler.run("stage", None, lambda: None)
+        scheduler.reset()
+        assert scheduler.traces() == []
+        assert scheduler.summary() == {}
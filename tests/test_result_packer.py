@@ -0,0 +1,160 @@
+"""
+测试utils/result_packer.py中的搜索结果打包
+
+覆盖token预算内装箱、单条截断、近似重复去除、按平台×情感分层轮流取结果，
+以及带时区与不带时区的发布时间在排序中的处理
+"""
+
+import sys
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import pytest
+
+# 添加项目根目录到路径（result_packer 与 Engine 中的导入方式一致，从utils目录直接导入）
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+sys.path.insert(0, str(project_root / "utils"))
+
+from result_packer import _age_days, _truncate_to_tokens, pack_search_results, rank_results
+from text_metrics import estimate_tokens
+
+TOPICS = [
+    "新能源汽车销量增长，电池续航与充电网络成为讨论焦点",
+    "外卖平台骑手权益保障引发热议，平台算法与配送时间受到质疑",
+    "高校毕业生就业形势严峻，考研考公人数持续上升",
+    "短视频平台直播带货乱象，虚假宣传与售后问题频发",
+    "城市房价走势分化，一线城市成交回暖而三四线城市库存高企",
+    "极端天气频发，防汛抗旱与城市排水系统建设备受关注",
+]
+
+
+def make_result(index: int, **overrides):
+    result = {"title": f"标题{index}", "url": f"https://example.com/{index}", "content": TOPICS[index % len(TOPICS)]}
+    result.update(overrides)
+    return result
+
+
+def pack(results, token_budget, **kwargs):
+    return pack_search_results(results, token_budget, count_tokens=estimate_tokens, **kwargs)
+
+
+class TestBudget:
+    """测试token预算内装箱"""
+
+    def test_unlimited_budget_keeps_all_unique(self):
+        results = [make_result(i) for i in range(len(TOPICS))]
+        packed, stats = pack(results, 0)
+        assert len(packed) == len(TOPICS)
+        assert stats["tokens"] == sum(estimate_tokens(topic) for topic in TOPICS)
+
+    def test_packed_tokens_within_budget(self):
+        results = [make_result(i, score=float(i)) for i in range(len(TOPICS))]
+        budget = 60
+        packed, stats = pack(results, budget)
+        assert 0 < stats["tokens"] <= budget
+        assert stats["tokens"] == sum(estimate_tokens(result["content"]) for result in packed)
+        assert stats["packed"] == len(packed) < len(TOPICS)
+
+    def test_smaller_results_fill_remaining_budget(self):
+        """放不下的结果跳过，后面更短的结果仍可装入"""
+        results = [make_result(0, score=100.0), make_result(1, score=10.0, content="很长的内容" * 20),
+                   make_result(2, score=1.0, content="短内容")]
+        packed, _ = pack(results, estimate_tokens(TOPICS[0]) + 5)
+        assert [result["title"] for result in packed] == ["标题0", "标题2"]
+
+    def test_results_without_text_are_skipped(self):
+        packed, stats = pack([make_result(0), make_result(1, content="", title="")], 0)
+        assert len(packed) == 1
+        assert stats["input"] == 2
+
+    def test_input_is_not_modified(self):
+        results = [make_result(0, content="很长的内容" * 50)]
+        packed, _ = pack(results, 0, max_item_tokens=10)
+        assert results[0]["content"] == "很长的内容" * 50
+        assert packed[0]["content"] != results[0]["content"]
+
+
+class TestTruncation:
+    """测试单条结果的截断"""
+
+    def test_truncates_to_item_limit(self):
+        text, tokens = _truncate_to_tokens("舆情分析" * 50, 30, estimate_tokens)
+        assert tokens <= 30
+        assert text.endswith("…")
+        assert tokens == estimate_tokens(text)
+
+    def test_short_text_unchanged(self):
+        assert _truncate_to_tokens("短内容", 30, estimate_tokens) == ("短内容", 3)
+
+    def test_item_limit_applied_when_packing(self):
+        results = [make_result(i, content=TOPICS[i] * 5) for i in range(3)]
+        packed, stats = pack(results, 0, max_item_tokens=20)
+        assert len(packed) == 3
+        assert all(estimate_tokens(result["content"]) <= 20 for result in packed)
+        assert stats["tokens"] <= 60
+
+
+class TestDedupAndStrata:
+    """测试近似重复去除与分层"""
+
+    def test_near_duplicates_keep_highest_ranked(self):
+        results = [make_result(0, score=1.0, title="原帖"),
+                   make_result(0, score=50.0, title="热门转发", content="转发 " + TOPICS[0]),
+                   make_result(1, score=5.0)]
+        packed, stats = pack(results, 0)
+        assert stats["duplicates"] == 1
+        assert [result["title"] for result in packed] == ["热门转发", "标题1"]
+
+    def test_strata_are_interleaved(self):
+        """热度最高的平台不会占满预算，各平台×情感组合轮流装箱"""
+        results = [make_result(i, platform="weibo", sentiment="正面", score=100.0 - i) for i in range(4)]
+        results.append(make_result(4, platform="zhihu", sentiment="负面", score=1.0))
+        results.append(make_result(5, platform="weibo", sentiment="负面", score=0.5))
+        packed, stats = pack(results, 0)
+        assert stats["groups"] == 3
+        assert [(r["platform"], r["sentiment"]) for r in packed[:3]] == \
+            [("weibo", "正面"), ("zhihu", "负面"), ("weibo", "负面")]
+
+        budget = sum(estimate_tokens(r["content"]) for r in packed[:3])
+        limited, _ = pack(results, budget)
+        assert {r["platform"] for r in limited} == {"weibo", "zhihu"}
+
+
+class TestRanking:
+    """测试排序分与发布时间"""
+
+    def test_missing_metrics_keep_search_order(self):
+        results = [make_result(i) for i in range(4)]
+        packed, _ = pack(results, 0)
+        assert [result["title"] for result in packed] == [f"标题{i}" for i in range(4)]
+
+    def test_recent_results_rank_higher(self):
+        now = datetime.now(timezone.utc)
+        results = [make_result(0, published_date=(now - timedelta(days=30)).isoformat()),
+                   make_result(1, published_date=(now - timedelta(hours=1)).isoformat())]
+        scores = rank_results(results)
+        assert scores[1] > scores[0]
+
+    @pytest.mark.parametrize("published", [
+        "2024-01-01T08:00:00+08:00",
+        "2024-01-01T00:00:00Z",
+        datetime(2024, 1, 1, tzinfo=timezone.utc),
+    ])
+    def test_aware_timestamps(self, published):
+        now = datetime(2024, 1, 2, tzinfo=timezone.utc)
+        assert _age_days({"published_date": published}, now) == pytest.approx(1.0)
+
+    def test_naive_timestamp_is_local_time(self):
+        local = datetime(2024, 1, 1, 12, 0)
+        now = local.astimezone(timezone.utc) + timedelta(days=2)
+        assert _age_days({"published_date": local.isoformat()}, now) == pytest.approx(2.0)
+        assert _age_days({"published_date": local}, now) == pytest.approx(2.0)
+
+    @pytest.mark.parametrize("published", [None, "", "昨天", "2024-13-01"])
+    def test_unparseable_dates(self, published):
+        assert _age_days({"published_date": published}, datetime.now(timezone.utc)) is None
+
+    def test_future_dates_are_clamped(self):
+        now = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        assert _age_days({"published_date": "2024-01-05T00:00:00+00:00"}, now) == 0.0
@@ -0,0 +1,171 @@
+"""
+测试utils/result_store.py中的搜索结果存储
+
+覆盖内容寻址去重、get_many批量读取、研究状态中search_history经结果ID的保存与还原，
+以及按保留期清理未被断点引用的结果
+"""
+
+import json
+import sqlite3
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from InsightEngine.state.state import Search, State
+from utils import result_store
+from utils.checkpoint import maintain_result_store, referenced_result_ids, write_checkpoint
+from utils.result_store import ResultStore, get_result_store, result_id
+
+DAY = 86400
+
+
+def make_result(index: int, **overrides):
+    result = {"url": f"https://example.com/{index}", "title": f"标题{index}", "content": f"内容{index}"}
+    result.update(overrides)
+    return result
+
+
+class FakeClock:
+    def __init__(self, now: float = 100 * DAY):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(result_store.time, "time", fake)
+    return fake
+
+
+class TestResultStore:
+    """测试写入与读取"""
+
+    def test_content_addressed_dedup(self, tmp_path):
+        store = ResultStore(str(tmp_path / "results.db"))
+        first = store.put_many([make_result(1), make_result(2)])
+        second = store.put_many([make_result(2, score=0.9), make_result(1)])
+        assert second == first[::-1]
+        assert store.count() == 2
+        assert first[0] == result_id("https://example.com/1", "标题1", "内容1")
+        assert store.put_many([make_result(1, content="内容有变化")])[0] not in first
+        assert store.count() == 3
+
+    def test_get_many_order_and_missing_ids(self, tmp_path):
+        store = ResultStore(str(tmp_path / "results.db"))
+        ids = store.put_many([make_result(i) for i in range(1200)])
+        requested = ids[::-1] + ids[:3] + ["missing"]
+        found = store.get_many(requested)
+        assert "missing" not in found
+        assert len(found) == 1200
+        assert [found[i]["title"] for i in requested[:-1]] == [f"标题{i}" for i in range(1199, -1, -1)] + \
+            ["标题0", "标题1", "标题2"]
+        assert found[ids[5]] == {"url": "https://example.com/5", "title": "标题5", "content": "内容5"}
+
+    def test_shared_store_per_path(self, tmp_path):
+        path = str(tmp_path / "shared.db")
+        assert get_result_store(path) is get_result_store(path)
+
+
+class TestSearchHistoryRoundTrip:
+    """测试研究状态只保存结果ID，加载后能还原完整搜索记录"""
+
+    def test_round_trip_through_dict(self, tmp_path):
+        store_path = str(tmp_path / "results.db")
+        state = State(query="测试", result_store=store_path)
+        state.add_paragraph("段落一", "预期内容")
+        research = state.paragraphs[0].research
+        research.add_search_results("查询A", [dict(make_result(1), score=0.5), dict(make_result(2), score=None)])
+        research.add_search_results("查询B", [dict(make_result(1), score=0.8)])
+
+        data = json.loads(state.to_json())
+        rounds = data["paragraphs"][0]["research"]["search_rounds"]
+        assert "content" not in json.dumps(rounds, ensure_ascii=False)
+        assert rounds[1]["result_ids"] == [rounds[0]["result_ids"][0]]
+        assert get_result_store(store_path).count() == 2
+
+        restored = State.from_dict(data).paragraphs[0].research
+        history = [(s.query, s.title, s.content, s.score) for s in restored.search_history]
+        assert history == [("查询A", "标题1", "内容1", 0.5), ("查询A", "标题2", "内容2", None),
+                           ("查询B", "标题1", "内容1", 0.8)]
+        assert restored.get_search_count() == 3
+
+    def test_legacy_search_history_is_migrated(self, tmp_path):
+        """旧版本断点中完整保存的search_history加载后写入结果存储"""
+        store_path = str(tmp_path / "results.db")
+        legacy = Search(query="旧查询", url="https://example.com/old", title="旧标题", content="旧内容", score=0.3)
+        data = {"query": "测试", "result_store": store_path,
+                "paragraphs": [{"title": "段落", "research": {"search_history": [legacy.to_dict()]}}]}
+        research = State.from_dict(data).paragraphs[0].research
+        assert [(s.title, s.content, s.score) for s in research.search_history] == [("旧标题", "旧内容", 0.3)]
+        assert "search_history" not in research.to_dict()
+
+
+class TestRetention:
+    """测试按保留期清理未被断点引用的结果"""
+
+    def test_prune_keeps_recent_and_referenced(self, tmp_path, clock):
+        store = ResultStore(str(tmp_path / "results.db"))
+        old_ids = store.put_many([make_result(1), make_result(2), make_result(3)])
+        clock.now += 40 * DAY
+        recent_ids = store.put_many([make_result(4)])
+        reused = store.put_many([make_result(3)])
+
+        assert store.prune(30, keep_ids=[old_ids[1]]) == 1
+        assert set(store.get_many(old_ids + recent_ids)) == {old_ids[1], reused[0], recent_ids[0]}
+
+    def test_referenced_ids_from_checkpoints(self, tmp_path):
+        store_path = str(tmp_path / "results.db")
+        state = State(query="测试", result_store=store_path)
+        state.add_paragraph("段落", "")
+        state.paragraphs[0].research.add_search_results("查询", [make_result(1), make_result(2)])
+        write_checkpoint(str(tmp_path / "insight"), "run_1", state.to_dict())
+        (tmp_path / "media").mkdir()
+        (tmp_path / "media" / "broken.json").write_text("{", encoding="utf-8")
+
+        ids = referenced_result_ids([str(tmp_path / "insight"), str(tmp_path / "media"), str(tmp_path / "none")])
+        assert ids == set(state.paragraphs[0].research.search_rounds[0].result_ids)
+
+    def test_maintain_uses_all_registered_checkpoint_dirs(self, tmp_path, clock):
+        """共用存储的其他引擎登记的断点目录中引用的结果同样保留"""
+        store = ResultStore(str(tmp_path / "results.db"))
+        kept, dropped = store.put_many([make_result(1), make_result(2)])
+        write_checkpoint(str(tmp_path / "media"), "run_1",
+                         {"paragraphs": [{"research": {"search_rounds": [{"result_ids": [kept]}]}}]})
+        store.register_checkpoint_dir(str(tmp_path / "media"))
+        clock.now += 40 * DAY
+
+        assert maintain_result_store(store, str(tmp_path / "insight"), 30)
+        for thread in [t for t in threading.enumerate() if t.name == "result-store-prune"]:
+            thread.join(timeout=5)
+        assert store.checkpoint_dirs() == sorted([str(tmp_path / "insight"), str(tmp_path / "media")])
+        assert set(store.get_many([kept, dropped])) == {kept}
+        # 每个进程每个存储只清理一次
+        assert not maintain_result_store(store, str(tmp_path / "insight"), 30)
+
+    def test_retention_disabled(self, tmp_path):
+        store = ResultStore(str(tmp_path / "results.db"))
+        assert not maintain_result_store(store, str(tmp_path / "insight"), 0)
+        assert store.checkpoint_dirs() == [str(tmp_path / "insight")]
+
+    def test_old_schema_is_migrated(self, tmp_path):
+        """旧版本没有写入时间的数据库自动补列，其中的结果视为已过期"""
+        path = str(tmp_path / "old.db")
+        conn = sqlite3.connect(path)
+        conn.execute("CREATE TABLE results (id TEXT PRIMARY KEY, url TEXT NOT NULL, title TEXT NOT NULL, "
+                     "content TEXT NOT NULL)")
+        conn.execute("INSERT INTO results VALUES ('old', 'u', 't', 'c')")
+        conn.commit()
+        conn.close()
+
+        store = ResultStore(path)
+        assert store.get_many(["old"]) == {"old": {"url": "u", "title": "t", "content": "c"}}
+        assert store.prune(30) == 1
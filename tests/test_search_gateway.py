@@ -0,0 +1,187 @@
+"""
+测试utils/search_gateway.py中的搜索网关
+
+使用FakeSearchBackend离线运行，覆盖缓存TTL过期、磁盘缓存重新加载、返回副本、
+相同请求并发时只调用一次，以及批量搜索按输入顺序返回
+"""
+
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from utils import search_gateway
+from utils.search_gateway import FakeSearchBackend, SearchCache, SearchGateway, cache_key
+
+
+class CountingBackend(FakeSearchBackend):
+    """记录调用次数，可在返回前阻塞，用于构造并发请求"""
+
+    def __init__(self, gate: threading.Event = None, **kwargs):
+        super().__init__(**kwargs)
+        self.gate = gate
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def search(self, provider, params):
+        with self._lock:
+            self.calls.append(params["query"])
+        if self.gate is not None:
+            self.gate.wait(timeout=5)
+        return super().search(provider, params)
+
+
+def unused_fetch(params):
+    raise AssertionError("使用模拟后端时不应调用真实请求函数")
+
+
+class FakeClock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(search_gateway.time, "time", fake)
+    return fake
+
+
+class TestSearchCache:
+    """测试两级TTL缓存"""
+
+    def test_ttl_expiry(self, clock):
+        cache = SearchCache(ttl=60)
+        cache.set("k", {"results": [1]})
+        clock.now += 59
+        assert cache.get("k") == {"results": [1]}
+        clock.now += 2
+        assert cache.get("k") is None
+
+    def test_disabled_when_ttl_not_positive(self):
+        cache = SearchCache(ttl=0)
+        cache.set("k", {"results": [1]})
+        assert cache.get("k") is None
+
+    def test_disk_tier_reload(self, tmp_path, clock):
+        """新的缓存实例（如另一个进程）从磁盘读到未过期的结果，过期的不返回"""
+        SearchCache(ttl=60, cache_dir=str(tmp_path)).set("abcdef", {"answer": "磁盘"})
+        reloaded = SearchCache(ttl=60, cache_dir=str(tmp_path))
+        assert reloaded.get("abcdef") == {"answer": "磁盘"}
+        clock.now += 61
+        assert SearchCache(ttl=60, cache_dir=str(tmp_path)).get("abcdef") is None
+
+    def test_lru_eviction(self):
+        cache = SearchCache(ttl=60, max_entries=2)
+        for key in ("a", "b", "c"):
+            cache.set(key, {"key": key})
+        assert cache.get("a") is None
+        assert cache.get("c") == {"key": "c"}
+
+    def test_returns_copies(self, tmp_path):
+        """调用方修改取到的结果或写入后的原字典，都不影响缓存内容"""
+        cache = SearchCache(ttl=60, cache_dir=str(tmp_path))
+        value = {"results": [{"title": "原始"}]}
+        cache.set("abcdef", value)
+        value["results"].append({"title": "写入后修改"})
+        first = cache.get("abcdef")
+        first["results"][0]["title"] = "读取后修改"
+        assert cache.get("abcdef") == {"results": [{"title": "原始"}]}
+        reloaded = SearchCache(ttl=60, cache_dir=str(tmp_path))
+        reloaded.get("abcdef")["results"].clear()
+        assert reloaded.get("abcdef") == {"results": [{"title": "原始"}]}
+
+
+class TestSearchGateway:
+    """测试网关的缓存命中、并发去重与批量执行"""
+
+    def test_cache_hit_skips_backend(self):
+        backend = CountingBackend()
+        gateway = SearchGateway(SearchCache(ttl=60), backend=backend)
+        first = gateway.search("tavily", {"query": "  新能源 汽车 "}, unused_fetch)
+        second = gateway.search("tavily", {"query": "新能源   汽车"}, unused_fetch)
+        assert first == second
+        assert len(backend.calls) == 1
+        assert gateway.stats["hits"] == 1
+        assert cache_key("tavily", {"query": "A  b"}) == cache_key("tavily", {"query": " a b", "days": None})
+
+    def test_uncacheable_results_are_not_stored(self):
+        calls = []
+
+        def fetch(params):
+            calls.append(params)
+            return {"error": "rate limited"}
+
+        gateway = SearchGateway(SearchCache(ttl=60))
+        for _ in range(2):
+            gateway.search("bocha", {"query": "q"}, fetch, cacheable=lambda result: "error" not in result)
+        assert len(calls) == 2
+
+    def test_single_flight_for_concurrent_identical_queries(self):
+        gate = threading.Event()
+        backend = CountingBackend(gate=gate)
+        gateway = SearchGateway(SearchCache(ttl=0), backend=backend)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(
+            gateway.search("tavily", {"query": "同一查询"}, unused_fetch))) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        deadline = time.monotonic() + 5
+        while gateway.stats["shared"] < 5 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        gate.set()
+        for thread in threads:
+            thread.join(timeout=5)
+
+        assert backend.calls == ["同一查询"]
+        assert gateway.stats["shared"] == 5
+        assert len(results) == 6
+        assert all(result == results[0] for result in results)
+        assert len({id(result) for result in results}) == 6
+
+    def test_failed_search_is_retried(self):
+        """请求失败时异常抛给调用方，不留下缓存或进行中的记录"""
+        gateway = SearchGateway(SearchCache(ttl=60))
+
+        def fetch(params):
+            raise RuntimeError("接口错误")
+
+        with pytest.raises(RuntimeError):
+            gateway.search("tavily", {"query": "q"}, fetch)
+        assert gateway.search("tavily", {"query": "q"}, lambda params: {"ok": True}) == {"ok": True}
+
+    def test_batch_preserves_input_order(self):
+        gateway = SearchGateway(max_workers=4)
+        delays = [0.08, 0.01, 0.05, 0.0]
+
+        def call(index):
+            time.sleep(delays[index])
+            return index
+
+        assert gateway.batch([lambda i=i: call(i) for i in range(len(delays))]) == [0, 1, 2, 3]
+
+    def test_bocha_batch_search_order(self):
+        """MediaEngine的batch_search按输入顺序返回各工具的结果"""
+        from MediaEngine.tools.search import BochaMultimodalSearch
+
+        gateway = SearchGateway(SearchCache(ttl=60), backend=FakeSearchBackend(), max_workers=4)
+        agency = BochaMultimodalSearch(api_key="offline", gateway=gateway)
+        queries = ["第一个", "第二个", "第三个"]
+        responses = agency.batch_search([
+            ("comprehensive_search", {"query": queries[0]}),
+            ("web_search_only", {"query": queries[1]}),
+            ("search_last_week", {"query": queries[2]}),
+        ])
+        assert [response.query for response in responses] == queries
+        assert all(response.webpages for response in responses)
+        with pytest.raises(ValueError):
+            agency.batch_search([("unknown_tool", {"query": "q"})])
@@ -0,0 +1,88 @@
+"""
+测试QueryEngine与MediaEngine中搜索规划的提前搜索回调
+
+覆盖search_query与search_tool都输出后才提交后台搜索，以及提交的任务使用提交时的参数，
+执行前LLM重试输出新字段（回调清空已收集的字段）不影响已提交的任务
+"""
+
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+pytest.importorskip("openai")
+
+
+class RecordingGateway:
+    """只记录提交的后台任务，由测试决定何时执行"""
+
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, fn):
+        self.submitted.append(fn)
+
+
+class RecordingScheduler:
+    def __init__(self):
+        self.calls = []
+
+    def run(self, stage, resource, fn, *args, **kwargs):
+        self.calls.append((stage, args, kwargs))
+
+
+def make_agent():
+    return SimpleNamespace(
+        config=SimpleNamespace(SPECULATIVE_SEARCH=True, SEARCH_CACHE_TTL=60),
+        search_gateway=RecordingGateway(),
+        scheduler=RecordingScheduler(),
+        execute_search_tool=lambda *args, **kwargs: None,
+    )
+
+
+@pytest.fixture(autouse=True)
+def offline_env(monkeypatch):
+    """导入Engine时会创建配置，提供离线的API密钥"""
+    for name in ("QUERY_ENGINE_API_KEY", "QUERY_ENGINE_MODEL_NAME", "TAVILY_API_KEY",
+                 "INSIGHT_ENGINE_API_KEY", "MEDIA_ENGINE_API_KEY", "REPORT_ENGINE_API_KEY",
+                 "FORUM_HOST_API_KEY", "KEYWORD_OPTIMIZER_API_KEY", "BOCHA_WEB_SEARCH_API_KEY"):
+        monkeypatch.setenv(name, "offline")
+
+
+def load_agent_class(engine: str):
+    if engine == "query":
+        pytest.importorskip("tavily")
+        from QueryEngine.agent import DeepSearchAgent
+    else:
+        from MediaEngine.agent import DeepSearchAgent
+    return DeepSearchAgent
+
+
+@pytest.mark.parametrize("engine, tool, expected_kwargs", [
+    ("query", "basic_search_news", {"label": "段落1"}),
+    ("media", "comprehensive_search", {"label": "段落1", "max_results": 10}),
+])
+class TestSpeculativeSearch:
+    """测试提前搜索回调"""
+
+    def test_submitted_task_uses_values_at_submit_time(self, engine, tool, expected_kwargs):
+        agent_class = load_agent_class(engine)
+        agent = make_agent()
+        on_field = agent_class._speculative_search(agent, "段落1")
+
+        on_field("search_query", "新能源汽车")
+        assert agent.search_gateway.submitted == []
+        on_field("search_tool", tool)
+        assert len(agent.search_gateway.submitted) == 1
+
+        # LLM重试，新的输出只到了search_query，已收集的字段被清空
+        on_field("search_query", "重试后的查询")
+        assert len(agent.search_gateway.submitted) == 1
+
+        agent.search_gateway.submitted[0]()
+        assert agent.scheduler.calls == [("speculative_search", (tool, "新能源汽车"), expected_kwargs)]
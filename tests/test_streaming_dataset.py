@@ -0,0 +1,107 @@
+"""
+测试SentimentAnalysisModel/streaming_dataset.py中的分词分片缓存
+
+覆盖分片写入与复用、按样本序号读取、样本长度读取、长度分桶取批次以及打开分片数的上限
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+# 添加情感模型目录到路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root / "SentimentAnalysisModel"))
+
+from streaming_dataset import TokenizedShards
+
+
+class CharTokenizer:
+    """按字符分词的测试分词器，每个字符的 token id 为其码位"""
+
+    name_or_path = "char-tokenizer"
+
+    def __init__(self):
+        self.calls = 0
+
+    def __len__(self):
+        return 0x110000
+
+    def __call__(self, texts, truncation=True, max_length=None):
+        self.calls += 1
+        return {"input_ids": [[ord(ch) for ch in text[:max_length]] for text in texts]}
+
+
+RECORDS = [("a" * length, length % 2) for length in (5, 1, 9, 3, 7, 2, 8, 4, 6, 10, 12)]
+
+
+def build_shards(tmp_path, tokenizer=None, shard_size=4, max_length=10):
+    shards = TokenizedShards(tokenizer or CharTokenizer(), max_length, "records",
+                             cache_root=str(tmp_path), shard_size=shard_size)
+    return shards.build(RECORDS)
+
+
+class TestTokenizedShards:
+    """测试分片写入、读取和按长度分桶"""
+
+    def test_build_writes_shards_and_reads_samples(self, tmp_path):
+        """分片按 shard_size 切分，按序号读取的结果与截断后的分词一致"""
+        shards = build_shards(tmp_path)
+        assert shards.is_complete
+        assert shards.num_shards == 3
+        assert len(shards) == len(RECORDS)
+        for index, (text, _) in enumerate(RECORDS):
+            item = shards[index]
+            assert item["input_ids"] == [ord("a")] * min(len(text), 10)
+            assert item["attention_mask"] == [1] * len(item["input_ids"])
+        assert shards[-1]["input_ids"] == [ord("a")] * 10
+        with pytest.raises(IndexError):
+            shards[len(RECORDS)]
+        assert shards.labels().tolist() == [label for _, label in RECORDS]
+
+    def test_complete_cache_is_reused(self, tmp_path):
+        """相同分词器、max_length 和数据指纹的缓存直接复用，不再分词"""
+        build_shards(tmp_path)
+        tokenizer = CharTokenizer()
+        shards = build_shards(tmp_path, tokenizer)
+        assert tokenizer.calls == 0
+        assert len(shards) == len(RECORDS)
+
+    def test_lengths_come_from_offsets(self, tmp_path):
+        """lengths() 返回每条样本截断后的 token 数，不需要逐条读取样本"""
+        shards = build_shards(tmp_path)
+        assert shards.lengths().tolist() == [min(len(text), 10) for text, _ in RECORDS]
+
+    def test_iter_batches_groups_by_length(self, tmp_path):
+        """不打乱时每个分片内按长度排序切批，批内只填充到最长样本"""
+        shards = build_shards(tmp_path)
+        batches = list(shards.iter_batches(batch_size=2, shuffle=False, pad_token_id=0))
+        seen = []
+        for batch in batches:
+            lengths = batch["attention_mask"].sum(axis=1)
+            assert batch["input_ids"].shape[1] == lengths.max()
+            assert (batch["input_ids"][batch["attention_mask"] == 0] == 0).all()
+            assert batch["labels"].tolist() == [RECORDS[i][1] for i in batch["index"]]
+            seen.extend(batch["index"].tolist())
+        assert sorted(seen) == list(range(len(RECORDS)))
+        first_shard = [i for batch in batches[:2] for i in batch["index"].tolist()]
+        assert [len(RECORDS[i][0]) for i in first_shard] == [1, 3, 5, 9]
+
+    def test_shuffled_batches_cover_every_sample(self, tmp_path):
+        """打乱时每条样本恰好出现一次，且同一批次来自同一分片"""
+        shards = build_shards(tmp_path)
+        seen = []
+        for batch in shards.iter_batches(batch_size=3, shuffle=True, seed=7):
+            assert len({int(i) // 4 for i in batch["index"]}) == 1
+            seen.extend(batch["index"].tolist())
+        assert sorted(seen) == list(range(len(RECORDS)))
+
+    def test_open_shards_are_bounded(self, tmp_path):
+        """遍历所有样本后同时打开的分片数不超过上限"""
+        shards = build_shards(tmp_path)
+        for index in range(len(shards)):
+            shards[index]
+        assert len(shards._opened) <= TokenizedShards.MAX_OPEN_SHARDS
+        assert list(shards._opened) == [1, 2]
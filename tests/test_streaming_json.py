@@ -0,0 +1,173 @@
+"""
+测试utils/streaming_json.py中的流式JSON解析
+
+覆盖按任意文本块增量输入、<think>推理块与markdown代码块、截断补全、转义引号、顶层数组，
+以及输出中没有JSON时的回退
+"""
+
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from utils.streaming_json import StreamingJSONParser, parse_json_text
+
+SEARCH_OUTPUT = {
+    "search_query": "新能源汽车 销量",
+    "search_tool": "basic_search_news",
+    "reasoning": "需要最新的\"销量\"数据，\n并对比去年同期",
+    "filters": {"days": 7, "sources": ["微博", "知乎"]},
+    "max_results": 10,
+    "strict": False,
+    "note": None,
+}
+
+
+def feed_in_chunks(text: str, size: int):
+    """按固定长度切块输入，返回每块完成的字段和解析结果"""
+    parser = StreamingJSONParser()
+    completed = []
+    for start in range(0, len(text), size):
+        completed.append(parser.feed(text[start:start + size]))
+    return completed, parser.finish()
+
+
+class TestIncrementalFeed:
+    """测试增量输入"""
+
+    @pytest.mark.parametrize("size", [1, 2, 3, 7, 1000])
+    def test_any_chunking_gives_same_result(self, size):
+        text = json.dumps(SEARCH_OUTPUT, ensure_ascii=False, indent=2)
+        completed, result = feed_in_chunks(text, size)
+        assert result.value == SEARCH_OUTPUT
+        assert result.complete and not result.repaired
+        assert [key for chunk in completed for key, _ in chunk] == list(SEARCH_OUTPUT)
+
+    def test_fields_are_emitted_as_soon_as_complete(self):
+        """search_query 完成时即产出，不需要等后面的推理说明"""
+        parser = StreamingJSONParser()
+        assert parser.feed('{"search_query": "新能源') == []
+        assert parser.feed('汽车", "reason') == [("search_query", "新能源汽车")]
+        assert parser.feed('ing": "因为') == []
+        assert parser.feed('..."}') == [("reasoning", "因为...")]
+        assert parser.fields == [("search_query", "新能源汽车"), ("reasoning", "因为...")]
+
+    def test_scalar_field_completes_on_delimiter(self):
+        parser = StreamingJSONParser()
+        assert parser.feed('{"count": 12') == []
+        assert parser.feed('3, "ok": true') == [("count", 123)]
+        assert parser.feed("}") == [("ok", True)]
+
+    def test_text_after_root_is_ignored(self):
+        result = parse_json_text('{"a": 1}\n以上是搜索规划。{"b": 2}')
+        assert result.value == {"a": 1}
+        assert result.text == '{"a": 1}'
+
+
+class TestPreamble:
+    """测试JSON之前的推理块、说明文字与代码块标记"""
+
+    def test_think_block_with_braces_is_skipped(self):
+        text = '<think>先想一下 {"search_query": "错误"} 这种格式</think>\n{"search_query": "正确"}'
+        result = parse_json_text(text)
+        assert result.value == {"search_query": "正确"}
+
+    @pytest.mark.parametrize("size", [1, 3, 5])
+    def test_think_tags_split_across_chunks(self, size):
+        text = '<think>推理 [1, 2]</think>```json\n{"a": [1, 2]}\n```'
+        _, result = feed_in_chunks(text, size)
+        assert result.value == {"a": [1, 2]}
+        assert result.complete
+
+    def test_markdown_fence_and_leading_text(self):
+        result = parse_json_text('好的，结果如下：\n```json\n{"search_tool": "deep_search_news"}\n```')
+        assert result.value == {"search_tool": "deep_search_news"}
+
+
+class TestEscapes:
+    """测试字符串中的转义"""
+
+    def test_escaped_quotes_and_backslashes(self):
+        value = {"query": 'he said "hi" \\ 引号\\"', "path": "C:\\tmp\\"}
+        _, result = feed_in_chunks(json.dumps(value, ensure_ascii=False), 1)
+        assert result.value == value
+
+    def test_brackets_inside_strings(self):
+        result = parse_json_text('{"a": "包含 } 和 ] 以及 { [", "b": 1}')
+        assert result.value == {"a": "包含 } 和 ] 以及 { [", "b": 1}
+
+    def test_invalid_escape_keeps_raw_text(self):
+        result = parse_json_text('{"a": "非法转义\\q 保留", "b": 2}')
+        assert result.value["b"] == 2
+        assert "保留" in result.value["a"]
+
+    def test_raw_newline_in_string(self):
+        result = parse_json_text('{"a": "第一行\n第二行"}')
+        assert result.value == {"a": "第一行\n第二行"}
+
+
+class TestTopLevelArray:
+    """测试顶层数组"""
+
+    def test_elements_are_emitted_with_index(self):
+        parser = StreamingJSONParser()
+        fields = parser.feed('[{"title": "段落一"}, {"title": "段落二"}')
+        assert fields == [(0, {"title": "段落一"}), (1, {"title": "段落二"})]
+        assert parser.feed("]") == []
+        result = parser.finish()
+        assert result.value == [{"title": "段落一"}, {"title": "段落二"}]
+        assert result.complete
+
+    def test_truncated_array_keeps_complete_elements(self):
+        result = parse_json_text('[{"title": "段落一", "content": "完整"}, {"title": "段落二", "cont')
+        assert result.repaired and not result.complete
+        assert result.value == [{"title": "段落一", "content": "完整"}, {"title": "段落二"}]
+
+
+class TestTruncationRepair:
+    """测试输出被截断时的补全"""
+
+    def test_unclosed_string_value_is_kept(self):
+        result = parse_json_text('{"search_query": "新能源", "reasoning": "需要最新')
+        assert result.repaired
+        assert result.value == {"search_query": "新能源", "reasoning": "需要最新"}
+
+    def test_trailing_escape_is_dropped(self):
+        result = parse_json_text('{"a": "结尾是反斜杠\\')
+        assert result.value == {"a": "结尾是反斜杠"}
+
+    @pytest.mark.parametrize("tail", [', "reas', ', "reasoning"', ', "reasoning":', ', "reasoning": ',
+                                      ', "count": 12', ', "ok": tr', ","])
+    def test_partial_member_is_dropped(self, tail):
+        result = parse_json_text('{"search_query": "新能源"' + tail)
+        assert result.value == {"search_query": "新能源"}
+
+    def test_nested_structures_are_closed(self):
+        result = parse_json_text('{"a": {"b": [1, 2, {"c": "d')
+        assert result.value == {"a": {"b": [1, 2, {"c": "d"}]}}
+        assert result.text == '{"a": {"b": [1, 2, {"c": "d"}]}}'
+
+    def test_just_opened_container_is_closed_empty(self):
+        result = parse_json_text('{"a": 1, "b": [')
+        assert result.value == {"a": 1, "b": []}
+
+
+class TestNoJSON:
+    """测试输出中没有JSON"""
+
+    def test_plain_text_fallback(self):
+        result = parse_json_text("<think>思考过程</think>```json\n抱歉，无法生成搜索查询\n```")
+        assert result.value is None
+        assert not result.complete and not result.repaired
+        assert result.text == "抱歉，无法生成搜索查询"
+
+    @pytest.mark.parametrize("text", ["", None])
+    def test_empty_output(self, text):
+        result = parse_json_text(text)
+        assert result.value is None
+        assert result.text == ""
@@ -0,0 +1,78 @@
+"""
+测试ReportEngine/utils/template_registry.py中的模板本地预排序
+
+使用仓库自带的报告模板，检查典型查询的排序结果，以及模板目录变化后的增量刷新
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from ReportEngine.utils.template_registry import TemplateRegistry, describe_template, tokenize
+
+TEMPLATE_DIR = project_root / "ReportEngine" / "report_template"
+
+
+@pytest.fixture(scope="module")
+def registry():
+    return TemplateRegistry(str(TEMPLATE_DIR))
+
+
+class TestTemplateRanking:
+    """测试典型查询排在第一位的模板"""
+
+    @pytest.mark.parametrize("query, expected", [
+        ("小米汽车品牌声誉与用户口碑年度复盘", "企业品牌声誉分析报告模板"),
+        ("国产手机厂商竞品对比与市场份额变化", "市场竞争格局舆情分析报告模板"),
+        ("本周舆情监测周报，数据汇总与动态追踪", "日常或定期舆情监测报告模板"),
+        ("新能源汽车补贴政策出台后的行业影响解读", "特定政策或行业动态舆情分析报告"),
+        ("网友热议的社会公共话题与社会心态", "社会公共热点事件分析报告模板"),
+        ("某企业产品事故曝光后的危机公关与道歉回应", "突发事件与危机公关舆情报告模板"),
+    ])
+    def test_expected_template_ranked_first(self, registry, query, expected):
+        ranked = registry.rank(query)
+        assert ranked[0][0].name == expected
+        assert ranked[0][1] > ranked[1][1]
+
+    def test_rank_returns_all_templates_sorted(self, registry):
+        """不指定top_k时返回全部模板，相似度从高到低"""
+        ranked = registry.rank("舆情分析")
+        assert len(ranked) == len(list(TEMPLATE_DIR.glob("*.md")))
+        scores = [score for _, score in ranked]
+        assert scores == sorted(scores, reverse=True)
+
+    def test_top_k_and_unrelated_query(self, registry):
+        """top_k截断结果；与任何模板都无关的文本相似度为0"""
+        assert len(registry.rank("品牌声誉", top_k=2)) == 2
+        assert all(score == 0 for _, score in registry.rank("xyz"))
+
+    def test_describe_template(self):
+        assert describe_template("突发事件与危机公关舆情报告模板") == "适用于突发事件和危机公关"
+        assert describe_template("自定义模板") == "通用报告模板"
+
+    def test_tokenize(self):
+        """中文按相邻两字切分，英文和数字按整词切分"""
+        assert tokenize("品牌声誉 SOV 2024") == ["品牌", "牌声", "声誉", "sov", "2024"]
+
+
+class TestTemplateRefresh:
+    """测试模板目录变化后的增量刷新"""
+
+    def test_added_changed_and_removed_templates(self, tmp_path):
+        (tmp_path / "企业品牌模板.md").write_text("# 品牌声誉\n", encoding="utf-8")
+        registry = TemplateRegistry(str(tmp_path), refresh_interval=0)
+        assert [t.name for t in registry.templates()] == ["企业品牌模板"]
+
+        (tmp_path / "突发危机模板.md").write_text("# 危机公关\n- **事件回应**\n", encoding="utf-8")
+        registry.refresh(force=True)
+        assert registry.rank("危机公关回应")[0][0].name == "突发危机模板"
+        assert registry.get("突发危机模板").headings == ["危机公关", "事件回应"]
+
+        (tmp_path / "企业品牌模板.md").unlink()
+        registry.refresh(force=True)
+        assert [t.name for t in registry.templates()] == ["突发危机模板"]
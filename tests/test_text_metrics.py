@@ -0,0 +1,128 @@
+"""
+测试utils/text_metrics.py中的文本度量
+
+覆盖token估算、未安装tiktoken或编码文件无法加载时的计数函数回退，以及SimHash指纹与汉明距离
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from utils import text_metrics
+from utils.text_metrics import estimate_tokens, get_token_counter, hamming_distance, simhash
+
+
+class TestEstimateTokens:
+    """测试token估算"""
+
+    @pytest.mark.parametrize("text, expected", [
+        ("", 0),
+        ("新能源汽车", 5),
+        ("abcd", 1),
+        ("abcde", 2),
+        ("电动车 EV", 3 + 1),
+        ("にほんご 한국어", 4 + 3 + 1),
+        ("销量增长12%", 4 + 1),
+    ])
+    def test_cjk_and_other_characters(self, text, expected):
+        assert estimate_tokens(text) == expected
+
+    def test_grows_with_length(self):
+        assert estimate_tokens("舆情" * 100) == 200
+        assert estimate_tokens("word " * 100) == 125
+
+
+class TestTokenCounter:
+    """测试token计数函数的选择"""
+
+    def test_falls_back_to_estimate_without_tiktoken(self, monkeypatch):
+        monkeypatch.setattr(text_metrics, "TIKTOKEN_AVAILABLE", False)
+        get_token_counter.cache_clear()
+        try:
+            assert get_token_counter("gpt-4o") is estimate_tokens
+        finally:
+            get_token_counter.cache_clear()
+
+    def test_tiktoken_counter(self, monkeypatch):
+        """未知模型使用cl100k_base编码（用假的tiktoken模块，不需要下载编码文件）"""
+        requested = []
+
+        class FakeEncoding:
+            def encode(self, text, disallowed_special=()):
+                return text.split()
+
+        class FakeTiktoken:
+            @staticmethod
+            def encoding_for_model(model_name):
+                raise KeyError(model_name)
+
+            @staticmethod
+            def get_encoding(name):
+                requested.append(name)
+                return FakeEncoding()
+
+        monkeypatch.setattr(text_metrics, "TIKTOKEN_AVAILABLE", True)
+        monkeypatch.setattr(text_metrics, "tiktoken", FakeTiktoken, raising=False)
+        get_token_counter.cache_clear()
+        try:
+            count = get_token_counter("unknown-model-name")
+            assert count("hello big world") == 3
+            assert requested == ["cl100k_base"]
+            assert get_token_counter("unknown-model-name") is count
+        finally:
+            get_token_counter.cache_clear()
+
+    def test_encoding_load_failure_falls_back_to_estimate(self, monkeypatch):
+        """tiktoken已安装但编码文件下载失败（离线）时回退到估算，而不是抛出异常"""
+
+        class OfflineTiktoken:
+            @staticmethod
+            def encoding_for_model(model_name):
+                raise KeyError(model_name)
+
+            @staticmethod
+            def get_encoding(name):
+                raise ConnectionError("Failed to resolve 'openaipublic.blob.core.windows.net'")
+
+        monkeypatch.setattr(text_metrics, "TIKTOKEN_AVAILABLE", True)
+        monkeypatch.setattr(text_metrics, "tiktoken", OfflineTiktoken, raising=False)
+        get_token_counter.cache_clear()
+        try:
+            assert get_token_counter("") is estimate_tokens
+            assert get_token_counter("gpt-4o") is estimate_tokens
+        finally:
+            get_token_counter.cache_clear()
+
+
+class TestSimHash:
+    """测试SimHash指纹"""
+
+    BASE = "外卖平台骑手权益保障引发热议，平台算法与配送时间受到广泛质疑，多地出台新规"
+
+    def test_identical_and_whitespace_insensitive(self):
+        assert simhash(self.BASE) == simhash(self.BASE)
+        assert simhash(self.BASE) == simhash(" ".join(self.BASE))
+
+    def test_near_duplicate_is_closer_than_unrelated(self):
+        near = simhash("转发：" + self.BASE)
+        unrelated = simhash("极端天气频发，防汛抗旱与城市排水系统建设备受关注，气象部门发布预警")
+        assert hamming_distance(simhash(self.BASE), near) < 16
+        assert hamming_distance(simhash(self.BASE), unrelated) > 16
+
+    def test_fingerprint_width(self):
+        assert 0 <= simhash(self.BASE) < 1 << 64
+        assert 0 <= simhash(self.BASE, bits=32) < 1 << 32
+
+    @pytest.mark.parametrize("text", ["", "短", "两字"])
+    def test_short_text(self, text):
+        assert simhash(text) == simhash(text)
+
+    def test_hamming_distance(self):
+        assert hamming_distance(0b1011, 0b1011) == 0
+        assert hamming_distance(0b1011, 0b0010) == 2
+        assert hamming_distance(0, (1 << 64) - 1) == 64
@@ -0,0 +1,154 @@
+"""
+研究运行的断点保存与恢复
+各引擎在生成报告结构、每个段落完成首次总结、每轮反思总结后把状态写入 <断点目录>/<run_id>.json，
+运行中断后按 run_id 加载断点继续：已完成的段落、已完成的首次总结和反思都不会重新调用LLM。
+状态中只保存搜索结果ID（正文在结果存储中），断点文件很小，每个阶段都写一次的开销可以忽略；
+结果存储按保留期清理时，保留所有断点仍引用的结果。
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+import uuid
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Set
+
+from loguru import logger
+
+_RUN_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+def new_run_id() -> str:
+    """生成运行ID：时间戳 + 随机后缀，可直接用作文件名"""
+    suffix = hashlib.blake2b(uuid.uuid4().bytes, digest_size=3).hexdigest()
+    return f"{datetime.now():%Y%m%d_%H%M%S}_{suffix}"
+
+
+def checkpoint_path(checkpoint_dir: str, run_id: str) -> str:
+    """断点文件路径，run_id 只允许字母、数字、下划线和连字符"""
+    if not run_id or not _RUN_ID_PATTERN.match(run_id):
+        raise ValueError(f"无效的运行ID: {run_id!r}")
+    return os.path.join(checkpoint_dir, f"{run_id}.json")
+
+
+def write_checkpoint(checkpoint_dir: str, run_id: str, data: Dict[str, Any]) -> str:
+    """
+    写入断点，先写临时文件再替换，进程在写入过程中退出也不会留下损坏的断点
+
+    Returns:
+        断点文件路径
+    """
+    path = checkpoint_path(checkpoint_dir, run_id)
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+    return path
+
+
+def read_checkpoint(checkpoint_dir: str, run_id: str) -> Dict[str, Any]:
+    """读取断点，不存在时抛出 FileNotFoundError"""
+    path = checkpoint_path(checkpoint_dir, run_id)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"未找到运行 {run_id} 的断点: {path}")
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def list_checkpoints(checkpoint_dir: str, include_completed: bool = False) -> List[Dict[str, Any]]:
+    """
+    列出断点目录中的运行，按更新时间从新到旧排序
+
+    Args:
+        checkpoint_dir: 断点目录
+        include_completed: 是否包含已生成最终报告的运行
+
+    Returns:
+        每个运行的 run_id、查询、段落进度、是否完成和更新时间
+    """
+    if not os.path.isdir(checkpoint_dir):
+        return []
+    runs = []
+    for filename in os.listdir(checkpoint_dir):
+        run_id, ext = os.path.splitext(filename)
+        if ext != ".json" or not _RUN_ID_PATTERN.match(run_id):
+            continue
+        try:
+            with open(os.path.join(checkpoint_dir, filename), "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if data.get("is_completed") and not include_completed:
+            continue
+        paragraphs = data.get("paragraphs", [])
+        runs.append({
+            "run_id": run_id,
+            "query": data.get("query", ""),
+            "report_title": data.get("report_title", ""),
+            "total_paragraphs": len(paragraphs),
+            "completed_paragraphs": sum(1 for p in paragraphs if p.get("research", {}).get("is_completed")),
+            "is_completed": data.get("is_completed", False),
+            "updated_at": data.get("updated_at", ""),
+        })
+    runs.sort(key=lambda run: run["updated_at"], reverse=True)
+    return runs
+
+
+def referenced_result_ids(checkpoint_dirs: Iterable[str]) -> Set[str]:
+    """断点目录中所有断点引用的搜索结果ID"""
+    ids: Set[str] = set()
+    for checkpoint_dir in checkpoint_dirs:
+        if not os.path.isdir(checkpoint_dir):
+            continue
+        for filename in os.listdir(checkpoint_dir):
+            if not filename.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(checkpoint_dir, filename), "r", encoding="utf-8") as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            for paragraph in data.get("paragraphs", []):
+                for search_round in paragraph.get("research", {}).get("search_rounds", []):
+                    ids.update(search_round.get("result_ids", []))
+    return ids
+
+
+_pruned_stores: Set[str] = set()
+_pruned_lock = threading.Lock()
+
+
+def maintain_result_store(store, checkpoint_dir: str, retention_days: float) -> bool:
+    """
+    登记断点目录，并在后台线程中按保留期清理一次结果存储（每个进程每个存储只清理一次）
+    清理时保留所有已登记断点目录中的断点引用的结果，包括共用同一存储的其他引擎
+
+    Args:
+        store: 结果存储（ResultStore）
+        checkpoint_dir: 当前引擎的断点目录
+        retention_days: 保留天数，<=0 表示不清理
+
+    Returns:
+        是否启动了清理
+    """
+    store.register_checkpoint_dir(checkpoint_dir)
+    if retention_days <= 0:
+        return False
+    with _pruned_lock:
+        if store.path in _pruned_stores:
+            return False
+        _pruned_stores.add(store.path)
+
+    def prune():
+        try:
+            deleted = store.prune(retention_days, referenced_result_ids(store.checkpoint_dirs()))
+            if deleted:
+                logger.info(f"结果存储已清理 {deleted} 条超过 {retention_days} 天且未被断点引用的结果: {store.path}")
+        except Exception as e:
+            logger.warning(f"清理结果存储失败: {str(e)}")
+
+    threading.Thread(target=prune, name="result-store-prune", daemon=True).start()
+    return True
@@ -1,51 +1,272 @@
 """
 Forum日志读取工具
 用于读取forum.log中的最新HOST发言
+
+forum.log只会追加写入，读取时从文件末尾按块反向查找，并按文件的 (inode, 大小, 修改时间) 缓存结果，
+每次总结的开销不随日志增长；文件追加时只扫描新增的完整行。日志被原地清空后重写时文件可能长到超过上次读到的
+位置，因此同时记录文件开头的内容，开头变化时从头重新扫描。与ForumEngine同进程运行时，主持人发言写入后
+直接推送给订阅者并作为缓存，之后其他写入方追加的发言仍会从文件中读到。
 """
 
+import os
 import re
+import threading
 from pathlib import Path
-from typing import Optional, List, Dict
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
 from loguru import logger
 
+HOST_LINE_PATTERN = re.compile(r'\[(\d{2}:\d{2}:\d{2})\]\s*\[HOST\]\s*(.+)')
+AGENT_LINE_PATTERN = re.compile(r'\[(\d{2}:\d{2}:\d{2})\]\s*\[(INSIGHT|MEDIA|QUERY)\]\s*(.+)')
+
+_BLOCK_SIZE = 64 * 1024
+_HEAD_SIZE = 256
+
+StatKey = Tuple[int, int, int]
+
+
+def _stat_key(path: Path) -> Optional[StatKey]:
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+
+def _read_head(path: Path, size: int) -> bytes:
+    """文件开头的size字节，与上次读取时记录的开头比较，判断文件是被追加还是被清空后重写"""
+    if size <= 0:
+        return b''
+    with open(path, 'rb') as f:
+        return f.read(size)
+
+
+def _unescape(content: str) -> str:
+    """处理转义的换行符，还原为实际换行"""
+    return content.replace('\\n', '\n').strip()
+
+
+def iter_lines_reversed(path: Path, block_size: int = _BLOCK_SIZE, start: int = 0,
+                        end: Optional[int] = None) -> Iterator[str]:
+    """
+    从文件末尾开始按块读取，逐行倒序产出（不含换行符，\r\n 结尾的行同样去掉 \r）
+
+    Args:
+        path: 文件路径
+        block_size: 每次读取的字节数
+        start: 只读取该偏移之后的内容（应位于行首）
+        end: 只读取到该偏移为止，默认到文件末尾
+    """
+    with open(path, 'rb') as f:
+        if end is None:
+            f.seek(0, os.SEEK_END)
+            end = f.tell()
+        position = end
+        remainder = b''
+        while position > start:
+            read_size = min(block_size, position - start)
+            position -= read_size
+            f.seek(position)
+            lines = (f.read(read_size) + remainder).split(b'\n')
+            # 第一段可能是上一行的后半截，留到读取下一块时拼接
+            remainder = lines[0]
+            for line in reversed(lines[1:]):
+                line = line.rstrip(b'\r')
+                if line:
+                    yield line.decode('utf-8', errors='ignore')
+        remainder = remainder.rstrip(b'\r')
+        if remainder:
+            yield remainder.decode('utf-8', errors='ignore')
+
+
+def _complete_end(path: Path, size: int, block_size: int = _BLOCK_SIZE) -> int:
+    """文件前size字节中最后一个完整行的结束偏移（写了一半的末行不计入）"""
+    with open(path, 'rb') as f:
+        position = size
+        while position > 0:
+            read_size = min(block_size, position)
+            position -= read_size
+            f.seek(position)
+            index = f.read(read_size).rfind(b'\n')
+            if index >= 0:
+                return position + index + 1
+    return 0
+
+
+class ForumLogReader:
+    """单个forum.log的读取缓存"""
+
+    def __init__(self, forum_log_path: Path):
+        self.path = Path(forum_log_path)
+        self._lock = threading.Lock()
+        self._latest_key: Optional[StatKey] = None
+        self._latest_host: Optional[str] = None
+        self._latest_end = 0             # 已扫描到的完整行结束偏移，文件追加时只扫描之后的部分
+        self._latest_head = b''          # 已扫描部分的开头，用于识别原地清空后重写
+        self._all_key: Optional[StatKey] = None
+        self._all_offset = 0
+        self._all_head = b''
+        self._all_speeches: List[Dict[str, str]] = []
+        self._subscribers: List[Callable[[Optional[str]], None]] = []
+
+    def latest_host_speech(self) -> Optional[str]:
+        """
+        最新的HOST发言，文件未变化时直接返回缓存；
+        文件在上次读取或推送之后被追加时只扫描新增的完整行，其中没有HOST发言则保留缓存的发言
+        """
+        with self._lock:
+            key = _stat_key(self.path)
+            if key is None:
+                self._latest_key, self._latest_host, self._latest_end = None, None, 0
+                return None
+            if key != self._latest_key:
+                appended = (self._latest_key is not None and key[0] == self._latest_key[0]
+                            and key[1] >= self._latest_end
+                            and _read_head(self.path, len(self._latest_head)) == self._latest_head)
+                end = _complete_end(self.path, key[1])
+                host_speech = self._find_latest_host(self._latest_end if appended else 0, end)
+                if host_speech is not None or not appended:
+                    self._latest_host = host_speech
+                self._latest_key, self._latest_end = key, end
+                self._latest_head = _read_head(self.path, min(end, _HEAD_SIZE))
+            return self._latest_host
+
+    def _find_latest_host(self, start: int, end: int) -> Optional[str]:
+        for line in iter_lines_reversed(self.path, start=start, end=end):
+            match = HOST_LINE_PATTERN.match(line)
+            if match:
+                return _unescape(match.group(2))
+        return None
+
+    def all_host_speeches(self) -> List[Dict[str, str]]:
+        """所有HOST发言，文件追加时只解析新增部分，被清空、替换或开头内容变化时重新解析"""
+        with self._lock:
+            key = _stat_key(self.path)
+            if key is None:
+                self._all_key, self._all_offset, self._all_speeches = None, 0, []
+                return []
+            if key != self._all_key:
+                if (self._all_key is None or key[0] != self._all_key[0] or key[1] < self._all_offset
+                        or _read_head(self.path, len(self._all_head)) != self._all_head):
+                    self._all_offset, self._all_speeches = 0, []
+                self._parse_appended()
+                self._all_key = key
+                self._all_head = _read_head(self.path, min(self._all_offset, _HEAD_SIZE))
+            return list(self._all_speeches)
+
+    def _parse_appended(self):
+        with open(self.path, 'rb') as f:
+            f.seek(self._all_offset)
+            data = f.read()
+        # 只解析到最后一个完整行，写了一半的行留到下次
+        end = data.rfind(b'\n') + 1
+        for line in data[:end].decode('utf-8', errors='ignore').splitlines():
+            match = HOST_LINE_PATTERN.match(line)
+            if match:
+                timestamp, content = match.groups()
+                self._all_speeches.append({'timestamp': timestamp, 'content': _unescape(content)})
+        self._all_offset += end
+
+    def recent_agent_speeches(self, limit: int) -> List[Dict[str, str]]:
+        """最近limit条Agent发言（不包括HOST），按时间顺序"""
+        if not self.path.exists():
+            return []
+        agent_speeches = []
+        for line in iter_lines_reversed(self.path):
+            match = AGENT_LINE_PATTERN.match(line)
+            if match:
+                timestamp, agent, content = match.groups()
+                agent_speeches.append({'timestamp': timestamp, 'agent': agent, 'content': _unescape(content)})
+                if len(agent_speeches) >= limit:
+                    break
+        agent_speeches.reverse()
+        return agent_speeches
+
+    def publish(self, host_speech: Optional[str]):
+        """
+        由写入方在写入HOST发言（或清空日志，host_speech为None）后调用
+        推送的发言直接作为缓存，之后追加到文件中的新发言仍会在读取时扫描到
+        """
+        with self._lock:
+            self._latest_host = host_speech.strip() if host_speech else None
+            self._latest_key = _stat_key(self.path)
+            self._latest_end = _complete_end(self.path, self._latest_key[1]) if self._latest_key else 0
+            self._latest_head = _read_head(self.path, min(self._latest_end, _HEAD_SIZE))
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            try:
+                callback(self._latest_host)
+            except Exception as e:
+                logger.exception(f"HOST发言订阅回调执行失败: {str(e)}")
+
+    def subscribe(self, callback: Callable[[Optional[str]], None]) -> Callable[[], None]:
+        """订阅新的HOST发言，返回取消订阅的函数"""
+        with self._lock:
+            self._subscribers.append(callback)
+
+        def unsubscribe():
+            with self._lock:
+                if callback in self._subscribers:
+                    self._subscribers.remove(callback)
+
+        return unsubscribe
+
+
+_readers: Dict[str, ForumLogReader] = {}
+_readers_lock = threading.Lock()
+
+
+def get_forum_reader(log_dir: str = "logs") -> ForumLogReader:
+    """获取日志目录对应的进程内共享读取器"""
+    path = Path(log_dir) / "forum.log"
+    key = os.path.abspath(path)
+    with _readers_lock:
+        if key not in _readers:
+            _readers[key] = ForumLogReader(path)
+        return _readers[key]
+
+
+def publish_host_speech(host_speech: Optional[str], log_dir: str = "logs"):
+    """
+    推送最新的HOST发言
+    写入forum.log的一方（ForumEngine）调用；同进程内的读取直接使用推送的发言，文件再被追加时只扫描新增部分
+    """
+    get_forum_reader(log_dir).publish(host_speech)
+
+
+def subscribe_host_speech(callback: Callable[[Optional[str]], None], log_dir: str = "logs") -> Callable[[], None]:
+    """
+    订阅HOST发言推送
+
+    Args:
+        callback: 收到新发言时调用，参数为发言内容（日志被清空时为None）
+        log_dir: 日志目录路径
+
+    Returns:
+        取消订阅的函数
+    """
+    return get_forum_reader(log_dir).subscribe(callback)
+
+
 def get_latest_host_speech(log_dir: str = "logs") -> Optional[str]:
     """
     获取forum.log中最新的HOST发言
-    
+
     Args:
         log_dir: 日志目录路径
-        
+
     Returns:
         最新的HOST发言内容，如果没有则返回None
     """
     try:
-        forum_log_path = Path(log_dir) / "forum.log"
-        
-        if not forum_log_path.exists():
-            logger.debug("forum.log文件不存在")
-            return None
-            
-        with open(forum_log_path, 'r', encoding='utf-8', errors='ignore') as f:
-            lines = f.readlines()
-        
-        # 从后往前查找最新的HOST发言
-        host_speech = None
-        for line in reversed(lines):
-            # 匹配格式: [时间] [HOST] 内容
-            match = re.match(r'\[(\d{2}:\d{2}:\d{2})\]\s*\[HOST\]\s*(.+)', line)
-            if match:
-                _, content = match.groups()
-                # 处理转义的换行符，还原为实际换行
-                host_speech = content.replace('\\n', '\n').strip()
-                break
-        
+        host_speech = get_forum_reader(log_dir).latest_host_speech()
+
         if host_speech:
             logger.info(f"找到最新的HOST发言，长度: {len(host_speech)}字符")
         else:
             logger.debug("未找到HOST发言")
-            
+
         return host_speech
-        
+
     except Exception as e:
         logger.error(f"读取forum.log失败: {str(e)}")
         return None
@@ -54,39 +275,18 @@ def get_latest_host_speech(log_dir: str = "logs") -> Optional[str]:
 def get_all_host_speeches(log_dir: str = "logs") -> List[Dict[str, str]]:
     """
     获取forum.log中所有的HOST发言
-    
+
     Args:
         log_dir: 日志目录路径
-        
+
     Returns:
         包含所有HOST发言的列表，每个元素是包含timestamp和content的字典
     """
     try:
-        forum_log_path = Path(log_dir) / "forum.log"
-        
-        if not forum_log_path.exists():
-            logger.debug("forum.log文件不存在")
-            return []
-            
-        with open(forum_log_path, 'r', encoding='utf-8', errors='ignore') as f:
-            lines = f.readlines()
-        
-        host_speeches = []
-        for line in lines:
-            # 匹配格式: [时间] [HOST] 内容
-            match = re.match(r'\[(\d{2}:\d{2}:\d{2})\]\s*\[HOST\]\s*(.+)', line)
-            if match:
-                timestamp, content = match.groups()
-                # 处理转义的换行符
-                content = content.replace('\\n', '\n').strip()
-                host_speeches.append({
-                    'timestamp': timestamp,
-                    'content': content
-                })
-        
+        host_speeches = get_forum_reader(log_dir).all_host_speeches()
         logger.info(f"找到{len(host_speeches)}条HOST发言")
         return host_speeches
-        
+
     except Exception as e:
         logger.error(f"读取forum.log失败: {str(e)}")
         return []
@@ -95,42 +295,17 @@ def get_all_host_speeches(log_dir: str = "logs") -> List[Dict[str, str]]:
 def get_recent_agent_speeches(log_dir: str = "logs", limit: int = 5) -> List[Dict[str, str]]:
     """
     获取forum.log中最近的Agent发言（不包括HOST）
-    
+
     Args:
         log_dir: 日志目录路径
         limit: 返回的最大发言数量
-        
+
     Returns:
         包含最近Agent发言的列表
     """
     try:
-        forum_log_path = Path(log_dir) / "forum.log"
-        
-        if not forum_log_path.exists():
-            return []
-            
-        with open(forum_log_path, 'r', encoding='utf-8', errors='ignore') as f:
-            lines = f.readlines()
-        
-        agent_speeches = []
-        for line in reversed(lines):  # 从后往前读取
-            # 匹配格式: [时间] [AGENT_NAME] 内容
-            match = re.match(r'\[(\d{2}:\d{2}:\d{2})\]\s*\[(INSIGHT|MEDIA|QUERY)\]\s*(.+)', line)
-            if match:
-                timestamp, agent, content = match.groups()
-                # 处理转义的换行符
-                content = content.replace('\\n', '\n').strip()
-                agent_speeches.append({
-                    'timestamp': timestamp,
-                    'agent': agent,
-                    'content': content
-                })
-                if len(agent_speeches) >= limit:
-                    break
-        
-        agent_speeches.reverse()  # 恢复时间顺序
-        return agent_speeches
-        
+        return get_forum_reader(log_dir).recent_agent_speeches(limit)
+
     except Exception as e:
         logger.error(f"读取forum.log失败: {str(e)}")
         return []
@@ -139,16 +314,16 @@ def get_recent_agent_speeches(log_dir: str = "logs", limit: int = 5) -> List[Dic
 def format_host_speech_for_prompt(host_speech: str) -> str:
     """
     格式化HOST发言，用于添加到prompt中
-    
+
     Args:
         host_speech: HOST发言内容
-        
+
     Returns:
         格式化后的内容
     """
     if not host_speech:
         return ""
-    
+
     return f"""
 ### 论坛主持人最新总结
 以下是论坛主持人对各Agent讨论的最新总结和引导，请参考其中的观点和建议：
@@ -0,0 +1,198 @@
+"""
+搜索结果近似重复检测
+转发、引用评论和跨平台搬运的内容往往只差几个字，按URL或前100字去重识别不出来，
+这些重复内容会放大情感分布、占用提示词。这里用64位SimHash（相邻三字，适合中文）识别近似重复：
+- SimHashIndex：内存中的分段索引。汉明距离不超过k的两个指纹按k+1段切分后至少有一段完全相同，
+  只需比较同段的候选，n条结果的去重是O(n)而不是两两比较的O(n²)
+- NearDuplicateIndex：带SQLite持久化、按作用域（如一次研究运行中的一个段落）划分的索引，
+  同一段落中不同关键词、不同反思轮次、以及隔天断点恢复后搜到的重复内容都能识别
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+try:
+    from text_metrics import hamming_distance, simhash
+except ImportError:
+    # 通过 utils.near_duplicates 导入（项目根目录在sys.path中、utils目录不在）
+    from utils.text_metrics import hamming_distance, simhash
+
+DEFAULT_NEAR_DUPLICATE_INDEX_PATH = "cache/near_duplicates.db"
+
+_BITS = 64
+
+
+class SimHashIndex:
+    """内存中的SimHash分段索引"""
+
+    def __init__(self, max_distance: int = 3, bits: int = _BITS):
+        """
+        Args:
+            max_distance: 汉明距离不超过该值视为近似重复
+            bits: 指纹位数
+        """
+        self.max_distance = max_distance
+        bands = max_distance + 1
+        bounds = [bits * i // bands for i in range(bands + 1)]
+        # 每段的 (右移位数, 掩码)
+        self._bands = [(bits - end, (1 << (end - start)) - 1) for start, end in zip(bounds, bounds[1:])]
+        self._buckets: List[Dict[int, List[Tuple[int, Any]]]] = [{} for _ in self._bands]
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def find(self, fingerprint: int, accept: Optional[Callable[[Any], bool]] = None) -> Optional[Tuple[int, Any]]:
+        """
+        查找与指纹近似重复的已有条目
+
+        Args:
+            fingerprint: SimHash指纹
+            accept: 可选的过滤函数，参数为条目附带的数据，返回False的条目不算重复
+
+        Returns:
+            (已有指纹, 附带数据)，没有近似重复时返回None
+        """
+        for (shift, mask), buckets in zip(self._bands, self._buckets):
+            for other, payload in buckets.get((fingerprint >> shift) & mask, ()):
+                if hamming_distance(fingerprint, other) <= self.max_distance and (accept is None or accept(payload)):
+                    return other, payload
+        return None
+
+    def add(self, fingerprint: int, payload: Any = None):
+        """加入一个指纹"""
+        for (shift, mask), buckets in zip(self._bands, self._buckets):
+            buckets.setdefault((fingerprint >> shift) & mask, []).append((fingerprint, payload))
+        self._size += 1
+
+
+def _to_signed(fingerprint: int) -> int:
+    # SQLite的INTEGER是有符号64位
+    return fingerprint - (1 << 64) if fingerprint >= 1 << 63 else fingerprint
+
+
+def _to_unsigned(value: int) -> int:
+    return value + (1 << 64) if value < 0 else value
+
+
+class NearDuplicateIndex:
+    """按作用域划分、可持久化的近似重复索引，可被多个线程共享"""
+
+    def __init__(self, path: Optional[str] = DEFAULT_NEAR_DUPLICATE_INDEX_PATH, max_distance: int = 3,
+                 retention_days: float = 7):
+        """
+        Args:
+            path: SQLite文件路径，为空则只保存在内存中
+            max_distance: 汉明距离不超过该值视为近似重复
+            retention_days: 持久化指纹的保留天数，更早的指纹在打开时清理，<=0 表示永久保留
+        """
+        self.path = path or None
+        self.max_distance = max_distance
+        self._cutoff = time.time() - retention_days * 86400 if retention_days > 0 else 0.0
+        self._lock = threading.Lock()
+        self._scopes: Dict[str, SimHashIndex] = {}
+        self._conn: Optional[sqlite3.Connection] = None
+        if self.path:
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS fingerprints ("
+                "scope TEXT NOT NULL, fingerprint INTEGER NOT NULL, source TEXT NOT NULL, seen_at REAL NOT NULL, "
+                "PRIMARY KEY (scope, fingerprint))"
+            )
+            if self._cutoff:
+                self._conn.execute("DELETE FROM fingerprints WHERE seen_at < ?", (self._cutoff,))
+            self._conn.commit()
+
+    def _scope_index(self, scope: str) -> SimHashIndex:
+        # 作用域第一次使用时从持久化存储加载
+        index = self._scopes.get(scope)
+        if index is None:
+            index = self._scopes[scope] = SimHashIndex(self.max_distance)
+            if self._conn is not None:
+                for fingerprint, source in self._conn.execute(
+                        "SELECT fingerprint, source FROM fingerprints WHERE scope = ? AND seen_at >= ?",
+                        (scope, self._cutoff)):
+                    index.add(_to_unsigned(fingerprint), source)
+        return index
+
+    def filter(self, items: Iterable[Any], text_of: Callable[[Any], str], scope: Optional[str] = None,
+               source: str = "") -> List[Any]:
+        """
+        去掉近似重复的条目，保留先出现的一条
+
+        Args:
+            items: 待去重的条目（顺序即优先级）
+            text_of: 取条目文本的函数，文本为空的条目原样保留
+            scope: 作用域，为None时只在本批内去重；否则还会去掉该作用域中此前（其他来源）记录过的内容，
+                   并把本批保留的条目记入该作用域
+            source: 本批的来源标识（如 运行ID:段落1）。同一来源重新执行时（如断点恢复后重做同一轮搜索），
+                    不会被自己上次记录的指纹判为重复
+
+        Returns:
+            去重后的条目
+        """
+        batch = SimHashIndex(self.max_distance)
+        kept, new_rows = [], []
+        with self._lock:
+            scoped = self._scope_index(scope) if scope is not None else None
+            for item in items:
+                text = text_of(item)
+                if not text:
+                    kept.append(item)
+                    continue
+                fingerprint = simhash(text)
+                if batch.find(fingerprint) is not None:
+                    continue
+                if scoped is not None and scoped.find(fingerprint, lambda seen_source: seen_source != source):
+                    continue
+                batch.add(fingerprint)
+                kept.append(item)
+                if scoped is not None and scoped.find(fingerprint) is None:
+                    scoped.add(fingerprint, source)
+                    new_rows.append((scope, _to_signed(fingerprint), source, time.time()))
+            if new_rows and self._conn is not None:
+                self._conn.executemany("INSERT OR IGNORE INTO fingerprints VALUES (?, ?, ?, ?)", new_rows)
+                self._conn.commit()
+        return kept
+
+    def drop_scopes(self, prefix: str) -> int:
+        """
+        释放名称以 prefix 开头的作用域的内存索引（如一次运行结束后的各段落作用域），持久化的指纹保留，
+        之后再次使用这些作用域（如断点恢复）时重新从SQLite加载
+
+        Returns:
+            释放的作用域数
+        """
+        with self._lock:
+            dropped = [scope for scope in self._scopes if scope.startswith(prefix)]
+            for scope in dropped:
+                del self._scopes[scope]
+        return len(dropped)
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+_indexes: Dict[Tuple[Optional[str], int], NearDuplicateIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_near_duplicate_index(path: Optional[str] = DEFAULT_NEAR_DUPLICATE_INDEX_PATH,
+                             max_distance: int = 3) -> NearDuplicateIndex:
+    """获取路径和距离阈值对应的进程内共享索引，各引擎共用同一个文件时也共用同一个实例"""
+    key = (os.path.abspath(path) if path else None, max_distance)
+    with _indexes_lock:
+        if key not in _indexes:
+            _indexes[key] = NearDuplicateIndex(path, max_distance)
+        return _indexes[key]
+
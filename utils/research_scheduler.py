@@ -0,0 +1,142 @@
+"""
+段落研究的流水线调度器
+三个引擎的研究流程中，段落之间互不依赖：一个段落的总结在流式生成时，下一个段落的搜索规划和数据库/网络搜索即可提前进行。
+调度器负责：
+- 按资源类型（llm / search / db）限制同时进行的调用数
+- 在后台线程中提前执行可独立进行的阶段
+- 记录每个阶段的排队、开始、结束时间，用于分析耗时
+"""
+
+import json
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from loguru import logger
+
+
+class ResearchScheduler:
+    """按资源限流并记录阶段耗时的调度器"""
+
+    def __init__(self, limits: Optional[Dict[str, int]] = None, max_workers: int = 4, name: str = ""):
+        """
+        Args:
+            limits: 各资源的并发上限，如 {"llm": 2, "search": 4, "db": 2}，未列出的资源不限流
+            max_workers: 后台执行提前阶段的线程数（线程池在首次 submit 时创建，shutdown 后再次 submit 会重新创建）
+            name: 调度器名称，出现在耗时记录中
+        """
+        self.limits = dict(limits or {})
+        self.name = name
+        self.max_workers = max_workers
+        self._semaphores = {resource: threading.BoundedSemaphore(max(1, limit))
+                            for resource, limit in self.limits.items()}
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._traces: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._started_at = time.monotonic()
+
+    def run(self, stage: str, resource: Optional[str], fn: Callable, *args, label: str = "", **kwargs) -> Any:
+        """
+        在当前线程执行一个阶段：先等待资源配额，再调用fn并记录耗时
+
+        Args:
+            stage: 阶段名称，如 first_search、first_summary
+            resource: 占用的资源类型，None表示不限流
+            fn: 要执行的函数
+            label: 附加说明，如段落序号
+        """
+        queued_at = time.monotonic()
+        semaphore = self._semaphores.get(resource)
+        if semaphore:
+            semaphore.acquire()
+        started_at = time.monotonic()
+        error = None
+        try:
+            return fn(*args, **kwargs)
+        except BaseException as e:
+            error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            finished_at = time.monotonic()
+            if semaphore:
+                semaphore.release()
+            self._record(stage, resource, label, queued_at, started_at, finished_at, error)
+
+    def submit(self, stage: str, fn: Callable, *args, label: str = "", **kwargs) -> Future:
+        """
+        在后台线程执行一个复合阶段（内部各步骤自行通过 run 申请资源），返回Future
+        """
+        def task():
+            return self.run(stage, None, fn, *args, label=label, **kwargs)
+
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                    thread_name_prefix=f"{self.name or 'research'}-prefetch")
+            return self._executor.submit(task)
+
+    def shutdown(self, wait: bool = False):
+        """
+        关闭后台线程池（一次研究结束时调用），尚未开始的提前阶段被取消
+
+        Args:
+            wait: 是否等待正在执行的阶段结束
+        """
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
+
+    def _record(self, stage: str, resource: Optional[str], label: str,
+                queued_at: float, started_at: float, finished_at: float, error: Optional[str]):
+        trace = {
+            "stage": stage,
+            "resource": resource,
+            "label": label,
+            "thread": threading.current_thread().name,
+            "queued_at": round(queued_at - self._started_at, 3),
+            "started_at": round(started_at - self._started_at, 3),
+            "finished_at": round(finished_at - self._started_at, 3),
+            "wait": round(started_at - queued_at, 3),
+            "duration": round(finished_at - started_at, 3),
+        }
+        if error:
+            trace["error"] = error
+        with self._lock:
+            self._traces.append(trace)
+
+    def traces(self) -> List[Dict[str, Any]]:
+        """所有阶段的耗时记录（按结束时间排序）"""
+        with self._lock:
+            return list(self._traces)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """按阶段汇总次数、总耗时和排队等待时间"""
+        result: Dict[str, Dict[str, float]] = {}
+        for trace in self.traces():
+            item = result.setdefault(trace["stage"], {"count": 0, "duration": 0.0, "wait": 0.0})
+            item["count"] += 1
+            item["duration"] = round(item["duration"] + trace["duration"], 3)
+            item["wait"] = round(item["wait"] + trace["wait"], 3)
+        return result
+
+    def log_summary(self):
+        """输出各阶段耗时汇总"""
+        wall = round(time.monotonic() - self._started_at, 3)
+        lines = [f"{self.name} 阶段耗时（总用时 {wall}s）:"]
+        for stage, item in self.summary().items():
+            lines.append(f"  {stage}: {item['count']} 次, 执行 {item['duration']}s, 排队 {item['wait']}s")
+        logger.info("\n".join(lines))
+
+    def save_trace(self, filepath: str):
+        """保存耗时记录为JSON"""
+        with open(filepath, 'w', encoding='utf-8') as f:
+            json.dump({"name": self.name, "limits": self.limits, "summary": self.summary(), "traces": self.traces()},
+                      f, ensure_ascii=False, indent=2)
+
+    def reset(self):
+        """清空耗时记录并重新计时（开始新的研究时调用）"""
+        with self._lock:
+            self._traces = []
+            self._started_at = time.monotonic()
@@ -0,0 +1,141 @@
+"""
+搜索结果打包
+总结提示词中的搜索结果原先只按字符数截断单条内容，数据库查询一次可返回数百条相近的帖子，提示词长度和LLM耗时都没有上限。
+打包步骤：
+1. 按 content（无则 title）计算SimHash，近似重复（转发、引用、跨平台搬运）只保留排名最高的一条
+2. 按热度、互动量、发布时间和情感置信度的加权和排序，缺失的指标对所有结果都记0，不影响相对顺序
+3. 按 平台×情感 分组轮流取结果，在token预算内装箱，保证各平台和各情感倾向都有代表
+"""
+
+import math
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from near_duplicates import SimHashIndex
+from text_metrics import get_token_counter, simhash
+
+DEFAULT_WEIGHTS = {"hotness": 0.35, "engagement": 0.25, "recency": 0.2, "sentiment": 0.2}
+RECENCY_HALF_LIFE_DAYS = 7.0
+
+
+def _text_of(result: Dict[str, Any]) -> str:
+    return str(result.get("content") or result.get("title") or "")
+
+
+def _engagement(result: Dict[str, Any]) -> float:
+    engagement = result.get("engagement")
+    if not isinstance(engagement, dict):
+        return 0.0
+    return float(sum(value for value in engagement.values() if isinstance(value, (int, float)) and value > 0))
+
+
+def _age_days(result: Dict[str, Any], now: datetime) -> Optional[float]:
+    published = result.get("published_date")
+    if not published:
+        return None
+    try:
+        moment = published if isinstance(published, datetime) else datetime.fromisoformat(str(published).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    # 不带时区的时间按本机时区解释（数据库中的发布时间为本地时间），统一转换为UTC后比较
+    moment = moment.astimezone(timezone.utc)
+    return max((now - moment).total_seconds() / 86400, 0.0)
+
+
+def _log_normalized(values: List[float]) -> List[float]:
+    logs = [math.log1p(max(value, 0.0)) for value in values]
+    top = max(logs, default=0.0)
+    return [value / top if top > 0 else 0.0 for value in logs]
+
+
+def rank_results(results: Sequence[Dict[str, Any]], weights: Optional[Dict[str, float]] = None) -> List[float]:
+    """
+    计算每条结果的排序分（0~1）
+
+    Args:
+        results: 搜索结果，可包含 score（热度或相关度）、engagement（互动量字典）、
+                 published_date、sentiment_confidence
+        weights: 各指标权重，默认 DEFAULT_WEIGHTS
+    """
+    weights = weights or DEFAULT_WEIGHTS
+    now = datetime.now(timezone.utc)
+    hotness = _log_normalized([float(result.get("score") or 0.0) for result in results])
+    engagement = _log_normalized([_engagement(result) for result in results])
+    scores = []
+    for i, result in enumerate(results):
+        age = _age_days(result, now)
+        recency = 0.5 ** (age / RECENCY_HALF_LIFE_DAYS) if age is not None else 0.0
+        confidence = float(result.get("sentiment_confidence") or 0.0)
+        scores.append(weights.get("hotness", 0) * hotness[i] + weights.get("engagement", 0) * engagement[i]
+                      + weights.get("recency", 0) * recency + weights.get("sentiment", 0) * confidence)
+    return scores
+
+
+def _truncate_to_tokens(text: str, max_tokens: int, count_tokens: Callable[[str], int]) -> Tuple[str, int]:
+    tokens = count_tokens(text)
+    while tokens > max_tokens and text:
+        text = text[:max(1, len(text) * max_tokens // tokens) - 1] + "…"
+        tokens = count_tokens(text)
+    return text, tokens
+
+
+def pack_search_results(results: Sequence[Dict[str, Any]], token_budget: int, max_item_tokens: int = 0,
+                        dedup_distance: int = 3, weights: Optional[Dict[str, float]] = None,
+                        strata: Sequence[str] = ("platform", "sentiment"),
+                        count_tokens: Optional[Callable[[str], int]] = None
+                        ) -> Tuple[List[Dict[str, Any]], Dict[str, int]]:
+    """
+    在token预算内挑选搜索结果
+
+    Args:
+        results: 搜索结果字典列表（顺序视为搜索引擎给出的排名，分数相同时保持）
+        token_budget: 所有结果内容合计的token上限，<=0 表示不限制（仍会去重）
+        max_item_tokens: 单条结果的token上限，超出时截断，<=0 表示不限制
+        dedup_distance: SimHash汉明距离不超过该值的结果视为近似重复
+        weights: 排序权重
+        strata: 分层字段，按这些字段的取值组合分组轮流装箱
+        count_tokens: token计数函数，默认使用 get_token_counter()
+
+    Returns:
+        (按装箱顺序排列的结果, 统计信息)，结果中的 content 为截断后的内容
+    """
+    count_tokens = count_tokens or get_token_counter()
+    candidates = [result for result in results if _text_of(result)]
+    scores = rank_results(candidates, weights)
+    ranked = [result for _, _, result in sorted(
+        ((-score, i, result) for i, (score, result) in enumerate(zip(scores, candidates))),
+        key=lambda item: item[:2])]
+
+    # 按排名从高到低保留，与已保留结果近似重复的丢弃
+    unique: List[Dict[str, Any]] = []
+    fingerprints = SimHashIndex(dedup_distance)
+    for result in ranked:
+        fingerprint = simhash(_text_of(result))
+        if fingerprints.find(fingerprint) is not None:
+            continue
+        unique.append(result)
+        fingerprints.add(fingerprint)
+
+    # 分组后轮流取各组的下一条，组的先后按组内最高分
+    groups: "OrderedDict[Tuple, List[Dict[str, Any]]]" = OrderedDict()
+    for result in unique:
+        groups.setdefault(tuple(result.get(field) for field in strata), []).append(result)
+    interleaved = [group[i] for i in range(max((len(g) for g in groups.values()), default=0))
+                   for group in groups.values() if i < len(group)]
+
+    packed, used = [], 0
+    for result in interleaved:
+        text = _text_of(result)
+        if max_item_tokens > 0:
+            text, tokens = _truncate_to_tokens(text, max_item_tokens, count_tokens)
+        else:
+            tokens = count_tokens(text)
+        if token_budget > 0 and used + tokens > token_budget:
+            continue
+        packed.append({**result, "content": text})
+        used += tokens
+
+    stats = {"input": len(results), "duplicates": len(candidates) - len(unique), "packed": len(packed),
+             "groups": len(groups), "tokens": used}
+    return packed, stats
@@ -0,0 +1,156 @@
+"""
+搜索结果的内容寻址存储
+研究状态中只保存结果ID和评分，结果正文按 url+标题+内容 的哈希去重后写入本地SQLite，
+同一结果在多轮反思、多次运行之间只存一份；保存状态时不再重复序列化正文。
+每条结果记录最近一次写入的时间，超过保留期且没有断点引用的结果可以用 prune 清理（见 utils/checkpoint.py）。
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+DEFAULT_RESULT_STORE_PATH = "cache/search_results.db"
+
+_SELECT_BATCH = 500
+
+
+def result_id(url: str, title: str, content: str) -> str:
+    """结果ID：url、标题、内容的哈希"""
+    digest = hashlib.blake2b(digest_size=12)
+    for part in (url or "", title or "", content or ""):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class ResultStore:
+    """基于SQLite的搜索结果存储，可被多个线程和进程共享"""
+
+    def __init__(self, path: str = DEFAULT_RESULT_STORE_PATH):
+        """
+        Args:
+            path: 数据库文件路径，":memory:" 表示只保存在内存中
+        """
+        self.path = path
+        if path != ":memory:" and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "id TEXT PRIMARY KEY, url TEXT NOT NULL, title TEXT NOT NULL, content TEXT NOT NULL, "
+            "last_seen REAL NOT NULL DEFAULT 0)"
+        )
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(results)")]
+        if "last_seen" not in columns:
+            # 旧版本的数据库没有写入时间，视为很久以前写入
+            self._conn.execute("ALTER TABLE results ADD COLUMN last_seen REAL NOT NULL DEFAULT 0")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS checkpoint_dirs (path TEXT PRIMARY KEY)")
+        self._conn.commit()
+
+    def put_many(self, results: Iterable[Dict[str, Any]]) -> List[str]:
+        """
+        写入一批结果（已存在的只更新写入时间），返回与输入顺序一致的ID列表
+
+        Args:
+            results: 包含 url、title、content 的字典
+        """
+        now = time.time()
+        rows = []
+        for result in results:
+            url, title, content = (str(result.get(key) or "") for key in ("url", "title", "content"))
+            rows.append((result_id(url, title, content), url, title, content, now))
+        if rows:
+            with self._lock:
+                self._conn.executemany(
+                    "INSERT INTO results (id, url, title, content, last_seen) VALUES (?, ?, ?, ?, ?) "
+                    "ON CONFLICT(id) DO UPDATE SET last_seen = excluded.last_seen",
+                    rows,
+                )
+                self._conn.commit()
+        return [row[0] for row in rows]
+
+    def get_many(self, ids: List[str]) -> Dict[str, Dict[str, str]]:
+        """按ID读取结果，缺失的ID不出现在返回值中"""
+        found: Dict[str, Dict[str, str]] = {}
+        unique = list(dict.fromkeys(ids))
+        with self._lock:
+            for start in range(0, len(unique), _SELECT_BATCH):
+                batch = unique[start:start + _SELECT_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                for row in self._conn.execute(
+                        f"SELECT id, url, title, content FROM results WHERE id IN ({placeholders})", batch):
+                    found[row[0]] = {"url": row[1], "title": row[2], "content": row[3]}
+        return found
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def register_checkpoint_dir(self, checkpoint_dir: str):
+        """登记引用本存储的断点目录（共用同一存储的各引擎都会登记，清理时读取所有登记的目录）"""
+        with self._lock:
+            self._conn.execute("INSERT OR IGNORE INTO checkpoint_dirs VALUES (?)", (os.path.abspath(checkpoint_dir),))
+            self._conn.commit()
+
+    def checkpoint_dirs(self) -> List[str]:
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT path FROM checkpoint_dirs ORDER BY path")]
+
+    def prune(self, max_age_days: float, keep_ids: Iterable[str] = (), vacuum: bool = True) -> int:
+        """
+        删除超过保留期且不在keep_ids中的结果
+
+        Args:
+            max_age_days: 保留天数，最近一次写入早于该时间的结果可被删除
+            keep_ids: 仍被引用（如断点中）的结果ID，不会删除
+            vacuum: 有结果被删除时是否压缩数据库文件
+
+        Returns:
+            删除的结果数
+        """
+        cutoff = time.time() - max_age_days * 86400
+        with self._lock:
+            self._conn.execute("CREATE TEMP TABLE IF NOT EXISTS keep_ids (id TEXT PRIMARY KEY)")
+            self._conn.execute("DELETE FROM keep_ids")
+            self._conn.executemany("INSERT OR IGNORE INTO keep_ids VALUES (?)", ((i,) for i in keep_ids))
+            deleted = self._conn.execute(
+                "DELETE FROM results WHERE last_seen < ? AND id NOT IN (SELECT id FROM keep_ids)", (cutoff,)
+            ).rowcount
+            self._conn.execute("DELETE FROM keep_ids")
+            self._conn.commit()
+            if deleted and vacuum:
+                self._conn.execute("VACUUM")
+        return deleted
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_stores: Dict[str, ResultStore] = {}
+_default_path = DEFAULT_RESULT_STORE_PATH
+_stores_lock = threading.Lock()
+
+
+def configure_result_store(path: str):
+    """设置本进程默认使用的结果存储路径（各引擎Agent初始化时按配置调用）"""
+    global _default_path
+    with _stores_lock:
+        _default_path = path
+
+
+def get_result_store(path: Optional[str] = None) -> ResultStore:
+    """获取路径对应的进程内共享存储，未指定路径时使用默认存储"""
+    path = path or _default_path
+    key = path if path == ":memory:" else os.path.abspath(path)
+    with _stores_lock:
+        if key not in _stores:
+            _stores[key] = ResultStore(path)
+        return _stores[key]
@@ -0,0 +1,296 @@
+"""
+搜索网关
+QueryEngine（Tavily）与MediaEngine（Bocha）的外部搜索统一经过这里：
+- 进程内共享带连接池的 requests.Session
+- 按 规范化查询+参数 缓存结果：内存LRU一层，本地磁盘一层（多个引擎进程、多次运行之间共享），均有TTL
+- 相同请求并发到达时只实际调用一次
+- batch 并发执行多个查询或多个工具
+- SEARCH_BACKEND=fake 时不访问外部API，返回按查询确定生成的模拟结果，用于离线压测整条流水线
+"""
+
+import copy
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import requests
+from requests.adapters import HTTPAdapter
+from loguru import logger
+
+Fetcher = Callable[[Dict[str, Any]], Dict[str, Any]]
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    """去掉首尾空白、合并连续空白并转为小写"""
+    return _WHITESPACE.sub(" ", (query or "").strip()).lower()
+
+
+def cache_key(provider: str, params: Dict[str, Any]) -> str:
+    """缓存键：服务名 + 规范化后的查询 + 其余非空参数"""
+    normalized = {k: v for k, v in params.items() if v is not None}
+    if "query" in normalized:
+        normalized["query"] = normalize_query(str(normalized["query"]))
+    payload = json.dumps([provider, normalized], ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+class SearchCache:
+    """两级TTL缓存，值为搜索API返回的原始字典；存取时都复制一份，调用方修改结果不会影响缓存"""
+
+    def __init__(self, ttl: float = 6 * 3600, max_entries: int = 1024, cache_dir: Optional[str] = None):
+        """
+        Args:
+            ttl: 缓存有效期（秒），<=0 表示不缓存
+            max_entries: 内存中最多保留的条目数
+            cache_dir: 磁盘缓存目录，为空则只使用内存
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self._memory: OrderedDict = OrderedDict()  # key -> (过期时间, 结果)
+        self._lock = threading.Lock()
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        if self.ttl <= 0:
+            return None
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry:
+                if entry[0] > now:
+                    self._memory.move_to_end(key)
+                    return copy.deepcopy(entry[1])
+                del self._memory[key]
+
+        if not self.cache_dir:
+            return None
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if record.get("expires_at", 0) <= now:
+            return None
+        self._remember(key, record["expires_at"], copy.deepcopy(record["value"]))
+        return record["value"]
+
+    def set(self, key: str, value: Dict[str, Any]):
+        if self.ttl <= 0:
+            return
+        expires_at = time.time() + self.ttl
+        self._remember(key, expires_at, copy.deepcopy(value))
+        if not self.cache_dir:
+            return
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # 先写临时文件再替换，避免其他进程读到写了一半的文件
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"expires_at": expires_at, "value": value}, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except (OSError, TypeError, ValueError) as e:
+            logger.warning(f"写入搜索磁盘缓存失败: {str(e)}")
+
+    def _remember(self, key: str, expires_at: float, value: Dict[str, Any]):
+        with self._lock:
+            self._memory[key] = (expires_at, value)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+
+class FakeSearchBackend:
+    """
+    离线模拟搜索后端
+    结果由查询内容确定性生成（同一查询总是得到相同结果），可设置模拟延迟，用于压测和调试
+    """
+
+    name = "fake"
+
+    def __init__(self, latency: float = 0.0, results: int = 8):
+        """
+        Args:
+            latency: 每次调用的模拟耗时（秒）
+            results: 每次返回的网页条数上限
+        """
+        self.latency = latency
+        self.results = results
+
+    def search(self, provider: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        if self.latency > 0:
+            time.sleep(self.latency)
+        query = str(params.get("query", ""))
+        rng = random.Random(cache_key(provider, params))
+        count = min(self.results, int(params.get("max_results") or params.get("count") or self.results))
+        pages = [
+            {
+                "title": f"{query} 相关报道 {i + 1}",
+                "url": f"https://example.com/{provider}/{rng.getrandbits(48):012x}",
+                "content": f"模拟结果：关于“{query}”的第{i + 1}条内容，"
+                           f"情感倾向{rng.choice(['正面', '中性', '负面'])}，热度{rng.randint(1, 10000)}。",
+                "score": round(rng.random(), 4),
+                "published_date": f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            }
+            for i in range(count)
+        ]
+        answer = f"模拟摘要：“{query}”共找到{count}条相关内容。"
+        if provider == "bocha":
+            return self._bocha_response(query, pages, answer if params.get("answer") else None)
+        return {"query": query, "answer": answer if params.get("include_answer") else None,
+                "results": pages, "images": [], "response_time": self.latency}
+
+    @staticmethod
+    def _bocha_response(query: str, pages: List[Dict[str, Any]], answer: Optional[str]) -> Dict[str, Any]:
+        webpages = [{"name": page["title"], "url": page["url"], "snippet": page["content"],
+                     "dateLastCrawled": page["published_date"]} for page in pages]
+        messages = [{"role": "assistant", "type": "source", "content_type": "webpage",
+                     "content": json.dumps({"value": webpages}, ensure_ascii=False)}]
+        if answer:
+            messages.append({"role": "assistant", "type": "answer", "content_type": "text", "content": answer})
+        return {"code": 200, "conversation_id": f"fake-{cache_key('bocha', {'query': query})[:16]}",
+                "messages": messages}
+
+
+class SearchGateway:
+    """外部搜索调用的共享入口"""
+
+    def __init__(self, cache: Optional[SearchCache] = None, max_workers: int = 8,
+                 backend: Optional[FakeSearchBackend] = None, pool_size: int = 16):
+        """
+        Args:
+            cache: 结果缓存，为空则不缓存
+            max_workers: batch 并发执行的最大线程数
+            backend: 替代真实API的后端（如 FakeSearchBackend），为空则调用各引擎提供的真实请求函数
+            pool_size: 共享Session每个主机的连接池大小
+        """
+        self.cache = cache
+        self.backend = backend
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="search")
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "shared": 0}
+
+    @property
+    def offline(self) -> bool:
+        """是否使用模拟后端（此时无需API密钥）"""
+        return self.backend is not None
+
+    def search(self, provider: str, params: Dict[str, Any], fetch: Fetcher,
+               cacheable: Optional[Callable[[Dict[str, Any]], bool]] = None) -> Dict[str, Any]:
+        """
+        执行一次搜索，命中缓存时直接返回
+
+        Args:
+            provider: 搜索服务名称，如 "tavily"、"bocha"
+            params: 请求参数
+            fetch: 实际调用外部API的函数，参数为params，返回原始结果字典；失败时应抛出异常
+            cacheable: 判断结果是否可以缓存（如API返回的错误结果不缓存），为空则全部缓存
+
+        Returns:
+            原始结果字典
+        """
+        key = cache_key(provider, params)
+        if self.cache:
+            cached = self.cache.get(key)
+            if cached is not None:
+                self._count("hits")
+                logger.info(f"搜索缓存命中: [{provider}] {params.get('query')}")
+                return cached
+
+        with self._lock:
+            pending = self._inflight.get(key)
+            owner = pending is None
+            if owner:
+                pending = Future()
+                self._inflight[key] = pending
+        if not owner:
+            # 相同请求正在进行，等待其结果（各自拿到一份副本）
+            self._count("shared")
+            return copy.deepcopy(pending.result())
+
+        self._count("misses")
+        try:
+            result = self.backend.search(provider, params) if self.backend else fetch(params)
+            if self.cache and (cacheable is None or cacheable(result)):
+                self.cache.set(key, result)
+            pending.set_result(copy.deepcopy(result))
+            return result
+        except BaseException as e:
+            pending.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def _count(self, name: str):
+        with self._lock:
+            self.stats[name] += 1
+
+    def submit(self, call: Callable[[], Any]) -> Future:
+        """在网关线程池中异步执行一个搜索调用（如提前发起的推测搜索）"""
+        return self._executor.submit(call)
+
+    def batch(self, calls: Sequence[Callable[[], Any]]) -> List[Any]:
+        """
+        并发执行多个搜索调用，按输入顺序返回结果
+
+        Args:
+            calls: 无参调用列表，如 [lambda: agency.basic_search_news("A"), ...]
+        """
+        futures = [self.submit(call) for call in calls]
+        return [future.result() for future in futures]
+
+
+_gateway: Optional[SearchGateway] = None
+_gateway_params: Optional[Dict[str, Any]] = None
+_gateway_lock = threading.Lock()
+
+
+def get_search_gateway(backend: str = "live", cache_dir: Optional[str] = "cache/search",
+                       ttl: float = 6 * 3600, max_workers: int = 8, fake_latency: float = 0.0) -> SearchGateway:
+    """
+    获取进程内共享的搜索网关，首次调用时按参数创建
+
+    网关在进程内只创建一次：之后的调用（包括引擎宿主中其他引擎的Agent）无论传入什么参数，
+    都返回第一个调用方创建的网关，沿用其后端、缓存目录、TTL和并发数；参数不同时记录警告。
+    需要不同参数的网关时直接构造 SearchGateway 并传给搜索工具集的 gateway 参数。
+
+    Args:
+        backend: "live" 调用真实API，"fake" 使用离线模拟后端
+        cache_dir: 磁盘缓存目录，为空则只缓存在内存
+        ttl: 缓存有效期（秒），<=0 关闭缓存
+        max_workers: batch 并发数
+        fake_latency: 模拟后端每次调用的耗时（秒）
+    """
+    global _gateway, _gateway_params
+    params = {"backend": backend, "cache_dir": cache_dir, "ttl": ttl, "max_workers": max_workers,
+              "fake_latency": fake_latency}
+    with _gateway_lock:
+        if _gateway is None:
+            fake = FakeSearchBackend(latency=fake_latency) if backend == "fake" else None
+            cache_dir = os.path.join(cache_dir, "fake") if fake and cache_dir else cache_dir
+            _gateway = SearchGateway(SearchCache(ttl=ttl, cache_dir=cache_dir), max_workers=max_workers, backend=fake)
+            _gateway_params = params
+            logger.info(f"搜索网关已初始化: 后端={backend}, 缓存TTL={ttl}s, 磁盘缓存={cache_dir or '无'}")
+        elif params != _gateway_params:
+            logger.warning(f"搜索网关已按 {_gateway_params} 创建，本次传入的参数 {params} 不生效")
+        return _gateway
@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+"""
+各入口的冷启动导入耗时基准
+
+每个入口在独立子进程中用 python -X importtime 导入，统计导入总耗时、进程总耗时和耗时最多的模块，
+结果写成JSON；指定 --baseline 时与之前的结果比较，任一入口变慢超过容差即以非零状态退出，用于发现启动变慢的改动。
+
+用法:
+    python utils/startup_benchmark.py --output logs/startup_baseline.json
+    python utils/startup_benchmark.py --baseline logs/startup_baseline.json --tolerance 0.2
+    python utils/startup_benchmark.py --entries InsightEngine app --repeat 5 --top 15
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MEDIA_CRAWLER_DIR = os.path.join(PROJECT_ROOT, "MindSpider", "DeepSentimentCrawling", "MediaCrawler")
+
+# Streamlit脚本按文件导入（不以 __main__ 运行，只执行模块顶层代码）
+_IMPORT_SCRIPT = (
+    "import importlib.util, sys; sys.argv = [{path!r}]; "
+    "spec = importlib.util.spec_from_file_location('entry', {path!r}); "
+    "spec.loader.exec_module(importlib.util.module_from_spec(spec))"
+)
+
+# 入口名 -> (执行的语句, 工作目录)
+ENTRY_POINTS: Dict[str, Tuple[str, str]] = {
+    "InsightEngine": ("import InsightEngine", PROJECT_ROOT),
+    "QueryEngine": ("import QueryEngine", PROJECT_ROOT),
+    "MediaEngine": ("import MediaEngine", PROJECT_ROOT),
+    "ReportEngine": ("import ReportEngine", PROJECT_ROOT),
+    "InsightEngine.agent": ("import InsightEngine.agent", PROJECT_ROOT),
+    "QueryEngine.agent": ("import QueryEngine.agent", PROJECT_ROOT),
+    "MediaEngine.agent": ("import MediaEngine.agent", PROJECT_ROOT),
+    "ReportEngine.flask_interface": ("import ReportEngine.flask_interface", PROJECT_ROOT),
+    "app": ("import app", PROJECT_ROOT),
+    "insight_streamlit": (_IMPORT_SCRIPT.format(
+        path=os.path.join(PROJECT_ROOT, "SingleEngineApp", "insight_engine_streamlit_app.py")), PROJECT_ROOT),
+    "media_streamlit": (_IMPORT_SCRIPT.format(
+        path=os.path.join(PROJECT_ROOT, "SingleEngineApp", "media_engine_streamlit_app.py")), PROJECT_ROOT),
+    "query_streamlit": (_IMPORT_SCRIPT.format(
+        path=os.path.join(PROJECT_ROOT, "SingleEngineApp", "query_engine_streamlit_app.py")), PROJECT_ROOT),
+    "MediaCrawler": ("import main", MEDIA_CRAWLER_DIR),
+}
+
+_IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def parse_importtime(stderr: str) -> List[Dict]:
+    """
+    解析 -X importtime 的输出
+
+    Returns:
+        每个模块的 module、self_us、cumulative_us、depth（0为顶层导入）
+    """
+    modules = []
+    base_indent = None
+    for line in stderr.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, module = match.groups()
+        if base_indent is None or len(indent) < base_indent:
+            base_indent = len(indent)
+        modules.append({"module": module, "self_us": int(self_us), "cumulative_us": int(cumulative_us),
+                        "indent": len(indent)})
+    for item in modules:
+        item["depth"] = (item.pop("indent") - (base_indent or 0)) // 2
+    return modules
+
+
+def measure_entry(name: str, statement: str, cwd: str, top: int) -> Dict:
+    """在新的解释器中执行一次入口导入"""
+    env = dict(os.environ, PYTHONIOENCODING="utf-8")
+    started = time.perf_counter()
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", statement], cwd=cwd, env=env,
+                               capture_output=True, text=True, encoding="utf-8", errors="replace")
+    wall_ms = (time.perf_counter() - started) * 1000
+    modules = parse_importtime(completed.stderr)
+    top_level = [item for item in modules if item["depth"] == 0]
+    slowest = sorted(modules, key=lambda item: item["cumulative_us"], reverse=True)[:top]
+    error = None
+    if completed.returncode != 0:
+        error = completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else "导入失败"
+    return {
+        "entry": name,
+        "ok": completed.returncode == 0,
+        "error": error,
+        "wall_ms": round(wall_ms, 1),
+        "import_ms": round(sum(item["cumulative_us"] for item in top_level) / 1000, 1),
+        "module_count": len(modules),
+        "slowest": [{"module": item["module"], "cumulative_ms": round(item["cumulative_us"] / 1000, 1)}
+                    for item in slowest],
+    }
+
+
+def run_benchmark(entries: List[str], repeat: int, top: int) -> Dict[str, Dict]:
+    """每个入口执行 repeat 次，取导入耗时的中位数那一次"""
+    results = {}
+    for name in entries:
+        statement, cwd = ENTRY_POINTS[name]
+        runs = [measure_entry(name, statement, cwd, top) for _ in range(repeat)]
+        runs.sort(key=lambda run: run["import_ms"])
+        result = runs[len(runs) // 2]
+        result["import_ms_runs"] = [run["import_ms"] for run in runs]
+        result["import_ms_stdev"] = round(statistics.pstdev(result["import_ms_runs"]), 1)
+        results[name] = result
+        status = "OK" if result["ok"] else f"失败: {result['error']}"
+        print(f"{name:<30} 导入 {result['import_ms']:>8.1f} ms  进程 {result['wall_ms']:>8.1f} ms  "
+              f"模块 {result['module_count']:>5}  {status}")
+    return results
+
+
+def compare_with_baseline(results: Dict[str, Dict], baseline: Dict[str, Dict], tolerance: float,
+                          min_delta_ms: float) -> List[str]:
+    """返回比基准变慢超过容差的入口说明"""
+    regressions = []
+    for name, result in results.items():
+        previous = baseline.get(name)
+        if not previous or not previous.get("ok") or not result["ok"]:
+            continue
+        before, after = previous["import_ms"], result["import_ms"]
+        if after - before > max(before * tolerance, min_delta_ms):
+            slowest = ", ".join(f"{item['module']}({item['cumulative_ms']}ms)" for item in result["slowest"][:5])
+            regressions.append(f"{name}: {before:.1f} ms -> {after:.1f} ms（耗时最多: {slowest}）")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="各入口冷启动导入耗时基准（python -X importtime）")
+    parser.add_argument("--entries", nargs="+", choices=sorted(ENTRY_POINTS), default=list(ENTRY_POINTS),
+                        help="要测量的入口，默认全部")
+    parser.add_argument("--repeat", type=int, default=3, help="每个入口的测量次数，取中位数")
+    parser.add_argument("--top", type=int, default=10, help="记录耗时最多的模块数")
+    parser.add_argument("--output", help="结果JSON的保存路径")
+    parser.add_argument("--baseline", help="作为基准的结果JSON，变慢超过容差时以状态1退出")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="相对基准允许变慢的比例")
+    parser.add_argument("--min-delta-ms", type=float, default=50.0, help="低于该值的变慢不算回归（排除测量噪声）")
+    args = parser.parse_args(argv)
+
+    results = run_benchmark(args.entries, max(1, args.repeat), args.top)
+
+    if args.output:
+        if os.path.dirname(args.output):
+            os.makedirs(os.path.dirname(args.output), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"python": sys.version.split()[0], "results": results}, f, ensure_ascii=False, indent=2)
+        print(f"结果已保存到: {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f).get("results", {})
+        regressions = compare_with_baseline(results, baseline, args.tolerance, args.min_delta_ms)
+        if regressions:
+            print("启动耗时回归:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print("未发现启动耗时回归")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,238 @@
+"""
+LLM输出的流式JSON解析
+随 stream_invoke 的文本块逐字符推进一个状态机：
+- JSON开始之前的文字、<think>推理块和 ```json 代码块标记在接收时直接跳过
+- 顶层对象的每个字段（顶层数组的每个元素）一完成即产出，调用方可以提前开始后续阶段
+- 每个顶层值只在完成时 json.loads 一次，整个输出不再做多轮正则清理
+- 输出被截断时按状态机记录的未闭合结构补全：未闭合的字符串值保留已生成的内容，
+  写了一半的键、数字或字面量丢弃，然后依次补上缺失的括号
+"""
+
+import json
+from dataclasses import dataclass
+from typing import Any, List, Optional, Tuple, Union
+
+FieldKey = Union[str, int]
+
+_THINK_OPEN = "<think>"
+_THINK_CLOSE = "</think>"
+_WHITESPACE = " \t\r\n"
+
+
+@dataclass
+class JSONStreamResult:
+    """流式解析的结果"""
+    value: Any = None           # 解析出的JSON值，未找到JSON时为None
+    text: str = ""              # 去掉推理块后的JSON文本（未找到JSON时为去掉推理块和代码块标记的全文）
+    complete: bool = False      # JSON是否完整闭合
+    repaired: bool = False      # 是否经过截断补全
+
+
+class _Frame:
+    """一个未闭合的对象或数组"""
+    __slots__ = ("kind", "expect", "member_start", "key_start", "key", "value_start")
+
+    def __init__(self, kind: str, member_start: int):
+        self.kind = kind                    # "{" 或 "["
+        self.expect = "key" if kind == "{" else "value"
+        self.member_start = member_start    # 当前成员在JSON文本中的起始位置（截断补全时回退到这里）
+        self.key_start = -1
+        self.key: Optional[str] = None
+        self.value_start = -1
+
+
+class StreamingJSONParser:
+    """增量JSON解析器，feed 每个文本块，finish 取得结果"""
+
+    def __init__(self):
+        self._parts: List[str] = []       # JSON文本（从第一个 { 或 [ 开始）
+        self._length = 0
+        self._plain: List[str] = []       # JSON开始前、推理块之外的文字
+        self._tail = ""                   # JSON开始前最近的几个字符，用于识别 <think> 标签
+        self._in_think = False
+        self._started = False
+        self._done = False
+        self._stack: List[_Frame] = []
+        self._in_string = False
+        self._string_role = ""            # "key" 或 "value"
+        self._escape = False
+        self._in_scalar = False
+        self._fields: List[Tuple[FieldKey, Any]] = []
+        self._root: Any = None
+
+    @property
+    def fields(self) -> List[Tuple[FieldKey, Any]]:
+        """已完成的顶层字段（顶层为数组时键为元素序号）"""
+        return list(self._fields)
+
+    def feed(self, chunk: str) -> List[Tuple[FieldKey, Any]]:
+        """
+        输入一个文本块
+
+        Returns:
+            本块中完成的顶层字段 [(键, 值), ...]
+        """
+        completed_before = len(self._fields)
+        for char in chunk:
+            if self._done:
+                break
+            if not self._started:
+                self._scan_preamble(char)
+            else:
+                self._step(char)
+        return self._fields[completed_before:]
+
+    def _scan_preamble(self, char: str):
+        self._tail = (self._tail + char)[-len(_THINK_CLOSE):]
+        if self._in_think:
+            if self._tail.endswith(_THINK_CLOSE):
+                self._in_think = False
+            return
+        if self._tail.endswith(_THINK_OPEN):
+            self._in_think = True
+            del self._plain[-(len(_THINK_OPEN) - 1):]
+            return
+        if char in "{[":
+            self._started = True
+            self._step(char)
+            return
+        self._plain.append(char)
+
+    def _append(self, char: str):
+        self._parts.append(char)
+        self._length += 1
+
+    def _text(self, start: int = 0, end: Optional[int] = None) -> str:
+        if len(self._parts) > 1:
+            self._parts = ["".join(self._parts)]
+        return self._parts[0][start:end] if self._parts else ""
+
+    def _step(self, char: str):
+        position = self._length
+        self._append(char)
+
+        if self._in_string:
+            if self._escape:
+                self._escape = False
+            elif char == "\\":
+                self._escape = True
+            elif char == '"':
+                self._in_string = False
+                frame = self._stack[-1]
+                if self._string_role == "key":
+                    # 只有顶层字段需要键名
+                    if len(self._stack) == 1:
+                        frame.key = self._load(self._text(frame.key_start, position + 1))
+                    frame.expect = "colon"
+                else:
+                    self._value_done(position + 1)
+            return
+
+        if self._in_scalar:
+            if char not in _WHITESPACE and char not in ",}]":
+                return
+            self._in_scalar = False
+            self._value_done(position)
+
+        if char in _WHITESPACE:
+            return
+
+        frame = self._stack[-1] if self._stack else None
+        if char in "{[":
+            if frame is not None:
+                if frame.expect != "value":
+                    return
+                frame.value_start = position
+                frame.expect = "open"
+            self._stack.append(_Frame(char, position + 1))
+        elif char in "}]":
+            if frame is None:
+                return
+            closed = self._stack.pop()
+            if not self._stack:
+                self._finish_root(closed)
+            else:
+                self._value_done(position + 1)
+        elif char == '"':
+            if frame.expect == "key":
+                self._in_string, self._string_role = True, "key"
+                frame.key_start = position
+            elif frame.expect == "value":
+                self._in_string, self._string_role = True, "value"
+                frame.value_start = position
+        elif char == ":":
+            if frame.expect == "colon":
+                frame.expect = "value"
+        elif char == ",":
+            frame.expect = "key" if frame.kind == "{" else "value"
+            frame.member_start = position + 1
+        elif frame.expect == "value":
+            self._in_scalar = True
+            frame.value_start = position
+
+    def _value_done(self, end: int):
+        """当前容器中的一个值已完成，若在顶层容器中则产出该字段"""
+        frame = self._stack[-1]
+        frame.expect = "comma"
+        if len(self._stack) != 1:
+            return
+        value = self._load(self._text(frame.value_start, end))
+        key: FieldKey = frame.key if frame.kind == "{" else len(self._fields)
+        self._fields.append((key, value))
+
+    def _finish_root(self, frame: _Frame):
+        # 顶层各字段已在完成时解析过，直接组装，不再整体解析一遍
+        self._done = True
+        if frame.kind == "{":
+            self._root = dict(self._fields)
+        else:
+            self._root = [value for _, value in self._fields]
+
+    @staticmethod
+    def _load(text: str) -> Any:
+        try:
+            return json.loads(text, strict=False)
+        except ValueError:
+            # 字符串中的非法转义：去掉引号后按原文保留
+            if len(text) >= 2 and text[0] == '"' and text[-1] == '"':
+                return text[1:-1].replace('\\"', '"').replace("\\n", "\n")
+            return None
+
+    def finish(self) -> JSONStreamResult:
+        """输入结束，返回解析结果（未闭合时补全）"""
+        if not self._started:
+            text = "".join(self._plain).replace("```json", "").replace("```", "").strip()
+            return JSONStreamResult(value=None, text=text)
+        if self._done:
+            return JSONStreamResult(value=self._root, text=self._text(), complete=True)
+
+        repaired = self._repair()
+        value = None
+        try:
+            value = json.loads(repaired, strict=False)
+        except ValueError:
+            pass
+        return JSONStreamResult(value=value, text=repaired, complete=False, repaired=True)
+
+    def _repair(self) -> str:
+        """按未闭合的结构补全截断的JSON"""
+        text = self._text()
+        frame = self._stack[-1]
+        if self._in_string and self._string_role == "value":
+            # 保留已生成的字符串内容
+            if self._escape:
+                text = text[:-1]
+            text += '"'
+        elif self._in_string or self._in_scalar or frame.expect in ("colon", "value", "open"):
+            # 写了一半的键、数字或字面量，以及只有键没有值的成员，整体丢弃
+            text = text[:frame.member_start]
+        text = text.rstrip(_WHITESPACE).rstrip(",")
+        closers = "".join("}" if f.kind == "{" else "]" for f in reversed(self._stack))
+        return text + closers
+
+
+def parse_json_text(text: str) -> JSONStreamResult:
+    """一次性解析完整的LLM输出（与流式解析的处理方式相同）"""
+    parser = StreamingJSONParser()
+    parser.feed(text or "")
+    return parser.finish()
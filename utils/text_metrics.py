@@ -0,0 +1,76 @@
+"""
+文本度量工具
+token计数（报告上下文打包、搜索结果打包共用）与基于相邻三字的SimHash指纹（近似重复检测）
+"""
+
+import hashlib
+import math
+import re
+from collections import Counter
+from functools import lru_cache
+from typing import Callable
+
+from loguru import logger
+
+try:
+    import tiktoken
+    TIKTOKEN_AVAILABLE = True
+except ImportError:
+    TIKTOKEN_AVAILABLE = False
+
+_CJK = re.compile(r"[一-鿿぀-ヿ가-힯]")
+_WHITESPACE = re.compile(r"\s+")
+_encoding_warned = False
+
+
+def estimate_tokens(text: str) -> int:
+    """按中日韩文字约1字1token、其他字符约4字符1token估算"""
+    cjk = len(_CJK.findall(text))
+    return cjk + math.ceil((len(text) - cjk) / 4)
+
+
+@lru_cache(maxsize=8)
+def get_token_counter(model_name: str = "") -> Callable[[str], int]:
+    """
+    返回目标模型的token计数函数
+    安装了tiktoken时使用模型对应的编码（未知模型使用cl100k_base），否则使用 estimate_tokens 估算；
+    编码文件无法加载时（如离线环境下载不到BPE文件）同样回退到估算
+    """
+    global _encoding_warned
+    if TIKTOKEN_AVAILABLE:
+        try:
+            try:
+                encoding = tiktoken.encoding_for_model(model_name)
+            except KeyError:
+                encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception as e:
+            if not _encoding_warned:
+                _encoding_warned = True
+                logger.warning(f"tiktoken编码加载失败，token数改用估算: {e}")
+            return estimate_tokens
+        return lambda text: len(encoding.encode(text, disallowed_special=()))
+    return estimate_tokens
+
+
+def _shingle_hash(shingle: str) -> int:
+    return int.from_bytes(hashlib.md5(shingle.encode("utf-8")).digest()[:8], "big")
+
+
+def simhash(text: str, bits: int = 64) -> int:
+    """基于相邻三字的SimHash指纹（去掉空白后计算，适合中文短文本）"""
+    normalized = _WHITESPACE.sub("", text or "")
+    shingles = Counter(normalized[i:i + 3] for i in range(max(len(normalized) - 2, 1)))
+    # 每个三字片段的哈希写成定长二进制串，按列统计1的个数（逐位循环放在C层的zip与count中完成）
+    rows = []
+    for shingle, count in shingles.items():
+        value = _shingle_hash(shingle) >> (64 - bits) if bits < 64 else _shingle_hash(shingle)
+        rows.extend([format(value, f"0{bits}b")] * count)
+    total = len(rows)
+    fingerprint = 0
+    for column in zip(*rows):
+        fingerprint = (fingerprint << 1) | (2 * column.count("1") > total)
+    return fingerprint
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")